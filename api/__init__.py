@@ -0,0 +1,10 @@
+from pathlib import Path
+
+# .env da raiz do projeto como fallback local (não sobrescreve o env do
+# container). Fica aqui para valer antes de qualquer módulo da API ler o
+# ambiente no import; sem .env (imagem de produção) o dotenv nem é importado.
+_ENV = Path(__file__).resolve().parent.parent / ".env"
+if _ENV.is_file():
+    from dotenv import load_dotenv
+
+    load_dotenv(dotenv_path=_ENV, override=False)
@@ -0,0 +1,265 @@
+import base64
+import json
+import os
+import queue
+import random
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# Captura de tráfego real para o bench/replay.py: uma amostra das requisições
+# (rota, corpo, headers relevantes, status, resposta e duração) vai para
+# arquivos JSONL em CAPTURA_DIR.
+#
+# Desligada por padrão. Na requisição só se copia bytes para uma fila; JSON,
+# escrita em disco e rotação ficam numa thread própria. Com a fila cheia o
+# registro é descartado (e contado), nunca segura a resposta.
+#
+# Os arquivos têm dados pessoais dos leads (nome, telefone, e-mail): o
+# diretório deve ter o mesmo cuidado que um dump do banco.
+
+CAPTURA_ENABLED = os.getenv("CAPTURA_ENABLED", "0") not in ("0", "false", "False")
+CAPTURA_DIR = os.getenv("CAPTURA_DIR", "capturas")
+# Fração das requisições capturadas (0 a 1)
+CAPTURA_AMOSTRA = float(os.getenv("CAPTURA_AMOSTRA", 1.0))
+# Corpo de requisição/resposta guardado até esse tamanho (o resto é cortado)
+CAPTURA_CORPO_MAX = int(os.getenv("CAPTURA_CORPO_MAX", 64 * 1024))
+CAPTURA_ARQUIVO_MAX_MB = float(os.getenv("CAPTURA_ARQUIVO_MAX_MB", 64))
+CAPTURA_ARQUIVOS_MAX = int(os.getenv("CAPTURA_ARQUIVOS_MAX", 20))
+CAPTURA_FILA_MAX = int(os.getenv("CAPTURA_FILA_MAX", 10_000))
+CAPTURA_ROTAS_IGNORADAS = tuple(
+    r for r in os.getenv("CAPTURA_ROTAS_IGNORADAS", "/health,/metrics,/docs,/openapi.json").split(",") if r
+)
+
+# Headers que mudam o comportamento da API; o resto (inclusive auth) não é guardado
+HEADERS_CAPTURADOS = ("content-type", "idempotency-key", "x-tenant")
+
+_FIM = object()
+
+
+def _decodificar(corpo: bytes, content_type: str) -> Dict[str, Any]:
+    """Corpo em JSON quando der, texto quando não, base64 em último caso."""
+    if not corpo:
+        return {}
+    if "json" in content_type:
+        try:
+            return {"json": json.loads(corpo)}
+        except ValueError:
+            pass
+    try:
+        return {"texto": corpo.decode("utf-8")}
+    except UnicodeDecodeError:
+        return {"base64": base64.b64encode(corpo).decode()}
+
+
+class GravadorCaptura:
+    """
+    Thread que grava os registros em `diretorio`/captura-<data>-<pid>-<n>.jsonl.
+    Troca de arquivo ao passar de `max_bytes` e apaga os mais antigos além de
+    `max_arquivos`. Cada processo (worker) escreve nos seus arquivos.
+    """
+
+    def __init__(
+        self,
+        diretorio: str = CAPTURA_DIR,
+        max_bytes: int = int(CAPTURA_ARQUIVO_MAX_MB * 1024 * 1024),
+        max_arquivos: int = CAPTURA_ARQUIVOS_MAX,
+        fila_max: int = CAPTURA_FILA_MAX,
+    ):
+        self.diretorio = Path(diretorio)
+        self.max_bytes = max_bytes
+        self.max_arquivos = max_arquivos
+        self._fila: "queue.Queue[Any]" = queue.Queue(maxsize=fila_max)
+        self._thread: Optional[threading.Thread] = None
+        self._trava = threading.Lock()
+        self._arquivo = None
+        self._tamanho = 0
+        self._sequencia = 0
+        self.gravados = 0
+        self.descartados = 0
+        self.erros = 0
+
+    def registrar(self, registro: Dict[str, Any]) -> None:
+        """Não bloqueia: com a fila cheia o registro é descartado."""
+        self._garantir_thread()
+        try:
+            self._fila.put_nowait(registro)
+        except queue.Full:
+            self.descartados += 1
+
+    def _garantir_thread(self) -> None:
+        if self._thread is not None:
+            return
+        with self._trava:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="captura", daemon=True)
+                self._thread.start()
+
+    def parar(self, timeout: float = 5.0) -> None:
+        """Grava o que estiver na fila e fecha o arquivo atual."""
+        if self._thread is None:
+            return
+        self._fila.put(_FIM)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _loop(self) -> None:
+        while True:
+            registro = self._fila.get()
+            if registro is _FIM:
+                break
+            try:
+                self._escrever(self._serializar(registro))
+                # esvazia o que já chegou antes de dar flush
+                while True:
+                    try:
+                        registro = self._fila.get_nowait()
+                    except queue.Empty:
+                        break
+                    if registro is _FIM:
+                        self._fechar()
+                        return
+                    self._escrever(self._serializar(registro))
+                self._arquivo.flush()
+            except Exception as e:
+                self.erros += 1
+                print(f"❌ Erro ao gravar captura: {e}")
+        self._fechar()
+
+    def _serializar(self, registro: Dict[str, Any]) -> bytes:
+        for campo, tipo in (("corpo", "content_type"), ("resposta", "resposta_content_type")):
+            registro[campo] = _decodificar(registro[campo], registro.pop(tipo, ""))
+        return (json.dumps(registro, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+
+    def _escrever(self, linha: bytes) -> None:
+        if self._arquivo is None or self._tamanho + len(linha) > self.max_bytes:
+            self._rotacionar()
+        self._arquivo.write(linha)
+        self._tamanho += len(linha)
+        self.gravados += 1
+
+    def _rotacionar(self) -> None:
+        self._fechar()
+        self.diretorio.mkdir(parents=True, exist_ok=True)
+        self._sequencia += 1
+        nome = f"captura-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{self._sequencia:04d}.jsonl"
+        self._arquivo = open(self.diretorio / nome, "ab")
+        self._tamanho = 0
+        self._apagar_antigos()
+
+    def _apagar_antigos(self) -> None:
+        arquivos = sorted(self.diretorio.glob("captura-*.jsonl"), key=lambda p: p.stat().st_mtime)
+        for antigo in arquivos[: max(0, len(arquivos) - self.max_arquivos)]:
+            try:
+                antigo.unlink()
+            except OSError:
+                pass
+
+    def _fechar(self) -> None:
+        if self._arquivo is not None:
+            self._arquivo.close()
+            self._arquivo = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "habilitado": CAPTURA_ENABLED,
+            "diretorio": str(self.diretorio),
+            "pendentes": self._fila.qsize(),
+            "gravados": self.gravados,
+            "descartados": self.descartados,
+            "erros": self.erros,
+        }
+
+
+gravador = GravadorCaptura()
+
+
+class CapturaMiddleware:
+    """
+    Middleware ASGI que copia requisição e resposta (até `corpo_max` bytes
+    cada) de uma amostra das chamadas HTTP e entrega ao gravador.
+    """
+
+    def __init__(
+        self,
+        app,
+        habilitado: bool = CAPTURA_ENABLED,
+        amostra: float = CAPTURA_AMOSTRA,
+        corpo_max: int = CAPTURA_CORPO_MAX,
+        destino: GravadorCaptura = gravador,
+    ):
+        self.app = app
+        self.habilitado = habilitado
+        self.amostra = amostra
+        self.corpo_max = corpo_max
+        self.destino = destino
+
+    def _capturar(self, scope) -> bool:
+        if not self.habilitado or scope["type"] != "http":
+            return False
+        if scope["path"].startswith(CAPTURA_ROTAS_IGNORADAS):
+            return False
+        return self.amostra >= 1 or random.random() < self.amostra
+
+    async def __call__(self, scope, receive, send):
+        if not self._capturar(scope):
+            await self.app(scope, receive, send)
+            return
+
+        inicio = time.perf_counter()
+        ts = time.time()
+        corpo: List[bytes] = []
+        resposta: List[bytes] = []
+        tamanhos = {"corpo": 0, "resposta": 0}
+        estado: Dict[str, Any] = {"status": 500, "content_type": ""}
+
+        def guardar(partes: List[bytes], campo: str, dados: bytes) -> None:
+            livre = self.corpo_max - tamanhos[campo]
+            if livre > 0 and dados:
+                partes.append(dados[:livre])
+            tamanhos[campo] += len(dados)
+
+        async def receive_capturado():
+            mensagem = await receive()
+            if mensagem["type"] == "http.request":
+                guardar(corpo, "corpo", mensagem.get("body", b""))
+            return mensagem
+
+        async def send_capturado(mensagem):
+            if mensagem["type"] == "http.response.start":
+                estado["status"] = mensagem["status"]
+                for nome, valor in mensagem.get("headers", ()):
+                    if nome.lower() == b"content-type":
+                        estado["content_type"] = valor.decode("latin-1")
+            elif mensagem["type"] == "http.response.body":
+                guardar(resposta, "resposta", mensagem.get("body", b""))
+            await send(mensagem)
+
+        try:
+            await self.app(scope, receive_capturado, send_capturado)
+        finally:
+            headers = {}
+            for nome, valor in scope.get("headers", ()):
+                nome = nome.decode("latin-1").lower()
+                if nome in HEADERS_CAPTURADOS:
+                    headers[nome] = valor.decode("latin-1")
+            rota = scope.get("route")
+
+            self.destino.registrar({
+                "ts": ts,
+                "metodo": scope["method"],
+                "caminho": scope["path"],
+                "query": scope.get("query_string", b"").decode("latin-1"),
+                "rota": getattr(rota, "path", None),
+                "headers": headers,
+                "status": estado["status"],
+                "duracao_ms": round((time.perf_counter() - inicio) * 1000, 3),
+                "corpo_truncado": tamanhos["corpo"] > self.corpo_max,
+                "resposta_truncada": tamanhos["resposta"] > self.corpo_max,
+                # bytes crus: a decodificação fica na thread do gravador
+                "corpo": b"".join(corpo),
+                "content_type": headers.get("content-type", ""),
+                "resposta": b"".join(resposta),
+                "resposta_content_type": estado["content_type"],
+            })
@@ -1,11 +1,15 @@
 import os
-from mysql.connector import pooling, Error
-from dotenv import load_dotenv
-from pathlib import Path
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict
 
-# Carrega .env só como fallback local (não sobrescreve env do container)
-env_path = Path(__file__).resolve().parent.parent / ".env"
-load_dotenv(dotenv_path=env_path, override=False)
+from api.pooling import PoolMetrics, PoolSettings, PoolTimeout
+
+# O .env local é carregado em api/__init__.py, antes de qualquer módulo ler o ambiente.
+#
+# O mysql.connector (~120 ms de import, puxa o dnspython) só é importado
+# quando o pool síncrono é usado de verdade: os workers da API usam o
+# aiomysql e não pagam esse custo no boot.
 
 DB_CONFIG = {
     "host": os.getenv("DB_HOST", "mysql_mysql"),
@@ -17,25 +21,144 @@ DB_CONFIG = {
     "autocommit": True,
 }
 
-try:
-    pool = pooling.MySQLConnectionPool(
-        pool_name="main_pool",
-        pool_size=5,
-        pool_reset_session=True,
-        **DB_CONFIG
-    )
-except Error as e:
-    print("❌ Erro ao criar pool de conexões:", e)
-    raise
+# O pool síncrono é criado só no primeiro uso: a API usa o pool assíncrono
+# (api/db_async.py) e não deve abrir conexões síncronas só por importar os
+# repositórios. Scripts como o teste_db.py continuam usando este aqui.
+#
+# Tamanho (DB_POOL_SIZE) e espera máxima (DB_POOL_TIMEOUT) vêm do ambiente.
+# O MySQLConnectionPool abre todas as conexões de uma vez e não tem overflow;
+# conexões caídas são reabertas por ele mesmo ao serem retiradas do pool.
+POOL_SETTINGS = PoolSettings.from_env()
+metrics = PoolMetrics("sync")
+
+pool = None
+_vagas = threading.BoundedSemaphore(POOL_SETTINGS.tamanho)
+# duas threads no primeiro uso não podem criar dois pools (o segundo abriria
+# mais DB_POOL_SIZE conexões e o primeiro ficaria órfão)
+_criando_pool = threading.Lock()
+
+
+def _get_pool():
+    global pool
+    if pool is not None:
+        return pool
+    with _criando_pool:
+        if pool is None:
+            from mysql.connector import Error, pooling
+
+            try:
+                pool = pooling.MySQLConnectionPool(
+                    pool_name="main_pool",
+                    pool_size=POOL_SETTINGS.tamanho,
+                    pool_reset_session=True,
+                    **DB_CONFIG
+                )
+            except Error as e:
+                print("❌ Erro ao criar pool de conexões:", e)
+                raise
+    return pool
+
+
+class _ConexaoDoPool:
+    """
+    Conexão do pool que devolve a vaga no semáforo quando é fechada.
+    Repassa todo o resto para a conexão do mysql.connector.
+    """
+
+    def __init__(self, conn):
+        self._conn = conn
+        self._fechada = False
+
+    def __getattr__(self, nome):
+        return getattr(self._conn, nome)
+
+    def close(self):
+        if self._fechada:
+            return
+        self._fechada = True
+        try:
+            self._conn.close()
+        finally:
+            _vagas.release()
+            metrics.liberada()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
 
 def get_conn():
+    """
+    Pega uma conexão do pool. Se todas estiverem em uso, espera na fila até
+    DB_POOL_TIMEOUT segundos (em vez do PoolError imediato do mysql.connector)
+    e então levanta PoolTimeout.
+    """
+    inicio = metrics.inicio_espera()
+    if not _vagas.acquire(timeout=POOL_SETTINGS.timeout):
+        metrics.fim_espera(inicio, "timeout")
+        raise PoolTimeout(
+            f"Nenhuma conexão livre no pool em {POOL_SETTINGS.timeout:g}s "
+            f"({POOL_SETTINGS.tamanho} conexões)"
+        )
+    from mysql.connector import Error
+
     try:
-        return pool.get_connection()
+        conn = _get_pool().get_connection()
     except Error as e:
+        _vagas.release()
+        metrics.fim_espera(inicio, "erro")
         print("❌ Erro ao obter conexão do pool:", e)
         raise
+    metrics.fim_espera(inicio, "ok")
+    return _ConexaoDoPool(conn)
+
+
+def pool_stats() -> Dict[str, Any]:
+    return {
+        "tamanho": POOL_SETTINGS.tamanho,
+        "timeout": POOL_SETTINGS.timeout,
+        "criado": pool is not None,
+        **metrics.snapshot(),
+    }
+
+@contextmanager
+def usar_conn(conn=None):
+    """
+    Reaproveita a conexão recebida (ex.: dentro de uma transação) ou,
+    se não vier nenhuma, pega uma do pool e devolve no final.
+    """
+    if conn is not None:
+        yield conn
+        return
+    with get_conn() as nova:
+        yield nova
+
+
+@contextmanager
+def transacao():
+    """
+    Abre uma transação numa conexão do pool: commit no final do bloco,
+    rollback se der exceção.
+
+        with transacao() as conn:
+            lead_id = upsert_lead(data, conn=conn)
+            add_event(lead_id, "entrada", data, conn=conn)
+    """
+    with get_conn() as conn:
+        conn.start_transaction()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
 
 def ping():
+    from mysql.connector import Error
+
     try:
         with get_conn() as conn:
             with conn.cursor(buffered=True) as cur:
@@ -43,6 +166,6 @@ def ping():
                 cur.fetchone()
         print("✅ Conexão bem-sucedida com o banco de dados!")
         return True
-    except Error as e:
+    except (Error, PoolTimeout) as e:
         print("❌ Falha no ping do banco:", e)
         return False
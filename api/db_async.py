@@ -0,0 +1,224 @@
+import asyncio
+import os
+import time
+import weakref
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
+
+import aiomysql
+
+from api.db import DB_CONFIG
+from api.pooling import PoolMetrics, PoolSettings, PoolTimeout
+
+# Pool assíncrono usado pelos endpoints da API (um por processo do uvicorn).
+# É criado no startup da aplicação (lifespan em api/main.py).
+#
+# - DB_POOL_SIZE conexões ficam abertas; sob carga abre até DB_POOL_MAX_OVERFLOW extras
+# - quem não consegue conexão em DB_POOL_TIMEOUT segundos recebe PoolTimeout (503)
+# - conexões mais velhas que DB_POOL_RECYCLE são recriadas pelo aiomysql
+# - conexões paradas há mais de DB_POOL_HEALTHCHECK_INTERVAL levam um ping antes
+#   de serem entregues, e um health check periódico testa o pool
+POOL_SETTINGS = PoolSettings.from_env()
+metrics = PoolMetrics("async")
+
+pool: Optional[aiomysql.Pool] = None
+_health_task: Optional[asyncio.Task] = None
+_ultimo_uso: "weakref.WeakKeyDictionary[Any, float]" = weakref.WeakKeyDictionary()
+
+
+async def criar_pool() -> aiomysql.Pool:
+    global pool, _health_task
+    if pool is None:
+        try:
+            pool = await aiomysql.create_pool(
+                host=DB_CONFIG["host"],
+                port=DB_CONFIG["port"],
+                user=DB_CONFIG["user"],
+                password=DB_CONFIG["password"],
+                db=DB_CONFIG["database"],
+                charset=DB_CONFIG["charset"],
+                autocommit=DB_CONFIG["autocommit"],
+                minsize=POOL_SETTINGS.tamanho,
+                maxsize=POOL_SETTINGS.maximo,
+                pool_recycle=POOL_SETTINGS.recycle,
+            )
+        except aiomysql.Error as e:
+            print("❌ Erro ao criar pool assíncrono de conexões:", e)
+            raise
+        if POOL_SETTINGS.health_interval > 0:
+            _health_task = asyncio.create_task(_health_loop(), name="db-pool-health")
+    return pool
+
+
+async def fechar_pool() -> None:
+    global pool, _health_task
+    if _health_task is not None:
+        _health_task.cancel()
+        await asyncio.gather(_health_task, return_exceptions=True)
+        _health_task = None
+    if pool is not None:
+        pool.close()
+        await pool.wait_closed()
+        pool = None
+
+
+@asynccontextmanager
+async def get_conn():
+    """
+    Pega uma conexão do pool assíncrono. Se o pool estiver todo em uso,
+    espera uma conexão ser devolvida (sem bloquear o event loop) por até
+    DB_POOL_TIMEOUT segundos; depois disso levanta PoolTimeout.
+    """
+    if pool is None:
+        await criar_pool()
+
+    inicio = metrics.inicio_espera()
+    try:
+        conn = await asyncio.wait_for(pool.acquire(), POOL_SETTINGS.timeout)
+    except asyncio.TimeoutError:
+        metrics.fim_espera(inicio, "timeout")
+        raise PoolTimeout(
+            f"Nenhuma conexão livre no pool em {POOL_SETTINGS.timeout:g}s "
+            f"({POOL_SETTINGS.maximo} conexões)"
+        )
+    except BaseException:
+        metrics.fim_espera(inicio, "erro")
+        raise
+    metrics.fim_espera(inicio, "ok")
+
+    try:
+        await _ping_se_ociosa(conn)
+        yield conn
+    finally:
+        _ultimo_uso[conn] = time.monotonic()
+        pool.release(conn)
+        metrics.liberada()
+
+
+async def _ping_se_ociosa(conn) -> None:
+    """
+    Conexão parada há muito tempo pode ter sido derrubada pelo servidor
+    (wait_timeout) ou pela rede: testa antes de entregar e reconecta se
+    precisar.
+    """
+    ultimo = _ultimo_uso.get(conn)
+    if ultimo is None or time.monotonic() - ultimo < POOL_SETTINGS.health_interval:
+        return
+    try:
+        await conn.ping(reconnect=False)
+    except Exception:
+        metrics.reconexao()
+        await conn.ping(reconnect=True)
+
+
+async def _health_loop() -> None:
+    while True:
+        await asyncio.sleep(POOL_SETTINGS.health_interval)
+        metrics.health(await ping())
+
+
+def pool_stats() -> Dict[str, Any]:
+    return {
+        "tamanho": POOL_SETTINGS.tamanho,
+        "overflow": POOL_SETTINGS.overflow,
+        "maximo": POOL_SETTINGS.maximo,
+        "timeout": POOL_SETTINGS.timeout,
+        "recycle": POOL_SETTINGS.recycle,
+        "abertas": pool.size if pool is not None else 0,
+        "livres": pool.freesize if pool is not None else 0,
+        **metrics.snapshot(),
+    }
+
+
+@asynccontextmanager
+async def usar_conn(conn=None):
+    """
+    Versão assíncrona do api.db.usar_conn: reaproveita a conexão recebida
+    ou pega uma do pool.
+    """
+    if conn is not None:
+        yield conn
+        return
+    async with get_conn() as nova:
+        yield nova
+
+
+@asynccontextmanager
+async def transacao():
+    """
+    Versão assíncrona do api.db.transacao.
+
+        async with transacao() as conn:
+            lead_id = await upsert_lead(data, conn=conn)
+            await add_event(lead_id, "entrada", data, conn=conn)
+    """
+    async with get_conn() as conn:
+        await conn.begin()
+        try:
+            yield conn
+            await conn.commit()
+        except BaseException:
+            await conn.rollback()
+            raise
+
+
+# Tempo que o MySQL espera o cliente consumir um resultado em streaming antes
+# de derrubar a conexão (o padrão do servidor, 60 s, é curto para exportações
+# lidas por clientes lentos).
+DB_STREAM_NET_WRITE_TIMEOUT = int(os.getenv("DB_STREAM_NET_WRITE_TIMEOUT", 600))
+
+
+async def stream_query(
+    sql: str,
+    params: Sequence[Any],
+    tamanho_bloco: int,
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    Executa `sql` com cursor sem buffer (SSDictCursor) e entrega as linhas em
+    blocos de `tamanho_bloco`, sem carregar o resultado inteiro na memória.
+
+    A conexão fica presa até o fim da leitura. Se o consumidor parar no meio
+    (ex.: cliente do download desconectou), a conexão é fechada em vez de
+    ler o resto do resultado só para devolvê-la ao pool. Lido até o fim, o
+    net_write_timeout da sessão volta ao global antes da conexão voltar ao
+    pool; se isso falhar, a conexão também é fechada.
+    """
+    async with get_conn() as conn:
+        cur = await conn.cursor(aiomysql.SSDictCursor)
+        terminou = False
+        try:
+            await cur.execute(
+                "SET SESSION net_write_timeout = %s", (DB_STREAM_NET_WRITE_TIMEOUT,)
+            )
+            await cur.execute(sql, params)
+            while True:
+                rows = await cur.fetchmany(tamanho_bloco)
+                if not rows:
+                    break
+                yield rows
+            terminou = True
+        finally:
+            if terminou:
+                try:
+                    await cur.close()
+                    async with conn.cursor() as restaurar:
+                        await restaurar.execute(
+                            "SET SESSION net_write_timeout = @@GLOBAL.net_write_timeout"
+                        )
+                except BaseException:
+                    conn.close()
+                    raise
+            else:
+                # fechar o cursor leria todas as linhas restantes do servidor
+                conn.close()
+
+
+async def ping() -> bool:
+    try:
+        async with get_conn() as conn, conn.cursor() as cur:
+            await cur.execute("SELECT 1")
+            await cur.fetchone()
+        return True
+    except (aiomysql.Error, OSError, PoolTimeout) as e:
+        print("❌ Falha no ping do banco:", e)
+        return False
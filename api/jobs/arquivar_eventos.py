@@ -0,0 +1,222 @@
+"""
+Ciclo de vida do lead_events particionado (migração 008).
+
+A cada execução:
+1. cria as partições mensais dos próximos LEAD_EVENTS_PARTICOES_FUTURAS meses;
+2. para cada partição que terminou há mais de LEAD_EVENTS_RETENCAO_DIAS dias,
+   lê os eventos em streaming, grava o arquivo comprimido
+   (api/services/arquivo_eventos.py), confere a contagem, remove a partição
+   (DROP PARTITION) e publica o arquivo para a API.
+
+A timeline e a exportação de eventos do lead leem o arquivo junto com o
+banco, então o arquivamento não muda as respostas da API.
+
+    python -m api.jobs.arquivar_eventos                 # arquiva o que passou da retenção
+    python -m api.jobs.arquivar_eventos --dry-run       # só lista o que faria
+    python -m api.jobs.arquivar_eventos --loop 86400    # uma vez por dia (serviço do compose)
+
+Eventos arquivados ficam como estavam: uma mesclagem de leads posterior
+(api.jobs.normalizar_telefones) não os move para o lead sobrevivente.
+"""
+import argparse
+import asyncio
+import os
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from api.db_async import criar_pool, fechar_pool
+from api.repositories.aio.events import (
+    contar_particao,
+    criar_particoes,
+    listar_particoes,
+    remover_particao,
+    stream_particao,
+)
+from api.services.arquivo_eventos import (
+    ARQUIVO_EVENTOS_DIR,
+    EscritorArquivo,
+    ler_indice,
+    nome_arquivo,
+    publicar,
+)
+
+LEAD_EVENTS_RETENCAO_DIAS = int(os.getenv("LEAD_EVENTS_RETENCAO_DIAS", 180))
+LEAD_EVENTS_PARTICOES_FUTURAS = int(os.getenv("LEAD_EVENTS_PARTICOES_FUTURAS", 3))
+ARQUIVAR_TAMANHO_BLOCO = int(os.getenv("ARQUIVAR_TAMANHO_BLOCO", 5000))
+
+
+def _mes_seguinte(mes: date) -> date:
+    return date(mes.year + mes.month // 12, mes.month % 12 + 1, 1)
+
+
+def _mes(particao: str) -> Optional[date]:
+    """Primeiro dia do mês de uma partição pAAAAMM; None para p_antigas/p_futuro."""
+    if len(particao) == 7 and particao[1:].isdigit():
+        return date(int(particao[1:5]), int(particao[5:]), 1)
+    return None
+
+
+def limites(particoes: List[str]) -> Dict[str, date]:
+    """
+    Limite superior (exclusivo) de cada partição: o mês seguinte para as
+    mensais, o início da primeira mensal para a p_antigas. A p_futuro não
+    tem limite e nunca é arquivada.
+    """
+    meses = sorted(m for m in map(_mes, particoes) if m)
+    resultado: Dict[str, date] = {}
+    for particao in particoes:
+        mes = _mes(particao)
+        if mes is not None:
+            resultado[particao] = _mes_seguinte(mes)
+        elif particao == "p_antigas" and meses:
+            resultado[particao] = meses[0]
+    return resultado
+
+
+def meses_a_criar(particoes: List[str], hoje: date, futuras: int) -> List[date]:
+    """Meses que faltam do mês atual até `futuras` meses à frente."""
+    alvo = date(hoje.year, hoje.month, 1)
+    for _ in range(futuras):
+        alvo = _mes_seguinte(alvo)
+
+    meses = sorted(m for m in map(_mes, particoes) if m)
+    mes = _mes_seguinte(meses[-1]) if meses else date(hoje.year, hoje.month, 1)
+    novos: List[date] = []
+    while mes <= alvo:
+        novos.append(mes)
+        mes = _mes_seguinte(mes)
+    return novos
+
+
+async def arquivar_particao(particao: str, ate: date, diretorio: str, tamanho_bloco: int) -> Dict[str, Any]:
+    """Grava o arquivo da partição, confere a contagem, remove a partição e publica."""
+    esperado = await contar_particao(particao)
+    escritor = EscritorArquivo(particao, diretorio)
+    try:
+        async for rows in stream_particao(particao, tamanho_bloco):
+            escritor.adicionar(rows)
+        indice = escritor.concluir(datetime.combine(ate, datetime.min.time()))
+    except BaseException:
+        escritor.descartar()
+        raise
+
+    if indice["total"] != esperado:
+        raise RuntimeError(
+            f"Arquivo da partição {particao} tem {indice['total']} eventos, o banco tem {esperado}; "
+            "partição mantida"
+        )
+    await remover_particao(particao)
+    publicar(particao, diretorio)
+    return indice
+
+
+def _publicar_pendentes(particoes: List[str], diretorio: str) -> List[str]:
+    """
+    Arquivo gravado cuja partição já saiu do banco (o job caiu entre o DROP
+    PARTITION e a publicação): só falta publicar.
+    """
+    publicados: List[str] = []
+    for caminho in Path(diretorio).glob(nome_arquivo("*") + ".idx.json"):
+        particao = caminho.name[len(nome_arquivo("")):-len(".idx.json")]
+        indice = ler_indice(particao, diretorio)
+        if indice and not indice["publicado"] and particao not in particoes:
+            publicar(particao, diretorio)
+            publicados.append(particao)
+    return publicados
+
+
+async def arquivar(
+    dias: int = LEAD_EVENTS_RETENCAO_DIAS,
+    futuras: int = LEAD_EVENTS_PARTICOES_FUTURAS,
+    dry_run: bool = False,
+    diretorio: str = ARQUIVO_EVENTOS_DIR,
+    tamanho_bloco: int = ARQUIVAR_TAMANHO_BLOCO,
+    hoje: Optional[date] = None,
+) -> Dict[str, Any]:
+    inicio = time.perf_counter()
+    hoje = hoje or date.today()
+    corte = hoje - timedelta(days=dias)
+    estado: Dict[str, Any] = {"criadas": [], "arquivadas": [], "eventos": 0, "bytes": 0, "bytes_json": 0}
+
+    particoes = await listar_particoes()
+    if not particoes:
+        print("⚠️ lead_events não está particionada (aplique a migração 008); nada a fazer.", flush=True)
+        return estado
+
+    if not dry_run:
+        for particao in _publicar_pendentes(particoes, diretorio):
+            print(f"   {particao}: arquivo publicado (partição já removida)", flush=True)
+
+    novos = meses_a_criar(particoes, hoje, futuras)
+    if novos and not dry_run:
+        await criar_particoes(novos)
+    estado["criadas"] = [f"p{mes:%Y%m}" for mes in novos]
+
+    for particao, ate in limites(particoes).items():
+        if ate > corte:
+            continue
+        if dry_run:
+            estado["arquivadas"].append(particao)
+            estado["eventos"] += await contar_particao(particao)
+            continue
+
+        anterior = ler_indice(particao, diretorio)
+        if anterior is not None and anterior["publicado"]:
+            # o arquivo publicado já é a fonte desses eventos; não sobrescreve
+            print(f"⚠️ {particao}: já existe arquivo publicado e a partição ainda está no banco", flush=True)
+            continue
+
+        indice = await arquivar_particao(particao, ate, diretorio, tamanho_bloco)
+        estado["arquivadas"].append(particao)
+        estado["eventos"] += indice["total"]
+        estado["bytes"] += indice["bytes"]
+        estado["bytes_json"] += indice["bytes_json"]
+        print(
+            f"   {particao}: {indice['total']} eventos, "
+            f"{indice['bytes_json'] / 1e6:.1f} MB de JSON -> {indice['bytes'] / 1e6:.1f} MB",
+            flush=True,
+        )
+
+    estado["segundos"] = round(time.perf_counter() - inicio, 3)
+    return estado
+
+
+async def _main(args: argparse.Namespace) -> None:
+    await criar_pool()
+    try:
+        while True:
+            print("==> Ciclo de vida do lead_events...", flush=True)
+            try:
+                estado = await arquivar(args.dias, args.futuras, args.dry_run, args.diretorio)
+                acao = "seriam arquivadas" if args.dry_run else "arquivadas"
+                print(
+                    f"✅ {len(estado['criadas'])} partições criadas, {len(estado['arquivadas'])} {acao} "
+                    f"({estado['eventos']} eventos).",
+                    flush=True,
+                )
+            except Exception as e:
+                if not args.loop:
+                    raise
+                print(f"❌ Erro ao arquivar eventos: {e}", flush=True)
+
+            if not args.loop:
+                return
+            await asyncio.sleep(args.loop)
+    finally:
+        await fechar_pool()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Cria partições futuras e arquiva as antigas do lead_events.")
+    parser.add_argument("--dias", type=int, default=LEAD_EVENTS_RETENCAO_DIAS, help="retenção no banco, em dias")
+    parser.add_argument("--futuras", type=int, default=LEAD_EVENTS_PARTICOES_FUTURAS, help="meses criados à frente")
+    parser.add_argument("--diretorio", default=ARQUIVO_EVENTOS_DIR)
+    parser.add_argument("--dry-run", action="store_true", help="só lista, não grava nada")
+    parser.add_argument("--loop", type=int, default=0, help="repete a cada N segundos")
+    asyncio.run(_main(parser.parse_args(argv)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""
+Backfill da phone_key e mesclagem dos leads duplicados pelo telefone.
+
+Antes do E.164 o mesmo número entrava como "11999999999", "5511999999999",
+"1199999999"..., cada um virando um lead. Este job, que roda uma vez entre
+as migrações 006 e 007:
+
+1. percorre os leads em ordem de id e grava a phone_key do telefone
+   normalizado (normalizar_telefones);
+2. para cada phone_key com mais de um lead, mescla tudo no lead mais antigo:
+   eventos, histórico, outbox e follow-ups passam para ele (follow-up de
+   uma regra que ele já tem é descartado), os outros são apagados e ele
+   fica com os dados mais recentes de cada campo (evento `mesclagem`);
+3. reescreve o telefone das linhas no formato E.164.
+
+    python -m api.jobs.normalizar_telefones              # grava
+    python -m api.jobs.normalizar_telefones --dry-run    # só conta o que faria
+
+Pode ser repetido (o que já está normalizado não é regravado). Com a API no
+ar, leads mesclados podem continuar no lead_cache até o TTL vencer.
+"""
+import argparse
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from api.db import transacao, usar_conn
+from api.repositories.events import TIPO_MESCLAGEM, add_event
+from api.repositories.leads import (
+    canonizar_telefones,
+    get_many_for_update,
+    gravar_phone_keys,
+    listar_bloco_telefones,
+    listar_phone_keys_duplicadas,
+    maior_id,
+    mesclar_leads,
+)
+from api.services.normalize import normalizar_telefones, phone_key
+
+TELEFONES_TAMANHO_BLOCO = int(os.getenv("TELEFONES_TAMANHO_BLOCO", 5000))
+
+# Campos em que vale o valor mais recente não vazio entre os duplicados
+_CAMPOS_RECENTES = ("nome", "email", "externo_id", "servico_interesse", "regiao_corpo", "disponibilidade")
+
+
+def _tags(bruto: Any) -> List[str]:
+    if not bruto:
+        return []
+    tags = json.loads(bruto) if isinstance(bruto, (str, bytes)) else bruto
+    return [tags] if isinstance(tags, str) else list(tags)
+
+
+def mesclar(linhas: List[Dict[str, Any]]) -> Tuple[int, List[int], Dict[str, Any], Any]:
+    """
+    Decide a mesclagem de leads com a mesma phone_key (em ordem de id).
+    Devolve (id do sobrevivente, ids duplicados, campos do sobrevivente,
+    updated_at do sobrevivente).
+
+    - sobrevive o mais antigo, que fica com a origem e o created_at da
+      primeira entrada (funil);
+    - nome, e-mail, externo_id e os campos do agente vêm do lead atualizado
+      mais recentemente que tiver o campo preenchido;
+    - tags são unidas; score/etapa vêm do lead de maior score, e "cliente"
+      prevalece.
+    """
+    sobrevivente = linhas[0]
+    recentes = sorted(linhas, key=lambda l: (l["updated_at"], l["id"]), reverse=True)
+
+    campos: Dict[str, Any] = {}
+    for campo in _CAMPOS_RECENTES:
+        valor = next((l[campo] for l in recentes if l[campo]), None)
+        if valor != sobrevivente[campo]:
+            campos[campo] = valor
+
+    tags: List[str] = []
+    for linha in linhas:
+        tags += [t for t in _tags(linha["tags"]) if t not in tags]
+    if tags != _tags(sobrevivente["tags"]):
+        campos["tags"] = json.dumps(tags, ensure_ascii=False)
+
+    maior = max(linhas, key=lambda l: (l["score"] or 0, l["id"]))
+    etapa = "cliente" if any(l["etapa"] == "cliente" for l in linhas) else maior["etapa"]
+    if (maior["score"], etapa) != (sobrevivente["score"], sobrevivente["etapa"]):
+        campos["score"], campos["etapa"] = maior["score"], etapa
+
+    return sobrevivente["id"], [l["id"] for l in linhas[1:]], campos, recentes[0]["updated_at"]
+
+
+def _gravar_chaves(tamanho_bloco: int, dry_run: bool, estado: Dict[str, Any]) -> None:
+    with usar_conn() as conn:
+        ultimo_id = 0
+        while True:
+            bloco = listar_bloco_telefones(ultimo_id, tamanho_bloco, conn=conn)
+            if not bloco:
+                break
+            ids, telefones, chaves = zip(*bloco)
+            ultimo_id = ids[-1]
+
+            novas = [phone_key(t) for t in normalizar_telefones(telefones)]
+            alteracoes = [(i, nova) for i, nova, atual in zip(ids, novas, chaves) if nova != atual]
+            if alteracoes and not dry_run:
+                gravar_phone_keys(alteracoes, conn=conn)
+
+            estado["com_telefone"] += len(bloco)
+            estado["chaves_gravadas"] += len(alteracoes)
+            estado["sem_chave"] += sum(1 for nova in novas if nova is None)
+            print(f"   chaves: até o id {ultimo_id}, {estado['chaves_gravadas']} gravadas", flush=True)
+
+
+def _mesclar_duplicados(tamanho_bloco: int, dry_run: bool, estado: Dict[str, Any]) -> None:
+    ultima_chave = 0
+    while True:
+        grupos = listar_phone_keys_duplicadas(ultima_chave, tamanho_bloco)
+        if not grupos:
+            break
+        ultima_chave = grupos[-1][0]
+
+        for chave, ids in grupos:
+            estado["grupos"] += 1
+            if dry_run:
+                estado["mesclados"] += len(ids) - 1
+                continue
+            with transacao() as conn:
+                linhas = get_many_for_update(ids, conn)
+                if len(linhas) < 2:
+                    continue
+                sobrevivente_id, duplicados, campos, atualizado_em = mesclar(linhas)
+                mesclar_leads(sobrevivente_id, duplicados, campos, atualizado_em, conn)
+                add_event(
+                    sobrevivente_id,
+                    TIPO_MESCLAGEM,
+                    {"phone_key": chave, "leads_mesclados": duplicados, "campos": campos},
+                    conn=conn,
+                )
+            estado["mesclados"] += len(duplicados)
+        print(f"   mesclagem: {estado['grupos']} telefones, {estado['mesclados']} leads mesclados", flush=True)
+
+
+def normalizar(tamanho_bloco: int = TELEFONES_TAMANHO_BLOCO, dry_run: bool = False) -> Dict[str, Any]:
+    """
+    Roda as três etapas. No dry-run as chaves não são gravadas, então a
+    contagem de mesclagem só enxerga o que já tinha phone_key.
+    """
+    inicio = time.perf_counter()
+    estado: Dict[str, Any] = {
+        "com_telefone": 0,
+        "chaves_gravadas": 0,
+        "sem_chave": 0,
+        "grupos": 0,
+        "mesclados": 0,
+        "telefones_reescritos": 0,
+        "dry_run": dry_run,
+    }
+
+    _gravar_chaves(tamanho_bloco, dry_run, estado)
+    _mesclar_duplicados(tamanho_bloco, dry_run, estado)
+
+    if not dry_run:
+        with usar_conn() as conn:
+            ate = maior_id(conn=conn)
+            for de_id in range(0, ate, tamanho_bloco):
+                estado["telefones_reescritos"] += canonizar_telefones(de_id, de_id + tamanho_bloco, conn=conn)
+
+    estado["segundos"] = round(time.perf_counter() - inicio, 3)
+    return estado
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Grava a phone_key e mescla leads com o mesmo telefone.")
+    parser.add_argument("--bloco", type=int, default=TELEFONES_TAMANHO_BLOCO, help="leads por bloco")
+    parser.add_argument("--dry-run", action="store_true", help="só conta, não grava nada")
+    args = parser.parse_args(argv)
+
+    print("==> Normalizando telefones dos leads...", flush=True)
+    estado = normalizar(args.bloco, args.dry_run)
+    acao = "seriam mesclados" if args.dry_run else "mesclados"
+    print(
+        f"✅ {estado['com_telefone']} leads com telefone, {estado['chaves_gravadas']} phone_keys "
+        f"{'a gravar' if args.dry_run else 'gravadas'} ({estado['sem_chave']} sem E.164), "
+        f"{estado['mesclados']} {acao} em {estado['grupos']} telefones, "
+        f"{estado['telefones_reescritos']} telefones reescritos em {estado['segundos']:.1f}s.",
+        flush=True,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Reconciliação dos agregados do funil (funil_diario / receita_diaria).
+
+Os triggers da migração 004 mantêm os agregados em dia; este job recalcula
+um período a partir de leads / historico_servicos para a carga inicial e
+para corrigir qualquer deriva (triggers desligados, carga direta no banco...).
+
+    python -m api.jobs.reconciliar_funil                   # últimos FUNIL_RECONCILIAR_DIAS dias
+    python -m api.jobs.reconciliar_funil --de 2024-01-01   # desde uma data (carga inicial)
+    python -m api.jobs.reconciliar_funil --loop 3600       # roda de hora em hora (serviço do compose)
+"""
+import argparse
+import os
+import time
+from datetime import date, timedelta
+from typing import List, Optional
+
+from api.repositories.analytics import reconciliar_funil
+
+FUNIL_RECONCILIAR_DIAS = int(os.getenv("FUNIL_RECONCILIAR_DIAS", 7))
+# Quantos dias cada transação recalcula (períodos longos vão em fatias)
+FUNIL_RECONCILIAR_FATIA = int(os.getenv("FUNIL_RECONCILIAR_FATIA", 31))
+
+
+def reconciliar(de: date, ate: date) -> None:
+    inicio = time.perf_counter()
+    atual = de
+    while atual <= ate:
+        fim = min(atual + timedelta(days=FUNIL_RECONCILIAR_FATIA - 1), ate)
+        funil, receita = reconciliar_funil(atual, fim)
+        print(f"   {atual} .. {fim}: {funil} linhas de funil, {receita} de receita", flush=True)
+        atual = fim + timedelta(days=1)
+    print(f"✅ Funil reconciliado de {de} até {ate} em {time.perf_counter() - inicio:.1f}s.", flush=True)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Recalcula funil_diario e receita_diaria.")
+    parser.add_argument("--de", type=date.fromisoformat, help="data inicial (AAAA-MM-DD)")
+    parser.add_argument("--ate", type=date.fromisoformat, help="data final, inclusive (padrão: hoje)")
+    parser.add_argument("--loop", type=int, default=0, help="repete a cada N segundos")
+    args = parser.parse_args(argv)
+
+    while True:
+        ate = args.ate or date.today()
+        de = args.de or ate - timedelta(days=FUNIL_RECONCILIAR_DIAS)
+        print("==> Reconciliando agregados do funil...", flush=True)
+        try:
+            reconciliar(de, ate)
+        except Exception as e:
+            if not args.loop:
+                raise
+            print(f"❌ Erro ao reconciliar funil: {e}", flush=True)
+
+        if not args.loop:
+            return
+        time.sleep(args.loop)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+Re-score da base inteira de leads.
+
+Recalcula score/etapa de todos os leads com as regras atuais do
+api/services/scoring.py e grava só as linhas que mudaram. Use depois de
+mexer nos pesos ou para aplicar servico_interesse/regiao_corpo/disponibilidade
+que chegaram depois da entrada do lead.
+
+    python -m api.jobs.rescore                   # grava
+    python -m api.jobs.rescore --dry-run         # só conta o que mudaria
+    python -m api.jobs.rescore --tenant clinica  # regras para leads sem tenant gravado
+
+Cada lead é pontuado com as regras do tenant gravado nele (migração 012);
+os que não têm tenant usam as de --tenant ou, sem ele, o padrao.json.
+
+Também pode ser disparado pela API em POST /admin/rescore. Só um re-score
+roda por vez em toda a instalação (GET_LOCK no MySQL, valendo para a CLI e
+para todos os workers da API) e o andamento fica na tabela jobs_estado
+(sql/migrations/011_jobs_estado.sql), lido pelo GET /admin/rescore.
+"""
+import argparse
+import os
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from api.db import usar_conn
+from api.repositories.jobs import gravar_estado, liberar_trava, obter_trava
+from api.repositories.leads import atualizar_scores, contar_leads, listar_bloco_para_score
+from api.services.scoring_vetorizado import calcular_etapas, calcular_scores
+
+RESCORE_TAMANHO_BLOCO = int(os.getenv("RESCORE_TAMANHO_BLOCO", 5000))
+
+JOB = "rescore"
+
+
+class RescoreEmAndamento(Exception):
+    """Outro processo (worker da API ou CLI) já está com a trava do re-score."""
+
+
+def rescore(
+    tamanho_bloco: int = RESCORE_TAMANHO_BLOCO,
+    dry_run: bool = False,
+    progresso: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ao_alterar: Optional[Callable[[List[int]], None]] = None,
+    iniciado: Optional[Callable[[], None]] = None,
+    tenant: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Percorre a tabela `leads` em blocos de `tamanho_bloco` (em ordem de id),
+    calcula os scores do bloco de uma vez com NumPy e grava as diferenças com
+    UPDATE ... CASE.
+
+    `progresso` recebe o resumo parcial depois de cada bloco; `ao_alterar`
+    recebe os ids gravados em cada bloco (ex.: para invalidar cache);
+    `iniciado` é chamado assim que a trava é obtida. `tenant` é o das
+    regras dos leads sem tenant gravado (None: padrao.json).
+
+    A trava (GET_LOCK) é da conexão usada pelo job inteiro: se o processo
+    morrer, ela cai junto. Levanta RescoreEmAndamento se outro processo
+    estiver com ela. O resumo parcial é gravado em jobs_estado a cada bloco.
+    """
+    inicio = time.perf_counter()
+    estado: Dict[str, Any] = {
+        "status": "executando",
+        "total": 0,
+        "processados": 0,
+        "alterados": 0,
+        "dry_run": dry_run,
+        "tenant": tenant,
+        "segundos": 0.0,
+        "inicio": datetime.now().isoformat(),
+    }
+
+    with usar_conn() as conn:
+        if not obter_trava(JOB, conn):
+            raise RescoreEmAndamento()
+        try:
+            gravar_estado(JOB, estado, conn=conn)
+            if iniciado is not None:
+                iniciado()
+            _percorrer(conn, estado, inicio, tamanho_bloco, dry_run, tenant, progresso, ao_alterar)
+            estado["status"] = "concluido"
+        except Exception as e:
+            estado.update(status="erro", erro=str(e))
+            raise
+        finally:
+            estado.update(segundos=round(time.perf_counter() - inicio, 3), fim=datetime.now().isoformat())
+            try:
+                gravar_estado(JOB, estado, conn=conn)
+                liberar_trava(JOB, conn)
+            except Exception as e:
+                # conexão perdida: a trava já caiu com ela
+                print(f"⚠️ Não foi possível gravar o fim do re-score: {e}", flush=True)
+
+    return estado
+
+
+def _pontuar(colunas, etapas, tenants) -> Tuple[np.ndarray, np.ndarray]:
+    """Scores e etapas do bloco, cada grupo de leads com as regras do seu tenant."""
+    grupos: Dict[Optional[str], List[int]] = {}
+    for i, tenant in enumerate(tenants):
+        grupos.setdefault(tenant, []).append(i)
+    if len(grupos) == 1:
+        (tenant,) = grupos
+        scores = calcular_scores(*colunas, tenant=tenant)
+        return scores, calcular_etapas(scores, etapas, tenant=tenant)
+
+    scores = np.empty(len(tenants), dtype=np.int16)
+    novas_etapas = np.empty(len(tenants), dtype=object)
+    for tenant, posicoes in grupos.items():
+        do_grupo = [[coluna[i] for i in posicoes] for coluna in colunas]
+        scores[posicoes] = calcular_scores(*do_grupo, tenant=tenant)
+        novas_etapas[posicoes] = calcular_etapas(scores[posicoes], [etapas[i] for i in posicoes], tenant=tenant)
+    return scores, novas_etapas
+
+
+def _percorrer(
+    conn,
+    estado: Dict[str, Any],
+    inicio: float,
+    tamanho_bloco: int,
+    dry_run: bool,
+    tenant_padrao: Optional[str],
+    progresso: Optional[Callable[[Dict[str, Any]], None]],
+    ao_alterar: Optional[Callable[[List[int]], None]],
+) -> None:
+    estado["total"] = contar_leads(conn=conn)
+    ultimo_id = 0
+
+    while True:
+        bloco = listar_bloco_para_score(ultimo_id, tamanho_bloco, conn=conn)
+        if not bloco:
+            break
+
+        ids, telefones, emails, tags, servicos, regioes, disps, scores, etapas, tenants = zip(*bloco)
+        ultimo_id = ids[-1]
+
+        novos_scores, novas_etapas = _pontuar(
+            (telefones, emails, tags, servicos, regioes, disps),
+            etapas,
+            [t or tenant_padrao for t in tenants],
+        )
+
+        atuais = np.array([-1 if s is None else s for s in scores], dtype=np.int16)
+        mudou = (novos_scores != atuais) | (novas_etapas != np.array(etapas, dtype=object))
+        posicoes = np.flatnonzero(mudou)
+
+        if len(posicoes):
+            alteracoes = [(ids[i], int(novos_scores[i]), str(novas_etapas[i])) for i in posicoes]
+            if not dry_run:
+                atualizar_scores(alteracoes, conn=conn)
+                if ao_alterar is not None:
+                    ao_alterar([lead_id for lead_id, _, _ in alteracoes])
+            estado["alterados"] += len(alteracoes)
+
+        estado["processados"] += len(bloco)
+        estado["segundos"] = round(time.perf_counter() - inicio, 3)
+        gravar_estado(JOB, estado, conn=conn)
+        if progresso is not None:
+            progresso(dict(estado))
+
+
+def _imprimir_progresso(estado: Dict[str, Any]) -> None:
+    total = estado["total"] or 1
+    print(
+        f"   {estado['processados']}/{estado['total']} "
+        f"({100 * estado['processados'] / total:.0f}%) - "
+        f"{estado['alterados']} alterados - {estado['segundos']:.1f}s",
+        flush=True,
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Recalcula score/etapa de todos os leads.")
+    parser.add_argument("--bloco", type=int, default=RESCORE_TAMANHO_BLOCO, help="leads por bloco")
+    parser.add_argument("--dry-run", action="store_true", help="só conta, não grava nada")
+    parser.add_argument("--tenant", default=None, help="regras para os leads sem tenant gravado (padrão: padrao.json)")
+    args = parser.parse_args(argv)
+
+    print("==> Re-score dos leads...")
+    try:
+        estado = rescore(args.bloco, args.dry_run, progresso=_imprimir_progresso, tenant=args.tenant)
+    except RescoreEmAndamento:
+        print("❌ Já existe um re-score em andamento (API ou outra execução).")
+        raise SystemExit(1)
+    acao = "mudariam" if args.dry_run else "atualizados"
+    print(f"✅ {estado['processados']} leads processados, {estado['alterados']} {acao} em {estado['segundos']:.1f}s.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,31 +1,124 @@
-from typing import Any, Dict, List, Optional
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Literal, Optional, Set
 
-from fastapi import Body, FastAPI, HTTPException, Query
+from fastapi import Body, Depends, FastAPI, Header, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 import json
-
-from pydantic import BaseModel, Field
-from api.schemas import LeadIn, LeadOut, LeadFilters, SendMessageIn, LeadUpdateIn
-from api.services.normalize import clean_name, clean_phone, lower_or_none
-from api.services.scoring import compute_score, stage_from_score
-from api.repositories.leads import upsert_lead, get_by_id, list_leads, update_lead
-from api.repositories.events import add_event
-from api.repositories.historico_servicos import (
+import os
+
+from pydantic import BaseModel, Field, ValidationError
+from api.schemas import (
+    HISTORICO_LINHAS,
+    LEAD_LINHA,
+    LEAD_LINHAS,
+    HistoricoServicoLinha,
+    LeadFilters,
+    LeadIn,
+    LeadLinha,
+    LeadOut,
+    LeadUpdateIn,
+    SendMessageIn,
+)
+from api.services.normalize import clean_name, clean_phone, lower_or_none, normalizar_telefones
+from api.services.scoring import compute_score, score_do_lead, stage_from_score
+# Os endpoints usam os repositórios assíncronos (aiomysql); os síncronos em
+# api/repositories/*.py continuam valendo para scripts como o teste_db.py.
+from api.repositories.aio.leads import (
+    upsert_lead,
+    upsert_leads_batch,
+    get_by_id,
+    get_for_update,
+    list_leads,
+    stream_leads,
+    update_lead,
+)
+from api.repositories.aio.events import stream_events_by_lead
+from api.repositories.aio.timeline import get_timeline
+from api.repositories.aio.analytics import get_funil
+from api.repositories.aio.jobs import ler_estado as ler_estado_job
+from api.repositories.timeline import (
+    CAMPOS_LEAD,
+    CAMPOS_TIMELINE,
+    CAMPOS_TIMELINE_PADRAO,
+    validar_campos,
+)
+from api.repositories.aio.historico_servicos import (
     adicionar_servico,
     listar_historico_por_lead,
 )
-from api.services.messaging import send_whatsapp  # <--- IMPORT DO ENVIO WHATSAPP
-
-# opcional – se você tiver o ping configurado no db.py
-try:
-    from db import ping as db_ping
-except ImportError:  # se não existir, a health só responde "ok" sem testar o banco
-    db_ping = None
+from api.services.messaging import (  # <--- IMPORT DO ENVIO WHATSAPP
+    fechar_cliente,
+    send_whatsapp_async,
+    tipo_evento_envio,
+)
+from api.services.fila_envio import FilaCheia, fila_envio
+from api.services.campanha import enviar_campanha
+from api.services.outbox import WHATSAPP_OUTBOX, enfileirar_campanha, enfileirar_mensagem
+from api.services.export import gerar_csv, gerar_ndjson
+from api.services.followup import FOLLOWUP_ENABLED, agendar_entrada
+from api.services.serializacao import RespostaJSON, resposta_linhas
+from api.services.cache import lead_cache
+from api.services.idempotencia import chave_idempotencia, idempotencia
+from api import db, db_async
+from api.db_async import criar_pool, fechar_pool, ping as db_ping
+from api.pooling import PoolTimeout
+from api import captura, metrics
+from api.services.event_buffer import event_buffer
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # um pool assíncrono por processo do uvicorn
+    await criar_pool()
+    await event_buffer.iniciar()
+    await fila_envio.iniciar()
+    await metrics.iniciar_gravacao()
+    try:
+        yield
+    finally:
+        # drena as mensagens pendentes e depois os eventos que elas geraram,
+        # antes de fechar o pool
+        await fila_envio.parar()
+        await fechar_cliente()
+        await event_buffer.parar()
+        await idempotencia.parar()
+        await lead_cache.fechar()
+        await fechar_pool()
+        await asyncio.to_thread(captura.gravador.parar)
+        await metrics.parar_gravacao()
 
 
 app = FastAPI(
     title="Leads API - Projeto Automação Estética",
     version="1.0.0",
+    lifespan=lifespan,
+    # corpo JSON pelo orjson (api/services/serializacao.py)
+    default_response_class=RespostaJSON,
 )
+app.add_middleware(metrics.MetricsMiddleware)
+# Amostra de tráfego para o bench/replay.py (CAPTURA_ENABLED=1)
+app.add_middleware(captura.CapturaMiddleware)
+
+
+# Gauges e counters lidos na hora do scrape do /metrics
+def _por_pool(campo: str):
+    return lambda: [(("async",), db_async.pool_stats()[campo]), (("sync",), db.pool_stats()[campo])]
+
+
+metrics.registrar_gauges("leads_api_db_pool_em_uso", "Conexões do pool em uso", ("pool",), _por_pool("em_uso"))
+metrics.registrar_gauges("leads_api_db_pool_esperando", "Requisições esperando conexão do pool", ("pool",), _por_pool("esperando"))
+metrics.registrar_counters("leads_api_db_pool_timeouts_total", "Esperas por conexão que estouraram o timeout", ("pool",), _por_pool("timeouts"))
+metrics.registrar_counters("leads_api_db_pool_espera_segundos_total", "Tempo total esperando conexão do pool", ("pool",), _por_pool("espera_total_s"))
+metrics.registrar_gauges("leads_api_db_pool_abertas", "Conexões abertas no pool assíncrono", ("pool",), lambda: [(("async",), db_async.pool_stats()["abertas"])])
+metrics.registrar_gauges("leads_api_db_pool_livres", "Conexões livres no pool assíncrono", ("pool",), lambda: [(("async",), db_async.pool_stats()["livres"])])
+metrics.registrar_counters("leads_api_lead_cache_hits_total", "Hits do cache de leads", (), lambda: [((), lead_cache.stats()["hits"])])
+metrics.registrar_counters("leads_api_lead_cache_misses_total", "Misses do cache de leads", (), lambda: [((), lead_cache.stats()["misses"])])
+metrics.registrar_counters("leads_api_webhook_replays_total", "Reenvios de webhook respondidos pelo cache de idempotência", (), lambda: [((), idempotencia.replays)])
+metrics.registrar_gauges("leads_api_event_buffer_pendentes", "Eventos aguardando gravação no buffer", (), lambda: [((), event_buffer.stats()["pendentes"])])
+metrics.registrar_gauges("leads_api_fila_envio_pendentes", "Mensagens aguardando envio na fila", (), lambda: [((), fila_envio.stats()["pendentes"])])
+metrics.registrar_counters("leads_api_captura_descartados_total", "Requisições amostradas descartadas com a fila de captura cheia", (), lambda: [((), captura.gravador.descartados)])
 
 
 # ---------------------------------------------------------------------------
@@ -33,31 +126,72 @@ app = FastAPI(
 # ---------------------------------------------------------------------------
 
 @app.get("/health")
-def health() -> Dict[str, str]:
+async def health() -> Dict[str, str]:
     api_status = "ok"
-    db_status = "ok"
-
-    if db_ping is not None:
-        try:
-            db_ping()
-            db_status = "ok"
-        except Exception:
-            db_status = "fail"
+    db_status = "ok" if await db_ping() else "fail"
 
     return {"api": api_status, "db": db_status}
 
 
+@app.exception_handler(PoolTimeout)
+async def pool_timeout_handler(request: Request, exc: PoolTimeout) -> JSONResponse:
+    # pool esgotado é sobrecarga momentânea: 503 + Retry-After em vez de 500
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": "1"},
+    )
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_prometheus() -> PlainTextResponse:
+    """
+    Métricas no formato texto do Prometheus: latência por rota, latência de
+    cada operação de repositório / Evolution API, pool de conexões, cache e filas.
+    Com METRICS_MULTIPROC_DIR, soma de todos os workers do gunicorn.
+    """
+    return PlainTextResponse(metrics.exportar(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/metrics/pool")
+async def metrics_pool() -> Dict[str, Any]:
+    """
+    Estado dos pools de conexão deste processo: tamanho, conexões em uso,
+    tempo de espera por conexão, timeouts e health checks.
+    """
+    return {"async": db_async.pool_stats(), "sync": db.pool_stats()}
+
+
+@app.get("/metrics/cache")
+async def metrics_cache() -> Dict[str, Any]:
+    """
+    Contadores do cache de leads (hits, misses, hit ratio, tamanho) e do
+    cache de idempotência dos webhooks.
+    """
+    return {**lead_cache.stats(), "idempotencia": idempotencia.stats()}
+
+
 # ---------------------------------------------------------------------------
 # Webhook de entrada de lead
 # ---------------------------------------------------------------------------
 
-@app.post("/webhooks/lead", response_model=LeadOut)
-def webhook_lead(lead_in: LeadIn) -> LeadOut:
+_NORMALIZAR = object()
+
+
+@metrics.cronometrar("python", "webhook.preparar_lead")
+def _preparar_lead(lead_in: LeadIn, tenant: Optional[str] = None, telefone: Any = _NORMALIZAR) -> Dict[str, Any]:
+    """
+    Normaliza e calcula o score de um lead recebido por webhook.
+    Usado tanto pelo webhook unitário quanto pelo de lote.
+    `tenant` escolhe o arquivo de regras de score da clínica (header X-Tenant).
+    `telefone` já normalizado dispensa o clean_phone (o lote normaliza todos
+    de uma vez com normalizar_telefones).
+    """
     data: Dict[str, Any] = lead_in.dict()
 
     # Normalização
     data["nome"] = clean_name(data.get("nome"))
-    data["telefone"] = clean_phone(data.get("telefone"))
+    data["telefone"] = clean_phone(data.get("telefone")) if telefone is _NORMALIZAR else telefone
     data["origem"] = lower_or_none(data.get("origem")) or "outro"
 
     # Garante que tags é uma lista
@@ -75,22 +209,131 @@ def webhook_lead(lead_in: LeadIn) -> LeadOut:
         has_email=bool(data.get("email")),
         origem=data.get("origem"),
         tags=tags,
+        tenant=tenant,
     )
-    etapa = stage_from_score(score)
     data["score"] = score
-    data["etapa"] = etapa
+    data["etapa"] = stage_from_score(score, tenant)
+    # gravado no lead: re-score e atualizações usam as mesmas regras
+    data["tenant"] = tenant
 
-    # Upsert no banco
-    lead_id = upsert_lead(data)
+    return data
 
-    # Evento
-    add_event(
-        lead_id=lead_id,
-        tipo="entrada",
-        payload=data,
-    )
 
-    return LeadOut(lead_id=lead_id, score=score, etapa=etapa)
+@app.post("/webhooks/lead", response_model=LeadOut)
+async def webhook_lead(
+    lead_in: LeadIn,
+    response: Response,
+    x_tenant: Optional[str] = Header(None),
+    idempotency_key: Optional[str] = Header(None),
+) -> LeadOut:
+    """
+    Reenvios do mesmo webhook (mesmo header Idempotency-Key ou, sem ele, o
+    mesmo lead normalizado) devolvem o LeadOut da primeira vez, sem novo
+    upsert nem novo evento de entrada. Esses respondem com
+    Idempotent-Replayed: true.
+    """
+    data = _preparar_lead(lead_in, x_tenant)
+    chave = chave_idempotencia("/webhooks/lead", idempotency_key, data, x_tenant)
+
+    async def gravar() -> Dict[str, Any]:
+        # Upsert + evento. Com o buffer de eventos ativo o evento é gravado em
+        # segundo plano; no modo síncrono vai na mesma transação do upsert.
+        async with event_buffer.conexao() as conn:
+            lead_id = await upsert_lead(data, conn=conn)
+            await event_buffer.registrar(
+                lead_id=lead_id,
+                tipo="entrada",
+                payload=data,
+                conn=conn,
+            )
+            if FOLLOWUP_ENABLED:
+                await agendar_entrada([(lead_id, data["etapa"])], conn=conn)
+        return {"lead_id": lead_id, "score": data["score"], "etapa": data["etapa"]}
+
+    resposta, replay = await idempotencia.executar(chave, "/webhooks/lead", gravar)
+    if replay:
+        response.headers["Idempotent-Replayed"] = "true"
+
+    return LeadOut(**resposta)
+
+
+# ---------------------------------------------------------------------------
+# Webhook de entrada de leads em lote (campanhas Instagram/ManyChat)
+# ---------------------------------------------------------------------------
+
+LEADS_BATCH_MAX = int(os.getenv("LEADS_BATCH_MAX", 5000))
+
+
+def _ler_lote(raw: bytes, content_type: str) -> List[Any]:
+    """
+    Lê o corpo do lote: um array JSON ou NDJSON (um lead por linha).
+    """
+    try:
+        if "ndjson" in content_type or "jsonl" in content_type:
+            return [json.loads(linha) for linha in raw.splitlines() if linha.strip()]
+
+        itens = json.loads(raw)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Corpo do lote não é JSON/NDJSON válido")
+
+    if not isinstance(itens, list):
+        raise HTTPException(status_code=400, detail="O lote precisa ser um array de leads")
+    return itens
+
+
+async def _gravar_lote(dados: List[Dict[str, Any]]) -> List[int]:
+    """
+    Upsert do lote + eventos de entrada (na mesma transação no modo síncrono
+    do buffer de eventos) + follow-ups agendados, se ligados.
+    """
+    async with event_buffer.conexao() as conn:
+        lead_ids = await upsert_leads_batch(dados, conn=conn)
+        await event_buffer.registrar_lote(
+            [(lead_id, "entrada", data) for lead_id, data in zip(lead_ids, dados)],
+            conn=conn,
+        )
+        if FOLLOWUP_ENABLED:
+            await agendar_entrada([(lead_id, data["etapa"]) for lead_id, data in zip(lead_ids, dados)], conn=conn)
+    return lead_ids
+
+
+@app.post("/webhooks/leads:batch", response_model=List[LeadOut])
+async def webhook_leads_batch(request: Request, x_tenant: Optional[str] = Header(None)) -> List[LeadOut]:
+    """
+    Recebe vários leads de uma vez, como array JSON ou NDJSON
+    (Content-Type: application/x-ndjson).
+
+    Todos os leads são normalizados e pontuados numa passada só e gravados com
+    um upsert de várias linhas + um insert em lote no lead_events, em vez de
+    duas idas ao banco por lead.
+
+    Retorna um LeadOut por item, na mesma ordem do lote.
+    """
+    itens = _ler_lote(await request.body(), request.headers.get("content-type", ""))
+
+    if len(itens) > LEADS_BATCH_MAX:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Lote com {len(itens)} leads excede o máximo de {LEADS_BATCH_MAX}",
+        )
+
+    leads: List[LeadIn] = []
+    for indice, item in enumerate(itens):
+        try:
+            leads.append(LeadIn(**item))
+        except (ValidationError, TypeError) as e:
+            erros = e.errors() if isinstance(e, ValidationError) else str(e)
+            raise HTTPException(status_code=422, detail={"indice": indice, "erros": erros})
+
+    telefones = normalizar_telefones([lead.telefone for lead in leads])
+    dados = [_preparar_lead(lead, x_tenant, telefone) for lead, telefone in zip(leads, telefones)]
+
+    lead_ids = await _gravar_lote(dados)
+
+    return [
+        LeadOut(lead_id=lead_id, score=data["score"], etapa=data["etapa"])
+        for lead_id, data in zip(lead_ids, dados)
+    ]
 
 
 # ---------------------------------------------------------------------------
@@ -98,7 +341,13 @@ def webhook_lead(lead_in: LeadIn) -> LeadOut:
 # ---------------------------------------------------------------------------
 
 @app.post("/action/send-message")
-def action_send_message(body: SendMessageIn) -> Dict[str, Any]:
+async def action_send_message(
+    body: SendMessageIn,
+    assincrono: bool = Query(
+        False,
+        description="Se true, só enfileira o envio e responde 202 com o message_id",
+    ),
+) -> Dict[str, Any]:
     """
     Envia uma mensagem de WhatsApp para o lead informado e registra o evento.
 
@@ -107,10 +356,15 @@ def action_send_message(body: SendMessageIn) -> Dict[str, Any]:
     - busca o telefone do lead no banco
     - chama o serviço de envio de WhatsApp
     - registra evento de mensagem enviada (ou erro de envio)
+
+    Com `?assincrono=true` a mensagem vai para a fila de envio e o endpoint
+    responde 202 na hora; o evento é registrado quando o envio terminar.
+    Com WHATSAPP_OUTBOX=1 a fila é a tabela outbox_mensagens (sobrevive a
+    restart, com novas tentativas), consumida pelo api.workers.outbox.
     """
 
     # 1) Buscar o lead
-    lead = get_by_id(body.lead_id)
+    lead = await get_by_id(body.lead_id)
     if not lead:
         raise HTTPException(status_code=404, detail="Lead não encontrado")
 
@@ -121,16 +375,31 @@ def action_send_message(body: SendMessageIn) -> Dict[str, Any]:
             detail="Lead não possui telefone cadastrado",
         )
 
+    if assincrono and WHATSAPP_OUTBOX:
+        message_id = await enfileirar_mensagem(body.lead_id, telefone, body.texto)
+        return JSONResponse(
+            status_code=202,
+            content={"status": "queued", "message_id": message_id},
+        )
+
+    if assincrono:
+        try:
+            message_id = fila_envio.enfileirar(body.lead_id, telefone, body.texto)
+        except FilaCheia as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        return JSONResponse(
+            status_code=202,
+            content={"status": "queued", "message_id": message_id},
+        )
+
     # 2) Enviar mensagem pelo WhatsApp
-    result = send_whatsapp(telefone=telefone, texto=body.texto)
+    result = await send_whatsapp_async(telefone=telefone, texto=body.texto)
 
     # 3) Definir tipo de evento conforme resultado
-    tipo_evento = "mensagem_enviada"
-    if isinstance(result, dict) and result.get("status") == "error":
-        tipo_evento = "erro_envio"
+    tipo_evento = tipo_evento_envio(result)
 
     # 4) Registrar evento no lead_events
-    add_event(
+    await event_buffer.registrar(
         lead_id=body.lead_id,
         tipo=tipo_evento,
         payload={
@@ -154,6 +423,58 @@ def action_send_message(body: SendMessageIn) -> Dict[str, Any]:
     }
 
 
+WHATSAPP_CAMPANHA_MAX = int(os.getenv("WHATSAPP_CAMPANHA_MAX", 5000))
+# Envio síncrono segura a requisição até a última mensagem (com 20 msg/s, 200
+# mensagens são ~10 s); acima disso a campanha tem que ir pelo outbox.
+WHATSAPP_CAMPANHA_SINCRONA_MAX = int(os.getenv("WHATSAPP_CAMPANHA_SINCRONA_MAX", 200))
+
+
+@app.post("/action/send-messages")
+async def action_send_messages(
+    body: List[SendMessageIn],
+    assincrono: bool = Query(
+        False,
+        description="Se true, só grava as mensagens no outbox (exige WHATSAPP_OUTBOX=1)",
+    ),
+) -> List[Dict[str, Any]]:
+    """
+    Versão em lote do /action/send-message, para campanhas do n8n.
+
+    Recebe uma lista de {lead_id, texto}, busca todos os telefones de uma vez,
+    envia em paralelo respeitando o limite global e o limite por número
+    (WHATSAPP_RATE_GLOBAL / WHATSAPP_RATE_POR_NUMERO) e grava todos os eventos
+    num único insert.
+
+    Retorna um {lead_id, status, detail} por item, na mesma ordem do corpo.
+
+    Com `?assincrono=true` (e WHATSAPP_OUTBOX=1) tudo vai para o outbox num
+    único INSERT e cada item volta como {lead_id, status: "queued", message_id};
+    o envio fica com o worker do outbox. Sem ele, campanhas com mais de
+    WHATSAPP_CAMPANHA_SINCRONA_MAX mensagens são recusadas (413).
+    """
+    if len(body) > WHATSAPP_CAMPANHA_MAX:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Campanha com {len(body)} mensagens excede o máximo de {WHATSAPP_CAMPANHA_MAX}",
+        )
+
+    itens = [(item.lead_id, item.texto) for item in body]
+    if assincrono:
+        if not WHATSAPP_OUTBOX:
+            raise HTTPException(status_code=400, detail="Envio assíncrono de campanha exige WHATSAPP_OUTBOX=1")
+        return await enfileirar_campanha(itens)
+
+    if len(itens) > WHATSAPP_CAMPANHA_SINCRONA_MAX:
+        raise HTTPException(
+            status_code=413,
+            detail=(
+                f"Campanha com {len(itens)} mensagens excede o máximo de {WHATSAPP_CAMPANHA_SINCRONA_MAX} "
+                "para envio síncrono; use ?assincrono=true (outbox, WHATSAPP_OUTBOX=1)"
+            ),
+        )
+    return await enviar_campanha(itens)
+
+
 # ---------------------------------------------------------------------------
 # Ação para ATUALIZAR dados do lead (/action/update-lead)
 # ---------------------------------------------------------------------------
@@ -161,11 +482,63 @@ def action_send_message(body: SendMessageIn) -> Dict[str, Any]:
 # importa o LeadUpdateIn lá em cima
 # from api.schemas import LeadUpdateIn, LeadFilters, LeadDetail, ...
 
+async def _atualizar_e_pontuar(
+    lead_id: int,
+    data: Dict[str, Any],
+    tenant: Optional[str] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    Aplica `data` no lead e recalcula score/etapa a partir da linha já
+    mesclada, tudo numa conexão só: SELECT ... FOR UPDATE, UPDATE e evento
+    `atualizacao` com o delta do score. Devolve a linha como ficou no banco
+    (sem reler) ou None se o lead não existir.
+
+    Score/etapa enviados explicitamente no payload prevalecem; quem já é
+    "cliente" continua "cliente". Sem `tenant` (header X-Tenant), valem as
+    regras do tenant gravado no lead.
+    """
+    async with db_async.transacao() as conn:
+        atual = await get_for_update(lead_id, conn=conn)
+        if atual is None:
+            return None
+        agora = atual.pop("_agora")
+
+        lead = {**atual, **data}
+        tenant = tenant or atual.get("tenant")
+        if "score" not in data:
+            data["score"] = score_do_lead(lead, tenant)
+        if "etapa" not in data:
+            data["etapa"] = "cliente" if atual["etapa"] == "cliente" else stage_from_score(data["score"], tenant)
+        lead.update(score=data["score"], etapa=data["etapa"], updated_at=agora)
+
+        await update_lead(lead_id, data, conn=conn, atualizado_em=agora)
+        await event_buffer.registrar(
+            lead_id=lead_id,
+            tipo="atualizacao",
+            payload={
+                "campos": {k: v for k, v in data.items() if k not in ("score", "etapa")},
+                "score_anterior": atual["score"],
+                "score": data["score"],
+                "delta": data["score"] - (atual["score"] or 0),
+                "etapa_anterior": atual["etapa"],
+                "etapa": data["etapa"],
+            },
+            conn=conn,
+        )
+
+    # write-through: a próxima leitura já sai do cache
+    await lead_cache.set(lead_id, lead)
+    return lead
+
+
 @app.post("/action/update-lead")
-def action_update_lead(payload: LeadUpdateIn) -> Dict[str, Any]:
+async def action_update_lead(payload: LeadUpdateIn, x_tenant: Optional[str] = Header(None)) -> Dict[str, Any]:
     """
     Atualiza alguns campos do lead (servico_interesse, regiao_corpo,
     disponibilidade, etapa, score) a partir de um payload vindo do n8n/agente de IA.
+
+    Score e etapa são recalculados com os dados novos (a não ser que venham
+    no payload) e a resposta já é o lead atualizado.
     """
 
     # 1) Monta o dicionário só com o que veio preenchido
@@ -186,38 +559,177 @@ def action_update_lead(payload: LeadUpdateIn) -> Dict[str, Any]:
     if payload.score is not None:
         data["score"] = payload.score
 
-    # 2) Chama a função do repositório
-    update_lead(payload.lead_id, data)
-
-    # 3) Busca o lead atualizado
-    lead = get_by_id(payload.lead_id)
+    # 2) Nada para atualizar: só devolve o lead
+    if not data:
+        lead = await get_by_id(payload.lead_id)
+    else:
+        # 3) Atualiza + re-score + evento, devolvendo a linha já mesclada
+        lead = await _atualizar_e_pontuar(payload.lead_id, data, x_tenant)
     if not lead:
         raise HTTPException(status_code=404, detail="Lead não encontrado")
 
     return lead
 
 
-@app.get("/leads")
-def listar_leads(
+LEADS_PAGINA_MAX = int(os.getenv("LEADS_PAGINA_MAX", 1000))
+EXPORT_TAMANHO_BLOCO = int(os.getenv("EXPORT_TAMANHO_BLOCO", 2000))
+
+
+def filtros_leads(
     origem: Optional[str] = Query(None),
     etapa: Optional[str] = Query(None),
-) -> List[Dict[str, Any]]:
+    servico_interesse: Optional[str] = Query(None),
+    score_min: Optional[int] = Query(None, ge=0, le=100),
+    score_max: Optional[int] = Query(None, ge=0, le=100),
+    tag: Optional[str] = Query(None),
+    atualizado_de: Optional[datetime] = Query(None),
+    atualizado_ate: Optional[datetime] = Query(None),
+) -> LeadFilters:
+    """
+    Filtros comuns da listagem e da exportação de leads.
+    """
+    return LeadFilters(
+        origem=origem,
+        etapa=etapa,
+        servico_interesse=servico_interesse,
+        score_min=score_min,
+        score_max=score_max,
+        tag=tag,
+        atualizado_de=atualizado_de,
+        atualizado_ate=atualizado_ate,
+    )
+
+
+def _resposta_export(blocos, formato: str, nome: str) -> StreamingResponse:
+    if formato == "csv":
+        corpo, media_type = gerar_csv(blocos), "text/csv; charset=utf-8"
+    else:
+        corpo, media_type = gerar_ndjson(blocos), "application/x-ndjson"
+    return StreamingResponse(
+        corpo,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{nome}.{formato}"'},
+    )
+
+
+@app.get("/leads", response_model=List[LeadLinha])
+async def listar_leads(
+    filtros: LeadFilters = Depends(filtros_leads),
+    cursor: Optional[str] = Query(None, description="Valor do header X-Next-Cursor da página anterior"),
+    limit: int = Query(200, ge=1, le=LEADS_PAGINA_MAX),
+) -> Response:
+    """
+    Lista leads do mais recente para o mais antigo, com filtros de origem,
+    etapa, serviço de interesse, faixa de score, tag e período de atualização.
+
+    A paginação é por cursor: quando existe próxima página, a resposta traz o
+    header `X-Next-Cursor`; basta repetir a chamada com `?cursor=<valor>`.
+    """
+    try:
+        leads, proximo_cursor = await list_leads(filtros, cursor=cursor, limite=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return resposta_linhas(LEAD_LINHAS, leads, headers={"X-Next-Cursor": proximo_cursor} if proximo_cursor else None)
+
+
+# declarado antes de /leads/{lead_id} para "export" não cair como lead_id
+@app.get("/leads/export")
+async def exportar_leads(
+    filtros: LeadFilters = Depends(filtros_leads),
+    formato: Literal["ndjson", "csv"] = Query("ndjson"),
+) -> StreamingResponse:
+    """
+    Exporta todos os leads do filtro (base inteira, sem limite de linhas)
+    em NDJSON ou CSV, em streaming: o banco é lido com cursor do lado do
+    servidor, em blocos de EXPORT_TAMANHO_BLOCO linhas, e cada bloco é
+    enviado assim que fica pronto. A memória fica constante.
+    """
+    return _resposta_export(
+        stream_leads(filtros, EXPORT_TAMANHO_BLOCO),
+        formato,
+        "leads",
+    )
+
+
+@app.get("/leads/{lead_id}/events/export")
+async def exportar_eventos_lead(
+    lead_id: int,
+    formato: Literal["ndjson", "csv"] = Query("ndjson"),
+) -> StreamingResponse:
+    """
+    Exporta todos os eventos (lead_events) de um lead, em streaming.
+    """
+    return _resposta_export(
+        stream_events_by_lead(lead_id, EXPORT_TAMANHO_BLOCO),
+        formato,
+        f"lead_{lead_id}_events",
+    )
+
+
+TIMELINE_PAGINA_MAX = int(os.getenv("TIMELINE_PAGINA_MAX", 500))
+
+
+def _lista_campos(valor: Optional[str]) -> Optional[List[str]]:
+    if not valor:
+        return None
+    return [c.strip() for c in valor.split(",") if c.strip()]
+
+
+@app.get("/leads/{lead_id}/timeline")
+async def timeline_lead(
+    lead_id: int,
+    response: Response,
+    campos: Optional[str] = Query(
+        None,
+        description=f"Campos dos itens, separados por vírgula ({', '.join(CAMPOS_TIMELINE)}). "
+        "O payload dos eventos só vem (e só é decodificado) se pedido aqui.",
+    ),
+    campos_lead: Optional[str] = Query(None, description="Campos do lead, separados por vírgula"),
+    cursor: Optional[str] = Query(None, description="Valor do header X-Next-Cursor da página anterior"),
+    limit: int = Query(100, ge=1, le=TIMELINE_PAGINA_MAX),
+    ordem: Literal["asc", "desc"] = Query("asc"),
+) -> Dict[str, Any]:
     """
-    Lista leads com filtros básicos de origem e etapa.
+    Lead + eventos (lead_events) + histórico de serviços numa resposta só,
+    em ordem cronológica, lidos numa única conexão (o lead e um SELECT com
+    UNION ALL das duas tabelas).
+
+    Cada item tem `fonte` ("evento" | "servico"), `id` e `momento`, mais os
+    `campos` pedidos. Paginação por cursor sobre o fluxo mesclado, como no
+    GET /leads: header `X-Next-Cursor` e `?cursor=<valor>`.
     """
-    filtros = LeadFilters(origem=origem, etapa=etapa)
-    return list_leads(filtros)
+    try:
+        itens_campos = validar_campos(_lista_campos(campos), list(CAMPOS_TIMELINE), CAMPOS_TIMELINE_PADRAO)
+        lead_campos = validar_campos(_lista_campos(campos_lead), CAMPOS_LEAD, CAMPOS_LEAD)
+        resultado = await get_timeline(
+            lead_id,
+            campos=itens_campos,
+            campos_lead=lead_campos,
+            cursor=cursor,
+            limite=limit,
+            desc=ordem == "desc",
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if resultado is None:
+        raise HTTPException(status_code=404, detail="Lead não encontrado")
+
+    if resultado["next_cursor"]:
+        response.headers["X-Next-Cursor"] = resultado["next_cursor"]
+    return resultado
 
 
-@app.get("/leads/{lead_id}")
-def obter_lead(lead_id: int) -> Dict[str, Any]:
+@app.get("/leads/{lead_id}", response_model=LeadLinha)
+async def obter_lead(lead_id: int) -> Response:
     """
     Retorna os dados de um lead específico.
     """
-    lead = get_by_id(lead_id)
+    lead = await get_by_id(lead_id)
     if not lead:
         raise HTTPException(status_code=404, detail="Lead não encontrado")
-    return lead
+    return resposta_linhas(LEAD_LINHA, lead)
 
 
 # ---------------------------------------------------------------------------
@@ -259,7 +771,7 @@ class HistoricoServicoIn(BaseModel):
 
 
 @app.post("/leads/{lead_id}/historico-servicos")
-def criar_historico_servico(
+async def criar_historico_servico(
     lead_id: int,
     body: HistoricoServicoIn,
 ) -> Dict[str, Any]:
@@ -275,11 +787,11 @@ def criar_historico_servico(
         )
 
     # Verifica se o lead existe
-    lead = get_by_id(lead_id)
+    lead = await get_by_id(lead_id)
     if not lead:
         raise HTTPException(status_code=404, detail="Lead não encontrado")
 
-    historico_id = adicionar_servico(
+    historico_id = await adicionar_servico(
         lead_id=body.lead_id,
         servico=body.servico,
         data_servico=body.data_servico,
@@ -291,14 +803,129 @@ def criar_historico_servico(
     return {"id": historico_id, "status": "created"}
 
 
-@app.get("/leads/{lead_id}/historico-servicos")
-def listar_historico_servicos(lead_id: int) -> List[Dict[str, Any]]:
+@app.get("/leads/{lead_id}/historico-servicos", response_model=List[HistoricoServicoLinha])
+async def listar_historico_servicos(lead_id: int) -> Response:
     """
     Lista o histórico de serviços realizados / agendados para um lead.
     """
-    # opcional: validar se o lead existe
-    lead = get_by_id(lead_id)
-    if not lead:
+    historico = await listar_historico_por_lead(lead_id)
+
+    # só confere se o lead existe quando não veio nada
+    if not historico and not await get_by_id(lead_id):
         raise HTTPException(status_code=404, detail="Lead não encontrado")
 
-    return listar_historico_por_lead(lead_id)
+    return resposta_linhas(HISTORICO_LINHAS, historico)
+
+
+# ---------------------------------------------------------------------------
+# Analytics: funil por origem x etapa x dia e receita por serviço
+# ---------------------------------------------------------------------------
+
+FUNIL_PERIODO_PADRAO = int(os.getenv("FUNIL_PERIODO_PADRAO", 30))
+FUNIL_PERIODO_MAX = int(os.getenv("FUNIL_PERIODO_MAX", 366))
+
+
+@app.get("/analytics/funnel")
+async def analytics_funnel(
+    de: Optional[date] = Query(None, description="Dia inicial (padrão: 30 dias atrás)"),
+    ate: Optional[date] = Query(None, description="Dia final, inclusive (padrão: hoje)"),
+    origem: Optional[str] = Query(None),
+    servico: Optional[str] = Query(None),
+) -> Dict[str, Any]:
+    """
+    Funil no período: leads por etapa (no dia de entrada), por origem e por
+    dia, taxas de conversão novo -> qualificado -> cliente e receita dos
+    tickets do histórico de serviços por serviço/status.
+
+    Lê só as tabelas de agregados (funil_diario / receita_diaria), mantidas
+    por triggers a cada escrita; nada de varrer leads/historico_servicos.
+    """
+    ate = ate or date.today()
+    de = de or ate - timedelta(days=FUNIL_PERIODO_PADRAO - 1)
+    if de > ate:
+        raise HTTPException(status_code=400, detail="'de' precisa ser antes de 'ate'")
+    if (ate - de).days >= FUNIL_PERIODO_MAX:
+        raise HTTPException(status_code=400, detail=f"Período máximo de {FUNIL_PERIODO_MAX} dias")
+
+    funil = await get_funil(de, ate, origem=origem, servico=servico)
+    return {"periodo": {"de": de, "ate": ate}, **funil}
+
+
+# ---------------------------------------------------------------------------
+# Admin: re-score da base inteira (mesmo job do `python -m api.jobs.rescore`)
+# ---------------------------------------------------------------------------
+
+# A trava (GET_LOCK) e o andamento (tabela jobs_estado) ficam no MySQL, então
+# valem para todos os workers do gunicorn e para o `python -m api.jobs.rescore`.
+# Aqui só as referências das tarefas deste processo, para não serem coletadas.
+_RESCORE_JOB = "rescore"
+_rescore_tarefas: Set[asyncio.Task] = set()
+
+
+async def _executar_rescore(dry_run: bool, tenant: Optional[str], iniciado: asyncio.Future) -> None:
+    # import tardio: numpy só é carregado se alguém disparar o job
+    from api.jobs.rescore import rescore
+
+    loop = asyncio.get_running_loop()
+
+    def ao_iniciar() -> None:
+        loop.call_soon_threadsafe(lambda: iniciado.done() or iniciado.set_result(None))
+
+    def ao_alterar(lead_ids: List[int]) -> None:
+        # o job roda numa thread; a invalidação do cache roda no event loop
+        asyncio.run_coroutine_threadsafe(lead_cache.invalidar(lead_ids), loop)
+
+    try:
+        await asyncio.to_thread(
+            rescore, dry_run=dry_run, ao_alterar=ao_alterar, iniciado=ao_iniciar, tenant=tenant
+        )
+    except Exception as e:
+        if not iniciado.done():
+            # não chegou a começar (trava ocupada, banco fora): quem responde é o POST
+            iniciado.set_exception(e)
+            return
+        # o job já gravou o erro em jobs_estado
+        print(f"❌ Erro no re-score: {e}")
+
+
+@app.post("/admin/rescore", status_code=202)
+async def admin_rescore(
+    dry_run: bool = Query(False),
+    tenant: Optional[str] = Query(None, description="Regras para os leads sem tenant gravado"),
+) -> Dict[str, Any]:
+    """
+    Dispara o re-score de todos os leads em segundo plano. Acompanhe o
+    andamento em GET /admin/rescore. 409 se já houver um rodando, em
+    qualquer worker ou pela CLI.
+
+    Cada lead usa as regras do tenant gravado nele; `tenant` vale para os
+    que entraram antes da migração 012 (sem tenant).
+    """
+    from api.jobs.rescore import RescoreEmAndamento
+
+    iniciado = asyncio.get_running_loop().create_future()
+    tarefa = asyncio.create_task(_executar_rescore(dry_run, tenant, iniciado))
+    _rescore_tarefas.add(tarefa)
+    tarefa.add_done_callback(_rescore_tarefas.discard)
+    try:
+        await iniciado
+    except RescoreEmAndamento:
+        raise HTTPException(status_code=409, detail="Re-score já em andamento")
+
+    estado, _ = await ler_estado_job(_RESCORE_JOB)
+    return estado or {"status": "executando", "dry_run": dry_run, "tenant": tenant}
+
+
+@app.get("/admin/rescore")
+async def admin_rescore_status() -> Dict[str, Any]:
+    """
+    Andamento do último re-score: total, processados, alterados, segundos.
+    "interrompido" quando o processo que rodava morreu no meio (a trava
+    caiu sem o job gravar o fim).
+    """
+    estado, em_uso = await ler_estado_job(_RESCORE_JOB)
+    if estado is None:
+        return {"status": "parado"}
+    if estado.get("status") == "executando" and not em_uso:
+        estado["status"] = "interrompido"
+    return estado
@@ -0,0 +1,427 @@
+import asyncio
+import functools
+import glob
+import inspect
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Métricas no formato texto do Prometheus, sem dependência externa.
+#
+# O custo por observação é um bisect + três somas sob um lock, então dá para
+# deixar ligado em produção. Os labels de rota usam o template do FastAPI
+# (/leads/{lead_id}), nunca a URL crua, para não explodir a cardinalidade.
+#
+# Com vários processos (workers do gunicorn) cada um só enxerga o que ele
+# mesmo mediu, e o scrape cai num worker qualquer. Com METRICS_MULTIPROC_DIR
+# (o gunicorn.conf.py liga quando há mais de um worker) cada processo grava
+# um retrato das suas métricas em <dir>/<pid>.json a cada METRICS_GRAVAR_S
+# segundos, e o /metrics soma counters e histogramas de todos os arquivos,
+# como o modo multiprocess do prometheus_client. Os nomes e labels não
+# mudam; só os gauges ganham o label `worker` (pid), porque não dá para
+# somar um "em uso" de processos diferentes sem perder o sentido.
+METRICS_MULTIPROC_DIR = os.getenv("METRICS_MULTIPROC_DIR") or None
+METRICS_GRAVAR_S = float(os.getenv("METRICS_GRAVAR_S", 5))
+
+BUCKETS_PADRAO = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escapar(valor: str) -> str:
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(nomes: Sequence[str], valores: Sequence[str], extra: str = "") -> str:
+    partes = [f'{n}="{_escapar(v)}"' for n, v in zip(nomes, valores)]
+    if extra:
+        partes.append(extra)
+    return "{" + ",".join(partes) + "}" if partes else ""
+
+
+def _numero(valor: float) -> str:
+    if valor == float("inf"):
+        return "+Inf"
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+def _amostras_counter(nome: str, labels: Sequence[str], itens) -> List[str]:
+    return [f"{nome}{_labels(labels, v)} {_numero(total)}" for v, total in itens]
+
+
+def _amostras_histogram(nome: str, labels: Sequence[str], buckets: Sequence[float], itens) -> List[str]:
+    linhas: List[str] = []
+    for valores, contagens, soma, total in itens:
+        acumulado = 0
+        for limite, contagem in zip(tuple(buckets) + (float("inf"),), contagens):
+            acumulado += contagem
+            le = f'le="{_numero(limite)}"'
+            linhas.append(f"{nome}_bucket{_labels(labels, valores, le)} {acumulado}")
+        linhas.append(f"{nome}_sum{_labels(labels, valores)} {_numero(soma)}")
+        linhas.append(f"{nome}_count{_labels(labels, valores)} {total}")
+    return linhas
+
+
+class Counter:
+    tipo = "counter"
+
+    def __init__(self, nome: str, ajuda: str, labels: Sequence[str] = ()):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.labels = tuple(labels)
+        self._valores: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *valores: str, quantidade: float = 1) -> None:
+        with self._lock:
+            self._valores[valores] = self._valores.get(valores, 0) + quantidade
+
+    def series(self) -> List[Tuple[LabelValues, float]]:
+        with self._lock:
+            return list(self._valores.items())
+
+    def amostras(self) -> List[str]:
+        return _amostras_counter(self.nome, self.labels, self.series())
+
+
+class Histogram:
+    tipo = "histogram"
+
+    def __init__(
+        self,
+        nome: str,
+        ajuda: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = BUCKETS_PADRAO,
+    ):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # por série: [contagem por bucket (não acumulada) + overflow, soma, total]
+        self._series: Dict[LabelValues, list] = {}
+        self._lock = threading.Lock()
+
+    def observar(self, valor: float, *valores: str) -> None:
+        indice = bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._series.get(valores)
+            if serie is None:
+                serie = self._series[valores] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            serie[0][indice] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    def series(self) -> List[Tuple[LabelValues, List[int], float, int]]:
+        with self._lock:
+            return [(v, list(s[0]), s[1], s[2]) for v, s in self._series.items()]
+
+    def amostras(self) -> List[str]:
+        return _amostras_histogram(self.nome, self.labels, self.buckets, self.series())
+
+
+class GaugeColetado:
+    """
+    Gauge lido na hora do scrape: `coletar()` devolve [(valores_dos_labels, valor)].
+    Usado para estado que já existe em outro lugar (pool, cache, filas).
+    """
+    tipo = "gauge"
+
+    def __init__(
+        self,
+        nome: str,
+        ajuda: str,
+        labels: Sequence[str],
+        coletar: Callable[[], Iterable[Tuple[LabelValues, float]]],
+    ):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.labels = tuple(labels)
+        self.coletar = coletar
+
+    def series(self) -> List[Tuple[LabelValues, float]]:
+        return [(tuple(valores), valor) for valores, valor in self.coletar() if valor is not None]
+
+    def amostras(self) -> List[str]:
+        return [f"{self.nome}{_labels(self.labels, valores)} {_numero(valor)}" for valores, valor in self.series()]
+
+
+class CounterColetado(GaugeColetado):
+    """
+    Counter lido na hora do scrape, para totais que já são contados em outro
+    lugar e só crescem (timeouts do pool, hits do cache). Sai com TYPE
+    counter e, com vários processos, é somado como os outros counters.
+    """
+    tipo = "counter"
+
+
+class Registro:
+    def __init__(self):
+        self._metricas: List[Any] = []
+
+    def registrar(self, metrica):
+        self._metricas.append(metrica)
+        return metrica
+
+    def exportar(self) -> str:
+        if METRICS_MULTIPROC_DIR:
+            return self._exportar_processos(METRICS_MULTIPROC_DIR)
+        linhas: List[str] = []
+        for metrica in self._metricas:
+            try:
+                amostras = metrica.amostras()
+            except Exception as e:  # um coletor quebrado não derruba o /metrics inteiro
+                print(f"⚠️ Falha ao coletar a métrica {metrica.nome}:", e)
+                continue
+            linhas.append(f"# HELP {metrica.nome} {metrica.ajuda}")
+            linhas.append(f"# TYPE {metrica.nome} {metrica.tipo}")
+            linhas.extend(amostras)
+        return "\n".join(linhas) + "\n"
+
+    # -- vários processos (METRICS_MULTIPROC_DIR) --------------------------
+
+    def retrato(self) -> Dict[str, Any]:
+        """Estado de todas as métricas deste processo, serializável em JSON."""
+        metricas: Dict[str, Any] = {}
+        for metrica in self._metricas:
+            try:
+                series = metrica.series()
+            except Exception as e:
+                print(f"⚠️ Falha ao coletar a métrica {metrica.nome}:", e)
+                continue
+            metricas[metrica.nome] = {
+                "tipo": metrica.tipo,
+                "ajuda": metrica.ajuda,
+                "labels": list(metrica.labels),
+                "buckets": list(getattr(metrica, "buckets", ())),
+                "series": [list(serie) for serie in series],
+            }
+        return {"pid": os.getpid(), "vivo": True, "metricas": metricas}
+
+    def gravar(self, diretorio: str) -> None:
+        """Grava o retrato em <diretorio>/<pid>.json (troca atômica do arquivo)."""
+        caminho = os.path.join(diretorio, f"{os.getpid()}.json")
+        temporario = caminho + ".tmp"
+        with open(temporario, "w") as f:
+            json.dump(self.retrato(), f)
+        os.replace(temporario, caminho)
+
+    def _exportar_processos(self, diretorio: str) -> str:
+        # o processo que atende o scrape grava antes, para sair com o valor de agora
+        try:
+            self.gravar(diretorio)
+        except OSError as e:
+            print(f"⚠️ Falha ao gravar as métricas em {diretorio}:", e)
+
+        # nome -> (tipo, ajuda, labels, buckets, {valores: acumulado})
+        juntas: Dict[str, Any] = {}
+        for caminho in sorted(glob.glob(os.path.join(diretorio, "*.json"))):
+            try:
+                with open(caminho) as f:
+                    processo = json.load(f)
+            except (OSError, ValueError):
+                continue  # arquivo de um worker que acabou de sair
+            for nome, m in processo["metricas"].items():
+                tipo, labels = m["tipo"], m["labels"]
+                if tipo == "gauge":
+                    if not processo["vivo"]:
+                        continue
+                    labels = labels + ["worker"]
+                atual = juntas.setdefault(nome, (tipo, m["ajuda"], labels, m["buckets"], {}))[4]
+                for serie in m["series"]:
+                    valores = tuple(serie[0])
+                    if tipo == "gauge":
+                        atual[valores + (str(processo["pid"]),)] = serie[1]
+                    elif tipo == "counter":
+                        atual[valores] = atual.get(valores, 0) + serie[1]
+                    else:
+                        soma = atual.get(valores)
+                        if soma is None:
+                            atual[valores] = [list(serie[1]), serie[2], serie[3]]
+                        else:
+                            soma[0] = [a + b for a, b in zip(soma[0], serie[1])]
+                            soma[1] += serie[2]
+                            soma[2] += serie[3]
+
+        linhas: List[str] = []
+        for nome, (tipo, ajuda, labels, buckets, series) in juntas.items():
+            linhas.append(f"# HELP {nome} {ajuda}")
+            linhas.append(f"# TYPE {nome} {tipo}")
+            if tipo == "histogram":
+                linhas.extend(_amostras_histogram(nome, labels, buckets, ((v, *s) for v, s in series.items())))
+            else:
+                linhas.extend(_amostras_counter(nome, labels, series.items()))
+        return "\n".join(linhas) + "\n"
+
+
+registro = Registro()
+
+http_duracao = registro.registrar(Histogram(
+    "leads_api_http_request_duration_seconds",
+    "Latência das requisições HTTP por rota",
+    ("method", "route", "status"),
+))
+
+operacao_duracao = registro.registrar(Histogram(
+    "leads_api_operacao_duration_seconds",
+    "Latência das operações internas (repositórios, Evolution API, ...)",
+    ("camada", "operacao"),
+))
+
+operacao_erros = registro.registrar(Counter(
+    "leads_api_operacao_erros_total",
+    "Operações internas que terminaram em exceção",
+    ("camada", "operacao"),
+))
+
+
+def cronometrar(camada: str, operacao: str):
+    """
+    Decorator que mede a duração de uma função (síncrona ou async) em
+    leads_api_operacao_duration_seconds{camada, operacao}.
+
+        @cronometrar("repo", "leads.get_by_id")
+        async def get_by_id(...): ...
+    """
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def wrapper_async(*args, **kwargs):
+                inicio = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                except BaseException:
+                    operacao_erros.inc(camada, operacao)
+                    raise
+                finally:
+                    operacao_duracao.observar(time.perf_counter() - inicio, camada, operacao)
+            return wrapper_async
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except BaseException:
+                operacao_erros.inc(camada, operacao)
+                raise
+            finally:
+                operacao_duracao.observar(time.perf_counter() - inicio, camada, operacao)
+        return wrapper
+
+    return decorator
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI que mede cada requisição HTTP até o fim do envio do
+    corpo (inclui respostas em streaming) e registra por método, rota e status.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        inicio = time.perf_counter()
+        status = {"codigo": 500}
+
+        async def send_medido(mensagem):
+            if mensagem["type"] == "http.response.start":
+                status["codigo"] = mensagem["status"]
+            await send(mensagem)
+
+        try:
+            await self.app(scope, receive, send_medido)
+        finally:
+            rota = scope.get("route")
+            http_duracao.observar(
+                time.perf_counter() - inicio,
+                scope["method"],
+                getattr(rota, "path", "<sem_rota>"),
+                str(status["codigo"]),
+            )
+
+
+def registrar_gauges(nome: str, ajuda: str, labels: Sequence[str], coletar) -> None:
+    registro.registrar(GaugeColetado(nome, ajuda, labels, coletar))
+
+
+def registrar_counters(nome: str, ajuda: str, labels: Sequence[str], coletar) -> None:
+    registro.registrar(CounterColetado(nome, ajuda, labels, coletar))
+
+
+def exportar() -> str:
+    return registro.exportar()
+
+
+# ---------------------------------------------------------------------------
+# Vários processos: gravação periódica e ciclo de vida dos arquivos
+# ---------------------------------------------------------------------------
+
+_tarefa_gravacao: Optional[asyncio.Task] = None
+
+
+async def _gravar_periodicamente(diretorio: str) -> None:
+    while True:
+        await asyncio.sleep(METRICS_GRAVAR_S)
+        try:
+            registro.gravar(diretorio)
+        except OSError as e:
+            print(f"⚠️ Falha ao gravar as métricas em {diretorio}:", e)
+
+
+async def iniciar_gravacao() -> None:
+    """Chamado no lifespan de cada worker; não faz nada sem METRICS_MULTIPROC_DIR."""
+    global _tarefa_gravacao
+    if METRICS_MULTIPROC_DIR and _tarefa_gravacao is None:
+        os.makedirs(METRICS_MULTIPROC_DIR, exist_ok=True)
+        _tarefa_gravacao = asyncio.create_task(_gravar_periodicamente(METRICS_MULTIPROC_DIR))
+
+
+async def parar_gravacao() -> None:
+    """Para a gravação periódica e grava o retrato final do processo."""
+    global _tarefa_gravacao
+    if _tarefa_gravacao is None:
+        return
+    _tarefa_gravacao.cancel()
+    try:
+        await _tarefa_gravacao
+    except asyncio.CancelledError:
+        pass
+    _tarefa_gravacao = None
+    try:
+        registro.gravar(METRICS_MULTIPROC_DIR)
+    except OSError as e:
+        print(f"⚠️ Falha ao gravar as métricas em {METRICS_MULTIPROC_DIR}:", e)
+
+
+def limpar_diretorio(diretorio: str) -> None:
+    """Apaga os arquivos de uma execução anterior (no start do gunicorn)."""
+    os.makedirs(diretorio, exist_ok=True)
+    for caminho in glob.glob(os.path.join(diretorio, "*.json*")):
+        os.remove(caminho)
+
+
+def marcar_processo_morto(diretorio: str, pid: int) -> None:
+    """
+    Worker que saiu: os counters e histogramas dele continuam somando (senão
+    o total voltaria para trás no restart de um worker), mas os gauges deixam
+    de ser exportados.
+    """
+    caminho = os.path.join(diretorio, f"{pid}.json")
+    try:
+        with open(caminho) as f:
+            processo = json.load(f)
+    except (OSError, ValueError):
+        return
+    processo["vivo"] = False
+    with open(caminho + ".tmp", "w") as f:
+        json.dump(processo, f)
+    os.replace(caminho + ".tmp", caminho)
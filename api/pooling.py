@@ -0,0 +1,121 @@
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict
+
+
+class PoolTimeout(Exception):
+    """Nenhuma conexão do pool ficou livre dentro de DB_POOL_TIMEOUT."""
+
+
+@dataclass
+class PoolSettings:
+    """
+    Configuração dos pools de conexão, lida do ambiente.
+
+    Cada processo (worker do uvicorn/gunicorn) tem o próprio pool, então o
+    total de conexões no MySQL é até workers × (tamanho + overflow); isso
+    precisa caber no max_connections do servidor.
+    """
+    tamanho: int = 5            # conexões mantidas abertas
+    overflow: int = 10          # conexões extras abertas sob carga (pool assíncrono)
+    timeout: float = 10.0       # espera máxima por uma conexão livre (s)
+    recycle: int = 1800         # recria conexões mais velhas que isso (s)
+    health_interval: float = 30.0   # intervalo do health check / ping de conexões ociosas (s)
+
+    @property
+    def maximo(self) -> int:
+        return self.tamanho + self.overflow
+
+    @classmethod
+    def from_env(cls) -> "PoolSettings":
+        return cls(
+            tamanho=int(os.getenv("DB_POOL_SIZE", cls.tamanho)),
+            overflow=int(os.getenv("DB_POOL_MAX_OVERFLOW", cls.overflow)),
+            timeout=float(os.getenv("DB_POOL_TIMEOUT", cls.timeout)),
+            recycle=int(os.getenv("DB_POOL_RECYCLE", cls.recycle)),
+            health_interval=float(os.getenv("DB_POOL_HEALTHCHECK_INTERVAL", cls.health_interval)),
+        )
+
+
+class PoolMetrics:
+    """
+    Contadores de uso de um pool: tempo de espera por conexão, conexões em
+    uso, timeouts e resultado dos health checks. Seguro para threads (o pool
+    síncrono é usado por várias threads; no assíncrono o lock nunca disputa).
+    """
+
+    def __init__(self, nome: str):
+        self.nome = nome
+        self._lock = threading.Lock()
+        self.aquisicoes = 0
+        self.timeouts = 0
+        self.erros = 0
+        self.esperando = 0
+        self.em_uso = 0
+        self.em_uso_max = 0
+        self.espera_total = 0.0
+        self.espera_max = 0.0
+        self.reconexoes = 0
+        self.health_ok = 0
+        self.health_falhas = 0
+        self.ultimo_health = None
+
+    def inicio_espera(self) -> float:
+        with self._lock:
+            self.esperando += 1
+        return time.perf_counter()
+
+    def fim_espera(self, inicio: float, resultado: str = "ok") -> None:
+        """
+        `resultado`: "ok" (conexão entregue), "timeout" ou "erro".
+        """
+        espera = time.perf_counter() - inicio
+        with self._lock:
+            self.esperando -= 1
+            self.espera_total += espera
+            self.espera_max = max(self.espera_max, espera)
+            if resultado == "ok":
+                self.aquisicoes += 1
+                self.em_uso += 1
+                self.em_uso_max = max(self.em_uso_max, self.em_uso)
+            elif resultado == "timeout":
+                self.timeouts += 1
+            else:
+                self.erros += 1
+
+    def liberada(self) -> None:
+        with self._lock:
+            self.em_uso -= 1
+
+    def health(self, ok: bool) -> None:
+        with self._lock:
+            if ok:
+                self.health_ok += 1
+            else:
+                self.health_falhas += 1
+            self.ultimo_health = time.time()
+
+    def reconexao(self) -> None:
+        with self._lock:
+            self.reconexoes += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            tentativas = self.aquisicoes + self.timeouts + self.erros
+            return {
+                "aquisicoes": self.aquisicoes,
+                "timeouts": self.timeouts,
+                "erros": self.erros,
+                "esperando": self.esperando,
+                "em_uso": self.em_uso,
+                "em_uso_max": self.em_uso_max,
+                "espera_media_ms": round(self.espera_total / tentativas * 1000, 3) if tentativas else 0.0,
+                "espera_max_ms": round(self.espera_max * 1000, 3),
+                "espera_total_s": round(self.espera_total, 6),
+                "reconexoes": self.reconexoes,
+                "health_ok": self.health_ok,
+                "health_falhas": self.health_falhas,
+                "ultimo_health": self.ultimo_health,
+            }
@@ -0,0 +1,25 @@
+from datetime import date
+from typing import Any, Dict, Optional
+
+import aiomysql
+
+from ...db_async import get_conn
+from ...metrics import cronometrar
+from ..analytics import _montar_funil, _sql_funil, _sql_receita
+
+# Espelho assíncrono de api/repositories/analytics.py (só a leitura).
+
+
+@cronometrar("repo", "analytics.get_funil")
+async def get_funil(
+    de: date,
+    ate: date,
+    origem: Optional[str] = None,
+    servico: Optional[str] = None,
+) -> Dict[str, Any]:
+    async with get_conn() as conn, conn.cursor(aiomysql.DictCursor) as cur:
+        await cur.execute(*_sql_funil(de, ate, origem))
+        funil = await cur.fetchall()
+        await cur.execute(*_sql_receita(de, ate, servico))
+        receita = await cur.fetchall()
+    return _montar_funil(list(funil), list(receita))
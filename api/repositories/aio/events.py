@@ -0,0 +1,175 @@
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+import asyncio
+import json
+import re
+from datetime import date
+
+from ...db_async import get_conn, stream_query, usar_conn
+from ...metrics import cronometrar
+from ...services.arquivo_eventos import catalogo
+from ...services.serializacao import codificar_payload
+from ..events import TIPOS_VALIDOS
+
+# Espelho assíncrono de api/repositories/events.py.
+
+
+@cronometrar("repo", "events.add_event")
+async def add_event(
+    lead_id: int,
+    tipo: str,
+    payload: Optional[Dict[str, Any]] = None,
+    conn=None,
+) -> None:
+    if tipo not in TIPOS_VALIDOS:
+        raise ValueError(f"Tipo de evento inválido: {tipo}")
+
+    async with usar_conn(conn) as c, c.cursor() as cur:
+        await cur.execute(
+            """
+            INSERT INTO lead_events (lead_id, tipo, payload)
+            VALUES (%s, %s, %s)
+            """,
+            (lead_id, tipo, codificar_payload(payload)),
+        )
+
+
+@cronometrar("repo", "events.add_events_batch")
+async def add_events_batch(
+    eventos: Iterable[Tuple[int, str, Optional[Dict[str, Any]]]],
+    conn=None,
+) -> int:
+    """
+    Insere vários eventos de uma vez; o executemany do aiomysql também
+    junta tudo num único INSERT de várias linhas.
+    """
+    params: List[Tuple[int, str, Optional[str]]] = []
+    for lead_id, tipo, payload in eventos:
+        if tipo not in TIPOS_VALIDOS:
+            raise ValueError(f"Tipo de evento inválido: {tipo}")
+        params.append((lead_id, tipo, codificar_payload(payload)))
+
+    if not params:
+        return 0
+
+    async with usar_conn(conn) as c, c.cursor() as cur:
+        await cur.executemany(
+            """
+            INSERT INTO lead_events (lead_id, tipo, payload)
+            VALUES (%s, %s, %s)
+            """,
+            params,
+        )
+    return len(params)
+
+
+async def stream_events_by_lead(lead_id: int, tamanho_bloco: int) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    Todos os eventos do lead, em ordem de gravação, em blocos de `tamanho_bloco`:
+    primeiro os do arquivo morto (partições já removidas do banco), no mesmo
+    formato das linhas do banco, depois os da tabela.
+    """
+    if catalogo.tem_lead(lead_id):
+        arquivados = await asyncio.to_thread(catalogo.eventos_do_lead, lead_id)
+        linhas = [
+            {
+                "id": e["id"],
+                "lead_id": e["lead_id"],
+                "tipo": e["tipo"],
+                "payload": None if e["payload"] is None else json.dumps(e["payload"], ensure_ascii=False),
+                "created_at": e["created_at"],
+            }
+            for e in arquivados
+        ]
+        for inicio in range(0, len(linhas), tamanho_bloco):
+            yield linhas[inicio:inicio + tamanho_bloco]
+
+    blocos = stream_query(
+        "SELECT * FROM lead_events WHERE lead_id = %s ORDER BY id",
+        (lead_id,),
+        tamanho_bloco,
+    )
+    try:
+        async for rows in blocos:
+            yield rows
+    finally:
+        # cliente que desconecta no meio: libera a conexão do stream na hora
+        await blocos.aclose()
+
+
+# ---------------------------------------------------------------------------
+# Partições mensais e arquivo morto (migração 008, api/jobs/arquivar_eventos.py)
+# ---------------------------------------------------------------------------
+
+# p_antigas (tudo antes da primeira mensal), pAAAAMM e p_futuro (MAXVALUE)
+_NOME_PARTICAO = re.compile(r"^p(\d{6}|_antigas|_futuro)$")
+
+
+def _particao(nome: str) -> str:
+    # o nome vai direto no SQL (PARTITION (...) não aceita parâmetro)
+    if not _NOME_PARTICAO.match(nome):
+        raise ValueError(f"Partição inválida: {nome}")
+    return nome
+
+
+@cronometrar("repo", "events.listar_particoes")
+async def listar_particoes() -> List[str]:
+    """Partições do lead_events em ordem; lista vazia se a tabela não for particionada."""
+    async with get_conn() as conn, conn.cursor() as cur:
+        await cur.execute(
+            """
+            SELECT PARTITION_NAME FROM information_schema.PARTITIONS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'lead_events'
+              AND PARTITION_NAME IS NOT NULL
+            ORDER BY PARTITION_ORDINAL_POSITION
+            """
+        )
+        return [row[0] for row in await cur.fetchall()]
+
+
+@cronometrar("repo", "events.contar_particao")
+async def contar_particao(particao: str) -> int:
+    async with get_conn() as conn, conn.cursor() as cur:
+        await cur.execute(f"SELECT COUNT(*) FROM lead_events PARTITION ({_particao(particao)})")
+        return int((await cur.fetchone())[0])
+
+
+def stream_particao(particao: str, tamanho_bloco: int) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    Eventos de uma partição em ordem de (lead_id, created_at, id), que é a
+    ordem do índice idx_lead_events_lead_created: leitura sem filesort.
+    """
+    return stream_query(
+        f"SELECT id, lead_id, tipo, payload, created_at FROM lead_events PARTITION ({_particao(particao)}) "
+        "ORDER BY lead_id, created_at, id",
+        (),
+        tamanho_bloco,
+    )
+
+
+@cronometrar("repo", "events.remover_particao")
+async def remover_particao(particao: str) -> None:
+    async with get_conn() as conn, conn.cursor() as cur:
+        await cur.execute(f"ALTER TABLE lead_events DROP PARTITION {_particao(particao)}")
+
+
+def _sql_criar_particoes(meses: List[date]) -> str:
+    """
+    Separa os meses pedidos do p_futuro. Com o p_futuro vazio (o job sempre
+    cria os meses antes de chegarem) o REORGANIZE não copia nenhuma linha.
+    """
+    particoes = []
+    for mes in meses:
+        seguinte = date(mes.year + mes.month // 12, mes.month % 12 + 1, 1)
+        particoes.append(
+            f"PARTITION p{mes:%Y%m} VALUES LESS THAN (UNIX_TIMESTAMP('{seguinte:%Y-%m-%d} 00:00:00'))"
+        )
+    particoes.append("PARTITION p_futuro VALUES LESS THAN MAXVALUE")
+    return "ALTER TABLE lead_events REORGANIZE PARTITION p_futuro INTO (" + ", ".join(particoes) + ")"
+
+
+@cronometrar("repo", "events.criar_particoes")
+async def criar_particoes(meses: List[date]) -> None:
+    if not meses:
+        return
+    async with get_conn() as conn, conn.cursor() as cur:
+        await cur.execute(_sql_criar_particoes(meses))
@@ -0,0 +1,231 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import aiomysql
+
+from ...db_async import transacao, usar_conn
+from ...metrics import cronometrar
+from ...services.serializacao import codificar_resultado
+from ..events import TIPO_MSG_ENVIADA
+
+# Tabela followups (sql/migrations/009_followups.sql).
+# API (agendar) e worker (carregar/reservar/concluir) são assíncronos, então
+# não tem versão síncrona.
+
+STATUS_PENDENTE = "pendente"
+STATUS_ENVIANDO = "enviando"
+STATUS_ENVIADO = "enviado"
+STATUS_CANCELADO = "cancelado"
+STATUS_FALHOU = "falhou"
+
+# (lead_id, regra, atraso em segundos a partir de agora)
+Agendamento = Tuple[int, str, float]
+# (id, status, atraso em segundos até a próxima tentativa ou None, resultado)
+Conclusao = Tuple[int, str, Optional[float], Optional[Dict[str, Any]]]
+# (agendado_para, id) do último follow-up carregado pelo worker
+Posicao = Tuple[Any, int]
+
+
+def _sql_agendar(itens: Sequence[Agendamento]):
+    """
+    INSERT de várias linhas. O agendado_para é calculado no relógio do
+    banco, o mesmo que o worker usa para saber o que venceu. Follow-up que
+    já existe para o (lead, regra) fica como está.
+    """
+    valores = ", ".join(["(%s, %s, CURRENT_TIMESTAMP(3) + INTERVAL %s MICROSECOND)"] * len(itens))
+    sql = (
+        f"INSERT INTO followups (lead_id, regra, agendado_para) VALUES {valores} "
+        f"ON DUPLICATE KEY UPDATE lead_id = lead_id"
+    )
+    params: List[Any] = []
+    for lead_id, regra, atraso in itens:
+        params += (lead_id, regra, int(atraso * 1_000_000))
+    return sql, params
+
+
+@cronometrar("repo", "followups.agendar")
+async def agendar(itens: Sequence[Agendamento], conn=None) -> int:
+    if not itens:
+        return 0
+    async with usar_conn(conn) as c, c.cursor() as cur:
+        await cur.execute(*_sql_agendar(itens))
+    return len(itens)
+
+
+@cronometrar("repo", "followups.agendar_existentes")
+async def agendar_existentes(regra: str, etapa: str, atraso_s: float, dias: int) -> int:
+    """
+    Agenda a regra para os leads que já estão na `etapa` e entraram nos
+    últimos `dias` (quem entrou antes de ligar o FOLLOWUP_ENABLED). O
+    horário é o de entrada + atraso; os que já passaram disparam na próxima
+    carga do worker.
+    """
+    async with usar_conn() as conn, conn.cursor() as cur:
+        await cur.execute(
+            """
+            INSERT INTO followups (lead_id, regra, agendado_para)
+            SELECT id, %s, created_at + INTERVAL %s MICROSECOND
+            FROM leads
+            WHERE etapa = %s AND created_at >= CURRENT_TIMESTAMP - INTERVAL %s DAY
+            ON DUPLICATE KEY UPDATE lead_id = followups.lead_id
+            """,
+            (regra, int(atraso_s * 1_000_000), etapa, dias),
+        )
+        # follow-ups criados: os que já existiam contam 0 no rowcount
+        return cur.rowcount
+
+
+def _sql_carregar(horizonte_s: float, depois_de: Optional[Posicao], limite: int):
+    """
+    Follow-ups elegíveis (pendentes ou com reserva) que vencem até
+    `horizonte_s` segundos à frente (a reserva de um lote em envio é
+    renovada pelo worker, então só volta a vencer se ele morrer), em ordem de (agendado_para, id), depois
+    de `depois_de` (keyset). `faltam_us` vem do relógio do banco, então o
+    worker não depende do relógio da própria máquina.
+
+    Com os dois status o índice (status, agendado_para, id) vira dois
+    intervalos e a ordenação é feita só sobre as linhas da janela.
+    """
+    condicoes = ["status IN (%s, %s)", "agendado_para <= CURRENT_TIMESTAMP(3) + INTERVAL %s MICROSECOND"]
+    params: List[Any] = [STATUS_PENDENTE, STATUS_ENVIANDO, int(horizonte_s * 1_000_000)]
+    if depois_de is not None:
+        momento, id_ = depois_de
+        condicoes.append("(agendado_para > %s OR (agendado_para = %s AND id > %s))")
+        params += (momento, momento, id_)
+    sql = (
+        "SELECT id, agendado_para, "
+        "TIMESTAMPDIFF(MICROSECOND, CURRENT_TIMESTAMP(3), agendado_para) AS faltam_us "
+        f"FROM followups WHERE {' AND '.join(condicoes)} "
+        "ORDER BY agendado_para, id LIMIT %s"
+    )
+    params.append(limite)
+    return sql, params
+
+
+@cronometrar("repo", "followups.carregar")
+async def carregar(horizonte_s: float, depois_de: Optional[Posicao], limite: int) -> List[Dict[str, Any]]:
+    async with usar_conn() as conn, conn.cursor(aiomysql.DictCursor) as cur:
+        await cur.execute(*_sql_carregar(horizonte_s, depois_de, limite))
+        return list(await cur.fetchall())
+
+
+@cronometrar("repo", "followups.reservar")
+async def reservar(ids: Sequence[int], reserva_s: float) -> List[Dict[str, Any]]:
+    """
+    Reserva por `reserva_s` segundos os follow-ups de `ids` que ainda estão
+    elegíveis e venceram, e devolve cada um com os dados do lead (nome,
+    telefone, etapa; NULL se o lead foi apagado) e o momento da última
+    mensagem_enviada ao lead desde a entrada dele (leads.created_at; o
+    criado_em do follow-up é a hora do agendar_existentes para os leads
+    antigos).
+
+    Os ids vêm do heap do worker e podem estar desatualizados: o que outra
+    réplica já reservou (SKIP LOCKED) ou concluiu simplesmente não volta.
+    """
+    if not ids:
+        return []
+    marcadores = ", ".join(["%s"] * len(ids))
+    async with transacao() as conn, conn.cursor(aiomysql.DictCursor) as cur:
+        await cur.execute(
+            f"""
+            SELECT f.id, f.lead_id, f.regra, f.tentativas, f.criado_em,
+                   l.nome, l.telefone, l.etapa,
+                   (SELECT MAX(e.created_at) FROM lead_events e
+                    WHERE e.lead_id = f.lead_id AND e.tipo = %s AND e.created_at >= l.created_at)
+                       AS mensagem_em
+            FROM followups f
+            LEFT JOIN leads l ON l.id = f.lead_id
+            WHERE f.id IN ({marcadores})
+              AND f.status IN (%s, %s)
+              AND f.agendado_para <= CURRENT_TIMESTAMP(3)
+            FOR UPDATE OF f SKIP LOCKED
+            """,
+            (TIPO_MSG_ENVIADA, *ids, STATUS_PENDENTE, STATUS_ENVIANDO),
+        )
+        rows = list(await cur.fetchall())
+        if not rows:
+            return []
+
+        marcadores = ", ".join(["%s"] * len(rows))
+        await cur.execute(
+            f"""
+            UPDATE followups
+            SET status = %s,
+                tentativas = tentativas + 1,
+                agendado_para = CURRENT_TIMESTAMP(3) + INTERVAL %s MICROSECOND
+            WHERE id IN ({marcadores})
+            """,
+            (STATUS_ENVIANDO, int(reserva_s * 1_000_000), *(row["id"] for row in rows)),
+        )
+
+    for row in rows:
+        row["tentativas"] += 1
+    return rows
+
+
+@cronometrar("repo", "followups.renovar")
+async def renovar(ids: Sequence[int], reserva_s: float) -> int:
+    """
+    Estende por mais `reserva_s` segundos a reserva de um lote que ainda
+    está sendo enviado, para outra réplica não reservá-lo de novo.
+    """
+    if not ids:
+        return 0
+    marcadores = ", ".join(["%s"] * len(ids))
+    async with usar_conn() as conn, conn.cursor() as cur:
+        await cur.execute(
+            f"""
+            UPDATE followups
+            SET agendado_para = CURRENT_TIMESTAMP(3) + INTERVAL %s MICROSECOND
+            WHERE id IN ({marcadores}) AND status = %s
+            """,
+            (int(reserva_s * 1_000_000), *ids, STATUS_ENVIANDO),
+        )
+        return cur.rowcount
+
+
+def _sql_concluir(conclusoes: Sequence[Conclusao]):
+    """
+    Um único UPDATE ... CASE para o lote, como o do outbox: status, próximo
+    disparo (só para quem volta a 'pendente'), último resultado e
+    concluido_em.
+    """
+    casos = " ".join(["WHEN %s THEN %s"] * len(conclusoes))
+    casos_atraso = " ".join(
+        ["WHEN %s THEN CURRENT_TIMESTAMP(3) + INTERVAL %s MICROSECOND"] * len(conclusoes)
+    )
+    marcadores = ", ".join(["%s"] * len(conclusoes))
+    sql = (
+        f"UPDATE followups SET "
+        f"status = CASE id {casos} END, "
+        f"agendado_para = CASE id {casos_atraso} END, "
+        f"ultimo_resultado = CASE id {casos} END, "
+        f"concluido_em = IF(status = %s, NULL, CURRENT_TIMESTAMP) "
+        f"WHERE id IN ({marcadores})"
+    )
+    params: List[Any] = []
+    for id_, status, _, _ in conclusoes:
+        params += (id_, status)
+    for id_, _, atraso, _ in conclusoes:
+        params += (id_, int((atraso or 0) * 1_000_000))
+    for id_, _, _, resultado in conclusoes:
+        params += (id_, codificar_resultado(resultado))
+    # no MySQL o SET é aplicado da esquerda para a direita: aqui `status` já é o novo
+    params.append(STATUS_PENDENTE)
+    params += (id_ for id_, _, _, _ in conclusoes)
+    return sql, params
+
+
+@cronometrar("repo", "followups.concluir")
+async def concluir(conclusoes: Sequence[Conclusao], conn=None) -> int:
+    if not conclusoes:
+        return 0
+    async with usar_conn(conn) as c, c.cursor() as cur:
+        await cur.execute(*_sql_concluir(conclusoes))
+    return len(conclusoes)
+
+
+@cronometrar("repo", "followups.contar_por_status")
+async def contar_por_status() -> Dict[str, int]:
+    async with usar_conn() as conn, conn.cursor() as cur:
+        await cur.execute("SELECT status, COUNT(*) FROM followups GROUP BY status")
+        return {status: int(total) for status, total in await cur.fetchall()}
@@ -0,0 +1,42 @@
+from typing import Any, Dict, List, Optional
+
+import aiomysql
+
+from ...db_async import get_conn
+from ...metrics import cronometrar
+
+# Espelho assíncrono de api/repositories/historico_servicos.py.
+
+
+@cronometrar("repo", "historico_servicos.adicionar_servico")
+async def adicionar_servico(
+    lead_id: int,
+    servico: str,
+    data_servico: str,   # 'YYYY-MM-DD HH:MM:SS'
+    status: str,
+    ticket: Optional[float] = None,
+    observacoes: Optional[str] = None,
+) -> int:
+    sql = """
+    INSERT INTO historico_servicos
+        (lead_id, servico, data_servico, status, ticket, observacoes)
+    VALUES (%s, %s, %s, %s, %s, %s)
+    """
+    params = (lead_id, servico, data_servico, status, ticket, observacoes)
+
+    async with get_conn() as conn, conn.cursor() as cur:
+        await cur.execute(sql, params)
+        return int(cur.lastrowid)
+
+
+@cronometrar("repo", "historico_servicos.listar_historico_por_lead")
+async def listar_historico_por_lead(lead_id: int) -> List[Dict[str, Any]]:
+    sql = """
+    SELECT *
+    FROM historico_servicos
+    WHERE lead_id = %s
+    ORDER BY data_servico DESC
+    """
+    async with get_conn() as conn, conn.cursor(aiomysql.DictCursor) as cur:
+        await cur.execute(sql, (lead_id,))
+        return await cur.fetchall()
@@ -0,0 +1,48 @@
+import json
+from typing import Any, Dict, Optional
+
+from ...db_async import get_conn
+from ...metrics import cronometrar
+
+# Tabela webhook_idempotencia (sql/migrations/002_webhook_idempotencia.sql).
+# Só a API usa, então não tem versão síncrona.
+
+
+@cronometrar("repo", "idempotencia.buscar")
+async def buscar(chave: str) -> Optional[Dict[str, Any]]:
+    async with get_conn() as conn, conn.cursor() as cur:
+        await cur.execute(
+            """
+            SELECT resposta
+            FROM webhook_idempotencia
+            WHERE chave = %s AND expira_em > CURRENT_TIMESTAMP
+            """,
+            (chave,),
+        )
+        row = await cur.fetchone()
+    return json.loads(row[0]) if row else None
+
+
+@cronometrar("repo", "idempotencia.gravar")
+async def gravar(chave: str, rota: str, resposta: Dict[str, Any], ttl: int) -> None:
+    async with get_conn() as conn, conn.cursor() as cur:
+        await cur.execute(
+            """
+            INSERT INTO webhook_idempotencia (chave, rota, resposta, expira_em)
+            VALUES (%s, %s, %s, CURRENT_TIMESTAMP + INTERVAL %s SECOND)
+            ON DUPLICATE KEY UPDATE
+              resposta = VALUES(resposta),
+              expira_em = VALUES(expira_em)
+            """,
+            (chave, rota, json.dumps(resposta), ttl),
+        )
+
+
+@cronometrar("repo", "idempotencia.limpar_expiradas")
+async def limpar_expiradas(limite: int = 1000) -> int:
+    async with get_conn() as conn, conn.cursor() as cur:
+        await cur.execute(
+            "DELETE FROM webhook_idempotencia WHERE expira_em <= CURRENT_TIMESTAMP LIMIT %s",
+            (limite,),
+        )
+        return cur.rowcount
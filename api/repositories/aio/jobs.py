@@ -0,0 +1,18 @@
+from typing import Any, Dict, Optional, Tuple
+
+from ...db_async import get_conn
+from ...metrics import cronometrar
+from ..jobs import _SQL_LER_ESTADO, _SQL_TRAVA_EM_USO, _decodificar, _nome_trava
+
+# Espelho assíncrono de api/repositories/jobs.py (só a leitura do estado).
+
+
+@cronometrar("repo", "jobs.ler_estado")
+async def ler_estado(job: str) -> Tuple[Optional[Dict[str, Any]], bool]:
+    """(último estado gravado pelo job ou None, se a trava do job está em uso)."""
+    async with get_conn() as conn, conn.cursor() as cur:
+        await cur.execute(_SQL_LER_ESTADO, (job,))
+        estado = _decodificar(await cur.fetchone())
+        await cur.execute(_SQL_TRAVA_EM_USO, (_nome_trava(job),))
+        (em_uso,) = await cur.fetchone()
+    return estado, bool(em_uso)
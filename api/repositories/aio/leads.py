@@ -0,0 +1,161 @@
+from datetime import datetime
+from typing import Optional, List, Dict, Any, AsyncIterator, Tuple
+
+import aiomysql
+
+from ...db_async import get_conn, stream_query, usar_conn
+from ...metrics import cronometrar
+from ...schemas import LeadFilters
+from ...services.cache import AUSENTE, lead_cache
+from ...services.normalize import phone_key
+from ..leads import (
+    UPSERT_BATCH_CHUNK,
+    _UPSERT_SQL,
+    _UPSERT_VALUES,
+    _upsert_params,
+    _sql_ids_por_chave,
+    _mapear_ids,
+    _ids_do_bloco,
+    _sql_update_lead,
+    _sql_telefones_por_ids,
+    _sql_list_leads,
+    _pagina,
+    _sql_export_leads,
+)
+
+# Espelho assíncrono de api/repositories/leads.py (mesmo SQL, driver aiomysql).
+# Os endpoints da API usam estas funções; scripts continuam com as síncronas.
+#
+# get_by_id passa pelo lead_cache (read-through); toda escrita em um lead
+# invalida a entrada dele.
+
+
+@cronometrar("repo", "leads.upsert_lead")
+async def upsert_lead(data: Dict[str, Any], conn=None) -> int:
+    async with usar_conn(conn) as c, c.cursor() as cur:
+        await cur.execute(_UPSERT_SQL % _UPSERT_VALUES, _upsert_params(data))
+        lead_id = int(cur.lastrowid or 0)
+
+    await lead_cache.invalidar([lead_id])
+    return lead_id
+
+
+@cronometrar("repo", "leads.upsert_leads_batch")
+async def upsert_leads_batch(rows: List[Dict[str, Any]], conn=None) -> List[int]:
+    ids: List[int] = [0] * len(rows)
+
+    async with usar_conn(conn) as c, c.cursor(aiomysql.DictCursor) as cur:
+        for inicio in range(0, len(rows), UPSERT_BATCH_CHUNK):
+            indices = range(inicio, min(inicio + UPSERT_BATCH_CHUNK, len(rows)))
+
+            chaves = {i: phone_key(rows[i]["telefone"]) for i in indices}
+            com_chave = [i for i in indices if rows[i]["email"] or chaves[i]]
+            sem_chave = [i for i in indices if not (rows[i]["email"] or chaves[i])]
+
+            for i in sem_chave:
+                await cur.execute(_UPSERT_SQL % _UPSERT_VALUES, _upsert_params(rows[i]))
+                ids[i] = int(cur.lastrowid)
+
+            if not com_chave:
+                continue
+
+            values = ", ".join([_UPSERT_VALUES] * len(com_chave))
+            params: List[Any] = []
+            for i in com_chave:
+                params.extend(_upsert_params(rows[i]))
+            await cur.execute(_UPSERT_SQL % values, params)
+
+            await cur.execute(*_sql_ids_por_chave(
+                emails=[rows[i]["email"] for i in com_chave if rows[i]["email"]],
+                phone_keys=[chaves[i] for i in com_chave if chaves[i]],
+            ))
+            achados = _ids_do_bloco(rows, chaves, com_chave, *_mapear_ids(await cur.fetchall()))
+            for i, lead_id in zip(com_chave, achados):
+                ids[i] = lead_id
+
+    await lead_cache.invalidar(ids)
+    return ids
+
+
+@cronometrar("repo", "leads.get_by_id")
+async def get_by_id(lead_id: int) -> Optional[Dict[str, Any]]:
+    cached = await lead_cache.get(lead_id)
+    if cached is not AUSENTE:
+        return cached
+
+    async with get_conn() as conn, conn.cursor(aiomysql.DictCursor) as cur:
+        await cur.execute("SELECT * FROM leads WHERE id = %s", (lead_id,))
+        row = await cur.fetchone()
+
+    await lead_cache.set(lead_id, row)
+    return row
+
+
+@cronometrar("repo", "leads.get_telefones_by_ids")
+async def get_telefones_by_ids(lead_ids: List[int]) -> Dict[int, Optional[str]]:
+    if not lead_ids:
+        return {}
+    async with get_conn() as conn, conn.cursor(aiomysql.DictCursor) as cur:
+        await cur.execute(*_sql_telefones_por_ids(lead_ids))
+        return {int(row["id"]): row["telefone"] for row in await cur.fetchall()}
+
+
+@cronometrar("repo", "leads.list_leads")
+async def list_leads(
+    filtros: LeadFilters,
+    cursor: Optional[str] = None,
+    limite: int = 200,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    sql, params = _sql_list_leads(filtros, cursor, limite)
+
+    async with get_conn() as conn, conn.cursor(aiomysql.DictCursor) as cur:
+        await cur.execute(sql, params)
+        return _pagina(await cur.fetchall(), limite)
+
+
+def stream_leads(filtros: LeadFilters, tamanho_bloco: int) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    Lê todos os leads do filtro em blocos de `tamanho_bloco` linhas, com
+    cursor do lado do servidor (memória constante, seja qual for a tabela).
+    """
+    sql, params = _sql_export_leads(filtros)
+    return stream_query(sql, params, tamanho_bloco)
+
+
+@cronometrar("repo", "leads.get_for_update")
+async def get_for_update(lead_id: int, conn) -> Optional[Dict[str, Any]]:
+    """
+    Lê o lead travando a linha até o fim da transação de `conn`. A linha vem
+    com `_agora` (CURRENT_TIMESTAMP do banco), para usar no updated_at do
+    UPDATE que vier em seguida.
+    """
+    async with conn.cursor(aiomysql.DictCursor) as cur:
+        await cur.execute(
+            "SELECT *, CURRENT_TIMESTAMP AS _agora FROM leads WHERE id = %s FOR UPDATE",
+            (lead_id,),
+        )
+        return await cur.fetchone()
+
+
+@cronometrar("repo", "leads.update_lead")
+async def update_lead(
+    lead_id: int,
+    data: Dict[str, Any],
+    conn=None,
+    atualizado_em: Optional[datetime] = None,
+) -> None:
+    """
+    Versão assíncrona do update_lead: só as chaves permitidas entram no UPDATE.
+    Com `conn` o UPDATE entra na transação de quem chamou.
+    """
+    montado = _sql_update_lead(lead_id, data, atualizado_em)
+    if montado is None:
+        return
+
+    sql, params = montado
+    async with usar_conn(conn) as c, c.cursor() as cur:
+        await cur.execute(sql, params)
+        if conn is None:
+            await c.commit()
+
+    await lead_cache.invalidar([lead_id])
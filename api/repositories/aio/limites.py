@@ -0,0 +1,50 @@
+from ...db_async import get_conn
+from ...metrics import cronometrar
+
+# Tabela limites_envio (sql/migrations/010_limites_envio.sql).
+# Usada pelos limites de envio da API e dos workers, todos assíncronos, então
+# não tem versão síncrona.
+
+# Agora em microssegundos desde a época, no relógio do banco
+_AGORA_US = "CAST(UNIX_TIMESTAMP(CURRENT_TIMESTAMP(6)) * 1000000 AS SIGNED)"
+
+# Linhas sem envio há mais que isso podem ser apagadas
+_INATIVA_US = 3600 * 1_000_000
+
+
+@cronometrar("repo", "limites.reservar")
+async def reservar(chave: str, intervalo_us: int) -> int:
+    """
+    Reserva o próximo envio da `chave` (GCRA): o tat avança `intervalo_us`
+    a partir de max(tat, agora). Devolve quanto falta, em microssegundos,
+    do agora até o novo tat; quem chama desconta o intervalo e a tolerância
+    do burst para saber quanto dormir. Para reservar um bloco de n envios,
+    passe n intervalos.
+
+    O LAST_INSERT_ID(expr) guarda o novo tat na conexão, então não há
+    corrida entre o UPDATE e a leitura.
+    """
+    async with get_conn() as conn, conn.cursor() as cur:
+        await cur.execute(
+            f"""
+            INSERT INTO limites_envio (chave, tat_us)
+            VALUES (%s, LAST_INSERT_ID({_AGORA_US} + %s))
+            ON DUPLICATE KEY UPDATE
+              tat_us = LAST_INSERT_ID(GREATEST(tat_us, {_AGORA_US}) + %s)
+            """,
+            (chave, intervalo_us, intervalo_us),
+        )
+        await cur.execute(f"SELECT CAST(LAST_INSERT_ID() AS SIGNED) - {_AGORA_US}")
+        (faltam,) = await cur.fetchone()
+    return int(faltam)
+
+
+@cronometrar("repo", "limites.limpar")
+async def limpar(prefixo: str, limite: int = 1000) -> int:
+    """Apaga um bloco de limites da `prefixo` sem envio há mais de uma hora."""
+    async with get_conn() as conn, conn.cursor() as cur:
+        await cur.execute(
+            f"DELETE FROM limites_envio WHERE chave LIKE %s AND tat_us < {_AGORA_US} - %s LIMIT %s",
+            (prefixo + "%", _INATIVA_US, limite),
+        )
+        return cur.rowcount
@@ -0,0 +1,157 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import aiomysql
+
+from ...db_async import transacao, usar_conn
+from ...metrics import cronometrar
+from ...services.serializacao import codificar_resultado
+
+# Tabela outbox_mensagens (sql/migrations/005_outbox_mensagens.sql).
+# API (enfileirar) e worker (reservar/concluir) são assíncronos, então não
+# tem versão síncrona.
+
+STATUS_PENDENTE = "pendente"
+STATUS_ENVIANDO = "enviando"
+STATUS_ENVIADA = "enviada"
+STATUS_FALHOU = "falhou"
+
+# (message_id, lead_id, telefone, texto)
+Mensagem = Tuple[str, int, str, str]
+# (id, status, atraso em segundos até a próxima tentativa ou None, resultado)
+Conclusao = Tuple[int, str, Optional[float], Optional[Dict[str, Any]]]
+
+
+@cronometrar("repo", "outbox.enfileirar")
+async def enfileirar(mensagens: Sequence[Mensagem], conn=None) -> int:
+    """
+    Grava as mensagens como pendentes; o executemany vira um único INSERT
+    de várias linhas.
+    """
+    if not mensagens:
+        return 0
+    async with usar_conn(conn) as c, c.cursor() as cur:
+        await cur.executemany(
+            """
+            INSERT INTO outbox_mensagens (message_id, lead_id, telefone, texto)
+            VALUES (%s, %s, %s, %s)
+            """,
+            list(mensagens),
+        )
+    return len(mensagens)
+
+
+@cronometrar("repo", "outbox.reservar")
+async def reservar(limite: int, reserva_s: float) -> List[Dict[str, Any]]:
+    """
+    Reserva até `limite` mensagens elegíveis para este worker por
+    `reserva_s` segundos e devolve as linhas (já com a tentativa atual).
+
+    O SKIP LOCKED faz réplicas concorrentes pegarem lotes diferentes sem
+    esperar umas pelas outras; a transação dura só o SELECT + UPDATE, o
+    envio acontece fora dela. A ordem do ORDER BY é a do índice
+    idx_outbox_fila, então não há filesort, e reservas vencidas
+    ('enviando' < 'pendente') saem primeiro.
+    """
+    async with transacao() as conn, conn.cursor(aiomysql.DictCursor) as cur:
+        await cur.execute(
+            """
+            SELECT id, message_id, lead_id, telefone, texto, tentativas
+            FROM outbox_mensagens
+            WHERE status IN (%s, %s) AND proxima_tentativa <= CURRENT_TIMESTAMP(3)
+            ORDER BY status, proxima_tentativa, id
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+            """,
+            (STATUS_ENVIANDO, STATUS_PENDENTE, limite),
+        )
+        rows = list(await cur.fetchall())
+        if not rows:
+            return []
+
+        marcadores = ", ".join(["%s"] * len(rows))
+        await cur.execute(
+            f"""
+            UPDATE outbox_mensagens
+            SET status = %s,
+                tentativas = tentativas + 1,
+                proxima_tentativa = CURRENT_TIMESTAMP(3) + INTERVAL %s MICROSECOND
+            WHERE id IN ({marcadores})
+            """,
+            (STATUS_ENVIANDO, int(reserva_s * 1_000_000), *(row["id"] for row in rows)),
+        )
+
+    for row in rows:
+        row["tentativas"] += 1
+    return rows
+
+
+@cronometrar("repo", "outbox.renovar")
+async def renovar(ids: Sequence[int], reserva_s: float) -> int:
+    """
+    Estende por mais `reserva_s` segundos a reserva de um lote que ainda
+    está sendo enviado, para outra réplica não reservá-lo de novo.
+    """
+    if not ids:
+        return 0
+    marcadores = ", ".join(["%s"] * len(ids))
+    async with usar_conn() as conn, conn.cursor() as cur:
+        await cur.execute(
+            f"""
+            UPDATE outbox_mensagens
+            SET proxima_tentativa = CURRENT_TIMESTAMP(3) + INTERVAL %s MICROSECOND
+            WHERE id IN ({marcadores}) AND status = %s
+            """,
+            (int(reserva_s * 1_000_000), *ids, STATUS_ENVIANDO),
+        )
+        return cur.rowcount
+
+
+def _sql_concluir(conclusoes: Sequence[Conclusao]):
+    """
+    Um único UPDATE ... CASE para o lote inteiro: status, próxima tentativa
+    (só para quem volta a 'pendente'), último resultado e concluido_em.
+    """
+    casos = " ".join(["WHEN %s THEN %s"] * len(conclusoes))
+    casos_atraso = " ".join(
+        ["WHEN %s THEN CURRENT_TIMESTAMP(3) + INTERVAL %s MICROSECOND"] * len(conclusoes)
+    )
+    marcadores = ", ".join(["%s"] * len(conclusoes))
+    sql = (
+        f"UPDATE outbox_mensagens SET "
+        f"status = CASE id {casos} END, "
+        f"proxima_tentativa = CASE id {casos_atraso} END, "
+        f"ultimo_resultado = CASE id {casos} END, "
+        f"concluido_em = IF(status IN (%s, %s), CURRENT_TIMESTAMP, NULL) "
+        f"WHERE id IN ({marcadores})"
+    )
+    params: List[Any] = []
+    for id_, status, _, _ in conclusoes:
+        params += (id_, status)
+    for id_, _, atraso, _ in conclusoes:
+        params += (id_, int((atraso or 0) * 1_000_000))
+    for id_, _, _, resultado in conclusoes:
+        params += (id_, codificar_resultado(resultado))
+    # no MySQL o SET é aplicado da esquerda para a direita: aqui `status` já é o novo
+    params += (STATUS_ENVIADA, STATUS_FALHOU)
+    params += (id_ for id_, _, _, _ in conclusoes)
+    return sql, params
+
+
+@cronometrar("repo", "outbox.concluir")
+async def concluir(conclusoes: Sequence[Conclusao], conn=None) -> int:
+    """
+    Grava o resultado de um lote enviado. Para 'enviada'/'falhou' o atraso
+    é ignorado na prática (a linha não volta para a fila).
+    """
+    if not conclusoes:
+        return 0
+    async with usar_conn(conn) as c, c.cursor() as cur:
+        await cur.execute(*_sql_concluir(conclusoes))
+    return len(conclusoes)
+
+
+@cronometrar("repo", "outbox.contar_por_status")
+async def contar_por_status() -> Dict[str, int]:
+    async with usar_conn() as conn, conn.cursor() as cur:
+        await cur.execute("SELECT status, COUNT(*) FROM outbox_mensagens GROUP BY status")
+        return {status: int(total) for status, total in await cur.fetchall()}
@@ -0,0 +1,49 @@
+import asyncio
+from typing import Any, Dict, Optional, Sequence
+
+import aiomysql
+
+from ...db_async import get_conn
+from ...metrics import cronometrar
+from ...services.arquivo_eventos import catalogo
+from ..timeline import (
+    CAMPOS_LEAD,
+    CAMPOS_TIMELINE_PADRAO,
+    _itens_arquivados,
+    _mesclar_arquivados,
+    _pagina_timeline,
+    _sql_lead_projetado,
+    _sql_timeline,
+)
+
+# Espelho assíncrono de api/repositories/timeline.py.
+
+
+@cronometrar("repo", "timeline.get_timeline")
+async def get_timeline(
+    lead_id: int,
+    campos: Sequence[str] = CAMPOS_TIMELINE_PADRAO,
+    campos_lead: Sequence[str] = CAMPOS_LEAD,
+    cursor: Optional[str] = None,
+    limite: int = 100,
+    desc: bool = False,
+) -> Optional[Dict[str, Any]]:
+    # monta o SQL antes de pegar conexão: cursor inválido não gasta o pool
+    sql_lead = _sql_lead_projetado(lead_id, campos_lead)
+    sql_timeline = _sql_timeline(lead_id, campos, cursor, limite, desc)
+
+    async with get_conn() as conn, conn.cursor(aiomysql.DictCursor) as cur:
+        await cur.execute(*sql_lead)
+        lead = await cur.fetchone()
+        if lead is None:
+            return None
+        await cur.execute(*sql_timeline)
+        rows = list(await cur.fetchall())
+
+    if catalogo.tem_lead(lead_id):
+        # descompressão dos blocos do lead fora do event loop
+        eventos = await asyncio.to_thread(catalogo.eventos_do_lead, lead_id)
+        rows = _mesclar_arquivados(rows, _itens_arquivados(eventos, campos, cursor, desc), limite, desc)
+    itens, proximo = _pagina_timeline(rows, limite)
+
+    return {"lead": lead, "itens": itens, "next_cursor": proximo}
@@ -0,0 +1,155 @@
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..db import transacao, usar_conn
+from ..metrics import cronometrar
+
+# Leitura e reconciliação dos agregados do funil (funil_diario e
+# receita_diaria, sql/migrations/004_funil_agregados.sql). Os triggers mantêm
+# as tabelas em dia; aqui só se lê o que já está somado.
+
+ETAPAS_FUNIL = ("novo", "qualificado", "cliente")
+
+
+def _sql_funil(de: date, ate: date, origem: Optional[str]):
+    sql = "SELECT dia, origem, etapa, total FROM funil_diario WHERE dia BETWEEN %s AND %s AND total <> 0"
+    params: List[Any] = [de, ate]
+    if origem:
+        sql += " AND origem = %s"
+        params.append(origem)
+    return sql + " ORDER BY dia, origem, etapa", params
+
+
+def _sql_receita(de: date, ate: date, servico: Optional[str]):
+    sql = (
+        "SELECT servico, status, SUM(quantidade) AS quantidade, SUM(receita) AS receita "
+        "FROM receita_diaria WHERE dia BETWEEN %s AND %s"
+    )
+    params: List[Any] = [de, ate]
+    if servico:
+        sql += " AND servico = %s"
+        params.append(servico)
+    return sql + " GROUP BY servico, status HAVING SUM(quantidade) <> 0 ORDER BY servico, status", params
+
+
+def _taxa(parte: int, total: int) -> Optional[float]:
+    return round(parte / total, 4) if total else None
+
+
+def _conversao(por_etapa: Dict[str, int]) -> Dict[str, Any]:
+    """
+    Cada lead está em uma etapa só, então quem chegou a "qualificado" é
+    qualificado + cliente.
+    """
+    total = sum(por_etapa.values())
+    chegou_qualificado = por_etapa.get("qualificado", 0) + por_etapa.get("cliente", 0)
+    return {
+        "novo_para_qualificado": _taxa(chegou_qualificado, total),
+        "qualificado_para_cliente": _taxa(por_etapa.get("cliente", 0), chegou_qualificado),
+        "novo_para_cliente": _taxa(por_etapa.get("cliente", 0), total),
+    }
+
+
+def _montar_funil(
+    linhas_funil: List[Dict[str, Any]],
+    linhas_receita: List[Dict[str, Any]],
+) -> Dict[str, Any]:
+    por_etapa: Dict[str, int] = {etapa: 0 for etapa in ETAPAS_FUNIL}
+    por_origem: Dict[str, Dict[str, int]] = {}
+    por_dia: Dict[str, Dict[str, int]] = {}
+
+    for row in linhas_funil:
+        etapa, origem, total = row["etapa"], row["origem"], int(row["total"])
+        por_etapa[etapa] = por_etapa.get(etapa, 0) + total
+        origem_etapas = por_origem.setdefault(origem, {e: 0 for e in ETAPAS_FUNIL})
+        origem_etapas[etapa] = origem_etapas.get(etapa, 0) + total
+        dia_etapas = por_dia.setdefault(row["dia"].isoformat(), {e: 0 for e in ETAPAS_FUNIL})
+        dia_etapas[etapa] = dia_etapas.get(etapa, 0) + total
+
+    receita: Dict[str, Dict[str, Any]] = {}
+    for row in linhas_receita:
+        servico = receita.setdefault(
+            row["servico"], {"quantidade": 0, "receita_realizada": 0.0, "por_status": {}}
+        )
+        quantidade, valor = int(row["quantidade"]), float(row["receita"] or 0)
+        servico["quantidade"] += quantidade
+        servico["por_status"][row["status"]] = {"quantidade": quantidade, "receita": valor}
+        if row["status"] == "concluido":
+            servico["receita_realizada"] += valor
+
+    return {
+        "total": sum(por_etapa.values()),
+        "por_etapa": por_etapa,
+        "conversao": _conversao(por_etapa),
+        "por_origem": {
+            origem: {"por_etapa": etapas, "total": sum(etapas.values()), "conversao": _conversao(etapas)}
+            for origem, etapas in por_origem.items()
+        },
+        "por_dia": por_dia,
+        # o cubo completo origem x etapa x dia, para o dashboard pivotar
+        "linhas": [
+            {"dia": row["dia"].isoformat(), "origem": row["origem"], "etapa": row["etapa"], "total": int(row["total"])}
+            for row in linhas_funil
+        ],
+        "receita_por_servico": receita,
+    }
+
+
+@cronometrar("repo_sync", "analytics.get_funil")
+def get_funil(
+    de: date,
+    ate: date,
+    origem: Optional[str] = None,
+    servico: Optional[str] = None,
+) -> Dict[str, Any]:
+    with usar_conn() as conn, conn.cursor(dictionary=True) as cur:
+        cur.execute(*_sql_funil(de, ate, origem))
+        funil = cur.fetchall()
+        cur.execute(*_sql_receita(de, ate, servico))
+        receita = cur.fetchall()
+    return _montar_funil(funil, receita)
+
+
+# ---------------------------------------------------------------------------
+# Reconciliação (api/jobs/reconciliar_funil.py)
+# ---------------------------------------------------------------------------
+
+_RECONCILIAR = (
+    (
+        "DELETE FROM funil_diario WHERE dia BETWEEN %s AND %s",
+        """
+        INSERT INTO funil_diario (dia, origem, etapa, total)
+        SELECT DATE(created_at), COALESCE(origem, ''), COALESCE(etapa, ''), COUNT(*)
+        FROM leads
+        WHERE created_at >= %s AND created_at < %s
+        GROUP BY DATE(created_at), COALESCE(origem, ''), COALESCE(etapa, '')
+        """,
+    ),
+    (
+        "DELETE FROM receita_diaria WHERE dia BETWEEN %s AND %s",
+        """
+        INSERT INTO receita_diaria (dia, servico, status, quantidade, receita)
+        SELECT DATE(data_servico), COALESCE(servico, ''), COALESCE(status, ''), COUNT(*), COALESCE(SUM(ticket), 0)
+        FROM historico_servicos
+        WHERE data_servico >= %s AND data_servico < %s
+        GROUP BY DATE(data_servico), COALESCE(servico, ''), COALESCE(status, '')
+        """,
+    ),
+)
+
+
+@cronometrar("repo_sync", "analytics.reconciliar_funil")
+def reconciliar_funil(de: date, ate: date) -> Tuple[int, int]:
+    """
+    Recalcula os dois agregados de `de` até `ate` (inclusive) a partir de
+    leads / historico_servicos, numa transação: o INSERT ... SELECT trava as
+    linhas lidas, então escritas concorrentes esperam e nenhum incremento de
+    trigger se perde. Retorna as linhas gravadas em (funil_diario, receita_diaria).
+    """
+    gravadas: List[int] = []
+    with transacao() as conn, conn.cursor() as cur:
+        for apagar, recalcular in _RECONCILIAR:
+            cur.execute(apagar, (de, ate))
+            cur.execute(recalcular, (de, ate + timedelta(days=1)))
+            gravadas.append(cur.rowcount)
+    return gravadas[0], gravadas[1]
@@ -1,12 +1,14 @@
-from typing import Any, Dict, Optional
-import json
-from ..db import get_conn
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from ..db import usar_conn
+from ..metrics import cronometrar
+from ..services.serializacao import codificar_payload
 
 TIPO_ENTRADA        = "entrada"
 TIPO_MSG_ENVIADA    = "mensagem_enviada"
 TIPO_ERRO_ENVIO     = "erro_envio"
 TIPO_FOLLOWUP       = "followup"
 TIPO_ATUALIZACAO    = "atualizacao"
+TIPO_MESCLAGEM      = "mesclagem"
 
 TIPOS_VALIDOS = {
     TIPO_ENTRADA,
@@ -14,17 +16,56 @@ TIPOS_VALIDOS = {
     TIPO_ERRO_ENVIO,
     TIPO_FOLLOWUP,
     TIPO_ATUALIZACAO,
+    TIPO_MESCLAGEM,
 }
 
-def add_event(lead_id: int, tipo: str, payload: Optional[Dict[str, Any]] = None) -> None:
+@cronometrar("repo_sync", "events.add_event")
+def add_event(
+    lead_id: int,
+    tipo: str,
+    payload: Optional[Dict[str, Any]] = None,
+    conn=None,
+) -> None:
     if tipo not in TIPOS_VALIDOS:
         raise ValueError(f"Tipo de evento inválido: {tipo}")
 
-    with get_conn() as conn, conn.cursor() as cur:
+    with usar_conn(conn) as c, c.cursor() as cur:
         cur.execute(
             """
             INSERT INTO lead_events (lead_id, tipo, payload)
             VALUES (%s, %s, %s)
             """,
-            (lead_id, tipo, json.dumps(payload) if payload is not None else None),
+            (lead_id, tipo, codificar_payload(payload)),
         )
+
+
+@cronometrar("repo_sync", "events.add_events_batch")
+def add_events_batch(
+    eventos: Iterable[Tuple[int, str, Optional[Dict[str, Any]]]],
+    conn=None,
+) -> int:
+    """
+    Insere vários eventos de uma vez, no formato (lead_id, tipo, payload).
+
+    O executemany do mysql.connector reescreve o INSERT ... VALUES em um único
+    INSERT de várias linhas, então o lote inteiro vai em uma ida ao banco.
+    Retorna a quantidade de eventos inseridos.
+    """
+    params: List[Tuple[int, str, Optional[str]]] = []
+    for lead_id, tipo, payload in eventos:
+        if tipo not in TIPOS_VALIDOS:
+            raise ValueError(f"Tipo de evento inválido: {tipo}")
+        params.append((lead_id, tipo, codificar_payload(payload)))
+
+    if not params:
+        return 0
+
+    with usar_conn(conn) as c, c.cursor() as cur:
+        cur.executemany(
+            """
+            INSERT INTO lead_events (lead_id, tipo, payload)
+            VALUES (%s, %s, %s)
+            """,
+            params,
+        )
+    return len(params)
@@ -1,7 +1,9 @@
 from typing import Any, Dict, List, Optional
 from ..db import get_conn
+from ..metrics import cronometrar
 
 
+@cronometrar("repo_sync", "historico_servicos.adicionar_servico")
 def adicionar_servico(
     lead_id: int,
     servico: str,
@@ -22,6 +24,7 @@ def adicionar_servico(
         return int(cur.lastrowid)
 
 
+@cronometrar("repo_sync", "historico_servicos.listar_historico_por_lead")
 def listar_historico_por_lead(lead_id: int) -> List[Dict[str, Any]]:
     sql = """
     SELECT *
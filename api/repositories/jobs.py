@@ -0,0 +1,57 @@
+import json
+from typing import Any, Dict, Optional
+
+from ..db import usar_conn
+from ..metrics import cronometrar
+
+# Tabela jobs_estado (sql/migrations/011_jobs_estado.sql) e travas GET_LOCK
+# dos jobs. A trava é da conexão: quem a pega precisa segurar a mesma
+# conexão até o fim do job.
+
+_SQL_GRAVAR_ESTADO = """
+    INSERT INTO jobs_estado (job, estado) VALUES (%s, %s)
+    ON DUPLICATE KEY UPDATE estado = VALUES(estado)
+    """
+_SQL_LER_ESTADO = "SELECT estado FROM jobs_estado WHERE job = %s"
+_SQL_TRAVA_EM_USO = "SELECT IS_USED_LOCK(%s) IS NOT NULL"
+
+
+def _nome_trava(job: str) -> str:
+    return f"leads-api:{job}"
+
+
+def obter_trava(job: str, conn) -> bool:
+    """GET_LOCK sem espera: False se outro processo já está rodando o job."""
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT GET_LOCK(%s, 0)", (_nome_trava(job),))
+        (obtida,) = cur.fetchone()
+    finally:
+        cur.close()
+    return obtida == 1
+
+
+def liberar_trava(job: str, conn) -> None:
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT RELEASE_LOCK(%s)", (_nome_trava(job),))
+        cur.fetchone()
+    finally:
+        cur.close()
+
+
+@cronometrar("repo_sync", "jobs.gravar_estado")
+def gravar_estado(job: str, estado: Dict[str, Any], conn=None) -> None:
+    with usar_conn(conn) as c:
+        cur = c.cursor()
+        try:
+            cur.execute(_SQL_GRAVAR_ESTADO, (job, json.dumps(estado, default=str)))
+        finally:
+            cur.close()
+
+
+def _decodificar(row) -> Optional[Dict[str, Any]]:
+    if not row:
+        return None
+    estado = row[0]
+    return json.loads(estado) if isinstance(estado, (str, bytes)) else estado
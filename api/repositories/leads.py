@@ -1,92 +1,317 @@
-from typing import Optional, List, Dict, Any
-from ..db import get_conn
-from typing import Optional, List, Dict, Any
-from ..db import get_conn
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Optional, List, Dict, Any, Tuple
 
+from ..db import get_conn, usar_conn
+from ..metrics import cronometrar
+from ..schemas import LeadFilters
+from ..services.normalize import phone_key
 
-def upsert_lead(data: Dict[str, Any]) -> int:
-    sql = """
-    INSERT INTO leads (nome, email, telefone, origem, tags, externo_id, score, etapa)
-    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+
+UPSERT_BATCH_CHUNK = 500
+
+_UPSERT_VALUES = "(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"
+
+# A chave única do telefone é a phone_key (E.164 como BIGINT, migrações
+# 006/007). O IF preenche a phone_key de linhas antigas que ainda não passaram
+# pelo backfill quando o upsert cai nelas pelo mesmo telefone. O tenant é o
+# das regras com que o score foi calculado (migração 012).
+_UPSERT_SQL = """
+    INSERT INTO leads (nome, email, telefone, phone_key, origem, tags, externo_id, score, etapa, tenant)
+    VALUES %s
     ON DUPLICATE KEY UPDATE
+      id = LAST_INSERT_ID(id),
+      phone_key = IF(telefone <=> VALUES(telefone), VALUES(phone_key), phone_key),
       nome = VALUES(nome),
       origem = VALUES(origem),
       tags = VALUES(tags),
       externo_id = VALUES(externo_id),
       score = VALUES(score),
       etapa = VALUES(etapa),
+      tenant = VALUES(tenant),
       updated_at = CURRENT_TIMESTAMP
     """
 
-    params = (
+
+def _upsert_params(data: Dict[str, Any]) -> tuple:
+    return (
         data["nome"],
         data["email"],
         data["telefone"],
+        phone_key(data["telefone"]),
         data["origem"],
         data["tags_json"],
         data.get("externo_id"),
         data["score"],
         data["etapa"],
+        data.get("tenant"),
     )
 
-    with get_conn() as conn, conn.cursor(dictionary=True) as cur:
-        cur.execute(sql, params)
 
-        # Se for um novo insert
-        if cur.lastrowid:
-            return int(cur.lastrowid)
+@cronometrar("repo_sync", "leads.upsert_lead")
+def upsert_lead(data: Dict[str, Any], conn=None) -> int:
+    """
+    Insere ou atualiza o lead e devolve o id numa única ida ao banco.
 
-        # Caso tenha sido update, buscamos o ID existente
-        cur.execute(
-            """
-            SELECT id
-            FROM leads
-            WHERE (email = %s AND %s IS NOT NULL)
-               OR (telefone = %s AND %s IS NOT NULL)
-            ORDER BY id DESC
-            LIMIT 1
-            """,
-            (data["email"], data["email"], data["telefone"], data["telefone"]),
+    O `id = LAST_INSERT_ID(id)` no UPDATE faz o MySQL devolver o id da linha
+    existente no lastrowid quando cai no ON DUPLICATE KEY, então não precisa
+    de um SELECT depois para descobrir o id.
+
+    Se `conn` vier preenchida, usa essa conexão (ex.: transação junto com o
+    add_event); senão pega uma do pool.
+    """
+    with usar_conn(conn) as c, c.cursor(dictionary=True) as cur:
+        cur.execute(_UPSERT_SQL % _UPSERT_VALUES, _upsert_params(data))
+        return int(cur.lastrowid or 0)
+
+
+@cronometrar("repo_sync", "leads.upsert_leads_batch")
+def upsert_leads_batch(rows: List[Dict[str, Any]], conn=None) -> List[int]:
+    """
+    Upsert de vários leads de uma vez (campanhas que disparam milhares de leads).
+
+    Cada bloco de até UPSERT_BATCH_CHUNK linhas vira um único
+    INSERT ... VALUES (...), (...) ON DUPLICATE KEY UPDATE, seguido de um
+    SELECT por e-mail/phone_key para descobrir os ids (num insert de várias
+    linhas o lastrowid não serve para as linhas que viraram update).
+
+    Retorna a lista de ids na mesma ordem de `rows`.
+    """
+    ids: List[int] = [0] * len(rows)
+
+    with usar_conn(conn) as c, c.cursor(dictionary=True) as cur:
+        for inicio in range(0, len(rows), UPSERT_BATCH_CHUNK):
+            indices = range(inicio, min(inicio + UPSERT_BATCH_CHUNK, len(rows)))
+
+            # Lead sem e-mail e sem telefone válido não tem chave única: sempre
+            # vira um insert novo, então vai sozinho para aproveitar o lastrowid.
+            chaves = {i: phone_key(rows[i]["telefone"]) for i in indices}
+            com_chave = [i for i in indices if rows[i]["email"] or chaves[i]]
+            sem_chave = [i for i in indices if not (rows[i]["email"] or chaves[i])]
+
+            for i in sem_chave:
+                cur.execute(_UPSERT_SQL % _UPSERT_VALUES, _upsert_params(rows[i]))
+                ids[i] = int(cur.lastrowid)
+
+            if not com_chave:
+                continue
+
+            values = ", ".join([_UPSERT_VALUES] * len(com_chave))
+            params: List[Any] = []
+            for i in com_chave:
+                params.extend(_upsert_params(rows[i]))
+            cur.execute(_UPSERT_SQL % values, params)
+
+            cur.execute(*_sql_ids_por_chave(
+                emails=[rows[i]["email"] for i in com_chave if rows[i]["email"]],
+                phone_keys=[chaves[i] for i in com_chave if chaves[i]],
+            ))
+            achados = _ids_do_bloco(rows, chaves, com_chave, *_mapear_ids(cur.fetchall()))
+            for i, lead_id in zip(com_chave, achados):
+                ids[i] = lead_id
+
+    return ids
+
+
+def _sql_ids_por_chave(emails: List[str], phone_keys: List[int]):
+    """
+    Monta a consulta que busca os ids por e-mail e por phone_key de uma vez.
+    UNION ALL de dois IN (...) deixa cada lado usar o próprio índice,
+    ao contrário de um OR entre as duas colunas; o lado do telefone é
+    resolvido só com o índice da phone_key (BIGINT), sem ler a linha.
+    """
+    partes: List[str] = []
+    params: List[Any] = []
+
+    if emails:
+        partes.append(
+            "SELECT id, email, NULL AS phone_key FROM leads WHERE email IN (%s)"
+            % ", ".join(["%s"] * len(emails))
+        )
+        params.extend(emails)
+    if phone_keys:
+        partes.append(
+            "SELECT id, NULL AS email, phone_key FROM leads WHERE phone_key IN (%s)"
+            % ", ".join(["%s"] * len(phone_keys))
         )
-        row = cur.fetchone()
-        return int(row["id"]) if row else 0
+        params.extend(phone_keys)
 
+    return " UNION ALL ".join(partes), params
 
+
+def _mapear_ids(rows: List[Dict[str, Any]]):
+    ids_por_email: Dict[str, int] = {}
+    ids_por_phone_key: Dict[int, int] = {}
+    for row in rows:
+        # mesmo critério do antigo fallback do upsert: em caso de empate, o id mais recente
+        if row["email"] is not None:
+            ids_por_email[row["email"]] = max(int(row["id"]), ids_por_email.get(row["email"], 0))
+        if row["phone_key"] is not None:
+            chave = int(row["phone_key"])
+            ids_por_phone_key[chave] = max(int(row["id"]), ids_por_phone_key.get(chave, 0))
+    return ids_por_email, ids_por_phone_key
+
+
+def _ids_do_bloco(
+    rows: List[Dict[str, Any]],
+    chaves: Dict[int, Optional[int]],
+    com_chave: List[int],
+    ids_por_email,
+    ids_por_phone_key,
+):
+    return [
+        ids_por_email.get(rows[i]["email"])
+        or ids_por_phone_key.get(chaves[i])
+        or 0
+        for i in com_chave
+    ]
+
+
+@cronometrar("repo_sync", "leads.get_by_id")
 def get_by_id(lead_id: int) -> Optional[Dict[str, Any]]:
     with get_conn() as conn, conn.cursor(dictionary=True) as cur:
         cur.execute("SELECT * FROM leads WHERE id = %s", (lead_id,))
         return cur.fetchone()
 
 
-def list_leads(origem: Optional[str], etapa: Optional[str]) -> List[Dict[str, Any]]:
+def _sql_telefones_por_ids(lead_ids: List[int]):
+    sql = "SELECT id, telefone FROM leads WHERE id IN (%s)" % ", ".join(["%s"] * len(lead_ids))
+    return sql, list(lead_ids)
+
+
+@cronometrar("repo_sync", "leads.get_telefones_by_ids")
+def get_telefones_by_ids(lead_ids: List[int]) -> Dict[int, Optional[str]]:
+    """
+    Busca o telefone de vários leads num único SELECT ... WHERE id IN (...).
+    Leads inexistentes ficam fora do dicionário.
+    """
+    if not lead_ids:
+        return {}
+    with get_conn() as conn, conn.cursor(dictionary=True) as cur:
+        cur.execute(*_sql_telefones_por_ids(lead_ids))
+        return {int(row["id"]): row["telefone"] for row in cur.fetchall()}
+
+
+def encode_cursor(row: Dict[str, Any]) -> str:
+    """
+    Cursor opaco da paginação: posição (updated_at, id) da última linha da página.
+    """
+    bruto = json.dumps([row["updated_at"].isoformat(), int(row["id"])])
+    return base64.urlsafe_b64encode(bruto.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    Levanta ValueError se o cursor não for um cursor válido desta API.
+    """
+    try:
+        bruto = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        updated_at, lead_id = json.loads(bruto)
+        return datetime.fromisoformat(updated_at), int(lead_id)
+    except (TypeError, ValueError, binascii.Error) as e:
+        raise ValueError(f"Cursor inválido: {cursor}") from e
+
+
+def _where_leads(filtros: LeadFilters):
     clauses: List[str] = []
     params: List[Any] = []
 
-    if origem:
+    if filtros.origem:
         clauses.append("origem = %s")
-        params.append(origem)
-    if etapa:
+        params.append(filtros.origem)
+    if filtros.etapa:
         clauses.append("etapa = %s")
-        params.append(etapa)
+        params.append(filtros.etapa)
+    if filtros.servico_interesse:
+        clauses.append("servico_interesse = %s")
+        params.append(filtros.servico_interesse)
+    if filtros.score_min is not None:
+        clauses.append("score >= %s")
+        params.append(filtros.score_min)
+    if filtros.score_max is not None:
+        clauses.append("score <= %s")
+        params.append(filtros.score_max)
+    if filtros.tag:
+        # usa o índice multi-valor em tags (ver sql/migrations)
+        clauses.append("%s MEMBER OF (tags)")
+        params.append(filtros.tag)
+    if filtros.atualizado_de:
+        clauses.append("updated_at >= %s")
+        params.append(filtros.atualizado_de)
+    if filtros.atualizado_ate:
+        clauses.append("updated_at < %s")
+        params.append(filtros.atualizado_ate)
+
+    return clauses, params
+
+
+def _sql_list_leads(filtros: LeadFilters, cursor: Optional[str], limite: int):
+    """
+    Monta o SELECT paginado por keyset em (updated_at, id): cada página começa
+    logo depois da última linha da anterior, então o custo é O(página) e não
+    O(offset). Busca `limite + 1` linhas para saber se existe próxima página.
+    """
+    clauses, params = _where_leads(filtros)
+
+    if cursor:
+        updated_at, lead_id = decode_cursor(cursor)
+        clauses.append("(updated_at < %s OR (updated_at = %s AND id < %s))")
+        params.extend([updated_at, updated_at, lead_id])
 
     where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
-    sql = f"SELECT * FROM leads {where} ORDER BY updated_at DESC LIMIT 200"
+    sql = f"SELECT * FROM leads {where} ORDER BY updated_at DESC, id DESC LIMIT %s"
+    params.append(limite + 1)
+    return sql, params
+
+
+def _pagina(rows: List[Dict[str, Any]], limite: int):
+    if len(rows) > limite:
+        rows = rows[:limite]
+        return rows, encode_cursor(rows[-1])
+    return rows, None
+
+
+@cronometrar("repo_sync", "leads.list_leads")
+def list_leads(
+    filtros: LeadFilters,
+    cursor: Optional[str] = None,
+    limite: int = 200,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Lista leads do mais recente para o mais antigo (updated_at, id).
+    Retorna (linhas, próximo_cursor); próximo_cursor é None na última página.
+    """
+    sql, params = _sql_list_leads(filtros, cursor, limite)
 
     with get_conn() as conn, conn.cursor(dictionary=True) as cur:
         cur.execute(sql, params)
-        return cur.fetchall()
-    
-def update_lead(lead_id: int, data: Dict[str, Any]) -> None:
+        return _pagina(cur.fetchall(), limite)
+
+
+def _sql_export_leads(filtros: LeadFilters):
     """
-    Atualiza um lead existente.
-    Apenas as chaves presentes em `data` e permitidas em `allowed_fields`
-    são incluídas no UPDATE.
+    SELECT da exportação completa: mesmos filtros da listagem, sem paginação,
+    na ordem da chave primária (leitura sequencial do índice clustered).
+    """
+    clauses, params = _where_leads(filtros)
+    where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
+    return f"SELECT * FROM leads {where} ORDER BY id", params
 
-    Exemplo de `data`:
-        {"servico_interesse": "Botox", "regiao_corpo": "rosto"}
+
+def _sql_update_lead(lead_id: int, data: Dict[str, Any], atualizado_em: Optional[datetime] = None):
+    """
+    Monta o UPDATE do lead só com as chaves presentes em `data` e permitidas
+    em `allowed_fields`. Retorna (sql, params) ou None se não houver nada
+    para atualizar.
+
+    Com `atualizado_em` o updated_at recebe esse valor em vez do
+    CURRENT_TIMESTAMP, para quem chama já saber como a linha ficou sem
+    precisar relê-la.
     """
     if not data:
-        return
+        return None
 
     # Campos que realmente existem na tabela `leads`
     allowed_fields = {
@@ -112,17 +337,248 @@ def update_lead(lead_id: int, data: Dict[str, Any]) -> None:
             continue
         set_clauses.append(f"{key} = %s")
         params.append(value)
+        if key == "telefone":
+            # a chave acompanha o telefone (quem chama já manda normalizado)
+            set_clauses.append("phone_key = %s")
+            params.append(phone_key(value))
 
     if not set_clauses:
         # nada permitido pra atualizar
-        return
+        return None
 
     # opcional: atualiza o updated_at também
-    set_clauses.append("updated_at = CURRENT_TIMESTAMP")
+    if atualizado_em is None:
+        set_clauses.append("updated_at = CURRENT_TIMESTAMP")
+    else:
+        set_clauses.append("updated_at = %s")
+        params.append(atualizado_em)
 
     params.append(lead_id)
     sql = f"UPDATE leads SET {', '.join(set_clauses)} WHERE id = %s"
+    return sql, params
+
+
+@cronometrar("repo_sync", "leads.update_lead")
+def update_lead(lead_id: int, data: Dict[str, Any]) -> None:
+    """
+    Atualiza um lead existente.
+    Apenas as chaves presentes em `data` e permitidas em `allowed_fields`
+    são incluídas no UPDATE.
 
+    Exemplo de `data`:
+        {"servico_interesse": "Botox", "regiao_corpo": "rosto"}
+    """
+    montado = _sql_update_lead(lead_id, data)
+    if montado is None:
+        return
+
+    sql, params = montado
     with get_conn() as conn, conn.cursor(dictionary=True) as cur:
         cur.execute(sql, params)
         conn.commit()
+
+
+# ---------------------------------------------------------------------------
+# Re-score em lote (api/jobs/rescore.py)
+# ---------------------------------------------------------------------------
+
+# Colunas que o compute_score usa, mais o score/etapa atuais para comparar
+_COLUNAS_SCORE = "id, telefone, email, tags, servico_interesse, regiao_corpo, disponibilidade, score, etapa, tenant"
+
+
+@cronometrar("repo_sync", "leads.contar_leads")
+def contar_leads(conn=None) -> int:
+    with usar_conn(conn) as c, c.cursor() as cur:
+        cur.execute("SELECT COUNT(*) FROM leads")
+        return int(cur.fetchone()[0])
+
+
+@cronometrar("repo_sync", "leads.listar_bloco_para_score")
+def listar_bloco_para_score(apos_id: int, limite: int, conn=None) -> List[tuple]:
+    """
+    Próximo bloco de leads com id > apos_id, em ordem de id (keyset pela
+    chave primária, sem OFFSET). Devolve tuplas na ordem de _COLUNAS_SCORE.
+    """
+    with usar_conn(conn) as c, c.cursor() as cur:
+        cur.execute(
+            f"SELECT {_COLUNAS_SCORE} FROM leads WHERE id > %s ORDER BY id LIMIT %s",
+            (apos_id, limite),
+        )
+        return cur.fetchall()
+
+
+def _sql_atualizar_scores(alteracoes: List[Tuple[int, int, str]]):
+    """
+    Um único UPDATE ... CASE para várias linhas (id, score, etapa).
+    O updated_at não é tocado: re-score não é atividade do lead e não deve
+    reordenar a listagem.
+    """
+    casos = " ".join(["WHEN %s THEN %s"] * len(alteracoes))
+    marcadores = ", ".join(["%s"] * len(alteracoes))
+    sql = (
+        f"UPDATE leads SET score = CASE id {casos} END, "
+        f"etapa = CASE id {casos} END "
+        f"WHERE id IN ({marcadores})"
+    )
+    params: List[Any] = []
+    for lead_id, score, _ in alteracoes:
+        params += (lead_id, score)
+    for lead_id, _, etapa in alteracoes:
+        params += (lead_id, etapa)
+    params += (lead_id for lead_id, _, _ in alteracoes)
+    return sql, params
+
+
+@cronometrar("repo_sync", "leads.atualizar_scores")
+def atualizar_scores(alteracoes: List[Tuple[int, int, str]], conn=None) -> int:
+    """
+    Grava (id, score, etapa) de várias linhas, em blocos de UPSERT_BATCH_CHUNK
+    por UPDATE. Retorna quantas linhas foram enviadas.
+    """
+    with usar_conn(conn) as c, c.cursor() as cur:
+        for inicio in range(0, len(alteracoes), UPSERT_BATCH_CHUNK):
+            sql, params = _sql_atualizar_scores(alteracoes[inicio:inicio + UPSERT_BATCH_CHUNK])
+            cur.execute(sql, params)
+    return len(alteracoes)
+
+
+# ---------------------------------------------------------------------------
+# Telefones canônicos e mesclagem de duplicados (api/jobs/normalizar_telefones.py)
+# ---------------------------------------------------------------------------
+
+# Tabelas filhas que apontam para o lead e passam para o sobrevivente na
+# mesclagem. A followups também passa, mas tem chave única (lead_id, regra):
+# ver _sql_followups_repetidos.
+_TABELAS_DO_LEAD = ("lead_events", "historico_servicos", "outbox_mensagens", "followups")
+
+
+def _sql_followups_repetidos(sobrevivente_id: int, duplicados: List[int]):
+    """
+    Apaga os follow-ups dos `duplicados` cuja regra o lead mesclado já vai
+    ter: a do sobrevivente fica e, entre duplicados, a de menor id. Assim o
+    UPDATE de lead_id não bate na uk_followups_lead_regra e cada regra
+    continua disparando uma vez só por lead.
+    """
+    marcadores = ", ".join(["%s"] * len(duplicados))
+    sql = (
+        "DELETE d FROM followups d "
+        "JOIN followups o ON o.regra = d.regra AND o.id <> d.id "
+        f"AND (o.lead_id = %s OR (o.lead_id IN ({marcadores}) AND o.id < d.id)) "
+        f"WHERE d.lead_id IN ({marcadores})"
+    )
+    return sql, [sobrevivente_id, *duplicados, *duplicados]
+
+
+@cronometrar("repo_sync", "leads.listar_bloco_telefones")
+def listar_bloco_telefones(apos_id: int, limite: int, conn=None) -> List[tuple]:
+    """Próximo bloco (id, telefone, phone_key) com id > apos_id, só leads com telefone."""
+    with usar_conn(conn) as c, c.cursor() as cur:
+        cur.execute(
+            "SELECT id, telefone, phone_key FROM leads "
+            "WHERE id > %s AND telefone IS NOT NULL ORDER BY id LIMIT %s",
+            (apos_id, limite),
+        )
+        return cur.fetchall()
+
+
+@cronometrar("repo_sync", "leads.gravar_phone_keys")
+def gravar_phone_keys(alteracoes: List[Tuple[int, Optional[int]]], conn=None) -> int:
+    """
+    Grava (id, phone_key) de várias linhas com UPDATE ... CASE, em blocos de
+    UPSERT_BATCH_CHUNK. Não mexe no updated_at (não é atividade do lead).
+    """
+    with usar_conn(conn) as c, c.cursor() as cur:
+        for inicio in range(0, len(alteracoes), UPSERT_BATCH_CHUNK):
+            bloco = alteracoes[inicio:inicio + UPSERT_BATCH_CHUNK]
+            casos = " ".join(["WHEN %s THEN %s"] * len(bloco))
+            marcadores = ", ".join(["%s"] * len(bloco))
+            params: List[Any] = []
+            for lead_id, chave in bloco:
+                params += (lead_id, chave)
+            params += (lead_id for lead_id, _ in bloco)
+            cur.execute(
+                f"UPDATE leads SET phone_key = CASE id {casos} END WHERE id IN ({marcadores})",
+                params,
+            )
+    return len(alteracoes)
+
+
+@cronometrar("repo_sync", "leads.listar_phone_keys_duplicadas")
+def listar_phone_keys_duplicadas(apos_chave: int, limite: int, conn=None) -> List[Tuple[int, List[int]]]:
+    """
+    Próximas `limite` phone_keys (> apos_chave) com mais de um lead, com os
+    ids de cada uma em ordem crescente. O GROUP BY percorre só o índice da
+    phone_key.
+    """
+    with usar_conn(conn) as c, c.cursor() as cur:
+        cur.execute(
+            "SELECT phone_key, GROUP_CONCAT(id ORDER BY id) FROM leads "
+            "WHERE phone_key > %s GROUP BY phone_key HAVING COUNT(*) > 1 "
+            "ORDER BY phone_key LIMIT %s",
+            (apos_chave, limite),
+        )
+        return [(int(chave), [int(i) for i in ids.split(",")]) for chave, ids in cur.fetchall()]
+
+
+@cronometrar("repo_sync", "leads.get_many_for_update")
+def get_many_for_update(lead_ids: List[int], conn) -> List[Dict[str, Any]]:
+    """Lê os leads em ordem de id travando as linhas até o fim da transação de `conn`."""
+    with conn.cursor(dictionary=True) as cur:
+        cur.execute(
+            "SELECT * FROM leads WHERE id IN (%s) ORDER BY id FOR UPDATE" % ", ".join(["%s"] * len(lead_ids)),
+            list(lead_ids),
+        )
+        return cur.fetchall()
+
+
+@cronometrar("repo_sync", "leads.mesclar_leads")
+def mesclar_leads(
+    sobrevivente_id: int,
+    duplicados: List[int],
+    campos: Dict[str, Any],
+    atualizado_em: Optional[datetime],
+    conn,
+) -> None:
+    """
+    Passa eventos, histórico, outbox e follow-ups dos `duplicados` para o
+    sobrevivente, apaga os duplicados e grava `campos` no sobrevivente, tudo
+    na transação de `conn`. Os duplicados saem antes do UPDATE para o e-mail
+    herdado não bater na chave única.
+    """
+    marcadores = ", ".join(["%s"] * len(duplicados))
+    with conn.cursor() as cur:
+        cur.execute(*_sql_followups_repetidos(sobrevivente_id, duplicados))
+        for tabela in _TABELAS_DO_LEAD:
+            cur.execute(
+                f"UPDATE {tabela} SET lead_id = %s WHERE lead_id IN ({marcadores})",
+                [sobrevivente_id, *duplicados],
+            )
+        cur.execute(f"DELETE FROM leads WHERE id IN ({marcadores})", list(duplicados))
+
+        montado = _sql_update_lead(sobrevivente_id, campos, atualizado_em)
+        if montado is not None:
+            cur.execute(*montado)
+
+
+@cronometrar("repo_sync", "leads.maior_id")
+def maior_id(conn=None) -> int:
+    with usar_conn(conn) as c, c.cursor() as cur:
+        cur.execute("SELECT COALESCE(MAX(id), 0) FROM leads")
+        return int(cur.fetchone()[0])
+
+
+@cronometrar("repo_sync", "leads.canonizar_telefones")
+def canonizar_telefones(de_id: int, ate_id: int, conn=None) -> int:
+    """
+    Reescreve o telefone das linhas com id em (de_id, ate_id] como o E.164
+    da phone_key. Só pode rodar depois da mesclagem: antes dela o telefone
+    canônico de uma linha pode ser o de outra e bater na uk_leads_telefone.
+    """
+    with usar_conn(conn) as c, c.cursor() as cur:
+        cur.execute(
+            "UPDATE leads SET telefone = CAST(phone_key AS CHAR) "
+            "WHERE id > %s AND id <= %s AND phone_key IS NOT NULL "
+            "AND NOT telefone <=> CAST(phone_key AS CHAR)",
+            (de_id, ate_id),
+        )
+        return cur.rowcount
@@ -0,0 +1,218 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from ..db import usar_conn
+from ..metrics import cronometrar
+from ..services.arquivo_eventos import catalogo
+
+# Linha do tempo do lead: eventos (lead_events) e histórico de serviços
+# (historico_servicos) num único SELECT ... UNION ALL, já na ordem
+# cronológica, paginado por cursor (momento, fonte, id) sobre o fluxo mesclado.
+#
+# Cada item tem sempre `fonte` ("evento" | "servico"), `id` e `momento`
+# (created_at do evento / data_servico do serviço); as outras colunas vêm só
+# se pedidas em `campos`.
+#
+# Eventos de partições já arquivadas (api/jobs/arquivar_eventos.py) vêm do
+# arquivo morto e entram no mesmo fluxo, com a mesma ordem e o mesmo cursor.
+
+# campo -> (expressão no SELECT de lead_events, expressão no de historico_servicos)
+CAMPOS_TIMELINE: Dict[str, Tuple[str, str]] = {
+    "tipo": ("tipo", "servico"),
+    "status": ("NULL", "status"),
+    "ticket": ("NULL", "ticket"),
+    "observacoes": ("NULL", "observacoes"),
+    "payload": ("payload", "NULL"),
+}
+CAMPOS_TIMELINE_PADRAO = ("tipo", "status", "ticket", "observacoes")
+
+CAMPOS_LEAD = (
+    "id", "nome", "email", "telefone", "origem", "tags", "externo_id", "score", "etapa",
+    "servico_interesse", "regiao_corpo", "disponibilidade", "created_at", "updated_at",
+)
+
+# fonte -> (tabela, coluna de tempo); a ordem das fontes desempata itens no mesmo momento
+_FONTES = (
+    ("evento", "lead_events", "created_at"),
+    ("servico", "historico_servicos", "data_servico"),
+)
+
+
+def validar_campos(pedidos: Optional[Sequence[str]], permitidos: Sequence[str], padrao: Sequence[str]) -> List[str]:
+    """
+    Projeção pedida pelo cliente, só com campos conhecidos. Levanta
+    ValueError para campo desconhecido.
+    """
+    if not pedidos:
+        return list(padrao)
+    desconhecidos = [c for c in pedidos if c not in permitidos]
+    if desconhecidos:
+        raise ValueError(f"Campos desconhecidos: {', '.join(desconhecidos)}")
+    return list(dict.fromkeys(pedidos))
+
+
+def encode_cursor_timeline(item: Dict[str, Any]) -> str:
+    bruto = json.dumps([item["momento"].isoformat(), item["fonte"], int(item["id"])])
+    return base64.urlsafe_b64encode(bruto.encode()).decode().rstrip("=")
+
+
+def decode_cursor_timeline(cursor: str) -> Tuple[datetime, str, int]:
+    """
+    Levanta ValueError se o cursor não for um cursor válido da timeline.
+    """
+    try:
+        bruto = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        momento, fonte, item_id = json.loads(bruto)
+        if fonte not in {f for f, _, _ in _FONTES}:
+            raise ValueError(fonte)
+        return datetime.fromisoformat(momento), fonte, int(item_id)
+    except (TypeError, ValueError, binascii.Error) as e:
+        raise ValueError(f"Cursor inválido: {cursor}") from e
+
+
+def _depois_do_cursor(fonte: str, coluna_tempo: str, cursor, desc: bool):
+    """
+    Condição de keyset de um ramo do UNION. Como a fonte é constante em cada
+    ramo, a comparação (momento, fonte, id) > cursor vira uma condição simples
+    sobre (coluna_tempo, id), que usa o índice (lead_id, coluna_tempo, id).
+    """
+    momento, fonte_cursor, item_id = cursor
+    maior, maior_igual = ("<", "<=") if desc else (">", ">=")
+    fonte_depois = fonte < fonte_cursor if desc else fonte > fonte_cursor
+
+    if fonte == fonte_cursor:
+        return f"({coluna_tempo} {maior} %s OR ({coluna_tempo} = %s AND id {maior} %s))", [momento, momento, item_id]
+    if fonte_depois:
+        return f"{coluna_tempo} {maior_igual} %s", [momento]
+    return f"{coluna_tempo} {maior} %s", [momento]
+
+
+def _sql_timeline(
+    lead_id: int,
+    campos: Sequence[str],
+    cursor: Optional[str],
+    limite: int,
+    desc: bool,
+):
+    posicao = decode_cursor_timeline(cursor) if cursor else None
+    direcao = "DESC" if desc else "ASC"
+    # fonte entra na ordenação para o desempate: "evento" < "servico"
+    ordem = f"momento {direcao}, fonte {direcao}, id {direcao}"
+
+    ramos: List[str] = []
+    params: List[Any] = []
+    for indice, (fonte, tabela, coluna_tempo) in enumerate(_FONTES):
+        colunas = [f"'{fonte}' AS fonte", "id", f"{coluna_tempo} AS momento"]
+        colunas += [f"{CAMPOS_TIMELINE[c][indice]} AS {c}" for c in campos]
+
+        where = ["lead_id = %s"]
+        params.append(lead_id)
+        if posicao is not None:
+            condicao, valores = _depois_do_cursor(fonte, coluna_tempo, posicao, desc)
+            where.append(condicao)
+            params += valores
+
+        # cada ramo já corta em limite+1 na ordem certa; o UNION só mescla
+        ramos.append(
+            f"(SELECT {', '.join(colunas)} FROM {tabela} "
+            f"WHERE {' AND '.join(where)} "
+            f"ORDER BY {coluna_tempo} {direcao}, id {direcao} LIMIT %s)"
+        )
+        params.append(limite + 1)
+
+    sql = " UNION ALL ".join(ramos) + f" ORDER BY {ordem} LIMIT %s"
+    params.append(limite + 1)
+    return sql, params
+
+
+def _sql_lead_projetado(lead_id: int, campos_lead: Sequence[str]):
+    return f"SELECT {', '.join(campos_lead)} FROM leads WHERE id = %s", (lead_id,)
+
+
+def _itens_arquivados(
+    eventos: List[Dict[str, Any]],
+    campos: Sequence[str],
+    cursor: Optional[str],
+    desc: bool,
+) -> List[Dict[str, Any]]:
+    """Eventos do arquivo morto no formato dos itens da timeline, depois do cursor."""
+    posicao = decode_cursor_timeline(cursor) if cursor else None
+    itens: List[Dict[str, Any]] = []
+    for evento in eventos:
+        chave = (evento["created_at"], "evento", evento["id"])
+        if posicao is not None and (chave <= posicao if not desc else chave >= posicao):
+            continue
+        item = {"fonte": "evento", "id": evento["id"], "momento": evento["created_at"]}
+        for campo in campos:
+            item[campo] = evento.get(campo) if CAMPOS_TIMELINE[campo][0] != "NULL" else None
+        itens.append(item)
+    return itens
+
+
+def _mesclar_arquivados(
+    rows: List[Dict[str, Any]],
+    arquivados: List[Dict[str, Any]],
+    limite: int,
+    desc: bool,
+) -> List[Dict[str, Any]]:
+    """
+    Junta as linhas do banco (já cortadas em limite + 1) com os itens do
+    arquivo e corta de novo: o que o banco deixou de fora vem depois de tudo
+    que ele devolveu.
+    """
+    if not arquivados:
+        return rows
+    juntos = sorted(
+        list(rows) + arquivados,
+        key=lambda item: (item["momento"], item["fonte"], item["id"]),
+        reverse=desc,
+    )
+    return juntos[:limite + 1]
+
+
+def _pagina_timeline(rows: List[Dict[str, Any]], limite: int) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Corta a página e decodifica o payload (só existe se foi pedido em `campos`).
+    """
+    proximo = None
+    if len(rows) > limite:
+        rows = rows[:limite]
+        proximo = encode_cursor_timeline(rows[-1])
+
+    for row in rows:
+        payload = row.get("payload")
+        if isinstance(payload, (str, bytes)):
+            row["payload"] = json.loads(payload)
+    return rows, proximo
+
+
+@cronometrar("repo_sync", "timeline.get_timeline")
+def get_timeline(
+    lead_id: int,
+    campos: Sequence[str] = CAMPOS_TIMELINE_PADRAO,
+    campos_lead: Sequence[str] = CAMPOS_LEAD,
+    cursor: Optional[str] = None,
+    limite: int = 100,
+    desc: bool = False,
+) -> Optional[Dict[str, Any]]:
+    """
+    {"lead": ..., "itens": [...], "next_cursor": ...} ou None se o lead não
+    existir. Lead e timeline saem da mesma conexão.
+    """
+    with usar_conn() as conn, conn.cursor(dictionary=True) as cur:
+        cur.execute(*_sql_lead_projetado(lead_id, campos_lead))
+        lead = cur.fetchone()
+        if lead is None:
+            return None
+        cur.execute(*_sql_timeline(lead_id, campos, cursor, limite, desc))
+        rows = cur.fetchall()
+
+    if catalogo.tem_lead(lead_id):
+        arquivados = _itens_arquivados(catalogo.eventos_do_lead(lead_id), campos, cursor, desc)
+        rows = _mesclar_arquivados(rows, arquivados, limite, desc)
+    itens, proximo = _pagina_timeline(rows, limite)
+
+    return {"lead": lead, "itens": itens, "next_cursor": proximo}
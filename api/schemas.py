@@ -2,9 +2,10 @@ from datetime import datetime
 from decimal import Decimal
 from typing import Optional, List, Literal, Dict, Any
 
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import BaseModel, ConfigDict, EmailStr, Field, TypeAdapter, with_config
 from typing import Optional
 from pydantic import BaseModel
+from typing_extensions import TypedDict
 
 
 # =========================
@@ -17,7 +18,7 @@ LeadEtapa = Literal["novo", "qualificado", "cliente"]
 ServicoTipo = Literal["depilacao_laser", "designer_sobrancelha", "limpeza_pele"]
 ServicoStatus = Literal["lead", "agendado", "confirmado", "concluido", "no_show", "cancelado"]
 
-LeadEventTipo = Literal["entrada", "mensagem_enviada", "erro_envio", "followup", "atualizacao"]
+LeadEventTipo = Literal["entrada", "mensagem_enviada", "erro_envio", "followup", "atualizacao", "mesclagem"]
 
 
 # =========================
@@ -100,12 +101,60 @@ class LeadDetail(BaseModel):
         orm_mode = True  # Pydantic v1: permite ler objetos vindos do cursor/ORM
 
 
+# Linhas do banco devolvidas como estão (GET /leads, /leads/{id}, ...).
+# Os campos do LeadDetail com os tipos das colunas (tags é o texto JSON da
+# coluna, etapa/origem sem Literal). Os TypeAdapters são montados uma vez no
+# import e serializam direto para bytes JSON no pydantic-core, sem validar a
+# linha: datetime e Decimal saem no mesmo formato de antes. Colunas que não
+# estão aqui (ex.: phone_key) passam como vieram.
+
+@with_config(ConfigDict(extra="allow"))
+class LeadLinha(TypedDict, total=False):
+    id: int
+    nome: str
+    email: Optional[str]
+    telefone: Optional[str]
+    origem: str
+    etapa: str
+    score: Optional[int]
+    tags: Optional[str]
+    externo_id: Optional[str]
+    created_at: datetime
+    updated_at: datetime
+    servico_interesse: Optional[str]
+    regiao_corpo: Optional[str]
+    disponibilidade: Optional[str]
+
+
+@with_config(ConfigDict(extra="allow"))
+class HistoricoServicoLinha(TypedDict, total=False):
+    id: int
+    lead_id: int
+    servico: str
+    data_servico: datetime
+    status: str
+    ticket: Optional[Decimal]
+    observacoes: Optional[str]
+    created_at: datetime
+
+
+LEAD_LINHA = TypeAdapter(LeadLinha)
+LEAD_LINHAS = TypeAdapter(List[LeadLinha])
+HISTORICO_LINHAS = TypeAdapter(List[HistoricoServicoLinha])
+
+
 class LeadFilters(BaseModel):
     """
     Filtros para listagem de leads (por origem, etapa, etc.).
     """
     origem: Optional[LeadOrigem] = None
     etapa: Optional[LeadEtapa] = None
+    servico_interesse: Optional[str] = None
+    score_min: Optional[int] = Field(None, ge=0, le=100)
+    score_max: Optional[int] = Field(None, ge=0, le=100)
+    tag: Optional[str] = None
+    atualizado_de: Optional[datetime] = None
+    atualizado_ate: Optional[datetime] = None
 
 
 # =========================
@@ -0,0 +1,291 @@
+import bisect
+import gzip
+import json
+import mmap
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+# Arquivo morto do lead_events (api/jobs/arquivar_eventos.py).
+#
+# Cada partição mensal arquivada vira dois arquivos em ARQUIVO_EVENTOS_DIR:
+#
+#   lead_events-<partição>.jsonl.gz   eventos em JSONL, ordenados por
+#                                      (lead_id, created_at, id), em blocos
+#                                      de ARQUIVO_EVENTOS_BLOCO linhas; cada
+#                                      bloco é um membro gzip independente
+#                                      (o arquivo inteiro continua legível
+#                                      com zcat)
+#   lead_events-<partição>.idx.json   offset, tamanho e faixa de lead_id de
+#                                      cada bloco
+#
+# Para ler os eventos de um lead o arquivo é mapeado em memória (mmap), a
+# faixa de blocos sai de uma busca binária no índice e só esses blocos são
+# descomprimidos. Cada linha começa com o lead_id, então as linhas de outros
+# leads do bloco são puladas sem decodificar o JSON.
+#
+# O índice só fica `publicado` depois que a partição foi removida do banco:
+# até lá a API ignora o arquivo e não há evento em dobro.
+
+ARQUIVO_EVENTOS_DIR = os.getenv("ARQUIVO_EVENTOS_DIR", "arquivo_eventos")
+ARQUIVO_EVENTOS_BLOCO = int(os.getenv("ARQUIVO_EVENTOS_BLOCO", 1000))
+ARQUIVO_EVENTOS_NIVEL = int(os.getenv("ARQUIVO_EVENTOS_NIVEL", 6))
+# De quanto em quanto tempo a API procura arquivos novos no diretório
+ARQUIVO_EVENTOS_RECARGA_S = float(os.getenv("ARQUIVO_EVENTOS_RECARGA_S", 60))
+
+VERSAO = 1
+
+
+def nome_arquivo(particao: str) -> str:
+    return f"lead_events-{particao}"
+
+
+def _caminhos(diretorio: Path, nome: str):
+    return diretorio / f"{nome}.jsonl.gz", diretorio / f"{nome}.idx.json"
+
+
+def _gravar_json(caminho: Path, dados: Dict[str, Any]) -> None:
+    temporario = caminho.with_name(caminho.name + ".tmp")
+    with open(temporario, "w", encoding="utf-8") as f:
+        json.dump(dados, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporario, caminho)
+
+
+def linha_evento(row: Dict[str, Any]) -> bytes:
+    """
+    Linha JSONL de um evento. O payload já vem do MySQL como texto JSON e
+    entra como está, sem decodificar e codificar de novo.
+    """
+    payload = row["payload"]
+    if payload is None:
+        payload = "null"
+    elif isinstance(payload, bytes):
+        payload = payload.decode("utf-8")
+    elif not isinstance(payload, str):
+        payload = json.dumps(payload, ensure_ascii=False)
+    return (
+        f'{{"lead_id":{int(row["lead_id"])},"id":{int(row["id"])},'
+        f'"tipo":{json.dumps(row["tipo"], ensure_ascii=False)},'
+        f'"created_at":"{row["created_at"].isoformat()}","payload":{payload}}}\n'
+    ).encode("utf-8")
+
+
+class EscritorArquivo:
+    """
+    Grava o arquivo de uma partição a partir de blocos de linhas (como os
+    do stream_query), já em ordem de (lead_id, created_at, id). Escreve num
+    .tmp e só troca pelo arquivo final em `concluir`.
+    """
+
+    def __init__(
+        self,
+        particao: str,
+        diretorio: str = ARQUIVO_EVENTOS_DIR,
+        linhas_por_bloco: int = ARQUIVO_EVENTOS_BLOCO,
+        nivel: int = ARQUIVO_EVENTOS_NIVEL,
+    ):
+        self.particao = particao
+        self.diretorio = Path(diretorio)
+        self.diretorio.mkdir(parents=True, exist_ok=True)
+        self.dados, self.indice = _caminhos(self.diretorio, nome_arquivo(particao))
+        self._temporario = self.dados.with_name(self.dados.name + ".tmp")
+        self._arquivo = open(self._temporario, "wb")
+        self.linhas_por_bloco = linhas_por_bloco
+        self.nivel = nivel
+        self._linhas: List[bytes] = []
+        self._lead_min = self._lead_max = 0
+        self._offset = 0
+        self.blocos: List[List[int]] = []
+        self.total = 0
+        self.bytes_json = 0
+        self.de: Optional[datetime] = None
+
+    def adicionar(self, rows: Iterable[Dict[str, Any]]) -> None:
+        for row in rows:
+            if not self._linhas:
+                self._lead_min = int(row["lead_id"])
+            self._lead_max = int(row["lead_id"])
+            self._linhas.append(linha_evento(row))
+            if self.de is None or row["created_at"] < self.de:
+                self.de = row["created_at"]
+            if len(self._linhas) >= self.linhas_por_bloco:
+                self._fechar_bloco()
+
+    def _fechar_bloco(self) -> None:
+        bruto = b"".join(self._linhas)
+        comprimido = gzip.compress(bruto, compresslevel=self.nivel, mtime=0)
+        self._arquivo.write(comprimido)
+        self.blocos.append([self._offset, len(comprimido), self._lead_min, self._lead_max, len(self._linhas)])
+        self._offset += len(comprimido)
+        self.total += len(self._linhas)
+        self.bytes_json += len(bruto)
+        self._linhas = []
+
+    def concluir(self, ate: datetime) -> Dict[str, Any]:
+        """
+        Fecha o arquivo e grava o índice (ainda não publicado). `ate` é o
+        limite superior (exclusivo) da partição. Devolve o índice.
+        """
+        if self._linhas:
+            self._fechar_bloco()
+        self._arquivo.flush()
+        os.fsync(self._arquivo.fileno())
+        self._arquivo.close()
+        os.replace(self._temporario, self.dados)
+
+        indice = {
+            "versao": VERSAO,
+            "particao": self.particao,
+            "de": self.de.isoformat() if self.de else None,
+            "ate": ate.isoformat(),
+            "total": self.total,
+            "bytes": self._offset,
+            "bytes_json": self.bytes_json,
+            "publicado": False,
+            "blocos": self.blocos,
+        }
+        _gravar_json(self.indice, indice)
+        return indice
+
+    def descartar(self) -> None:
+        self._arquivo.close()
+        self._temporario.unlink(missing_ok=True)
+
+
+def ler_indice(particao: str, diretorio: str = ARQUIVO_EVENTOS_DIR) -> Optional[Dict[str, Any]]:
+    _, indice = _caminhos(Path(diretorio), nome_arquivo(particao))
+    try:
+        with open(indice, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def publicar(particao: str, diretorio: str = ARQUIVO_EVENTOS_DIR) -> None:
+    """Marca o arquivo como publicado (a partição já saiu do banco)."""
+    indice = ler_indice(particao, diretorio)
+    if indice is None:
+        raise FileNotFoundError(f"Índice do arquivo da partição {particao} não encontrado")
+    indice["publicado"] = True
+    _gravar_json(_caminhos(Path(diretorio), nome_arquivo(particao))[1], indice)
+
+
+class ArquivoEventos:
+    """Leitura de um arquivo publicado, com o arquivo de dados mapeado em memória."""
+
+    def __init__(self, caminho_indice: Path):
+        with open(caminho_indice, encoding="utf-8") as f:
+            self.indice = json.load(f)
+        self.blocos = self.indice["blocos"]
+        self._maximos = [bloco[3] for bloco in self.blocos]
+        self.lead_min = self.blocos[0][2] if self.blocos else 0
+        self.lead_max = self.blocos[-1][3] if self.blocos else -1
+        self.ate = self.indice["ate"]
+
+        self._mmap = None
+        if self.indice["bytes"]:
+            dados = caminho_indice.with_name(caminho_indice.name[: -len(".idx.json")] + ".jsonl.gz")
+            with open(dados, "rb") as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def tem_lead(self, lead_id: int) -> bool:
+        return self.lead_min <= lead_id <= self.lead_max
+
+    def eventos_do_lead(self, lead_id: int) -> List[Dict[str, Any]]:
+        """Eventos do lead neste arquivo, em ordem de (created_at, id)."""
+        if not self.tem_lead(lead_id):
+            return []
+        prefixo = b'{"lead_id":%d,' % lead_id
+        eventos: List[Dict[str, Any]] = []
+        i = bisect.bisect_left(self._maximos, lead_id)
+        while i < len(self.blocos) and self.blocos[i][2] <= lead_id:
+            offset, tamanho = self.blocos[i][0], self.blocos[i][1]
+            for linha in gzip.decompress(self._mmap[offset:offset + tamanho]).split(b"\n"):
+                if linha.startswith(prefixo):
+                    evento = json.loads(linha)
+                    evento["created_at"] = datetime.fromisoformat(evento["created_at"])
+                    eventos.append(evento)
+            i += 1
+        return eventos
+
+    def fechar(self) -> None:
+        if self._mmap is not None:
+            self._mmap.close()
+
+
+class CatalogoArquivo:
+    """
+    Os arquivos publicados do diretório, recarregados a cada `recarga_s`
+    segundos. Com o diretório vazio (ou inexistente) as consultas não custam
+    nada além de um os.scandir por período de recarga.
+    """
+
+    def __init__(self, diretorio: str = ARQUIVO_EVENTOS_DIR, recarga_s: float = ARQUIVO_EVENTOS_RECARGA_S):
+        self.diretorio = Path(diretorio)
+        self.recarga_s = recarga_s
+        self._arquivos: Dict[str, tuple] = {}  # nome -> (mtime, ArquivoEventos)
+        self._ordenados: List[ArquivoEventos] = []
+        self._carregado_em: Optional[float] = None
+        self._trava = threading.Lock()
+
+    def _atualizar(self) -> None:
+        agora = time.monotonic()
+        if self._carregado_em is not None and agora - self._carregado_em < self.recarga_s:
+            return
+        with self._trava:
+            if self._carregado_em is not None and agora - self._carregado_em < self.recarga_s:
+                return
+            vistos: Dict[str, tuple] = {}
+            try:
+                entradas = [e for e in os.scandir(self.diretorio) if e.name.endswith(".idx.json")]
+            except FileNotFoundError:
+                entradas = []
+            for entrada in entradas:
+                mtime = entrada.stat().st_mtime
+                atual = self._arquivos.get(entrada.name)
+                if atual is not None and atual[0] == mtime:
+                    vistos[entrada.name] = atual
+                    continue
+                try:
+                    arquivo = ArquivoEventos(Path(entrada.path))
+                except (OSError, ValueError, KeyError) as e:
+                    print(f"⚠️ Arquivo de eventos ilegível ({entrada.name}): {e}")
+                    continue
+                if arquivo.indice.get("publicado"):
+                    vistos[entrada.name] = (mtime, arquivo)
+                else:
+                    arquivo.fechar()
+
+            # os que saíram do catálogo não são fechados aqui: uma leitura em
+            # outra thread pode estar usando o mmap (o GC fecha depois)
+            self._arquivos = vistos
+            self._ordenados = sorted((a for _, a in vistos.values()), key=lambda a: a.ate)
+            self._carregado_em = agora
+
+    def tem_lead(self, lead_id: int) -> bool:
+        self._atualizar()
+        return any(a.tem_lead(lead_id) for a in self._ordenados)
+
+    def eventos_do_lead(self, lead_id: int) -> List[Dict[str, Any]]:
+        """Eventos arquivados do lead, em ordem cronológica."""
+        self._atualizar()
+        eventos: List[Dict[str, Any]] = []
+        for arquivo in self._ordenados:
+            eventos += arquivo.eventos_do_lead(lead_id)
+        return eventos
+
+    def stats(self) -> Dict[str, Any]:
+        self._atualizar()
+        return {
+            "arquivos": len(self._ordenados),
+            "eventos": sum(a.indice["total"] for a in self._ordenados),
+            "bytes": sum(a.indice["bytes"] for a in self._ordenados),
+        }
+
+
+catalogo = CatalogoArquivo()
@@ -0,0 +1,201 @@
+import os
+import pickle
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional
+
+LEAD_CACHE_ENABLED = os.getenv("LEAD_CACHE_ENABLED", "1") not in ("0", "false", "False")
+LEAD_CACHE_TTL = float(os.getenv("LEAD_CACHE_TTL", 30))
+LEAD_CACHE_MAX = int(os.getenv("LEAD_CACHE_MAX", 5000))
+LEAD_CACHE_REDIS_URL = os.getenv("LEAD_CACHE_REDIS_URL", "")
+# Workers do gunicorn (gunicorn.conf.py exporta antes do import da API)
+_PROCESSOS = int(os.getenv("WEB_CONCURRENCY") or 1)
+
+# Marca de "não está no cache" (None pode ser um valor cacheado).
+AUSENTE = object()
+
+
+class TTLCache:
+    """
+    Cache em memória do processo: LRU limitado a `max_itens`, cada item
+    expira `ttl` segundos depois de gravado.
+
+    Com vários workers cada processo teria o seu cache, e a invalidação só
+    valeria no processo que fez a escrita: por isso, com WEB_CONCURRENCY > 1
+    e sem LEAD_CACHE_REDIS_URL o cache de leads fica desligado (_criar_cache).
+    """
+
+    backend = "memoria"
+
+    def __init__(self, ttl: float = LEAD_CACHE_TTL, max_itens: int = LEAD_CACHE_MAX):
+        self.ttl = ttl
+        self.max_itens = max_itens
+        self._itens: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    async def get(self, chave: Hashable) -> Any:
+        """
+        Retorna o valor ou AUSENTE.
+        """
+        item = self._itens.get(chave)
+        if item is None or item[0] < time.monotonic():
+            if item is not None:
+                del self._itens[chave]
+            self.misses += 1
+            return AUSENTE
+        self._itens.move_to_end(chave)
+        self.hits += 1
+        return item[1]
+
+    async def set(self, chave: Hashable, valor: Any) -> None:
+        self._itens[chave] = (time.monotonic() + self.ttl, valor)
+        self._itens.move_to_end(chave)
+        while len(self._itens) > self.max_itens:
+            self._itens.popitem(last=False)
+            self.evictions += 1
+
+    async def delete(self, *chaves: Hashable) -> None:
+        for chave in chaves:
+            self._itens.pop(chave, None)
+
+    async def fechar(self) -> None:
+        self._itens.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "backend": self.backend,
+            "itens": len(self._itens),
+            "max_itens": self.max_itens,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else None,
+            "evictions": self.evictions,
+        }
+
+
+class RedisCache:
+    """
+    Mesmo contrato do TTLCache, guardando os itens num Redis (ou compatível,
+    ex.: KeyDB/Valkey) local. A invalidação vale para todos os workers.
+    Falha de rede no Redis conta como miss: o dado vem do MySQL.
+    """
+
+    backend = "redis"
+
+    def __init__(self, url: str, ttl: float = LEAD_CACHE_TTL, prefixo: str = "leads-api:"):
+        import redis.asyncio as redis  # dependência opcional
+
+        self._redis = redis.from_url(url)
+        self._erro = redis.RedisError
+        self.ttl = ttl
+        self.prefixo = prefixo
+        self.hits = 0
+        self.misses = 0
+        self.erros = 0
+
+    def _chave(self, chave: Hashable) -> str:
+        return f"{self.prefixo}{chave}"
+
+    async def get(self, chave: Hashable) -> Any:
+        try:
+            bruto = await self._redis.get(self._chave(chave))
+        except self._erro as e:
+            self.erros += 1
+            print("⚠️ Falha ao ler do cache Redis:", e)
+            bruto = None
+        if bruto is None:
+            self.misses += 1
+            return AUSENTE
+        self.hits += 1
+        return pickle.loads(bruto)
+
+    async def set(self, chave: Hashable, valor: Any) -> None:
+        try:
+            await self._redis.set(self._chave(chave), pickle.dumps(valor), px=int(self.ttl * 1000))
+        except self._erro as e:
+            self.erros += 1
+            print("⚠️ Falha ao gravar no cache Redis:", e)
+
+    async def delete(self, *chaves: Hashable) -> None:
+        if not chaves:
+            return
+        try:
+            await self._redis.delete(*(self._chave(c) for c in chaves))
+        except self._erro as e:
+            self.erros += 1
+            print("⚠️ Falha ao invalidar o cache Redis:", e)
+
+    async def fechar(self) -> None:
+        await self._redis.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "backend": self.backend,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else None,
+            "erros": self.erros,
+        }
+
+
+class LeadCache:
+    """
+    Read-through dos leads por id, na frente de api/repositories/aio/leads.py.
+    `get_by_id` consulta aqui primeiro; upsert/update invalidam o lead.
+    """
+
+    def __init__(self, backend, habilitado: bool = True):
+        self.backend = backend
+        self.habilitado = habilitado
+
+    async def get(self, lead_id: int) -> Any:
+        if not self.habilitado:
+            return AUSENTE
+        row = await self.backend.get(f"lead:{lead_id}")
+        # cópia rasa: quem recebe pode mexer no dict sem sujar o cache
+        return dict(row) if isinstance(row, dict) else row
+
+    async def set(self, lead_id: int, row: Optional[Dict[str, Any]]) -> None:
+        if self.habilitado and row is not None:
+            await self.backend.set(f"lead:{lead_id}", dict(row))
+
+    async def invalidar(self, lead_ids: Iterable[int]) -> None:
+        if self.habilitado:
+            await self.backend.delete(*(f"lead:{lead_id}" for lead_id in set(lead_ids)))
+
+    async def fechar(self) -> None:
+        await self.backend.fechar()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"habilitado": self.habilitado, **self.backend.stats()}
+
+
+def _criar_backend():
+    if LEAD_CACHE_REDIS_URL:
+        try:
+            return RedisCache(LEAD_CACHE_REDIS_URL)
+        except ImportError:
+            print("⚠️ LEAD_CACHE_REDIS_URL definido mas o pacote 'redis' não está instalado; usando cache em memória")
+    return TTLCache()
+
+
+def _criar_cache() -> LeadCache:
+    backend = _criar_backend()
+    habilitado = LEAD_CACHE_ENABLED
+    if habilitado and backend.backend == "memoria" and _PROCESSOS > 1:
+        # a invalidação de um PUT só chegaria ao worker que o atendeu
+        print(
+            f"⚠️ Cache de leads desligado: {_PROCESSOS} workers sem LEAD_CACHE_REDIS_URL "
+            "(o cache em memória não invalida entre processos)"
+        )
+        habilitado = False
+    return LeadCache(backend, habilitado=habilitado)
+
+
+lead_cache = _criar_cache()
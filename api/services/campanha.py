@@ -0,0 +1,109 @@
+import asyncio
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from api.repositories.aio.leads import get_telefones_by_ids
+from api.services.event_buffer import event_buffer
+from api.services.messaging import send_whatsapp_async, tipo_evento_envio
+from api.services.rate_limit import LimitadorPorChave, LimiteCompartilhado, TokenBucket
+
+# Limites de envio das campanhas (mensagens por segundo).
+# 0 desliga o limite correspondente.
+WHATSAPP_RATE_GLOBAL = float(os.getenv("WHATSAPP_RATE_GLOBAL", 20))
+WHATSAPP_RATE_GLOBAL_BURST = float(os.getenv("WHATSAPP_RATE_GLOBAL_BURST", 20))
+# Quantos envios do limite global cada processo reserva por ida ao banco
+# (só com WHATSAPP_RATE_BACKEND=mysql); 1 volta a uma reserva por mensagem.
+WHATSAPP_RATE_GLOBAL_BLOCO = int(os.getenv("WHATSAPP_RATE_GLOBAL_BLOCO", 5))
+WHATSAPP_RATE_POR_NUMERO = float(os.getenv("WHATSAPP_RATE_POR_NUMERO", 0.2))
+WHATSAPP_RATE_POR_NUMERO_BURST = float(os.getenv("WHATSAPP_RATE_POR_NUMERO_BURST", 1))
+WHATSAPP_CAMPANHA_CONCORRENCIA = int(os.getenv("WHATSAPP_CAMPANHA_CONCORRENCIA", 16))
+
+# Os limites valem para a conta da Evolution inteira: com
+# WHATSAPP_RATE_BACKEND=mysql (padrão) o estado fica na tabela limites_envio
+# e é dividido entre todos os workers do gunicorn e as réplicas dos workers
+# de outbox/follow-up. Com "memoria" (ou sem a migração 010) cada processo
+# tem o próprio bucket, com a taxa dividida por WHATSAPP_RATE_PROCESSOS
+# (padrão: WEB_CONCURRENCY); réplicas de workers continuam somando.
+WHATSAPP_RATE_BACKEND = os.getenv("WHATSAPP_RATE_BACKEND", "mysql")
+WHATSAPP_RATE_PROCESSOS = max(1, int(os.getenv("WHATSAPP_RATE_PROCESSOS") or os.getenv("WEB_CONCURRENCY") or 1))
+
+_global_local = TokenBucket(WHATSAPP_RATE_GLOBAL / WHATSAPP_RATE_PROCESSOS, WHATSAPP_RATE_GLOBAL_BURST)
+_numero_local = LimitadorPorChave(WHATSAPP_RATE_POR_NUMERO / WHATSAPP_RATE_PROCESSOS, WHATSAPP_RATE_POR_NUMERO_BURST)
+
+if WHATSAPP_RATE_BACKEND == "mysql":
+    limite_global = LimiteCompartilhado(
+        "whatsapp:global", WHATSAPP_RATE_GLOBAL, WHATSAPP_RATE_GLOBAL_BURST,
+        local=_global_local, bloco=WHATSAPP_RATE_GLOBAL_BLOCO,
+    )
+    limite_por_numero = LimiteCompartilhado(
+        "whatsapp:numero:", WHATSAPP_RATE_POR_NUMERO, WHATSAPP_RATE_POR_NUMERO_BURST, local=_numero_local
+    )
+else:
+    limite_global, limite_por_numero = _global_local, _numero_local
+
+
+async def enviar_com_limites(telefone: str, texto: str) -> Dict[str, Any]:
+    """
+    Envia respeitando o limite por número e depois o global.
+
+    Chame já dentro do semáforo de concorrência de quem envia: os limites
+    vão ao banco (limites_envio), e fora do semáforo todos os envios de um
+    lote disputariam o pool ao mesmo tempo, estourando o timeout do pool.
+    """
+    await limite_por_numero.adquirir(telefone)
+    await limite_global.adquirir()
+    return await send_whatsapp_async(telefone=telefone, texto=texto)
+
+
+async def enviar_campanha(itens: List[Tuple[int, str]]) -> List[Dict[str, Any]]:
+    """
+    Envia várias mensagens (lead_id, texto) de uma vez.
+
+    - busca os telefones de todos os leads num único SELECT
+    - dispara os envios em paralelo (até WHATSAPP_CAMPANHA_CONCORRENCIA),
+      respeitando o limite global e o limite por número
+    - registra todos os eventos de uma vez no buffer de eventos, inclusive
+      quando um envio levanta exceção (esse item volta como "error")
+
+    Retorna um status por item, na mesma ordem de `itens`.
+    """
+    telefones = await get_telefones_by_ids(list({lead_id for lead_id, _ in itens}))
+    semaforo = asyncio.Semaphore(WHATSAPP_CAMPANHA_CONCORRENCIA)
+
+    async def enviar(lead_id: int, telefone: str, texto: str) -> Dict[str, Any]:
+        async with semaforo:
+            return await enviar_com_limites(telefone, texto)
+
+    resultados: List[Optional[Dict[str, Any]]] = [None] * len(itens)
+    tarefas = []
+    for indice, (lead_id, texto) in enumerate(itens):
+        if lead_id not in telefones:
+            resultados[indice] = {"lead_id": lead_id, "status": "not_found", "detail": "Lead não encontrado"}
+        elif not telefones[lead_id]:
+            resultados[indice] = {"lead_id": lead_id, "status": "no_phone", "detail": "Lead não possui telefone cadastrado"}
+        else:
+            tarefas.append((indice, asyncio.ensure_future(enviar(lead_id, telefones[lead_id], texto))))
+
+    # um envio que quebra não pode levar junto os eventos dos que já saíram
+    saidas = await asyncio.gather(*(tarefa for _, tarefa in tarefas), return_exceptions=True)
+
+    eventos = []
+    for (indice, _), result in zip(tarefas, saidas):
+        lead_id, texto = itens[indice]
+        if isinstance(result, Exception):
+            result = {"status": "error", "detail": str(result)}
+        elif isinstance(result, BaseException):
+            raise result
+        eventos.append((
+            lead_id,
+            tipo_evento_envio(result),
+            {"texto": texto, "telefone": telefones[lead_id], "whatsapp_result": result},
+        ))
+        resultados[indice] = {
+            "lead_id": lead_id,
+            "status": result.get("status", "unknown"),
+            "detail": result.get("detail"),
+        }
+
+    await event_buffer.registrar_lote(eventos)
+    return resultados
@@ -0,0 +1,174 @@
+import asyncio
+import os
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from api.db_async import get_conn, transacao
+from api.repositories.aio.events import add_event, add_events_batch
+from api.repositories.events import TIPOS_VALIDOS
+
+# "buffer": eventos vão para a memória e são gravados em lote em segundo plano.
+# "sync": cada evento é gravado na hora (útil em testes e para depurar).
+EVENT_BUFFER_MODO = os.getenv("EVENT_BUFFER_MODO", "buffer")
+EVENT_BUFFER_MAX_LOTE = int(os.getenv("EVENT_BUFFER_MAX_LOTE", 500))
+EVENT_BUFFER_INTERVALO_MS = int(os.getenv("EVENT_BUFFER_INTERVALO_MS", 200))
+EVENT_BUFFER_CAPACIDADE = int(os.getenv("EVENT_BUFFER_CAPACIDADE", 20_000))
+EVENT_BUFFER_TENTATIVAS = int(os.getenv("EVENT_BUFFER_TENTATIVAS", 5))
+
+Evento = Tuple[int, str, Optional[Dict[str, Any]]]
+
+# Marca de fim colocada na fila pelo parar(). O loop não é encerrado com
+# cancel(): no Python 3.11 o asyncio.wait_for pode engolir o cancelamento
+# quando o get() da fila termina no mesmo instante.
+_FIM = object()
+
+
+class EventBuffer:
+    """
+    Write-behind do lead_events.
+
+    `registrar` só coloca o evento na memória; uma tarefa em segundo plano
+    grava tudo com INSERTs de várias linhas quando junta `max_lote` eventos
+    ou passa `intervalo_ms`, o que vier primeiro. Com o buffer cheio,
+    `registrar` espera abrir espaço (backpressure) em vez de crescer sem
+    limite. No shutdown, `parar` grava o que ainda estiver pendente.
+
+    No modo "sync" (ou antes de `iniciar`) o evento é gravado na hora,
+    inclusive na conexão/transação recebida em `conn`.
+    """
+
+    def __init__(
+        self,
+        modo: str = EVENT_BUFFER_MODO,
+        max_lote: int = EVENT_BUFFER_MAX_LOTE,
+        intervalo_ms: int = EVENT_BUFFER_INTERVALO_MS,
+        capacidade: int = EVENT_BUFFER_CAPACIDADE,
+    ):
+        self.modo = modo
+        self.max_lote = max_lote
+        self.intervalo = intervalo_ms / 1000
+        self.capacidade = capacidade
+        self._fila: Optional[asyncio.Queue] = None
+        self._tarefa: Optional[asyncio.Task] = None
+        self.gravados = 0
+        self.lotes = 0
+        self.erros = 0
+
+    @property
+    def sincrono(self) -> bool:
+        return self.modo == "sync" or self._tarefa is None
+
+    def conexao(self):
+        """
+        Conexão para gravar o dado principal junto com o evento: no modo
+        síncrono é uma transação (dado + evento juntos); com o buffer ativo o
+        evento sai da requisição, então basta uma conexão simples.
+        """
+        return transacao() if self.sincrono else get_conn()
+
+    async def iniciar(self) -> None:
+        if self.modo == "sync" or self._tarefa is not None:
+            return
+        self._fila = asyncio.Queue(maxsize=self.capacidade)
+        self._tarefa = asyncio.create_task(self._loop(), name="event-buffer")
+
+    async def parar(self) -> None:
+        if self._tarefa is None:
+            return
+        await self._fila.put(_FIM)
+        await self._tarefa
+        self._tarefa = None
+
+        # eventos que chegaram depois da marca de fim
+        pendentes: List[Evento] = []
+        while not self._fila.empty():
+            pendentes.append(self._fila.get_nowait())
+        for inicio in range(0, len(pendentes), self.max_lote):
+            await self._gravar(pendentes[inicio:inicio + self.max_lote], tentativas=3)
+
+    async def registrar(
+        self,
+        lead_id: int,
+        tipo: str,
+        payload: Optional[Dict[str, Any]] = None,
+        conn=None,
+    ) -> None:
+        if self.sincrono:
+            await add_event(lead_id=lead_id, tipo=tipo, payload=payload, conn=conn)
+            return
+
+        if tipo not in TIPOS_VALIDOS:
+            raise ValueError(f"Tipo de evento inválido: {tipo}")
+        await self._fila.put((lead_id, tipo, payload))
+
+    async def registrar_lote(self, eventos: Iterable[Evento], conn=None) -> None:
+        if self.sincrono:
+            await add_events_batch(eventos, conn=conn)
+            return
+
+        for lead_id, tipo, payload in eventos:
+            await self.registrar(lead_id, tipo, payload)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "modo": self.modo,
+            "pendentes": self._fila.qsize() if self._fila else 0,
+            "capacidade": self.capacidade,
+            "gravados": self.gravados,
+            "lotes": self.lotes,
+            "erros": self.erros,
+        }
+
+    async def _loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        fim = False
+        while not fim:
+            item = await self._fila.get()
+            if item is _FIM:
+                return
+            lote = [item]
+            prazo = loop.time() + self.intervalo
+
+            while len(lote) < self.max_lote:
+                try:
+                    item = self._fila.get_nowait()
+                except asyncio.QueueEmpty:
+                    restante = prazo - loop.time()
+                    if restante <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._fila.get(), restante)
+                    except asyncio.TimeoutError:
+                        break
+                if item is _FIM:
+                    fim = True
+                    break
+                lote.append(item)
+
+            await self._gravar(lote)
+
+    async def _gravar(self, lote: List[Evento], tentativas: int = EVENT_BUFFER_TENTATIVAS) -> None:
+        """
+        Grava o lote; se o banco falhar, tenta de novo com espera crescente
+        (enquanto isso o buffer enche e segura os produtores). Depois de
+        `tentativas` falhas o lote é descartado e fica registrado no log.
+        """
+        espera = 0.5
+        tentativa = 0
+        while True:
+            tentativa += 1
+            try:
+                await add_events_batch(lote)
+                self.gravados += len(lote)
+                self.lotes += 1
+                return
+            except Exception as e:
+                self.erros += 1
+                print(f"❌ Erro ao gravar lote de {len(lote)} eventos (tentativa {tentativa}):", e)
+                if tentativa >= tentativas:
+                    print(f"❌ Descartando lote de {len(lote)} eventos após {tentativa} tentativas")
+                    return
+                await asyncio.sleep(espera)
+                espera = min(espera * 2, 10)
+
+
+event_buffer = EventBuffer()
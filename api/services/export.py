@@ -0,0 +1,53 @@
+import csv
+import io
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, AsyncIterator, Dict, List
+
+Blocos = AsyncIterator[List[Dict[str, Any]]]
+
+
+def _json_default(valor: Any) -> Any:
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return str(valor)
+    if isinstance(valor, bytes):
+        return valor.decode("utf-8", errors="replace")
+    raise TypeError(f"Tipo não serializável: {type(valor).__name__}")
+
+
+async def gerar_ndjson(blocos: Blocos) -> AsyncIterator[bytes]:
+    """
+    Uma linha JSON por registro; cada bloco lido do banco vira um único
+    pedaço da resposta.
+    """
+    async for rows in blocos:
+        yield "".join(
+            json.dumps(row, default=_json_default, ensure_ascii=False) + "\n"
+            for row in rows
+        ).encode("utf-8")
+
+
+def _csv_valor(valor: Any) -> Any:
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    if isinstance(valor, bytes):
+        return valor.decode("utf-8", errors="replace")
+    return valor
+
+
+async def gerar_csv(blocos: Blocos) -> AsyncIterator[bytes]:
+    """
+    CSV com cabeçalho tirado das colunas da primeira linha.
+    """
+    colunas = None
+    async for rows in blocos:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if colunas is None:
+            colunas = list(rows[0].keys())
+            writer.writerow(colunas)
+        writer.writerows([_csv_valor(row.get(c)) for c in colunas] for row in rows)
+        yield buffer.getvalue().encode("utf-8")
@@ -0,0 +1,113 @@
+import asyncio
+import os
+import uuid
+from typing import Any, Dict, List, Optional
+
+from api.services.campanha import enviar_com_limites
+from api.services.event_buffer import event_buffer
+from api.services.messaging import tipo_evento_envio
+
+WHATSAPP_FILA_MAX = int(os.getenv("WHATSAPP_FILA_MAX", 1000))
+WHATSAPP_FILA_CONCORRENCIA = int(os.getenv("WHATSAPP_FILA_CONCORRENCIA", 8))
+
+
+class FilaCheia(Exception):
+    """A fila de envio atingiu o limite (WHATSAPP_FILA_MAX)."""
+
+
+class FilaEnvio:
+    """
+    Fila em memória de mensagens de WhatsApp com N envios simultâneos.
+
+    O endpoint enfileira e responde 202 na hora; os workers enviam pela
+    Evolution API, dentro dos mesmos limites por número e global das
+    campanhas e do outbox, e registram `mensagem_enviada` / `erro_envio` no
+    lead_events quando o envio termina. A fila é limitada: quando enche,
+    `enfileirar` levanta FilaCheia em vez de acumular memória sem fim.
+    """
+
+    def __init__(self, maxsize: int = WHATSAPP_FILA_MAX, concorrencia: int = WHATSAPP_FILA_CONCORRENCIA):
+        self.maxsize = maxsize
+        self.concorrencia = concorrencia
+        self._fila: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+
+    async def iniciar(self) -> None:
+        if self._workers:
+            return
+        self._fila = asyncio.Queue(maxsize=self.maxsize)
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"fila-envio-{i}")
+            for i in range(self.concorrencia)
+        ]
+
+    async def parar(self, timeout: float = 30) -> None:
+        """
+        Espera a fila esvaziar (até `timeout` segundos) e encerra os workers.
+        """
+        if not self._workers:
+            return
+        try:
+            await asyncio.wait_for(self._fila.join(), timeout)
+        except asyncio.TimeoutError:
+            print(f"⚠️ Fila de envio encerrada com {self._fila.qsize()} mensagens pendentes")
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def enfileirar(self, lead_id: int, telefone: str, texto: str) -> str:
+        """
+        Coloca a mensagem na fila e devolve o message_id gerado.
+        """
+        if self._fila is None:
+            raise RuntimeError("FilaEnvio não foi iniciada")
+
+        message_id = uuid.uuid4().hex
+        try:
+            self._fila.put_nowait({
+                "message_id": message_id,
+                "lead_id": lead_id,
+                "telefone": telefone,
+                "texto": texto,
+            })
+        except asyncio.QueueFull:
+            raise FilaCheia(f"Fila de envio cheia ({self.maxsize} mensagens)")
+        return message_id
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pendentes": self._fila.qsize() if self._fila else 0,
+            "max": self.maxsize,
+            "concorrencia": self.concorrencia,
+        }
+
+    async def _worker(self) -> None:
+        while True:
+            item = await self._fila.get()
+            try:
+                await self._enviar(item)
+            except Exception as e:
+                print(f"❌ Erro no envio {item['message_id']} (lead {item['lead_id']}):", e)
+            finally:
+                self._fila.task_done()
+
+    async def _enviar(self, item: Dict[str, Any]) -> None:
+        try:
+            result = await enviar_com_limites(item["telefone"], item["texto"])
+        except Exception as e:
+            # limite sem banco também vira erro_envio, como nas campanhas
+            result = {"status": "error", "detail": str(e)}
+        await event_buffer.registrar(
+            lead_id=item["lead_id"],
+            tipo=tipo_evento_envio(result),
+            payload={
+                "message_id": item["message_id"],
+                "texto": item["texto"],
+                "telefone": item["telefone"],
+                "whatsapp_result": result,
+            },
+        )
+
+
+fila_envio = FilaEnvio()
@@ -0,0 +1,175 @@
+import heapq
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from api.repositories.aio import followups as repo
+
+# Follow-ups automáticos (sql/migrations/009_followups.sql).
+#
+# Com FOLLOWUP_ENABLED=1 a entrada de um lead (webhook unitário ou lote)
+# agenda, na mesma conexão do upsert, os follow-ups das regras que a etapa
+# de entrada dispara. Quem dispara é o `python -m api.workers.followup`: ele
+# mantém em memória um heap com o que vence nas próximas
+# FOLLOWUP_HORIZONTE_S e vai completando a janela pelo índice da tabela, em
+# vez de o n8n listar todos os leads a cada execução para descobrir quem
+# precisa de follow-up.
+FOLLOWUP_ENABLED = os.getenv("FOLLOWUP_ENABLED", "0") not in ("0", "false", "False")
+FOLLOWUP_NOVO_HORAS = float(os.getenv("FOLLOWUP_NOVO_HORAS", 24))
+FOLLOWUP_NOVO_TEXTO = os.getenv(
+    "FOLLOWUP_NOVO_TEXTO",
+    "{saudacao} Vimos que você se interessou pelos nossos serviços. "
+    "Quer ajuda para agendar uma avaliação?",
+)
+
+# Janela carregada no heap do worker e de quanto em quanto tempo ela avança
+FOLLOWUP_HORIZONTE_S = float(os.getenv("FOLLOWUP_HORIZONTE_S", 600))
+FOLLOWUP_CARGA_S = float(os.getenv("FOLLOWUP_CARGA_S", 30))
+# Recarga completa da janela: pega o que entrou antes do cursor (novas
+# tentativas agendadas por outra réplica, agendar_existentes, reservas vencidas)
+FOLLOWUP_RECARGA_S = float(os.getenv("FOLLOWUP_RECARGA_S", 300))
+FOLLOWUP_CARGA_MAX = int(os.getenv("FOLLOWUP_CARGA_MAX", 5000))
+
+CANCELAR_SEM_LEAD = "lead_removido"
+CANCELAR_ETAPA = "etapa_mudou"
+CANCELAR_COM_MENSAGEM = "mensagem_enviada"
+CANCELAR_SEM_TELEFONE = "sem_telefone"
+
+
+@dataclass(frozen=True)
+class Regra:
+    """
+    Follow-up agendado quando o lead entra na `etapa` e disparado
+    `atraso_s` segundos depois, se o lead continuar nela e não tiver
+    recebido mensagem nesse meio tempo.
+    """
+
+    nome: str
+    etapa: str
+    atraso_s: float
+    texto: str
+
+
+REGRAS: Dict[str, Regra] = {
+    regra.nome: regra
+    for regra in (
+        Regra("novo_sem_mensagem", "novo", FOLLOWUP_NOVO_HORAS * 3600, FOLLOWUP_NOVO_TEXTO),
+    )
+}
+
+
+def agendamentos_de_entrada(entradas: Iterable[Tuple[int, Optional[str]]]) -> List[repo.Agendamento]:
+    """Follow-ups que a entrada de cada (lead_id, etapa) dispara."""
+    return [
+        (lead_id, regra.nome, regra.atraso_s)
+        for lead_id, etapa in entradas
+        for regra in REGRAS.values()
+        if regra.etapa == etapa
+    ]
+
+
+async def agendar_entrada(entradas: Iterable[Tuple[int, Optional[str]]], conn=None) -> int:
+    """Agenda (um INSERT só) os follow-ups de leads que acabaram de entrar."""
+    return await repo.agendar(agendamentos_de_entrada(entradas), conn=conn)
+
+
+def motivo_cancelamento(item: Dict[str, Any]) -> Optional[str]:
+    """
+    Por que um follow-up reservado (repo.reservar) não deve mais ser
+    enviado, ou None se a regra ainda vale. Regra desconhecida (removida
+    do código depois de agendada) cai como etapa mudada.
+    """
+    regra = REGRAS.get(item["regra"])
+    if item["etapa"] is None:
+        return CANCELAR_SEM_LEAD
+    if regra is None or item["etapa"] != regra.etapa:
+        return CANCELAR_ETAPA
+    if item["mensagem_em"] is not None:
+        return CANCELAR_COM_MENSAGEM
+    if not item["telefone"]:
+        return CANCELAR_SEM_TELEFONE
+    return None
+
+
+def texto_followup(item: Dict[str, Any]) -> str:
+    """Texto da regra com {nome} (primeiro nome) e {saudacao} preenchidos."""
+    partes = (item.get("nome") or "").split()
+    nome = partes[0].capitalize() if partes else ""
+    saudacao = f"Olá, {nome}!" if nome else "Olá!"
+    return REGRAS[item["regra"]].texto.format(nome=nome, saudacao=saudacao)
+
+
+class AgendaFollowups:
+    """
+    Heap (momento do disparo, id) dos follow-ups que vencem dentro de
+    `horizonte_s`, para o worker dormir até o próximo em vez de consultar
+    o banco em intervalo fixo.
+
+    A carga é incremental: cada `carga_s` o worker busca só o que está
+    depois do último (agendado_para, id) carregado e dentro da nova janela;
+    a cada `recarga_s` o heap é refeito do zero. O momento do disparo é
+    guardado em time.monotonic(), a partir do `faltam_us` calculado pelo
+    banco.
+
+    Os ids do heap são só candidatos: quem confirma se o follow-up ainda
+    está elegível é a reserva (repo.reservar).
+    """
+
+    def __init__(
+        self,
+        horizonte_s: float = FOLLOWUP_HORIZONTE_S,
+        carga_s: float = FOLLOWUP_CARGA_S,
+        recarga_s: float = FOLLOWUP_RECARGA_S,
+        carga_max: int = FOLLOWUP_CARGA_MAX,
+    ):
+        self.horizonte_s = horizonte_s
+        self.carga_s = carga_s
+        self.recarga_s = recarga_s
+        self.carga_max = carga_max
+        self._heap: List[Tuple[float, int]] = []
+        self._ids: Set[int] = set()
+        self.posicao: Optional[repo.Posicao] = None
+        self._proxima_carga = 0.0
+        self._proxima_recarga = 0.0
+        self._pagina_cheia = False
+
+    def precisa_carregar(self, agora: float) -> bool:
+        # página cheia: a janela não coube numa carga, continua assim que o heap esvaziar
+        return agora >= self._proxima_carga or (self._pagina_cheia and not self._heap)
+
+    def inicio_carga(self, agora: float) -> Optional[repo.Posicao]:
+        """Posição de onde a próxima carga continua (None: do começo, heap refeito)."""
+        if agora >= self._proxima_recarga:
+            self._heap, self._ids, self.posicao = [], set(), None
+            self._proxima_recarga = agora + self.recarga_s
+        return self.posicao
+
+    def adicionar(self, rows: List[Dict[str, Any]], agora: float) -> None:
+        """Resultado de uma carga (repo.carregar), em ordem de (agendado_para, id)."""
+        for row in rows:
+            if row["id"] not in self._ids:
+                self._ids.add(row["id"])
+                heapq.heappush(self._heap, (agora + int(row["faltam_us"]) / 1e6, row["id"]))
+        if rows:
+            self.posicao = (rows[-1]["agendado_para"], rows[-1]["id"])
+        self._pagina_cheia = len(rows) >= self.carga_max
+        self._proxima_carga = agora + self.carga_s
+
+    def reagendar(self, id_: int, atraso_s: float, agora: float) -> None:
+        """Nova tentativa decidida por este worker: volta para o heap se cair na janela."""
+        if atraso_s <= self.horizonte_s and id_ not in self._ids:
+            self._ids.add(id_)
+            heapq.heappush(self._heap, (agora + atraso_s, id_))
+
+    def vencidos(self, agora: float, limite: int) -> List[int]:
+        ids: List[int] = []
+        while self._heap and self._heap[0][0] <= agora and len(ids) < limite:
+            _, id_ = heapq.heappop(self._heap)
+            self._ids.discard(id_)
+            ids.append(id_)
+        return ids
+
+    def espera(self, agora: float) -> float:
+        """Segundos até o próximo disparo ou a próxima carga, o que vier antes."""
+        proximo = self._heap[0][0] if self._heap else float("inf")
+        return max(0.0, min(proximo, self._proxima_carga) - agora)
@@ -0,0 +1,158 @@
+import asyncio
+import hashlib
+import json
+import os
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+
+from api.repositories.aio import idempotencia as repo
+from api.services.cache import AUSENTE, TTLCache
+
+IDEMPOTENCIA_ENABLED = os.getenv("IDEMPOTENCIA_ENABLED", "1") not in ("0", "false", "False")
+IDEMPOTENCIA_TTL = int(os.getenv("IDEMPOTENCIA_TTL", 86400))
+IDEMPOTENCIA_MAX = int(os.getenv("IDEMPOTENCIA_MAX", 20000))
+# Guarda as chaves também na tabela webhook_idempotencia (vale entre workers e restarts)
+IDEMPOTENCIA_DB = os.getenv("IDEMPOTENCIA_DB", "1") not in ("0", "false", "False")
+# A cada N gravações apaga um bloco de linhas vencidas da tabela
+IDEMPOTENCIA_LIMPEZA_A_CADA = int(os.getenv("IDEMPOTENCIA_LIMPEZA_A_CADA", 1000))
+
+# Campos do lead normalizado que identificam um reenvio do mesmo webhook
+_CAMPOS_CHAVE = ("nome", "email", "telefone", "origem", "tags", "externo_id")
+
+
+def chave_idempotencia(
+    rota: str,
+    idempotency_key: Optional[str],
+    data: Optional[Dict[str, Any]] = None,
+    tenant: Optional[str] = None,
+) -> str:
+    """
+    sha256 do header Idempotency-Key ou, sem header, do lead já normalizado
+    (mais o externo_id), para que reenvios com o mesmo conteúdo caiam na
+    mesma chave.
+    """
+    if idempotency_key:
+        base = f"{rota}|key|{tenant or ''}|{idempotency_key}"
+    else:
+        campos = {campo: (data or {}).get(campo) for campo in _CAMPOS_CHAVE}
+        base = f"{rota}|lead|{tenant or ''}|" + json.dumps(campos, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(base.encode("utf-8")).hexdigest()
+
+
+class Idempotencia:
+    """
+    Dedup de webhooks: a resposta de cada chave fica num LRU com TTL em
+    memória (e na tabela webhook_idempotencia). Um reenvio devolve a
+    resposta guardada sem tocar no MySQL; reenvios que chegam enquanto a
+    primeira requisição ainda está rodando esperam por ela em vez de
+    gravar de novo.
+    """
+
+    def __init__(
+        self,
+        ttl: int = IDEMPOTENCIA_TTL,
+        max_itens: int = IDEMPOTENCIA_MAX,
+        habilitado: bool = IDEMPOTENCIA_ENABLED,
+        usar_db: bool = IDEMPOTENCIA_DB,
+    ):
+        self.ttl = ttl
+        self.habilitado = habilitado
+        self.usar_db = usar_db
+        self._cache = TTLCache(ttl=ttl, max_itens=max_itens)
+        self._em_andamento: Dict[str, "asyncio.Future[Dict[str, Any]]"] = {}
+        self._gravacoes: Set[asyncio.Task] = set()
+        self._total_gravacoes = 0
+        self.replays = 0
+
+    async def executar(
+        self,
+        chave: str,
+        rota: str,
+        produzir: Callable[[], Awaitable[Dict[str, Any]]],
+    ) -> Tuple[Dict[str, Any], bool]:
+        """
+        Devolve (resposta, replay). `produzir` só roda se a chave ainda não
+        tiver resposta; se falhar, nada fica guardado e o próximo envio tenta
+        de novo.
+        """
+        if not self.habilitado:
+            return await produzir(), False
+
+        guardada = await self._cache.get(chave)
+        if guardada is not AUSENTE:
+            self.replays += 1
+            return guardada, True
+
+        em_andamento = self._em_andamento.get(chave)
+        if em_andamento is not None:
+            resposta = await asyncio.shield(em_andamento)
+            self.replays += 1
+            return resposta, True
+
+        futuro: "asyncio.Future[Dict[str, Any]]" = asyncio.get_running_loop().create_future()
+        self._em_andamento[chave] = futuro
+        try:
+            guardada = await self._buscar_no_db(chave)
+            if guardada is not None:
+                await self._cache.set(chave, guardada)
+                futuro.set_result(guardada)
+                self.replays += 1
+                return guardada, True
+
+            resposta = await produzir()
+            await self._cache.set(chave, resposta)
+            futuro.set_result(resposta)
+            self._gravar_no_db(chave, rota, resposta)
+            return resposta, False
+        except BaseException as e:
+            futuro.set_exception(e)
+            # ninguém mais esperando: evita o aviso de exceção não lida
+            futuro.exception()
+            raise
+        finally:
+            self._em_andamento.pop(chave, None)
+
+    async def _buscar_no_db(self, chave: str) -> Optional[Dict[str, Any]]:
+        if not self.usar_db:
+            return None
+        try:
+            return await repo.buscar(chave)
+        except Exception as e:
+            # tabela fora do ar não pode derrubar o webhook: segue sem dedup no banco
+            print(f"❌ Erro ao consultar idempotência: {e}")
+            return None
+
+    def _gravar_no_db(self, chave: str, rota: str, resposta: Dict[str, Any]) -> None:
+        """Grava em segundo plano; a resposta já está no cache em memória."""
+        if not self.usar_db:
+            return
+        self._total_gravacoes += 1
+        limpar = IDEMPOTENCIA_LIMPEZA_A_CADA > 0 and self._total_gravacoes % IDEMPOTENCIA_LIMPEZA_A_CADA == 0
+        tarefa = asyncio.create_task(self._gravar(chave, rota, resposta, limpar))
+        self._gravacoes.add(tarefa)
+        tarefa.add_done_callback(self._gravacoes.discard)
+
+    async def _gravar(self, chave: str, rota: str, resposta: Dict[str, Any], limpar: bool) -> None:
+        try:
+            await repo.gravar(chave, rota, resposta, self.ttl)
+            if limpar:
+                await repo.limpar_expiradas()
+        except Exception as e:
+            print(f"❌ Erro ao gravar idempotência: {e}")
+
+    async def parar(self) -> None:
+        """Espera as gravações pendentes na tabela (chamar antes de fechar o pool)."""
+        if self._gravacoes:
+            await asyncio.gather(*self._gravacoes, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "habilitado": self.habilitado,
+            "db": self.usar_db,
+            "replays": self.replays,
+            "em_andamento": len(self._em_andamento),
+            "gravacoes_pendentes": len(self._gravacoes),
+            "cache": self._cache.stats(),
+        }
+
+
+idempotencia = Idempotencia()
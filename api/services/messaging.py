@@ -1,22 +1,32 @@
 import os
-import requests
-from typing import Any, Dict
+import httpx
+from typing import Any, Dict, Optional, Tuple
+
+from api.metrics import cronometrar
 
 WHATSAPP_API = os.getenv("WHATSAPP_API_URL", "")
 WHATSAPP_TOKEN = os.getenv("WHATSAPP_TOKEN", "")
+WHATSAPP_TIMEOUT = float(os.getenv("WHATSAPP_TIMEOUT", 15))
+WHATSAPP_POOL_MAX = int(os.getenv("WHATSAPP_POOL_MAX", 20))
 
+# Conexões keep-alive reaproveitadas entre envios (uma sessão por processo).
+# `_session` atende o send_whatsapp síncrono (scripts) e `_client` o
+# send_whatsapp_async usado pela API. O `requests` só é importado pelo
+# caminho síncrono: a API não paga o import (~60 ms) no boot de cada worker.
+_session = None
+_client: Optional[httpx.AsyncClient] = None
 
-def send_whatsapp(telefone: str, texto: str) -> Dict[str, Any]:
-    """
-    Envia mensagem de texto via Evolution API.
-    """
 
+def _desabilitado() -> Optional[Dict[str, Any]]:
     if not WHATSAPP_API or not WHATSAPP_TOKEN:
         return {
             "status": "disabled",
             "detail": "configure WHATSAPP_API_URL/WHATSAPP_TOKEN",
         }
+    return None
+
 
+def _montar_requisicao(telefone: str, texto: str) -> Tuple[Dict[str, str], Dict[str, Any]]:
     headers = {
         "apikey": WHATSAPP_TOKEN,           # Evolution usa 'apikey'
         "Content-Type": "application/json",
@@ -31,13 +41,41 @@ def send_whatsapp(telefone: str, texto: str) -> Dict[str, Any]:
         "delay": 0,
         "presence": "composing",
     }
+    return headers, payload
+
+
+def tipo_evento_envio(result: Any) -> str:
+    """
+    Traduz o retorno do envio no tipo de evento do lead_events.
+    """
+    if isinstance(result, dict) and result.get("status") == "error":
+        return "erro_envio"
+    return "mensagem_enviada"
+
+
+@cronometrar("servico", "evolution.send_whatsapp")
+def send_whatsapp(telefone: str, texto: str) -> Dict[str, Any]:
+    """
+    Envia mensagem de texto via Evolution API.
+    """
+    desabilitado = _desabilitado()
+    if desabilitado:
+        return desabilitado
+
+    import requests
+
+    global _session
+    if _session is None:
+        _session = requests.Session()
+
+    headers, payload = _montar_requisicao(telefone, texto)
 
     try:
-        response = requests.post(
+        response = _session.post(
             WHATSAPP_API,
             headers=headers,
             json=payload,
-            timeout=15,
+            timeout=WHATSAPP_TIMEOUT,
         )
         return {
             "status": response.status_code,
@@ -48,3 +86,52 @@ def send_whatsapp(telefone: str, texto: str) -> Dict[str, Any]:
             "status": "error",
             "detail": str(e),
         }
+
+
+def _get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            timeout=WHATSAPP_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=WHATSAPP_POOL_MAX,
+                max_keepalive_connections=WHATSAPP_POOL_MAX,
+            ),
+        )
+    return _client
+
+
+async def fechar_cliente() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+@cronometrar("servico", "evolution.send_whatsapp")
+async def send_whatsapp_async(telefone: str, texto: str) -> Dict[str, Any]:
+    """
+    Mesmo contrato do send_whatsapp, mas sem bloquear o event loop e
+    reaproveitando as conexões do cliente httpx compartilhado.
+    """
+    desabilitado = _desabilitado()
+    if desabilitado:
+        return desabilitado
+
+    headers, payload = _montar_requisicao(telefone, texto)
+
+    try:
+        response = await _get_client().post(
+            WHATSAPP_API,
+            headers=headers,
+            json=payload,
+        )
+        return {
+            "status": response.status_code,
+            "detail": response.text,
+        }
+    except httpx.HTTPError as e:
+        return {
+            "status": "error",
+            "detail": str(e),
+        }
@@ -1,10 +1,112 @@
 import re
+from typing import Dict, Iterable, List, Optional
+
+_NAO_DIGITO = re.compile(r"\D")
+
+# DDDs em uso no Brasil (Anatel)
+DDDS_VALIDOS = frozenset(
+    [str(d) for d in range(11, 20)]
+    + ["21", "22", "24", "27", "28"]
+    + ["31", "32", "33", "34", "35", "37", "38"]
+    + [str(d) for d in range(41, 50)]
+    + ["51", "53", "54", "55"]
+    + [str(d) for d in range(61, 70)]
+    + ["71", "73", "74", "75", "77", "79"]
+    + [str(d) for d in range(81, 90)]
+    + [str(d) for d in range(91, 100)]
+)
+
+
+def telefone_e164(raw: str | None) -> str | None:
+    """
+    Telefone no formato E.164 só com dígitos (sem o "+"), ex.: "5511999999999",
+    que é o que a Evolution espera no `number`. None se não for um número válido.
+
+    Números brasileiros:
+    - "11 99999-9999", "(11) 9999-9999", "011 ...", "0 21 11 ..." (tronco e
+      código de operadora) e "+55 11 ..." / "5511..." caem no mesmo valor;
+    - celular antigo de 8 dígitos (começa com 6-9) ganha o nono dígito;
+    - DDD inexistente ou assinante fora do plano de numeração é inválido.
+
+    Número com "+" ou "00" e DDI que não é 55 é mantido como veio (8 a 15 dígitos).
+    """
+    if not raw:
+        return None
+    digitos = _NAO_DIGITO.sub("", raw)
+    internacional = raw.lstrip().startswith("+")
+
+    if digitos.startswith("00") and len(digitos) >= 12:
+        # 00 + DDI (discagem internacional)
+        digitos, internacional = digitos[2:], True
+    elif not internacional and digitos.startswith("0"):
+        digitos = digitos[1:]
+        if len(digitos) in (12, 13):
+            # 0 + código da operadora + DDD + número
+            digitos = digitos[2:]
+
+    if not internacional and len(digitos) in (10, 11):
+        nacional = digitos
+    elif digitos.startswith("55") and len(digitos) in (12, 13):
+        nacional = digitos[2:]
+    elif internacional and not digitos.startswith(("0", "55")) and 8 <= len(digitos) <= 15:
+        return digitos
+    else:
+        return None
+
+    ddd, assinante = nacional[:2], nacional[2:]
+    if ddd not in DDDS_VALIDOS:
+        return None
+    if len(assinante) == 8:
+        if assinante[0] in "6789":
+            assinante = "9" + assinante
+        elif assinante[0] not in "2345":
+            return None
+    elif assinante[0] != "9":
+        return None
+    return "55" + ddd + assinante
+
 
 def clean_phone(raw: str | None) -> str | None:
-    """Remove todos os caracteres não numéricos do telefone e retorna apenas dígitos."""
+    """
+    Telefone canônico (telefone_e164). O que não dá para reconhecer fica só
+    com os dígitos, como antes, para não perder o contato.
+    """
     if not raw: return None
-    digits = re.sub(r"\D", "", raw)
-    return digits or None
+    return telefone_e164(raw) or _NAO_DIGITO.sub("", raw) or None
+
+
+def normalizar_telefones(valores: Iterable[str | None]) -> List[str | None]:
+    """
+    clean_phone de uma lista inteira (lotes de webhook, backfill). Cada valor
+    distinto é normalizado uma vez só: campanhas repetem muito o mesmo número.
+    """
+    vistos: Dict[Optional[str], Optional[str]] = {}
+    resultado: List[Optional[str]] = []
+    for valor in valores:
+        try:
+            resultado.append(vistos[valor])
+        except KeyError:
+            resultado.append(vistos.setdefault(valor, clean_phone(valor)))
+    return resultado
+
+
+def phone_key(telefone: str | None) -> int | None:
+    """
+    Chave numérica do telefone já normalizado (coluna leads.phone_key):
+    o E.164 como inteiro, que cabe num BIGINT UNSIGNED.
+
+    Só tem chave o telefone que já é a forma canônica do telefone_e164. Os
+    dígitos que o clean_phone guarda do que não reconheceu ("99999-9999" ->
+    "999999999") ficam sem chave, para não juntar leads diferentes. Número
+    de fora do Brasil chega aqui sem o "+" e não dá para separar desses
+    dígitos (nem de um número nacional: "1999..." viraria DDD 19), então
+    também fica sem chave.
+    """
+    e164 = telefone_e164(telefone)
+    if e164 is None or e164 != telefone:
+        return None
+    return int(e164)
+
 
 def clean_name(raw: str) -> str:
     """Remove espaços extras e normaliza nome."""
@@ -13,4 +115,3 @@ def clean_name(raw: str) -> str:
 def lower_or_none(s: str | None) -> str | None:
     """Converte para minúsculo se existir valor, caso contrário retorna None."""
     return s.lower() if s else None
-
@@ -0,0 +1,77 @@
+import os
+import random
+import uuid
+from typing import Any, Dict, List, Tuple
+
+from api.repositories.aio import outbox as repo
+from api.repositories.aio.leads import get_telefones_by_ids
+
+# Com WHATSAPP_OUTBOX=1 os envios assíncronos (?assincrono=true) vão para a
+# tabela outbox_mensagens em vez da fila em memória: sobrevivem a restart
+# e são enviados (com novas tentativas) pelo `python -m api.workers.outbox`.
+WHATSAPP_OUTBOX = os.getenv("WHATSAPP_OUTBOX", "0") not in ("0", "false", "False")
+OUTBOX_MAX_TENTATIVAS = int(os.getenv("OUTBOX_MAX_TENTATIVAS", 8))
+OUTBOX_BACKOFF_BASE_S = float(os.getenv("OUTBOX_BACKOFF_BASE_S", 5))
+OUTBOX_BACKOFF_MAX_S = float(os.getenv("OUTBOX_BACKOFF_MAX_S", 3600))
+
+ENVIADA = "enviada"
+REPETIR = "repetir"
+FALHA = "falha"
+
+
+async def enfileirar_mensagem(lead_id: int, telefone: str, texto: str) -> str:
+    """Grava a mensagem no outbox e devolve o message_id gerado."""
+    message_id = uuid.uuid4().hex
+    await repo.enfileirar([(message_id, lead_id, telefone, texto)])
+    return message_id
+
+
+async def enfileirar_campanha(itens: List[Tuple[int, str]]) -> List[Dict[str, Any]]:
+    """
+    Versão do enviar_campanha que só enfileira: um SELECT para os telefones
+    e um INSERT para todas as mensagens. Rate limit e paralelismo ficam por
+    conta do worker. Retorna um status por item, na mesma ordem de `itens`.
+    """
+    telefones = await get_telefones_by_ids(list({lead_id for lead_id, _ in itens}))
+    resultados: List[Dict[str, Any]] = []
+    mensagens: List[repo.Mensagem] = []
+    for lead_id, texto in itens:
+        if lead_id not in telefones:
+            resultados.append({"lead_id": lead_id, "status": "not_found", "detail": "Lead não encontrado"})
+        elif not telefones[lead_id]:
+            resultados.append({"lead_id": lead_id, "status": "no_phone", "detail": "Lead não possui telefone cadastrado"})
+        else:
+            message_id = uuid.uuid4().hex
+            mensagens.append((message_id, lead_id, telefones[lead_id], texto))
+            resultados.append({"lead_id": lead_id, "status": "queued", "message_id": message_id})
+
+    await repo.enfileirar(mensagens)
+    return resultados
+
+
+def classificar(result: Any) -> str:
+    """
+    O que fazer com o retorno do send_whatsapp_async:
+    - 2xx: ENVIADA
+    - erro de rede, 429, 5xx ou envio desabilitado: REPETIR (com backoff)
+    - outros 4xx (número inválido, payload recusado): FALHA, sem nova tentativa
+    """
+    status = result.get("status") if isinstance(result, dict) else None
+    if isinstance(status, int):
+        if 200 <= status < 300:
+            return ENVIADA
+        if status == 429 or status >= 500:
+            return REPETIR
+        return FALHA
+    return REPETIR
+
+
+def atraso_backoff(tentativa: int) -> float:
+    """
+    Segundos até a próxima tentativa: exponencial a partir de
+    OUTBOX_BACKOFF_BASE_S, limitado a OUTBOX_BACKOFF_MAX_S, com jitter para
+    as mensagens de um lote que falhou junto não voltarem todas no mesmo
+    instante.
+    """
+    teto = min(OUTBOX_BACKOFF_MAX_S, OUTBOX_BACKOFF_BASE_S * 2 ** max(0, tentativa - 1))
+    return teto * random.uniform(0.5, 1.0)
@@ -0,0 +1,161 @@
+import asyncio
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Hashable, List, Optional
+
+
+class TokenBucket:
+    """
+    Token bucket assíncrono: `taxa` tokens por segundo, acumulando até
+    `capacidade`. Quem pede um token sem saldo reserva o próximo e dorme
+    até ele existir, então a ordem de chegada é respeitada.
+
+    `taxa <= 0` desliga o limite.
+    """
+
+    def __init__(self, taxa: float, capacidade: float = 1):
+        self.taxa = taxa
+        self.capacidade = max(capacidade, 1)
+        self._tokens = self.capacidade
+        self._ultimo = time.monotonic()
+
+    def _espera(self) -> float:
+        agora = time.monotonic()
+        self._tokens = min(self.capacidade, self._tokens + (agora - self._ultimo) * self.taxa)
+        self._ultimo = agora
+        self._tokens -= 1
+        return -self._tokens / self.taxa if self._tokens < 0 else 0.0
+
+    async def adquirir(self) -> None:
+        if self.taxa <= 0:
+            return
+        # sem await entre ler e reservar o token: no event loop isso é atômico
+        espera = self._espera()
+        if espera:
+            await asyncio.sleep(espera)
+
+
+class LimitadorPorChave:
+    """
+    Um TokenBucket por chave (ex.: por número de WhatsApp), guardando no
+    máximo `max_chaves` buckets; os usados há mais tempo são descartados.
+    """
+
+    def __init__(self, taxa: float, capacidade: float = 1, max_chaves: int = 10_000):
+        self.taxa = taxa
+        self.capacidade = capacidade
+        self.max_chaves = max_chaves
+        self._buckets: "OrderedDict[Hashable, TokenBucket]" = OrderedDict()
+
+    async def adquirir(self, chave: Hashable) -> None:
+        if self.taxa <= 0:
+            return
+        bucket = self._buckets.get(chave)
+        if bucket is None:
+            bucket = self._buckets[chave] = TokenBucket(self.taxa, self.capacidade)
+            if len(self._buckets) > self.max_chaves:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(chave)
+        await bucket.adquirir()
+
+
+def _tabela_ausente(e: Exception) -> bool:
+    # 1146: Table doesn't exist (migração 010 não aplicada)
+    return bool(getattr(e, "args", None)) and e.args[0] == 1146
+
+
+class LimiteCompartilhado:
+    """
+    Mesmo contrato do TokenBucket/LimitadorPorChave, mas com o estado na
+    tabela limites_envio (migração 010), compartilhado por todos os workers
+    do gunicorn e réplicas dos workers de envio: a taxa configurada vale
+    para o conjunto, não por processo.
+
+    Cada `adquirir` reserva o horário do envio no banco (GCRA, ver
+    api/repositories/aio/limites.py) e dorme até ele; `capacidade` envios
+    podem sair juntos depois de um tempo parado, como no TokenBucket.
+
+    No limite sem chave (o global), `bloco` > 1 reserva os horários de
+    `bloco` envios numa ida só ao banco e os entrega em ordem aos próximos
+    `adquirir` do processo. Um horário que passou há mais de um intervalo
+    sem ser usado é descartado (não vira rajada atrasada): o bloco grande
+    economiza idas ao banco, mas desperdiça vazão se o processo não tiver
+    envios para usá-lo.
+
+    Sem a tabela, cai de vez para o limite `local` (em memória, por
+    processo), que deve vir com a taxa já dividida pelo número de processos.
+    """
+
+    LIMPAR_A_CADA = 1000
+
+    def __init__(self, prefixo: str, taxa: float, capacidade: float = 1, local=None, bloco: int = 1):
+        self.prefixo = prefixo
+        self.taxa = taxa
+        self.intervalo_us = int(1_000_000 / taxa) if taxa > 0 else 0
+        self.tolerancia_us = int((max(capacidade, 1) - 1) * self.intervalo_us)
+        self.local = local
+        self.bloco = max(1, int(bloco))
+        self._usar_local = False
+        self._reservas = 0
+        # horários (time.monotonic) já reservados no banco e ainda não usados
+        self._horarios: Deque[float] = deque()
+        self._reservando = asyncio.Lock()
+
+    async def adquirir(self, chave: Hashable = "") -> None:
+        if self.taxa <= 0:
+            return
+        if not self._usar_local:
+            if chave == "" and self.bloco > 1:
+                horario = await self._proximo_horario()
+            else:
+                horarios = await self._reservar(chave, 1)
+                horario = horarios[0] if horarios else None
+            if horario is not None:
+                espera = horario - self.tolerancia_us / 1_000_000 - time.monotonic()
+                if espera > 0:
+                    await asyncio.sleep(espera)
+                return
+        await (self.local.adquirir(chave) if chave != "" else self.local.adquirir())
+
+    async def _proximo_horario(self) -> Optional[float]:
+        while True:
+            vencido = time.monotonic() - self.intervalo_us / 1_000_000
+            while self._horarios and self._horarios[0] < vencido:
+                self._horarios.popleft()
+            if self._horarios:
+                return self._horarios.popleft()
+            async with self._reservando:
+                # quem esperou a trava pode já ter um bloco novo para usar
+                if self._horarios:
+                    continue
+                horarios = await self._reservar("", self.bloco)
+                if horarios is None:
+                    return None
+                self._horarios.extend(horarios)
+
+    async def _reservar(self, chave: Hashable, quantos: int) -> Optional[List[float]]:
+        """
+        Reserva `quantos` envios seguidos da `chave` no banco e devolve o
+        horário de cada um em time.monotonic(); None se caiu para o local.
+        """
+        # import tardio: o pool só existe depois do lifespan/criar_pool
+        from api.repositories.aio import limites
+
+        try:
+            faltam_us = await limites.reservar(f"{self.prefixo}{chave}", self.intervalo_us * quantos)
+        except Exception as e:
+            if not _tabela_ausente(e) or self.local is None:
+                raise
+            print(f"⚠️ Tabela limites_envio não existe (migração 010); limite '{self.prefixo}' só por processo")
+            self._usar_local = True
+            return None
+
+        self._reservas += 1
+        if chave != "" and self._reservas % self.LIMPAR_A_CADA == 0:
+            await limites.limpar(self.prefixo)
+
+        # o novo tat fecha o bloco: o envio i sai (quantos - i) intervalos antes dele
+        tat = time.monotonic() + faltam_us / 1_000_000
+        intervalo = self.intervalo_us / 1_000_000
+        return [tat - (quantos - i) * intervalo for i in range(quantos)]
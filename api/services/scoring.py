@@ -1,4 +1,291 @@
-from typing import Optional, List
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# As regras do score ficam em JSON (api/services/regras_score/padrao.json),
+# uma por tenant/clínica: regras_score/<tenant>.json. Quem não tiver arquivo
+# próprio usa o padrao.json. Os arquivos são recompilados sozinhos quando
+# mudam (checagem de mtime no máximo a cada SCORING_RULES_RELOAD segundos),
+# sem reiniciar o uvicorn.
+SCORING_RULES_DIR = Path(os.getenv("SCORING_RULES_DIR", Path(__file__).resolve().parent / "regras_score"))
+SCORING_RULES_RELOAD = float(os.getenv("SCORING_RULES_RELOAD", 2))
+TENANT_PADRAO = "padrao"
+
+_TENANT_VALIDO = re.compile(r"^[a-z0-9_-]+$")
+
+
+def _tabela_sem_acento() -> Dict[int, str]:
+    # letras latinas acentuadas (Latin-1 + Latin Extended-A) -> letra base
+    tabela = {}
+    for codigo in range(0xC0, 0x180):
+        base = unicodedata.normalize("NFKD", chr(codigo))[0]
+        if base.isascii() and base != chr(codigo):
+            tabela[codigo] = base
+    return tabela
+
+
+_SEM_ACENTO = _tabela_sem_acento()
+# A mesma tabela em bytes para o Latin-1 (o caso comum em português): o
+# bytes.translate é bem mais rápido que o str.translate com dicionário
+_SEM_ACENTO_LATIN1 = bytes(ord(_SEM_ACENTO.get(codigo, chr(codigo))) for codigo in range(256))
+
+
+def dobrar_acentos(texto: Optional[str]) -> str:
+    """Minúsculas e sem acento ("Manhã" -> "manha"), para comparar texto livre."""
+    if not texto:
+        return ""
+    texto = texto.lower()
+    if texto.isascii():
+        return texto
+    try:
+        return texto.encode("latin-1").translate(_SEM_ACENTO_LATIN1).decode("latin-1")
+    except UnicodeEncodeError:
+        return texto.translate(_SEM_ACENTO)
+
+
+class _Memo(dict):
+    """texto -> resultado, calculado (e guardado) no primeiro acesso; até `maximo` textos."""
+
+    def __init__(self, calcular: Callable[[Optional[str]], int], maximo: int):
+        super().__init__()
+        self._calcular = calcular
+        self._maximo = maximo
+
+    def __missing__(self, texto: Optional[str]) -> int:
+        valor = self._calcular(texto)
+        if len(self) >= self._maximo:
+            self.clear()
+        self[texto] = valor
+        return valor
+
+
+class _Palavras:
+    """
+    Lista de palavras-chave (já sem acento, dobrar_acentos) compilada em uma
+    única regex. Cada palavra tem um valor (pontos da faixa);
+    `melhor[texto]` é o maior valor encontrado no texto e
+    `distintas[texto]` quantas palavras diferentes aparecem.
+
+    O texto do lead é dobrado uma vez (em bytes Latin-1, que é o mais
+    barato de dobrar e de varrer) e a regex roda sobre ele, então "manha"
+    casa "manhã" e "MANHÃ". A regex é uma alternação de literais sem
+    grupos, das mais longas para as mais curtas; cada trecho casado vale
+    por todas as palavras que ele contém. Uma palavra que começa no meio de
+    um trecho casado e termina depois dele ("coxa" em "bracoxa") fica
+    escondida da regex; as que podem se esconder assim são calculadas ao
+    compilar e conferidas com `in` só quando aquele trecho aparece.
+
+    Em `distintas` cada grafia encontrada no texto conta uma vez ("manhã
+    ou manha" são duas), como nas regras fixas no código de antes; a dobra
+    troca um caractere por um byte, então a grafia sai do texto original
+    na mesma posição.
+
+    Esses campos vêm de botões/respostas do n8n e se repetem muito, então
+    `melhor` e `distintas` são dicionários memorizados pelo texto como veio
+    do lead (até _MEMO_MAX textos por campo): um acerto é só a busca no
+    dicionário, sem lower() nem regex.
+    """
+
+    _MEMO_MAX = 4096
+
+    def __init__(self, valores: Dict[str, int]):
+        palavras = sorted(valores, key=len, reverse=True)
+        self.pontos = [valores[p] for p in palavras]
+        self.maximo = max(self.pontos, default=0)
+        self.palavras = [p.encode("latin-1", "replace") for p in palavras]
+        # sem palavras, uma regex que nunca casa
+        self.regex = re.compile(b"|".join(re.escape(p) for p in self.palavras) or b"(?!)")
+        # trecho casado -> palavras que ele contém
+        self._contidas = {
+            trecho: [j for j, palavra in enumerate(self.palavras) if palavra in trecho] for trecho in self.palavras
+        }
+        self._pontos = {trecho: max(self.pontos[j] for j in contidas) for trecho, contidas in self._contidas.items()}
+        # trecho casado -> palavras que começam dentro dele e terminam depois
+        self._escondidas = {
+            trecho: [
+                j
+                for j, palavra in enumerate(self.palavras)
+                if any(trecho.endswith(palavra[:k]) for k in range(1, min(len(trecho), len(palavra))))
+            ]
+            for trecho in self.palavras
+        }
+        # nenhuma palavra dentro de outra nem emendada nela: cada trecho é uma palavra
+        self._simples = all(len(c) == 1 for c in self._contidas.values()) and not any(self._escondidas.values())
+        self.melhor = _Memo(self._melhor, self._MEMO_MAX)
+        self.distintas = _Memo(self._distintas, self._MEMO_MAX)
+
+    @staticmethod
+    def _dobrar_fora_do_latin1(texto: str) -> bytes:
+        # o que não existe em Latin-1 (emoji etc.) vira "?", um byte por
+        # caractere, para as posições seguirem as do texto
+        return texto.translate(_SEM_ACENTO).encode("latin-1", "replace")
+
+    def _melhor(self, texto: Optional[str]) -> int:
+        if not texto:
+            return 0
+        try:
+            dobrado = texto.lower().encode("latin-1").translate(_SEM_ACENTO_LATIN1)
+        except UnicodeEncodeError:
+            dobrado = self._dobrar_fora_do_latin1(texto.lower())
+        trechos = self.regex.findall(dobrado)
+        melhor = max(map(self._pontos.__getitem__, trechos), default=0)
+        if trechos and melhor < self.maximo:
+            for trecho in trechos:
+                for j in self._escondidas[trecho]:
+                    if self.pontos[j] > melhor and self.palavras[j] in dobrado:
+                        melhor = self.pontos[j]
+        return melhor
+
+    def _distintas(self, texto: Optional[str]) -> int:
+        if not texto:
+            return 0
+        texto = texto.lower()
+        try:
+            dobrado = texto.encode("latin-1").translate(_SEM_ACENTO_LATIN1)
+        except UnicodeEncodeError:
+            dobrado = self._dobrar_fora_do_latin1(texto)
+        trechos = self.regex.findall(dobrado)
+        if self._simples:
+            achadas = trechos
+        else:
+            achadas = [self.palavras[j] for trecho in trechos for j in self._contidas[trecho]]
+            for trecho in set(trechos):
+                achadas.extend(self.palavras[j] for j in self._escondidas[trecho] if self.palavras[j] in dobrado)
+        distintas = set(achadas)
+        if len(distintas) == len(achadas) or texto.isascii():
+            # cada palavra uma vez só, ou sem acento: uma grafia por palavra
+            return len(distintas)
+        total = 0
+        for palavra in distintas:
+            grafias = set()
+            inicio = dobrado.find(palavra)
+            while inicio >= 0:
+                grafias.add(texto[inicio:inicio + len(palavra)])
+                inicio = dobrado.find(palavra, inicio + 1)
+            total += len(grafias)
+        return total
+
+
+class RegrasScore:
+    """Regras de um arquivo JSON já compiladas para o cálculo do score."""
+
+    def __init__(self, cfg: Dict[str, Any]):
+        self.limiar_qualificado = int(cfg.get("limiar_qualificado", 60))
+
+        contato = cfg.get("contato", {})
+        self.pontos_telefone = int(contato.get("telefone", 0))
+        self.pontos_email = int(contato.get("email", 0))
+
+        self.servicos = {dobrar_acentos(s): int(p) for s, p in cfg.get("servico_interesse", {}).items()}
+
+        # por serviço: (palavras da região, pontos de região não listada, [(tag, pontos)])
+        self.detalhes: Dict[str, Tuple[_Palavras, int, List[Tuple[str, int]]]] = {}
+        for servico, det in cfg.get("detalhes", {}).items():
+            regiao = det.get("regiao_corpo", {})
+            valores: Dict[str, int] = {}
+            for faixa in regiao.get("faixas", []):
+                for palavra in faixa["palavras"]:
+                    palavra = dobrar_acentos(palavra)
+                    valores[palavra] = max(valores.get(palavra, 0), int(faixa["pontos"]))
+            historico = [(h["tag"], int(h["pontos"])) for h in det.get("historico_tags", [])]
+            self.detalhes[dobrar_acentos(servico)] = (_Palavras(valores), int(regiao.get("outra", 0)), historico)
+
+        disp = cfg.get("disponibilidade", {})
+        self.disponibilidade = _Palavras({dobrar_acentos(p): 1 for p in disp.get("palavras", [])})
+        self.disp_minimo = int(disp.get("minimo", 2))
+        self.disp_pontos = int(disp.get("pontos", 0))
+
+    # Cada bloco do score fica num método próprio para o re-score em lote
+    # (api/services/scoring_vetorizado.py) reaproveitar exatamente as mesmas
+    # regras; o compute_score faz as mesmas contas em linha, por ser chamado
+    # a cada lead (tests/test_scoring.py confere os dois caminhos). O serviço
+    # chega com dobrar_acentos(); região e disponibilidade como vieram
+    # (_Palavras cuida de minúsculas e acentos).
+
+    def pontos_contato(self, has_phone: bool, has_email: bool) -> int:
+        return (self.pontos_telefone if has_phone else 0) + (self.pontos_email if has_email else 0)
+
+    def pontos_servico(self, si: str) -> int:
+        # se não vier nada (ou serviço desconhecido), não soma aqui
+        return self.servicos.get(si, 0)
+
+    def pontos_regiao(self, si: str, regiao: str) -> int:
+        palavras, outra, _ = self.detalhes[si]
+        pontos = palavras.melhor[regiao]
+        if pontos:
+            return pontos
+        return outra if regiao else 0
+
+    def pontos_historico(self, si: str, tags: Iterable[str]) -> int:
+        # essas tags você configura no n8n conforme a resposta do lead
+        # (ex.: "laser_outra_clinica", "laser_parou", "laser_primeira_vez")
+        for tag, pontos in self.detalhes[si][2]:
+            if tag in tags:
+                return pontos
+        return 0
+
+    def pontos_disponibilidade(self, disp: str) -> int:
+        # se a pessoa tem mais de um período/dia possível, é mais fácil encaixar
+        if self.disponibilidade.distintas[disp] >= self.disp_minimo:
+            return self.disp_pontos
+        return 0
+
+
+class _Carregador:
+    """Cache das regras por tenant, recarregando o arquivo quando o mtime muda."""
+
+    def __init__(self):
+        self._regras: Dict[str, Tuple[float, float, RegrasScore]] = {}
+        self._lock = threading.Lock()
+
+    def _arquivo(self, tenant: Optional[str]) -> Path:
+        if tenant and _TENANT_VALIDO.match(tenant):
+            caminho = SCORING_RULES_DIR / f"{tenant}.json"
+            if caminho.exists():
+                return caminho
+        return SCORING_RULES_DIR / f"{TENANT_PADRAO}.json"
+
+    def regras(self, tenant: Optional[str] = None) -> RegrasScore:
+        chave = tenant or TENANT_PADRAO
+        agora = time.monotonic()
+        atual = self._regras.get(chave)
+        if atual is not None and agora < atual[1]:
+            return atual[2]
+
+        with self._lock:
+            caminho = self._arquivo(tenant)
+            mtime = caminho.stat().st_mtime
+            atual = self._regras.get(chave)
+            if atual is not None and atual[0] == mtime:
+                regras = atual[2]
+            else:
+                try:
+                    regras = RegrasScore(json.loads(caminho.read_text(encoding="utf-8")))
+                except (ValueError, KeyError, TypeError) as e:
+                    if atual is None:
+                        raise
+                    # arquivo quebrado no meio de uma edição: segue com as regras anteriores
+                    print(f"❌ Erro ao recarregar regras de score {caminho}: {e}")
+                    regras = atual[2]
+            self._regras[chave] = (mtime, agora + SCORING_RULES_RELOAD, regras)
+            return regras
+
+
+_carregador = _Carregador()
+
+
+def carregar_regras(tenant: Optional[str] = None) -> RegrasScore:
+    """Regras compiladas do tenant (ou as padrão), já recarregadas se o arquivo mudou."""
+    # caminho rápido (é chamado a cada score): regras em cache e ainda no prazo
+    atual = _carregador._regras.get(tenant or TENANT_PADRAO)
+    if atual is not None and time.monotonic() < atual[1]:
+        return atual[2]
+    return _carregador.regras(tenant)
 
 
 def compute_score(
@@ -9,89 +296,100 @@ def compute_score(
     servico_interesse: Optional[str] = None,
     regiao_corpo: Optional[str] = None,
     disponibilidade: Optional[str] = None,
+    tenant: Optional[str] = None,
 ) -> int:
     """
     Calcula um score de 0 a 100 para o lead, pensando no funil da clínica de estética.
 
     - Bloco 1: contato (telefone/email)
     - Bloco 2: serviço de interesse (designer, limpeza, depilação)
-    - Bloco 3: detalhes específicos de depilação (região + histórico em tags)
+    - Bloco 3: detalhes específicos do serviço (região + histórico em tags)
     - Bloco 4: disponibilidade
+
+    Os pesos e palavras-chave vêm do arquivo de regras do `tenant`.
     """
+    regras = carregar_regras(tenant)
     score = 0
-    tags = tags or []
 
     # =========================
-    # 1) CONTATO (até 35 pts)
+    # 1) CONTATO
     # =========================
     if has_phone:
-        # foco forte em quem tem telefone válido (WhatsApp)
-        score += 30
+        score += regras.pontos_telefone
     if has_email:
-        score += 5
+        score += regras.pontos_email
 
     # =========================
-    # 2) SERVIÇO DE INTERESSE (até 30 pts)
+    # 2) SERVIÇO DE INTERESSE
     # =========================
     # servico_interesse pode vir do payload ou ser inferido por tags,
     # então deixamos opcional.
     si = (servico_interesse or "").lower()
-
-    if si == "depilacao_laser":
-        score += 30
-    elif si == "limpeza_pele":
-        score += 20
-    elif si == "designer_sobrancelha":
-        score += 10
-    # se não vier nada, não soma aqui
+    if not si.isascii():
+        si = dobrar_acentos(si)
+    score += regras.servicos.get(si, 0)
 
     # =========================
-    # 3) DETALHES DE DEPILAÇÃO A LASER (até 30 pts)
+    # 3) DETALHES DO SERVIÇO (hoje só depilação a laser)
     # =========================
-    if si == "depilacao_laser":
-        # 3.1 Região do corpo (até 15)
-        regiao = (regiao_corpo or "").lower()
-
-        if any(p in regiao for p in ["perna", "coxa", "corpo inteiro", "corpo todo"]):
-            score += 15
-        elif any(p in regiao for p in ["virilha", "axila", "rosto", "braço", "braco"]):
-            score += 10
-        elif regiao:
-            score += 5
-
-        # 3.2 Histórico (até 15)
-        # essas tags você configura no n8n conforme a resposta do lead:
-        # - "laser_outra_clinica"
-        # - "laser_parou"
-        # - "laser_primeira_vez"
-        if "laser_outra_clinica" in tags:
-            score += 15
-        elif "laser_parou" in tags:
-            score += 10
-        elif "laser_primeira_vez" in tags:
-            score += 5
+    detalhe = regras.detalhes.get(si)
+    if detalhe is not None:
+        palavras, outra, historico = detalhe
+
+        # 3.1 Região do corpo
+        score += palavras.melhor[regiao_corpo] or (outra if regiao_corpo else 0)
+
+        # 3.2 Histórico
+        if tags:
+            for tag, pontos in historico:
+                if tag in tags:
+                    score += pontos
+                    break
 
     # =========================
-    # 4) DISPONIBILIDADE (até 5 pts)
+    # 4) DISPONIBILIDADE
     # =========================
-    disp = (disponibilidade or "").lower()
-    opcoes = ["manhã", "manha", "tarde", "noite", "semana", "sábado", "sabado"]
-    encontradas = [p for p in opcoes if p in disp]
-
-    # se a pessoa tem mais de um período/dia possível, é mais fácil encaixar
-    if len(encontradas) >= 2:
-        score += 5
+    if regras.disponibilidade.distintas[disponibilidade] >= regras.disp_minimo:
+        score += regras.disp_pontos
 
     # Garante que fica entre 0 e 100
-    return max(0, min(score, 100))
+    if score > 100:
+        return 100
+    return score if score > 0 else 0
+
+
+def score_do_lead(lead: Dict[str, Any], tenant: Optional[str] = None) -> int:
+    """
+    compute_score a partir de uma linha da tabela `leads` (tags gravadas
+    como JSON), com todos os blocos: usado quando o lead é atualizado.
+    """
+    tags = lead.get("tags") or []
+    if isinstance(tags, (str, bytes)):
+        try:
+            tags = json.loads(tags)
+        except ValueError:
+            tags = []
+    if isinstance(tags, str):
+        tags = [tags]
+
+    return compute_score(
+        has_phone=bool(lead.get("telefone")),
+        has_email=bool(lead.get("email")),
+        origem=lead.get("origem"),
+        tags=tags or [],
+        servico_interesse=lead.get("servico_interesse"),
+        regiao_corpo=lead.get("regiao_corpo"),
+        disponibilidade=lead.get("disponibilidade"),
+        tenant=tenant,
+    )
 
 
-def stage_from_score(score: int) -> str:
+def stage_from_score(score: int, tenant: Optional[str] = None) -> str:
     """
     Traduz o score em etapa do funil.
     Aqui eu deixo 'cliente' para ser setado manualmente (quando a venda fechar),
     e uso o score só pra decidir 'novo' x 'qualificado'.
     """
-    if score >= 60:
+    if score >= carregar_regras(tenant).limiar_qualificado:
         return "qualificado"
     return "novo"
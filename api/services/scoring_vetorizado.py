@@ -0,0 +1,107 @@
+import json
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from api.services.scoring import RegrasScore, carregar_regras, dobrar_acentos
+
+# Versão em lote do compute_score, usada no re-score da base inteira.
+#
+# As colunas de texto têm pouquíssimos valores distintos (3 serviços, algumas
+# dezenas de regiões/disponibilidades), então cada coluna é fatorada em
+# (valores distintos, código por linha), cada regra roda uma vez por valor
+# distinto e o resultado é espalhado para as linhas com indexação do NumPy.
+# As regras em si são os mesmos métodos de RegrasScore (scoring.py), então o
+# resultado é idêntico ao compute_score linha a linha.
+
+
+def _fatorar(coluna: Sequence[Any]) -> Tuple[List[str], np.ndarray]:
+    """Coluna de texto -> (valores distintos, índice do valor de cada linha). None vira ''."""
+    indices: Dict[str, int] = {}
+    codigos = np.fromiter(
+        (indices.setdefault("" if v is None else str(v), len(indices)) for v in coluna),
+        dtype=np.int32,
+        count=len(coluna),
+    )
+    return list(indices), codigos
+
+
+def _aplicar(fatorada: Tuple[List[str], np.ndarray], regra: Callable[[str], Any], dtype=np.int16) -> np.ndarray:
+    """Aplica `regra` uma vez por valor distinto e devolve um valor por linha."""
+    unicos, codigos = fatorada
+    valores = np.fromiter((regra(v) for v in unicos), dtype=dtype, count=len(unicos))
+    return valores[codigos]
+
+
+def _por_valor_distinto(coluna: Sequence[Any], regra: Callable[[str], Any], dtype=np.int16) -> np.ndarray:
+    return _aplicar(_fatorar(coluna), regra, dtype)
+
+
+def _tags_json(bruto: str) -> List[str]:
+    if not bruto:
+        return []
+    try:
+        tags = json.loads(bruto)
+    except ValueError:
+        return []
+    if isinstance(tags, str):
+        tags = [tags]
+    return tags or []
+
+
+def calcular_scores(
+    telefones: Sequence[Any],
+    emails: Sequence[Any],
+    tags: Sequence[Any],
+    servicos: Sequence[Any],
+    regioes: Sequence[Any],
+    disponibilidades: Sequence[Any],
+    tenant: Optional[str] = None,
+) -> np.ndarray:
+    """
+    Calcula o score de várias linhas de uma vez. Cada argumento é uma coluna
+    da tabela `leads` (mesmo tamanho); `tags` vem como o JSON gravado no banco.
+    """
+    regras: RegrasScore = carregar_regras(tenant)
+    tem_telefone = _por_valor_distinto(telefones, bool, dtype=bool)
+    tem_email = _por_valor_distinto(emails, bool, dtype=bool)
+
+    score = np.select(
+        [tem_telefone & tem_email, tem_telefone, tem_email],
+        [
+            regras.pontos_contato(True, True),
+            regras.pontos_contato(True, False),
+            regras.pontos_contato(False, True),
+        ],
+        default=regras.pontos_contato(False, False),
+    ).astype(np.int16)
+
+    si = _fatorar(servicos)
+    score += _aplicar(si, lambda v: regras.pontos_servico(dobrar_acentos(v)))
+
+    # Região e histórico só contam para os serviços com "detalhes" nas regras
+    si_dobrado = _aplicar(si, dobrar_acentos, dtype=object)
+    regioes_f = tags_f = None
+    for servico in regras.detalhes:
+        do_servico = si_dobrado == servico
+        if not do_servico.any():
+            continue
+        regioes_f = regioes_f or _fatorar(regioes)
+        tags_f = tags_f or _fatorar(tags)
+        extra = _aplicar(regioes_f, lambda v: regras.pontos_regiao(servico, v))
+        extra += _aplicar(tags_f, lambda v: regras.pontos_historico(servico, _tags_json(v)))
+        score += np.where(do_servico, extra, 0).astype(np.int16)
+
+    score += _por_valor_distinto(disponibilidades, lambda v: regras.pontos_disponibilidade(v))
+
+    return np.clip(score, 0, 100)
+
+
+def calcular_etapas(scores: np.ndarray, etapas_atuais: Sequence[Any], tenant: Optional[str] = None) -> np.ndarray:
+    """
+    Etapa correspondente a cada score, como no stage_from_score. Quem já está
+    em "cliente" continua "cliente" (essa etapa é marcada manualmente).
+    """
+    atuais = np.array(["" if e is None else str(e) for e in etapas_atuais], dtype=object)
+    novas = np.where(scores >= carregar_regras(tenant).limiar_qualificado, "qualificado", "novo")
+    return np.where(atuais == "cliente", atuais, novas)
@@ -0,0 +1,116 @@
+import os
+from decimal import Decimal
+from typing import Any, Dict, Mapping, Optional
+
+import orjson
+from pydantic import TypeAdapter
+from starlette.responses import JSONResponse, Response
+
+# Serialização JSON da API e dos payloads do lead_events.
+#
+# - RespostaJSON (default_response_class da API): o corpo sai do orjson em
+#   vez do json.dumps.
+# - resposta_linhas: linhas do banco com o TypeAdapter pré-montado
+#   (api/schemas.py) direto para bytes, sem o response_model validar e
+#   converter linha a linha.
+# - codificar_payload: payload de evento compacto (sem espaços, UTF-8 cru,
+#   sem o tags_json repetido) e com o retorno da Evolution aparado
+#   (aparar_resultado). Chaves com null continuam no payload: a timeline
+#   e o export de eventos devolvem o payload como foi gravado.
+
+# Tamanho máximo do `detail` de um envio que falhou guardado no evento/outbox
+EVENTO_DETALHE_MAX = int(os.getenv("EVENTO_DETALHE_MAX", 512))
+
+# Chaves que não vão para o payload do evento (tags_json repete tags)
+_CHAVES_DESCARTADAS = frozenset({"tags_json"})
+
+_OPCOES = orjson.OPT_NON_STR_KEYS
+
+
+def _default(valor: Any) -> Any:
+    if isinstance(valor, Decimal):
+        return str(valor)
+    if isinstance(valor, bytes):
+        return valor.decode("utf-8", errors="replace")
+    if isinstance(valor, (set, frozenset, tuple)):
+        return list(valor)
+    raise TypeError(f"Tipo não serializável: {type(valor).__name__}")
+
+
+def json_bytes(conteudo: Any) -> bytes:
+    """JSON compacto em UTF-8 (datetime/date em ISO 8601, Decimal como texto)."""
+    return orjson.dumps(conteudo, default=_default, option=_OPCOES)
+
+
+class RespostaJSON(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return json_bytes(content)
+
+
+def resposta_linhas(
+    adaptador: TypeAdapter,
+    conteudo: Any,
+    status_code: int = 200,
+    headers: Optional[Mapping[str, str]] = None,
+) -> Response:
+    """
+    Resposta JSON serializada pelo TypeAdapter da linha. Quem devolve isto
+    direto pula o response_model (que fica só para a documentação).
+    """
+    return Response(
+        adaptador.dump_json(conteudo, warnings=False),
+        status_code=status_code,
+        headers=headers,
+        media_type="application/json",
+    )
+
+
+def aparar_resultado(result: Any) -> Any:
+    """
+    Retorno do send_whatsapp como vai para o banco. A Evolution devolve a
+    mensagem inteira no corpo (key, message, contextInfo...): de um envio
+    bem-sucedido ficam só o id e o status da mensagem; de um que falhou,
+    os primeiros EVENTO_DETALHE_MAX caracteres do detalhe.
+    """
+    if not isinstance(result, dict) or not isinstance(result.get("detail"), str):
+        return result
+
+    aparado: Dict[str, Any] = {k: v for k, v in result.items() if k != "detail"}
+    detalhe = result["detail"]
+    status = result.get("status")
+    if isinstance(status, int) and 200 <= status < 300:
+        try:
+            corpo = orjson.loads(detalhe)
+        except orjson.JSONDecodeError:
+            corpo = None
+        if isinstance(corpo, dict):
+            chave = corpo.get("key")
+            if isinstance(chave, dict) and chave.get("id"):
+                aparado["evolution_id"] = chave["id"]
+            if corpo.get("status") is not None:
+                aparado["evolution_status"] = corpo["status"]
+            return aparado
+
+    if len(detalhe) > EVENTO_DETALHE_MAX:
+        aparado["detail"] = detalhe[:EVENTO_DETALHE_MAX]
+        aparado["detail_tamanho"] = len(detalhe)
+    else:
+        aparado["detail"] = detalhe
+    return aparado
+
+
+def codificar_resultado(result: Any) -> Optional[str]:
+    """Retorno de envio aparado, em texto JSON (outbox_mensagens.ultimo_resultado)."""
+    if result is None:
+        return None
+    return json_bytes(aparar_resultado(result)).decode("utf-8")
+
+
+def codificar_payload(payload: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Texto JSON do payload de um evento (coluna lead_events.payload)."""
+    if payload is None:
+        return None
+    compacto = {chave: valor for chave, valor in payload.items() if chave not in _CHAVES_DESCARTADAS}
+    if "whatsapp_result" in compacto:
+        compacto["whatsapp_result"] = aparar_resultado(compacto["whatsapp_result"])
+    return json_bytes(compacto).decode("utf-8")
@@ -0,0 +1,261 @@
+"""
+Worker dos follow-ups automáticos (tabela followups, FOLLOWUP_ENABLED=1).
+
+    python -m api.workers.followup                            # roda até SIGTERM/SIGINT
+    python -m api.workers.followup --uma-vez                  # dispara o que já venceu e sai
+    python -m api.workers.followup --agendar-existentes 7     # agenda os leads dos últimos 7 dias e sai
+
+O worker guarda num heap em memória os follow-ups que vencem dentro de
+FOLLOWUP_HORIZONTE_S (api/services/followup.py) e dorme até o próximo. Na
+hora, reserva o lote vencido com SELECT ... FOR UPDATE SKIP LOCKED, confere
+se a regra ainda vale (lead na mesma etapa e sem mensagem_enviada desde o
+agendamento), envia em paralelo respeitando os limites de envio das
+campanhas e grava status + eventos `followup` do lote numa transação.
+Enquanto o lote está em envio a reserva é renovada a cada metade de
+FOLLOWUP_RESERVA_S; se o worker morrer, ela vence e outra réplica pega o
+lote.
+
+Como no outbox, a entrega é "pelo menos uma vez" e a vazão escala com
+réplicas: cada uma reserva lotes diferentes.
+"""
+import argparse
+import asyncio
+import os
+import signal
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from api.db_async import criar_pool, fechar_pool, transacao
+from api.repositories.aio import followups as repo
+from api.repositories.aio.events import add_events_batch
+from api.repositories.events import TIPO_FOLLOWUP
+from api.services.campanha import enviar_com_limites
+from api.services.followup import (
+    REGRAS,
+    AgendaFollowups,
+    motivo_cancelamento,
+    texto_followup,
+)
+from api.services.messaging import fechar_cliente
+from api.services.outbox import (
+    ENVIADA,
+    FALHA,
+    OUTBOX_MAX_TENTATIVAS,
+    atraso_backoff,
+    classificar,
+)
+
+FOLLOWUP_LOTE = int(os.getenv("FOLLOWUP_LOTE", 100))
+FOLLOWUP_CONCORRENCIA = int(os.getenv("FOLLOWUP_CONCORRENCIA", 8))
+# Por quanto tempo um lote fica reservado para o worker (renovada enquanto o lote é enviado)
+FOLLOWUP_RESERVA_S = float(os.getenv("FOLLOWUP_RESERVA_S", 120))
+# Espera depois de um erro (banco fora do ar etc.)
+FOLLOWUP_ESPERA_ERRO_S = float(os.getenv("FOLLOWUP_ESPERA_ERRO_S", 5))
+
+Evento = Tuple[int, str, Optional[Dict[str, Any]]]
+
+
+def _desfecho(
+    item: Dict[str, Any],
+    texto: str,
+    result: Dict[str, Any],
+) -> Tuple[repo.Conclusao, Optional[Evento]]:
+    """
+    Conclusão do follow-up e, se o envio terminou (com sucesso ou de vez),
+    o evento do lead. Falhas que ainda vão ser repetidas não geram evento.
+    """
+    decisao = classificar(result)
+    if decisao == ENVIADA:
+        status, atraso = repo.STATUS_ENVIADO, None
+    elif decisao == FALHA or item["tentativas"] >= OUTBOX_MAX_TENTATIVAS:
+        status, atraso = repo.STATUS_FALHOU, None
+    else:
+        status, atraso = repo.STATUS_PENDENTE, atraso_backoff(item["tentativas"])
+
+    conclusao = (item["id"], status, atraso, result)
+    if status == repo.STATUS_PENDENTE:
+        return conclusao, None
+    return conclusao, (
+        item["lead_id"],
+        TIPO_FOLLOWUP,
+        {
+            "followup_id": item["id"],
+            "regra": item["regra"],
+            "status": status,
+            "texto": texto,
+            "telefone": item["telefone"],
+            "tentativas": item["tentativas"],
+            "whatsapp_result": result,
+        },
+    )
+
+
+async def _manter_reserva(ids: List[int], reserva_s: float) -> None:
+    while True:
+        await asyncio.sleep(reserva_s / 2)
+        try:
+            await repo.renovar(ids, reserva_s)
+        except Exception as e:
+            print(f"⚠️ Falha ao renovar a reserva de {len(ids)} follow-ups: {e}", flush=True)
+
+
+async def processar_lote(
+    itens: List[Dict[str, Any]],
+    concorrencia: int,
+    reserva_s: float = FOLLOWUP_RESERVA_S,
+) -> List[repo.Conclusao]:
+    """
+    Cancela o que deixou de valer, envia o resto e grava os resultados.
+    Devolve as conclusões (o worker usa para reagendar as novas tentativas).
+    """
+    renovacao = asyncio.create_task(_manter_reserva([item["id"] for item in itens], reserva_s))
+    try:
+        return await _processar_lote(itens, concorrencia)
+    finally:
+        renovacao.cancel()
+        await asyncio.gather(renovacao, return_exceptions=True)
+
+
+async def _processar_lote(itens: List[Dict[str, Any]], concorrencia: int) -> List[repo.Conclusao]:
+    semaforo = asyncio.Semaphore(concorrencia)
+
+    async def enviar(item: Dict[str, Any], texto: str) -> Dict[str, Any]:
+        try:
+            async with semaforo:
+                return await enviar_com_limites(item["telefone"], texto)
+        except Exception as e:
+            # erro de um item (limite, banco) não derruba o lote: vira nova tentativa
+            return {"status": "error", "detail": str(e)}
+
+    conclusoes: List[repo.Conclusao] = []
+    envios: List[Tuple[Dict[str, Any], str]] = []
+    for item in itens:
+        motivo = motivo_cancelamento(item)
+        if motivo is None:
+            envios.append((item, texto_followup(item)))
+        else:
+            conclusoes.append((item["id"], repo.STATUS_CANCELADO, None, {"motivo": motivo}))
+
+    resultados = await asyncio.gather(*(enviar(item, texto) for item, texto in envios))
+
+    eventos: List[Evento] = []
+    for (item, texto), result in zip(envios, resultados):
+        conclusao, evento = _desfecho(item, texto, result)
+        conclusoes.append(conclusao)
+        if evento is not None:
+            eventos.append(evento)
+
+    # status e eventos do lote juntos: ou grava tudo, ou o lote volta quando a reserva vencer
+    async with transacao() as conn:
+        await repo.concluir(conclusoes, conn=conn)
+        await add_events_batch(eventos, conn=conn)
+    return conclusoes
+
+
+async def _carregar(agenda: AgendaFollowups) -> None:
+    agora = time.monotonic()
+    posicao = agenda.inicio_carga(agora)
+    rows = await repo.carregar(agenda.horizonte_s, posicao, agenda.carga_max)
+    agenda.adicionar(rows, agora)
+
+
+async def rodar(
+    lote: int = FOLLOWUP_LOTE,
+    concorrencia: int = FOLLOWUP_CONCORRENCIA,
+    uma_vez: bool = False,
+    parar: Optional[asyncio.Event] = None,
+    agenda: Optional[AgendaFollowups] = None,
+) -> Dict[str, int]:
+    parar = parar or asyncio.Event()
+    agenda = agenda or AgendaFollowups()
+    total: Dict[str, int] = {}
+    while not parar.is_set():
+        espera = 0.0
+        try:
+            if agenda.precisa_carregar(time.monotonic()):
+                await _carregar(agenda)
+
+            ids = agenda.vencidos(time.monotonic(), lote)
+            if ids:
+                inicio = time.perf_counter()
+                itens = await repo.reservar(ids, FOLLOWUP_RESERVA_S)
+                conclusoes = await processar_lote(itens, concorrencia) if itens else []
+                contagem: Dict[str, int] = {}
+                for id_, status, atraso, _ in conclusoes:
+                    contagem[status] = contagem.get(status, 0) + 1
+                    if atraso is not None:
+                        agenda.reagendar(id_, atraso, time.monotonic())
+                for status, quantidade in contagem.items():
+                    total[status] = total.get(status, 0) + quantidade
+                if conclusoes:
+                    resumo = ", ".join(f"{q} {s}" for s, q in sorted(contagem.items()))
+                    print(f"   lote de {len(itens)} em {time.perf_counter() - inicio:.2f}s: {resumo}", flush=True)
+                continue
+
+            if uma_vez:
+                # só o que já venceu: o resto do heap fica para a próxima execução
+                break
+            espera = agenda.espera(time.monotonic())
+        except Exception as e:
+            if uma_vez:
+                raise
+            # o lote reservado volta sozinho quando a reserva vencer
+            print(f"❌ Erro no worker de follow-up: {e}", flush=True)
+            espera = FOLLOWUP_ESPERA_ERRO_S
+
+        try:
+            await asyncio.wait_for(parar.wait(), espera)
+        except asyncio.TimeoutError:
+            pass
+    return total
+
+
+async def _agendar_existentes(dias: int) -> None:
+    for regra in REGRAS.values():
+        criados = await repo.agendar_existentes(regra.nome, regra.etapa, regra.atraso_s, dias)
+        print(f"   {regra.nome}: {criados} follow-ups agendados", flush=True)
+
+
+async def _main(args: argparse.Namespace) -> None:
+    parar = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sinal in (signal.SIGTERM, signal.SIGINT):
+        # termina o lote em andamento antes de sair
+        loop.add_signal_handler(sinal, parar.set)
+
+    await criar_pool()
+    try:
+        if args.agendar_existentes:
+            print(f"==> Agendando follow-ups dos leads dos últimos {args.agendar_existentes} dias...", flush=True)
+            await _agendar_existentes(args.agendar_existentes)
+            print("✅ Agendamento concluído.", flush=True)
+            return
+
+        print(f"==> Worker de follow-up (lote {args.lote}, concorrência {args.concorrencia})...", flush=True)
+        try:
+            total = await rodar(args.lote, args.concorrencia, args.uma_vez, parar)
+        finally:
+            await fechar_cliente()
+    finally:
+        await fechar_pool()
+    resumo = ", ".join(f"{q} {s}" for s, q in sorted(total.items())) or "nada disparado"
+    print(f"✅ Worker de follow-up encerrado: {resumo}.", flush=True)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Dispara os follow-ups agendados na tabela followups.")
+    parser.add_argument("--lote", type=int, default=FOLLOWUP_LOTE)
+    parser.add_argument("--concorrencia", type=int, default=FOLLOWUP_CONCORRENCIA)
+    parser.add_argument("--uma-vez", action="store_true", help="sai quando não houver mais nada vencido")
+    parser.add_argument(
+        "--agendar-existentes",
+        type=int,
+        default=0,
+        metavar="DIAS",
+        help="agenda as regras para os leads que entraram nos últimos DIAS e sai",
+    )
+    asyncio.run(_main(parser.parse_args(argv)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""
+Worker do outbox de mensagens de WhatsApp (outbox_mensagens, WHATSAPP_OUTBOX=1).
+
+    python -m api.workers.outbox              # roda até receber SIGTERM/SIGINT
+    python -m api.workers.outbox --uma-vez    # esvazia o que estiver elegível e sai
+
+Cada volta reserva um lote com SELECT ... FOR UPDATE SKIP LOCKED, envia as
+mensagens em paralelo (OUTBOX_CONCORRENCIA, respeitando os limites de envio
+das campanhas) pelo cliente httpx compartilhado e grava status + eventos do
+lote inteiro numa transação. A vazão escala com réplicas do serviço: cada uma
+pega lotes diferentes.
+
+Os limites de envio (WHATSAPP_RATE_GLOBAL, WHATSAPP_RATE_POR_NUMERO) são os
+mesmos da API e ficam no MySQL (tabela limites_envio, migração 010): valem
+para a soma de todas as réplicas deste worker, do worker de follow-up e dos
+workers da API, não por réplica. Só com WHATSAPP_RATE_BACKEND=memoria (ou sem
+a migração 010) cada processo tem o próprio balde, e aí N réplicas enviam até
+N × a taxa configurada.
+
+A entrega é "pelo menos uma vez": se o worker morrer depois de enviar e antes
+de gravar o resultado, a mensagem volta para a fila quando a reserva
+(OUTBOX_RESERVA_S) vencer. Enquanto o lote está em envio a reserva é
+renovada a cada metade de OUTBOX_RESERVA_S, então um lote lento (limites de
+envio compartilhados entre as réplicas) não é reservado de novo por outra.
+"""
+import argparse
+import asyncio
+import os
+import signal
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from api.db_async import criar_pool, fechar_pool, transacao
+from api.repositories.aio import outbox as repo
+from api.repositories.aio.events import add_events_batch
+from api.repositories.events import TIPO_ERRO_ENVIO, TIPO_MSG_ENVIADA
+from api.services.campanha import enviar_com_limites
+from api.services.messaging import fechar_cliente
+from api.services.outbox import (
+    ENVIADA,
+    FALHA,
+    OUTBOX_MAX_TENTATIVAS,
+    atraso_backoff,
+    classificar,
+)
+
+OUTBOX_LOTE = int(os.getenv("OUTBOX_LOTE", 100))
+OUTBOX_CONCORRENCIA = int(os.getenv("OUTBOX_CONCORRENCIA", 16))
+# Por quanto tempo um lote fica reservado para o worker (renovada enquanto o lote é enviado)
+OUTBOX_RESERVA_S = float(os.getenv("OUTBOX_RESERVA_S", 120))
+# Espera entre consultas quando não há nada elegível
+OUTBOX_INTERVALO_VAZIO_S = float(os.getenv("OUTBOX_INTERVALO_VAZIO_S", 1.0))
+
+Evento = Tuple[int, str, Optional[Dict[str, Any]]]
+
+
+def _desfecho(item: Dict[str, Any], result: Dict[str, Any]) -> Tuple[repo.Conclusao, Optional[Evento]]:
+    """
+    Conclusão da linha no outbox e, se o envio terminou (com sucesso ou de
+    vez), o evento do lead. Falhas que ainda vão ser repetidas não geram evento.
+    """
+    decisao = classificar(result)
+    if decisao == ENVIADA:
+        status, tipo, atraso = repo.STATUS_ENVIADA, TIPO_MSG_ENVIADA, None
+    elif decisao == FALHA or item["tentativas"] >= OUTBOX_MAX_TENTATIVAS:
+        status, tipo, atraso = repo.STATUS_FALHOU, TIPO_ERRO_ENVIO, None
+    else:
+        status, tipo, atraso = repo.STATUS_PENDENTE, None, atraso_backoff(item["tentativas"])
+
+    conclusao = (item["id"], status, atraso, result)
+    if tipo is None:
+        return conclusao, None
+    return conclusao, (
+        item["lead_id"],
+        tipo,
+        {
+            "message_id": item["message_id"],
+            "texto": item["texto"],
+            "telefone": item["telefone"],
+            "tentativas": item["tentativas"],
+            "whatsapp_result": result,
+        },
+    )
+
+
+async def _manter_reserva(ids: List[int], reserva_s: float) -> None:
+    while True:
+        await asyncio.sleep(reserva_s / 2)
+        try:
+            await repo.renovar(ids, reserva_s)
+        except Exception as e:
+            print(f"⚠️ Falha ao renovar a reserva de {len(ids)} mensagens: {e}", flush=True)
+
+
+async def processar_lote(
+    itens: List[Dict[str, Any]],
+    concorrencia: int,
+    reserva_s: float = OUTBOX_RESERVA_S,
+) -> Dict[str, int]:
+    """Envia um lote reservado e grava os resultados; devolve a contagem por status."""
+    renovacao = asyncio.create_task(_manter_reserva([item["id"] for item in itens], reserva_s))
+    try:
+        return await _processar_lote(itens, concorrencia)
+    finally:
+        renovacao.cancel()
+        await asyncio.gather(renovacao, return_exceptions=True)
+
+
+async def _processar_lote(itens: List[Dict[str, Any]], concorrencia: int) -> Dict[str, int]:
+    semaforo = asyncio.Semaphore(concorrencia)
+
+    async def enviar(item: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            async with semaforo:
+                return await enviar_com_limites(item["telefone"], item["texto"])
+        except Exception as e:
+            # erro de um item (limite, banco) não derruba o lote: vira nova tentativa
+            return {"status": "error", "detail": str(e)}
+
+    resultados = await asyncio.gather(*(enviar(item) for item in itens))
+
+    conclusoes: List[repo.Conclusao] = []
+    eventos: List[Evento] = []
+    contagem: Dict[str, int] = {}
+    for item, result in zip(itens, resultados):
+        conclusao, evento = _desfecho(item, result)
+        conclusoes.append(conclusao)
+        if evento is not None:
+            eventos.append(evento)
+        contagem[conclusao[1]] = contagem.get(conclusao[1], 0) + 1
+
+    # status e eventos do lote juntos: ou grava tudo, ou o lote volta quando a reserva vencer
+    async with transacao() as conn:
+        await repo.concluir(conclusoes, conn=conn)
+        await add_events_batch(eventos, conn=conn)
+    return contagem
+
+
+async def rodar(
+    lote: int = OUTBOX_LOTE,
+    concorrencia: int = OUTBOX_CONCORRENCIA,
+    uma_vez: bool = False,
+    parar: Optional[asyncio.Event] = None,
+) -> Dict[str, int]:
+    parar = parar or asyncio.Event()
+    total: Dict[str, int] = {}
+    while not parar.is_set():
+        try:
+            itens = await repo.reservar(lote, OUTBOX_RESERVA_S)
+            if itens:
+                inicio = time.perf_counter()
+                contagem = await processar_lote(itens, concorrencia)
+                for status, quantidade in contagem.items():
+                    total[status] = total.get(status, 0) + quantidade
+                resumo = ", ".join(f"{q} {s}" for s, q in sorted(contagem.items()))
+                print(f"   lote de {len(itens)} em {time.perf_counter() - inicio:.2f}s: {resumo}", flush=True)
+                continue
+        except Exception as e:
+            if uma_vez:
+                raise
+            # banco fora do ar etc.: o lote reservado volta sozinho quando a reserva vencer
+            print(f"❌ Erro no worker do outbox: {e}", flush=True)
+        else:
+            if uma_vez:
+                break
+
+        try:
+            await asyncio.wait_for(parar.wait(), OUTBOX_INTERVALO_VAZIO_S)
+        except asyncio.TimeoutError:
+            pass
+    return total
+
+
+async def _main(args: argparse.Namespace) -> None:
+    parar = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sinal in (signal.SIGTERM, signal.SIGINT):
+        # termina o lote em andamento antes de sair
+        loop.add_signal_handler(sinal, parar.set)
+
+    await criar_pool()
+    print(f"==> Worker do outbox (lote {args.lote}, concorrência {args.concorrencia})...", flush=True)
+    try:
+        total = await rodar(args.lote, args.concorrencia, args.uma_vez, parar)
+    finally:
+        await fechar_cliente()
+        await fechar_pool()
+    resumo = ", ".join(f"{q} {s}" for s, q in sorted(total.items())) or "nada enviado"
+    print(f"✅ Worker do outbox encerrado: {resumo}.", flush=True)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Envia as mensagens do outbox_mensagens.")
+    parser.add_argument("--lote", type=int, default=OUTBOX_LOTE)
+    parser.add_argument("--concorrencia", type=int, default=OUTBOX_CONCORRENCIA)
+    parser.add_argument("--uma-vez", action="store_true", help="sai quando não houver mais nada elegível")
+    asyncio.run(_main(parser.parse_args(argv)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+"""
+Teste de carga dos endpoints do webhook e das ações, com leads sintéticos do
+bench/gerador.py. Mede latência (p50/p95/p99) e vazão (req/s) por cenário e
+guarda o resultado em JSON para comparar antes/depois de cada mudança.
+
+    docker compose -f docker-compose.bench.yml up -d --build
+    python -m bench.carga --salvar bench/resultados/base.json
+    # ... mudança ...
+    python -m bench.carga --comparar bench/resultados/base.json
+
+Cenários (--cenarios, na ordem):
+    webhook       POST /webhooks/lead com leads novos
+    update-lead   POST /action/update-lead em leads existentes (re-score)
+    send-message  POST /action/send-message (Evolution = bench/stub_evolution.py)
+    leads         GET /leads com filtros variados
+
+Para números comparáveis, rode sempre contra um banco recém-criado
+(`docker compose -f docker-compose.bench.yml down -v` entre as rodadas).
+"""
+import argparse
+import asyncio
+import json
+import math
+import platform
+import random
+import sys
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from bench.gerador import ORIGENS, SERVICOS, gerar_atualizacao, gerar_lead, gerar_mensagem
+
+CENARIOS = ("webhook", "update-lead", "send-message", "leads")
+PERCENTIS = (50, 95, 99)
+
+# (método, caminho, json, params, headers)
+Requisicao = Tuple[str, str, Optional[Dict[str, Any]], Optional[Dict[str, Any]], Optional[Dict[str, str]]]
+
+
+class _Estado:
+    """O que os cenários compartilham: gerador, ids de leads criados e o id da rodada."""
+
+    def __init__(self, semente: int):
+        self.rnd = random.Random(semente)
+        self.lead_ids: List[int] = []
+        self.execucao = uuid.uuid4().hex[:12]
+        self.indice = 0
+
+    def proximo_indice(self) -> int:
+        self.indice += 1
+        return self.indice
+
+    def lead_id(self) -> int:
+        return self.rnd.choice(self.lead_ids)
+
+
+def _req_webhook(estado: _Estado) -> Requisicao:
+    indice = estado.proximo_indice()
+    lead = gerar_lead(estado.rnd, indice)
+    lead["externo_id"] = f"bench-{estado.execucao}-{indice}"
+    # chave única por requisição: o cenário mede a gravação, não o replay
+    headers = {"Idempotency-Key": f"{estado.execucao}-{indice}"}
+    return "POST", "/webhooks/lead", lead, None, headers
+
+
+def _req_update_lead(estado: _Estado) -> Requisicao:
+    return "POST", "/action/update-lead", gerar_atualizacao(estado.rnd, estado.lead_id()), None, None
+
+
+def _req_send_message(estado: _Estado) -> Requisicao:
+    return "POST", "/action/send-message", gerar_mensagem(estado.rnd, estado.lead_id()), None, None
+
+
+def _req_leads(estado: _Estado) -> Requisicao:
+    rnd = estado.rnd
+    params: Dict[str, Any] = {"limit": rnd.choice((20, 50, 200))}
+    filtro = rnd.random()
+    if filtro < 0.3:
+        params["origem"] = rnd.choice(ORIGENS)
+    elif filtro < 0.5:
+        params["etapa"] = rnd.choice(("novo", "qualificado"))
+    elif filtro < 0.6:
+        params["servico_interesse"] = rnd.choice(SERVICOS)
+    elif filtro < 0.7:
+        params["score_min"] = rnd.choice((30, 50, 70))
+    return "GET", "/leads", None, params, None
+
+
+_GERADORES: Dict[str, Callable[[_Estado], Requisicao]] = {
+    "webhook": _req_webhook,
+    "update-lead": _req_update_lead,
+    "send-message": _req_send_message,
+    "leads": _req_leads,
+}
+
+
+def percentil(ordenadas: List[float], p: float) -> float:
+    """Percentil por posição mais próxima sobre uma lista já ordenada."""
+    if not ordenadas:
+        return 0.0
+    posicao = max(0, min(len(ordenadas) - 1, math.ceil(p / 100 * len(ordenadas)) - 1))
+    return ordenadas[posicao]
+
+
+def resumir(latencias: List[float], erros: int, status: Dict[str, int], segundos: float) -> Dict[str, Any]:
+    ordenadas = sorted(latencias)
+    total = len(latencias)
+    resumo: Dict[str, Any] = {
+        "requisicoes": total,
+        "erros": erros,
+        "req_s": round(total / segundos, 1) if segundos else 0.0,
+        "segundos": round(segundos, 3),
+        "media_ms": round(sum(ordenadas) / total * 1000, 2) if total else 0.0,
+        "max_ms": round(ordenadas[-1] * 1000, 2) if total else 0.0,
+        "status": status,
+    }
+    for p in PERCENTIS:
+        resumo[f"p{p}_ms"] = round(percentil(ordenadas, p) * 1000, 2)
+    return resumo
+
+
+async def _rodar_cenario(
+    client: httpx.AsyncClient,
+    estado: _Estado,
+    cenario: str,
+    requisicoes: int,
+    concorrencia: int,
+    ao_responder: Optional[Callable[[httpx.Response], None]] = None,
+) -> Dict[str, Any]:
+    gerar = _GERADORES[cenario]
+    latencias: List[float] = []
+    status: Dict[str, int] = {}
+    erros = 0
+    restantes = requisicoes
+
+    async def trabalhador():
+        nonlocal restantes, erros
+        while restantes > 0:
+            restantes -= 1
+            metodo, caminho, corpo, params, headers = gerar(estado)
+            inicio = time.perf_counter()
+            try:
+                resposta = await client.request(metodo, caminho, json=corpo, params=params, headers=headers)
+            except httpx.HTTPError as e:
+                latencias.append(time.perf_counter() - inicio)
+                erros += 1
+                chave = type(e).__name__
+            else:
+                latencias.append(time.perf_counter() - inicio)
+                chave = str(resposta.status_code)
+                if resposta.status_code >= 400:
+                    erros += 1
+                elif ao_responder is not None:
+                    ao_responder(resposta)
+            status[chave] = status.get(chave, 0) + 1
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(trabalhador() for _ in range(concorrencia)))
+    return resumir(latencias, erros, status, time.perf_counter() - inicio)
+
+
+def _guardar_lead_id(estado: _Estado) -> Callable[[httpx.Response], None]:
+    def guardar(resposta: httpx.Response) -> None:
+        lead_id = resposta.json().get("lead_id")
+        if lead_id is not None:
+            estado.lead_ids.append(int(lead_id))
+    return guardar
+
+
+async def executar(
+    url: str,
+    cenarios: List[str],
+    requisicoes: int,
+    concorrencia: int,
+    aquecimento: int,
+    leads_base: int,
+    semente: int,
+    timeout: float,
+) -> Dict[str, Any]:
+    estado = _Estado(semente)
+    limites = httpx.Limits(max_connections=concorrencia, max_keepalive_connections=concorrencia)
+    resultados: Dict[str, Any] = {}
+
+    async with httpx.AsyncClient(base_url=url, timeout=timeout, limits=limites) as client:
+        guardar = _guardar_lead_id(estado)
+
+        # os cenários de ação precisam de leads no banco
+        if any(c != "webhook" for c in cenarios) and leads_base > 0:
+            print(f"==> Criando {leads_base} leads base...", flush=True)
+            await _rodar_cenario(client, estado, "webhook", leads_base, concorrencia, guardar)
+            if not estado.lead_ids:
+                raise RuntimeError("nenhum lead criado; a API está de pé e com banco?")
+
+        for cenario in cenarios:
+            if cenario != "webhook" and not estado.lead_ids:
+                raise RuntimeError(f"cenário {cenario} precisa de leads (use --leads-base > 0)")
+            if aquecimento:
+                await _rodar_cenario(client, estado, cenario, aquecimento, concorrencia)
+
+            print(f"==> {cenario}: {requisicoes} requisições, concorrência {concorrencia}...", flush=True)
+            ao_responder = guardar if cenario == "webhook" else None
+            resultados[cenario] = await _rodar_cenario(
+                client, estado, cenario, requisicoes, concorrencia, ao_responder
+            )
+
+    return {
+        "meta": {
+            "quando": datetime.now().isoformat(timespec="seconds"),
+            "url": url,
+            "requisicoes": requisicoes,
+            "concorrencia": concorrencia,
+            "aquecimento": aquecimento,
+            "leads_base": leads_base,
+            "semente": semente,
+            "python": platform.python_version(),
+            "maquina": platform.node(),
+        },
+        "cenarios": resultados,
+    }
+
+
+def imprimir(resultado: Dict[str, Any]) -> None:
+    w = max([14] + [len(c) + 2 for c in resultado["cenarios"]])
+    print(f"\n   {'cenário':<{w}}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'máx ms':>9}{'erros':>7}")
+    for cenario, r in resultado["cenarios"].items():
+        print(
+            f"   {cenario:<{w}}{r['req_s']:>9.1f}{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}"
+            f"{r['p99_ms']:>9.2f}{r['max_ms']:>9.2f}{r['erros']:>7}"
+        )
+
+
+def comparar(atual: Dict[str, Any], base: Dict[str, Any], tolerancia: float) -> List[str]:
+    """
+    Compara com um resultado salvo; devolve as regressões acima da
+    tolerância (fração: 0.1 = 10%) em p50/p95/p99, req/s e erros.
+    """
+    regressoes: List[str] = []
+    print(f"\n   comparação com {base['meta'].get('quando', '?')} (tolerância {tolerancia:.0%}):")
+    for cenario, r in atual["cenarios"].items():
+        antes = base["cenarios"].get(cenario)
+        if antes is None:
+            print(f"   {cenario:<14} (sem base)")
+            continue
+
+        linha = []
+        for campo, maior_pior in [(f"p{p}_ms", True) for p in PERCENTIS] + [("req_s", False)]:
+            valor, referencia = r[campo], antes[campo]
+            variacao = (valor - referencia) / referencia if referencia else 0.0
+            linha.append(f"{campo} {referencia:.1f}->{valor:.1f} ({variacao:+.1%})")
+            piorou = variacao > tolerancia if maior_pior else variacao < -tolerancia
+            if piorou:
+                regressoes.append(f"{cenario} {campo}: {referencia} -> {valor} ({variacao:+.1%})")
+        if r["erros"] > antes["erros"]:
+            regressoes.append(f"{cenario} erros: {antes['erros']} -> {r['erros']}")
+        print(f"   {cenario:<14} " + ", ".join(linha))
+    return regressoes
+
+
+def salvar_e_comparar(
+    resultado: Dict[str, Any],
+    salvar: Optional[Path],
+    base: Optional[Path],
+    tolerancia: float,
+) -> None:
+    """--salvar / --comparar; sai com 1 se houver regressão."""
+    if salvar:
+        salvar.parent.mkdir(parents=True, exist_ok=True)
+        salvar.write_text(json.dumps(resultado, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+        print(f"\n✅ Resultado salvo em {salvar}")
+
+    if base:
+        regressoes = comparar(resultado, json.loads(base.read_text(encoding="utf-8")), tolerancia)
+        if regressoes:
+            print("\n❌ Regressões:")
+            for regressao in regressoes:
+                print(f"   {regressao}")
+            sys.exit(1)
+        print("\n✅ Sem regressões")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--cenarios", default=",".join(CENARIOS), help="lista separada por vírgula")
+    parser.add_argument("-n", "--requisicoes", type=int, default=2000, help="requisições medidas por cenário")
+    parser.add_argument("-c", "--concorrencia", type=int, default=32)
+    parser.add_argument("--aquecimento", type=int, default=100, help="requisições descartadas antes de medir")
+    parser.add_argument("--leads-base", type=int, default=500)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--salvar", type=Path, help="grava o resultado neste JSON")
+    parser.add_argument("--comparar", type=Path, help="JSON de uma rodada anterior; sai com 1 se houver regressão")
+    parser.add_argument("--tolerancia", type=float, default=0.10)
+    args = parser.parse_args(argv)
+
+    cenarios = [c.strip() for c in args.cenarios.split(",") if c.strip()]
+    desconhecidos = [c for c in cenarios if c not in CENARIOS]
+    if desconhecidos:
+        parser.error(f"cenários desconhecidos: {', '.join(desconhecidos)}")
+
+    resultado = asyncio.run(
+        executar(
+            args.url, cenarios, args.requisicoes, args.concorrencia,
+            args.aquecimento, args.leads_base, args.semente, args.timeout,
+        )
+    )
+    imprimir(resultado)
+
+    salvar_e_comparar(resultado, args.salvar, args.comparar, args.tolerancia)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Gerador de leads sintéticos (nomes, telefones, e-mails e tags brasileiros)
+para os benchmarks. Com a mesma semente gera sempre os mesmos leads.
+
+    python -m bench.gerador -n 10000 > leads.ndjson
+"""
+import argparse
+import json
+import random
+import sys
+import unicodedata
+from typing import Any, Dict, Iterator, Optional
+
+NOMES = (
+    "Ana", "Maria", "Juliana", "Fernanda", "Camila", "Beatriz", "Larissa", "Patrícia",
+    "Aline", "Letícia", "Gabriela", "Amanda", "Bruna", "Jéssica", "Vanessa", "Carla",
+    "Mariana", "Luana", "Tatiane", "Rafaela", "Lucas", "Gabriel", "Rafael", "João",
+    "Pedro", "Thiago", "Bruno", "Felipe", "Mateus", "Gustavo",
+)
+SOBRENOMES = (
+    "Silva", "Santos", "Oliveira", "Souza", "Rodrigues", "Ferreira", "Alves", "Pereira",
+    "Lima", "Gomes", "Costa", "Ribeiro", "Martins", "Carvalho", "Almeida", "Lopes",
+    "Soares", "Fernandes", "Vieira", "Barbosa", "Rocha", "Dias", "Nascimento", "Araújo",
+)
+DOMINIOS = ("gmail.com", "hotmail.com", "outlook.com", "yahoo.com.br", "uol.com.br", "bol.com.br")
+# DDDs mais comuns, com peso aproximado pela população
+DDDS = (11, 11, 11, 21, 21, 31, 41, 51, 61, 71, 81, 85, 19, 27, 48, 62, 92, 13, 16, 47)
+ORIGENS = ("instagram", "instagram", "instagram", "manychat", "manychat", "site", "outro")
+TAGS = (
+    "laser_outra_clinica", "laser_parou", "laser_primeira_vez", "promo_verao",
+    "indicacao", "retorno", "anuncio_stories", "sorteio",
+)
+SERVICOS = ("depilacao_laser", "depilacao_laser", "limpeza_pele", "designer_sobrancelha")
+REGIOES = ("perna inteira", "axila", "virilha", "buço", "braço", "corpo todo", "rosto", "costas", "coxa")
+DISPONIBILIDADES = (
+    "manhã", "tarde", "noite", "sábado de manhã", "terça e quinta à tarde",
+    "fim de semana", "manhã ou tarde", "qualquer horário", "depois das 18h",
+)
+TEXTOS = (
+    "Oi {nome}! Vi que você tem interesse em nossos tratamentos. Posso te ajudar?",
+    "{nome}, temos horários livres essa semana. Quer agendar uma avaliação?",
+    "Olá {nome}, tudo bem? Passando para lembrar da nossa promoção!",
+)
+
+
+def _sem_acento(texto: str) -> str:
+    return "".join(c for c in unicodedata.normalize("NFKD", texto) if not unicodedata.combining(c))
+
+
+def _telefone(rnd: random.Random, formatado: bool) -> str:
+    ddd = rnd.choice(DDDS)
+    numero = f"9{rnd.randint(6000, 9999)}{rnd.randint(0, 9999):04d}"
+    if formatado:
+        # do jeito que chega do formulário/ManyChat, para exercitar o clean_phone
+        return rnd.choice((f"({ddd}) {numero[:5]}-{numero[5:]}", f"+55 {ddd} {numero}", f"{ddd}{numero}"))
+    return f"55{ddd}{numero}"
+
+
+def gerar_lead(rnd: random.Random, indice: int) -> Dict[str, Any]:
+    """Um payload de POST /webhooks/lead."""
+    nome = f"{rnd.choice(NOMES)} {rnd.choice(SOBRENOMES)}"
+    if rnd.random() < 0.4:
+        nome += f" {rnd.choice(SOBRENOMES)}"
+
+    lead: Dict[str, Any] = {
+        "nome": nome,
+        "origem": rnd.choice(ORIGENS),
+        "tags": rnd.sample(TAGS, k=rnd.choice((0, 1, 1, 2, 3))),
+        "externo_id": f"bench-{indice}",
+    }
+    if rnd.random() < 0.9:
+        lead["telefone"] = _telefone(rnd, formatado=rnd.random() < 0.5)
+    if rnd.random() < 0.6 or "telefone" not in lead:
+        usuario = _sem_acento(nome.lower()).replace(" ", rnd.choice((".", "_", "")))
+        lead["email"] = f"{usuario}{indice}@{rnd.choice(DOMINIOS)}"
+    return lead
+
+
+def gerar_atualizacao(rnd: random.Random, lead_id: int) -> Dict[str, Any]:
+    """Um payload de POST /action/update-lead, como o agente de IA manda."""
+    dados: Dict[str, Any] = {"lead_id": lead_id, "servico_interesse": rnd.choice(SERVICOS)}
+    if dados["servico_interesse"] == "depilacao_laser" or rnd.random() < 0.3:
+        dados["regiao_corpo"] = rnd.choice(REGIOES)
+    if rnd.random() < 0.7:
+        dados["disponibilidade"] = rnd.choice(DISPONIBILIDADES)
+    return dados
+
+
+def gerar_mensagem(rnd: random.Random, lead_id: int) -> Dict[str, Any]:
+    """Um payload de POST /action/send-message."""
+    return {"lead_id": lead_id, "texto": rnd.choice(TEXTOS).format(nome=rnd.choice(NOMES))}
+
+
+def gerar_leads(quantidade: int, semente: int = 42, inicio: int = 0) -> Iterator[Dict[str, Any]]:
+    rnd = random.Random(semente)
+    for indice in range(inicio, inicio + quantidade):
+        yield gerar_lead(rnd, indice)
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description="Gera leads sintéticos em NDJSON.")
+    parser.add_argument("-n", "--quantidade", type=int, default=1000)
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    for lead in gerar_leads(args.quantidade, args.semente):
+        sys.stdout.write(json.dumps(lead, ensure_ascii=False) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Tempo de import da API (o que cada worker paga no boot e em cada rolling
+deploy), medido em processos novos.
+
+    python -m bench.importacao              # mediana de 7 imports + os módulos mais caros
+    python -m bench.importacao --modulo api.workers.outbox --top 30
+
+Os módulos são ordenados pelo tempo próprio (sem contar os filhos) do
+`python -X importtime`.
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+from typing import List, Optional, Tuple
+
+
+def _tempo_import(modulo: str) -> float:
+    inicio = time.perf_counter()
+    subprocess.run([sys.executable, "-c", f"import {modulo}"], check=True, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - inicio
+
+
+def _interpretador() -> float:
+    inicio = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "pass"], check=True)
+    return time.perf_counter() - inicio
+
+
+def mais_caros(modulo: str, top: int) -> List[Tuple[int, int, str]]:
+    """(µs próprio, µs acumulado, módulo) dos `top` imports mais caros."""
+    saida = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {modulo}"],
+        check=True, capture_output=True, text=True,
+    ).stderr
+    linhas = []
+    for linha in saida.splitlines():
+        if not linha.startswith("import time:") or "self [us]" in linha:
+            continue
+        proprio, acumulado, nome = linha[len("import time:"):].split("|")
+        linhas.append((int(proprio), int(acumulado), nome.strip()))
+    return sorted(linhas, reverse=True)[:top]
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modulo", default="api.main")
+    parser.add_argument("--repeticoes", type=int, default=7)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args(argv)
+
+    _tempo_import(args.modulo)  # aquece o cache de .pyc e do sistema de arquivos
+    base = statistics.median(_interpretador() for _ in range(args.repeticoes))
+    tempos = [_tempo_import(args.modulo) for _ in range(args.repeticoes)]
+    print(f"   import {args.modulo}: mediana {statistics.median(tempos) * 1000:.0f} ms "
+          f"(mín {min(tempos) * 1000:.0f} ms; só o interpretador: {base * 1000:.0f} ms)")
+
+    print(f"\n   {'próprio ms':>10}{'acumulado ms':>14}  módulo")
+    for proprio, acumulado, nome in mais_caros(args.modulo, args.top):
+        print(f"   {proprio / 1000:>10.1f}{acumulado / 1000:>14.1f}  {nome}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+"""
+Replay do tráfego capturado pela API (CAPTURA_ENABLED=1, api/captura.py)
+contra uma instância local, comparando as respostas com as originais.
+
+    python -m bench.replay capturas/                     # no ritmo original (1x)
+    python -m bench.replay capturas/ --velocidade 5      # 5x mais rápido
+    python -m bench.replay capturas/ --velocidade max -c 64
+    python -m bench.replay capturas/captura-*.jsonl --salvar bench/resultados/replay.json
+    python -m bench.replay capturas/ --comparar bench/resultados/replay.json
+
+No ritmo 1x/Nx as requisições saem nos mesmos intervalos da captura
+(divididos por N), sem esperar as anteriores terminarem; em "max" saem o mais
+rápido possível com -c requisições em paralelo.
+
+A comparação olha status e corpo JSON, ignorando campos que mudam de uma
+base para outra (ids, datas; veja --ignorar). O resultado por rota tem o
+mesmo formato do bench/carga.py, então --salvar/--comparar funcionam igual.
+"""
+import argparse
+import asyncio
+import base64
+import json
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+import httpx
+
+from bench.carga import imprimir, resumir, salvar_e_comparar
+
+IGNORAR_PADRAO = "id,lead_id,message_id,created_at,updated_at,momento,data_servico,next_cursor"
+
+
+def carregar(caminhos: Iterable[Path]) -> List[Dict[str, Any]]:
+    """Lê os JSONL (arquivos ou diretórios) e devolve os registros em ordem de chegada."""
+    registros: List[Dict[str, Any]] = []
+    for caminho in caminhos:
+        arquivos = sorted(caminho.glob("captura-*.jsonl")) if caminho.is_dir() else [caminho]
+        for arquivo in arquivos:
+            with arquivo.open(encoding="utf-8") as f:
+                for numero, linha in enumerate(f, 1):
+                    if not linha.strip():
+                        continue
+                    try:
+                        registros.append(json.loads(linha))
+                    except ValueError:
+                        # última linha cortada de um arquivo ainda aberto
+                        print(f"⚠️ {arquivo}:{numero} ignorada (JSON inválido)")
+    registros.sort(key=lambda r: r["ts"])
+    return registros
+
+
+def diferencas(original: Any, novo: Any, ignorar: Set[str], caminho: str = "$") -> List[str]:
+    """Caminhos (estilo $.campo[0]) em que os dois JSON divergem."""
+    if isinstance(original, dict) and isinstance(novo, dict):
+        saida: List[str] = []
+        for chave in sorted(set(original) | set(novo), key=str):
+            if chave in ignorar:
+                continue
+            if chave not in original or chave not in novo:
+                saida.append(f"{caminho}.{chave} (só em {'novo' if chave in novo else 'original'})")
+            else:
+                saida += diferencas(original[chave], novo[chave], ignorar, f"{caminho}.{chave}")
+        return saida
+    if isinstance(original, list) and isinstance(novo, list):
+        if len(original) != len(novo):
+            return [f"{caminho} (tamanho {len(original)} -> {len(novo)})"]
+        saida = []
+        for indice, (a, b) in enumerate(zip(original, novo)):
+            saida += diferencas(a, b, ignorar, f"{caminho}[{indice}]")
+        return saida
+    return [] if original == novo else [f"{caminho}: {original!r} -> {novo!r}"]
+
+
+def _requisicao(registro: Dict[str, Any]) -> Dict[str, Any]:
+    corpo = registro.get("corpo") or {}
+    kwargs: Dict[str, Any] = {"headers": registro.get("headers") or {}}
+    if "json" in corpo:
+        kwargs["content"] = json.dumps(corpo["json"], ensure_ascii=False).encode("utf-8")
+    elif "texto" in corpo:
+        kwargs["content"] = corpo["texto"].encode("utf-8")
+    elif "base64" in corpo:
+        kwargs["content"] = base64.b64decode(corpo["base64"])
+    caminho = registro["caminho"] + (f"?{registro['query']}" if registro.get("query") else "")
+    return {"method": registro["metodo"], "url": caminho, **kwargs}
+
+
+def _comparar_resposta(registro: Dict[str, Any], resposta: httpx.Response, ignorar: Set[str]) -> List[str]:
+    saida: List[str] = []
+    if resposta.status_code != registro["status"]:
+        saida.append(f"status {registro['status']} -> {resposta.status_code}")
+
+    original = registro.get("resposta") or {}
+    if "json" in original and not registro.get("resposta_truncada"):
+        try:
+            novo = resposta.json()
+        except ValueError:
+            saida.append("resposta deixou de ser JSON")
+        else:
+            saida += diferencas(original["json"], novo, ignorar)
+    return saida
+
+
+class _Rota:
+    def __init__(self):
+        self.latencias: List[float] = []
+        self.originais: List[float] = []
+        self.status: Dict[str, int] = {}
+        self.erros = 0
+        self.divergentes = 0
+
+
+async def executar(
+    registros: List[Dict[str, Any]],
+    url: str,
+    velocidade: Optional[float],
+    concorrencia: int,
+    timeout: float,
+    ignorar: Set[str],
+    mostrar: int,
+) -> Dict[str, Any]:
+    rotas: Dict[str, _Rota] = {}
+    exemplos: List[str] = []
+    limites = httpx.Limits(max_connections=concorrencia, max_keepalive_connections=concorrencia)
+
+    async with httpx.AsyncClient(base_url=url, timeout=timeout, limits=limites) as client:
+
+        async def reenviar(registro: Dict[str, Any]) -> None:
+            nome = f"{registro['metodo']} {registro.get('rota') or registro['caminho']}"
+            rota = rotas.setdefault(nome, _Rota())
+            rota.originais.append(registro["duracao_ms"] / 1000)
+            inicio = time.perf_counter()
+            try:
+                resposta = await client.request(**_requisicao(registro))
+            except httpx.HTTPError as e:
+                rota.latencias.append(time.perf_counter() - inicio)
+                rota.erros += 1
+                chave = type(e).__name__
+                divergencias = [f"{chave}: {e}"]
+            else:
+                rota.latencias.append(time.perf_counter() - inicio)
+                chave = str(resposta.status_code)
+                if resposta.status_code >= 500:
+                    rota.erros += 1
+                divergencias = _comparar_resposta(registro, resposta, ignorar)
+            rota.status[chave] = rota.status.get(chave, 0) + 1
+
+            if divergencias:
+                rota.divergentes += 1
+                if len(exemplos) < mostrar:
+                    exemplos.append(f"{nome} ({registro['caminho']}): " + "; ".join(divergencias[:5]))
+
+        inicio = time.perf_counter()
+        if velocidade is None:
+            fila: asyncio.Queue = asyncio.Queue()
+            for registro in registros:
+                fila.put_nowait(registro)
+
+            async def trabalhador():
+                while not fila.empty():
+                    await reenviar(fila.get_nowait())
+
+            await asyncio.gather(*(trabalhador() for _ in range(concorrencia)))
+        else:
+            # mantém os intervalos da captura, divididos pela velocidade
+            ts0 = registros[0]["ts"] if registros else 0.0
+            tarefas = []
+            for registro in registros:
+                espera = (registro["ts"] - ts0) / velocidade - (time.perf_counter() - inicio)
+                if espera > 0:
+                    await asyncio.sleep(espera)
+                tarefas.append(asyncio.create_task(reenviar(registro)))
+            await asyncio.gather(*tarefas)
+        segundos = time.perf_counter() - inicio
+
+    cenarios: Dict[str, Any] = {}
+    for nome, rota in sorted(rotas.items()):
+        resumo = resumir(rota.latencias, rota.erros, rota.status, segundos)
+        originais = resumir(rota.originais, 0, {}, segundos)
+        resumo["original_p50_ms"] = originais["p50_ms"]
+        resumo["original_p95_ms"] = originais["p95_ms"]
+        resumo["divergentes"] = rota.divergentes
+        cenarios[nome] = resumo
+
+    return {
+        "meta": {
+            "quando": datetime.now().isoformat(timespec="seconds"),
+            "url": url,
+            "requisicoes": len(registros),
+            "velocidade": velocidade or "max",
+            "concorrencia": concorrencia,
+            "segundos": round(segundos, 3),
+        },
+        "cenarios": cenarios,
+        "exemplos_divergencia": exemplos,
+    }
+
+
+def _velocidade(valor: str) -> Optional[float]:
+    if valor == "max":
+        return None
+    velocidade = float(valor.rstrip("x"))
+    if velocidade <= 0:
+        raise argparse.ArgumentTypeError("velocidade deve ser > 0 ou 'max'")
+    return velocidade
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("capturas", nargs="+", type=Path, help="arquivos captura-*.jsonl ou diretórios")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--velocidade", type=_velocidade, default=1.0, help="1, 2x, 10... ou max")
+    parser.add_argument("-c", "--concorrencia", type=int, default=32)
+    parser.add_argument("--rotas", default="", help="só caminhos com esses prefixos (separados por vírgula)")
+    parser.add_argument("--metodos", default="", help="ex.: POST,GET")
+    parser.add_argument("--limite", type=int, default=0, help="reenvia só os N primeiros registros")
+    parser.add_argument("--ignorar", default=IGNORAR_PADRAO, help="campos JSON fora da comparação")
+    parser.add_argument("--mostrar", type=int, default=10, help="quantas divergências imprimir")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--salvar", type=Path)
+    parser.add_argument("--comparar", type=Path, help="JSON de um replay anterior; sai com 1 se houver regressão")
+    parser.add_argument("--tolerancia", type=float, default=0.10)
+    args = parser.parse_args(argv)
+
+    registros = carregar(args.capturas)
+    prefixos = tuple(p for p in args.rotas.split(",") if p)
+    metodos = {m.upper() for m in args.metodos.split(",") if m}
+    registros = [
+        r for r in registros
+        if (not prefixos or r["caminho"].startswith(prefixos)) and (not metodos or r["metodo"] in metodos)
+    ]
+    if args.limite:
+        registros = registros[: args.limite]
+    if not registros:
+        parser.error("nenhum registro de captura para reenviar")
+
+    ritmo = "máximo" if args.velocidade is None else f"{args.velocidade:g}x"
+    print(f"==> Reenviando {len(registros)} requisições para {args.url} (ritmo {ritmo})...", flush=True)
+    resultado = asyncio.run(
+        executar(
+            registros, args.url, args.velocidade, args.concorrencia, args.timeout,
+            {c for c in args.ignorar.split(",") if c}, args.mostrar,
+        )
+    )
+    imprimir(resultado)
+
+    divergentes = sum(r["divergentes"] for r in resultado["cenarios"].values())
+    print(f"\n   {divergentes} de {len(registros)} respostas divergentes")
+    for exemplo in resultado["exemplos_divergencia"]:
+        print(f"   - {exemplo}")
+
+    salvar_e_comparar(resultado, args.salvar, args.comparar, args.tolerancia)
+
+
+if __name__ == "__main__":
+    main()
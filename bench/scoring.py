@@ -0,0 +1,156 @@
+"""
+Paridade e microbenchmark do scoring por regras (api/services/scoring.py)
+contra a versão antiga, com as palavras-chave fixas no código.
+
+    python -m bench.scoring                 # paridade + benchmark
+    python -m bench.scoring --so-paridade   # só confere os casos (sai com 1 se divergir)
+
+Os casos ficam em bench/fixtures/scoring_casos.json; o "esperado" de cada um
+foi gerado com a função antiga. Também confere o caminho vetorizado do
+re-score (api/services/scoring_vetorizado.py). Os mesmos casos rodam no
+pytest (tests/test_scoring.py).
+"""
+import argparse
+import json
+import sys
+import timeit
+from pathlib import Path
+from typing import List, Optional
+
+from api.services.scoring import carregar_regras, compute_score
+
+CASOS = Path(__file__).resolve().parent / "fixtures" / "scoring_casos.json"
+
+
+def compute_score_antigo(
+    has_phone: bool,
+    has_email: bool,
+    origem: str,
+    tags: Optional[List[str]] = None,
+    servico_interesse: Optional[str] = None,
+    regiao_corpo: Optional[str] = None,
+    disponibilidade: Optional[str] = None,
+) -> int:
+    """Cópia congelada do compute_score antes das regras em JSON."""
+    score = 0
+    tags = tags or []
+    if has_phone:
+        score += 30
+    if has_email:
+        score += 5
+    si = (servico_interesse or "").lower()
+    if si == "depilacao_laser":
+        score += 30
+    elif si == "limpeza_pele":
+        score += 20
+    elif si == "designer_sobrancelha":
+        score += 10
+    if si == "depilacao_laser":
+        regiao = (regiao_corpo or "").lower()
+        if any(p in regiao for p in ["perna", "coxa", "corpo inteiro", "corpo todo"]):
+            score += 15
+        elif any(p in regiao for p in ["virilha", "axila", "rosto", "braço", "braco"]):
+            score += 10
+        elif regiao:
+            score += 5
+        if "laser_outra_clinica" in tags:
+            score += 15
+        elif "laser_parou" in tags:
+            score += 10
+        elif "laser_primeira_vez" in tags:
+            score += 5
+    disp = (disponibilidade or "").lower()
+    opcoes = ["manhã", "manha", "tarde", "noite", "semana", "sábado", "sabado"]
+    encontradas = [p for p in opcoes if p in disp]
+    if len(encontradas) >= 2:
+        score += 5
+    return max(0, min(score, 100))
+
+
+def _casos():
+    casos = json.loads(CASOS.read_text(encoding="utf-8"))
+    for caso in casos:
+        esperado = caso.pop("esperado")
+        yield caso, esperado
+
+
+def paridade() -> int:
+    """Confere os casos nas três implementações; devolve o número de divergências."""
+    erros = 0
+    casos = list(_casos())
+
+    for caso, esperado in casos:
+        for nome, funcao in (("antigo", compute_score_antigo), ("regras", compute_score)):
+            obtido = funcao(**caso)
+            if obtido != esperado:
+                erros += 1
+                print(f"❌ {nome}: esperado {esperado}, obtido {obtido} -> {caso}")
+
+    try:
+        from api.services.scoring_vetorizado import calcular_scores
+    except ImportError:
+        print("   (numpy não instalado, pulando o caminho vetorizado)")
+    else:
+        vetor = calcular_scores(
+            ["11999999999" if c["has_phone"] else None for c, _ in casos],
+            ["a@b.com" if c["has_email"] else None for c, _ in casos],
+            [json.dumps(c["tags"]) if c["tags"] is not None else None for c, _ in casos],
+            [c["servico_interesse"] for c, _ in casos],
+            [c["regiao_corpo"] for c, _ in casos],
+            [c["disponibilidade"] for c, _ in casos],
+        )
+        for (caso, esperado), obtido in zip(casos, vetor):
+            if int(obtido) != esperado:
+                erros += 1
+                print(f"❌ vetorizado: esperado {esperado}, obtido {obtido} -> {caso}")
+
+    print(f"{'✅' if not erros else '❌'} paridade: {len(casos)} casos, {erros} divergências")
+    return erros
+
+
+def _textos_distintos(casos, repeticoes: int):
+    """Mesmos casos, mas com região/disponibilidade nunca repetidas (pior caso do memo)."""
+    for n in range(repeticoes):
+        for caso in casos:
+            distinto = dict(caso)
+            for campo in ("regiao_corpo", "disponibilidade"):
+                if distinto[campo]:
+                    distinto[campo] = f"{distinto[campo]} #{n}"
+            yield distinto
+
+
+def benchmark(repeticoes: int) -> None:
+    casos = [caso for caso, _ in _casos()]
+    carregar_regras()  # compila antes de medir
+
+    cenarios = (
+        ("textos repetidos", [casos] * repeticoes),
+        ("textos distintos", [list(_textos_distintos(casos, repeticoes))]),
+    )
+    for cenario, blocos in cenarios:
+        print(f"   {cenario}:")
+        total = sum(len(bloco) for bloco in blocos)
+        for nome, funcao in (("antigo", compute_score_antigo), ("regras", compute_score)):
+            def rodar():
+                for bloco in blocos:
+                    for caso in bloco:
+                        funcao(**caso)
+
+            melhor = min(timeit.repeat(rodar, number=1, repeat=5))
+            print(f"     {nome:<8} {melhor / total * 1e6:6.2f} µs/lead")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--so-paridade", action="store_true")
+    parser.add_argument("--repeticoes", type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    erros = paridade()
+    if not args.so_paridade:
+        benchmark(args.repeticoes)
+    sys.exit(1 if erros else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""
+Paridade e microbenchmark da serialização JSON (api/services/serializacao.py)
+contra o caminho antigo.
+
+    python -m bench.serializacao                 # paridade + benchmark
+    python -m bench.serializacao --so-paridade   # só confere (sai com 1 se divergir)
+
+Caminhos comparados:
+- lista de leads/histórico: response_model List[Dict[str, Any]] (valida e
+  converte cada linha) + json.dumps  x  TypeAdapter da linha direto para
+  bytes (resposta_linhas);
+- respostas com dict: jsonable_encoder + json.dumps  x  orjson (RespostaJSON);
+- payload de evento: json.dumps do dict inteiro  x  codificar_payload, com
+  tempo e tamanho em bytes.
+
+As respostas precisam sair byte a byte iguais. O payload novo tem que ser o
+antigo (chaves nulas inclusive) sem tags_json e com o whatsapp_result aparado.
+"""
+import argparse
+import json
+import sys
+import timeit
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from api.schemas import HISTORICO_LINHAS, LEAD_LINHAS
+from api.services.serializacao import aparar_resultado, codificar_payload, json_bytes
+
+_LINHAS_ANTIGO = TypeAdapter(List[Dict[str, Any]])
+
+_EVOLUTION_OK = json.dumps({
+    "key": {"remoteJid": "5511999999999@s.whatsapp.net", "fromMe": True, "id": "3EB0C431C26A1916E07E"},
+    "pushName": "",
+    "status": "PENDING",
+    "message": {"conversation": "Olá! Vimos seu interesse em depilação a laser. " * 4},
+    "contextInfo": {"expiration": 0, "disappearingMode": {"initiator": "CHANGED_IN_CHAT"}},
+    "messageType": "conversation",
+    "messageTimestamp": 1735700000,
+    "instanceId": "c1a5e1a8-5a61-4f1e-9f38-0c3b4c1a0e9d",
+    "source": "unknown",
+})
+
+
+def leads(n: int) -> List[Dict[str, Any]]:
+    base = datetime(2025, 1, 2, 3, 4, 5)
+    return [
+        {
+            "id": i,
+            "nome": f"Cliente {i} Araújo",
+            "email": f"cliente{i}@exemplo.com" if i % 3 else None,
+            "telefone": f"55119{i:08d}",
+            "phone_key": int(f"55119{i:08d}"),
+            "origem": ("instagram", "facebook", "site")[i % 3],
+            "tags": '["laser", "promo"]' if i % 2 else None,
+            "externo_id": None,
+            "score": i % 100,
+            "etapa": ("novo", "morno", "quente")[i % 3],
+            "servico_interesse": "depilacao_laser",
+            "regiao_corpo": "axilas" if i % 4 else None,
+            "disponibilidade": "manhã e sábado",
+            "created_at": base + timedelta(minutes=i),
+            "updated_at": base + timedelta(minutes=i, microseconds=120000),
+        }
+        for i in range(n)
+    ]
+
+
+def historico(n: int) -> List[Dict[str, Any]]:
+    base = datetime(2025, 1, 3, 10, 0)
+    return [
+        {
+            "id": i,
+            "lead_id": 7,
+            "servico": "limpeza_pele",
+            "data_servico": base + timedelta(days=i),
+            "status": "concluido" if i % 2 else "agendado",
+            "ticket": Decimal("150.00") if i % 2 else None,
+            "observacoes": None,
+            "created_at": base,
+        }
+        for i in range(n)
+    ]
+
+
+def payloads() -> List[Dict[str, Any]]:
+    """Payloads como main.py, fila_envio e o worker do outbox montam."""
+    lead = leads(1)[0]
+    criado = {k: v for k, v in lead.items() if k not in ("id", "created_at", "updated_at", "phone_key")}
+    criado["tags"] = ["laser", "promo"]
+    criado["tags_json"] = json.dumps(criado["tags"], ensure_ascii=False)
+    criado.update(email=None, externo_id=None)
+    return [
+        criado,
+        {"texto": "Olá!", "telefone": "5511999999999", "whatsapp_result": {"status": 201, "detail": _EVOLUTION_OK}},
+        {"texto": "Olá!", "telefone": "5511999999999", "whatsapp_result": {"status": 400, "detail": "x" * 2000}},
+        {"texto": "Olá!", "telefone": "5511999999999", "whatsapp_result": {"status": "error", "detail": "timeout"}},
+        {"score": 70, "etapa": "quente"},
+    ]
+
+
+def resposta_antiga(linhas: List[Dict[str, Any]]) -> bytes:
+    """response_model List[Dict[str, Any]] + JSONResponse do Starlette."""
+    validado = _LINHAS_ANTIGO.validate_python(linhas)
+    conteudo = _LINHAS_ANTIGO.dump_python(validado, mode="json")
+    return json.dumps(conteudo, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def dict_antigo(conteudo: Any) -> bytes:
+    return json.dumps(
+        jsonable_encoder(conteudo), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def payload_antigo(payload: Dict[str, Any]) -> str:
+    return json.dumps(payload)
+
+
+def _payload_esperado(payload: Dict[str, Any]) -> Dict[str, Any]:
+    esperado = {k: v for k, v in payload.items() if k != "tags_json"}
+    if "whatsapp_result" in esperado:
+        esperado["whatsapp_result"] = aparar_resultado(esperado["whatsapp_result"])
+    return json.loads(json.dumps(esperado))
+
+
+def paridade() -> int:
+    """Confere respostas e payloads; devolve o número de divergências."""
+    erros = 0
+    for nome, adaptador, linhas in (
+        ("leads", LEAD_LINHAS, leads(50)),
+        ("histórico", HISTORICO_LINHAS, historico(20)),
+        ("vazio", LEAD_LINHAS, []),
+    ):
+        antigo, novo = resposta_antiga(linhas), adaptador.dump_json(linhas, warnings=False)
+        if antigo != novo:
+            erros += 1
+            print(f"❌ {nome}: resposta diferente\n   antes: {antigo[:200]!r}\n   agora: {novo[:200]!r}")
+
+    resposta = {"status": "ok", "lead": leads(1)[0], "historico": historico(2)}
+    if dict_antigo(resposta) != json_bytes(jsonable_encoder(resposta)):
+        erros += 1
+        print("❌ RespostaJSON: corpo diferente do JSONResponse")
+
+    for payload in payloads():
+        obtido = json.loads(codificar_payload(payload))
+        if obtido != _payload_esperado(payload):
+            erros += 1
+            print(f"❌ payload: esperado {_payload_esperado(payload)}, obtido {obtido}")
+
+    print(f"{'✅' if not erros else '❌'} paridade: {erros} divergências")
+    return erros
+
+
+def _medir(funcao, total: int) -> float:
+    return min(timeit.repeat(funcao, number=1, repeat=5)) / total * 1e6
+
+
+def benchmark(tamanho: int, repeticoes: int) -> None:
+    linhas = leads(tamanho)
+    print(f"   GET /leads ({tamanho} linhas):")
+    print(f"     {'antigo':<8} {_medir(lambda: resposta_antiga(linhas), 1):8.1f} µs/resposta")
+    print(f"     {'novo':<8} {_medir(lambda: LEAD_LINHAS.dump_json(linhas, warnings=False), 1):8.1f} µs/resposta")
+
+    resposta = {"status": "ok", "lead": linhas[0]}
+    print("   resposta com dict (response_model inferido):")
+    print(f"     {'antigo':<8} {_medir(lambda: [dict_antigo(resposta) for _ in range(repeticoes)], repeticoes):8.1f} µs/resposta")
+    print(f"     {'novo':<8} {_medir(lambda: [json_bytes(jsonable_encoder(resposta)) for _ in range(repeticoes)], repeticoes):8.1f} µs/resposta")
+
+    amostra = payloads()
+    total = len(amostra) * repeticoes
+    bytes_antigo = sum(len(payload_antigo(p).encode("utf-8")) for p in amostra)
+    bytes_novo = sum(len(codificar_payload(p).encode("utf-8")) for p in amostra)
+    print(f"   payload de evento ({len(amostra)} tipos):")
+    for nome, funcao, tamanho_total in (
+        ("antigo", payload_antigo, bytes_antigo),
+        ("novo", codificar_payload, bytes_novo),
+    ):
+        def rodar():
+            for _ in range(repeticoes):
+                for payload in amostra:
+                    funcao(payload)
+
+        print(f"     {nome:<8} {_medir(rodar, total):8.2f} µs/evento  {tamanho_total / len(amostra):7.0f} bytes/evento")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--so-paridade", action="store_true")
+    parser.add_argument("--tamanho", type=int, default=500, help="linhas da página de leads")
+    parser.add_argument("--repeticoes", type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    erros = paridade()
+    if not args.so_paridade:
+        benchmark(args.tamanho, args.repeticoes)
+    sys.exit(1 if erros else 0)
+
+
+if __name__ == "__main__":
+    main()
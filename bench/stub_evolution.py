@@ -0,0 +1,98 @@
+"""
+Evolution API de mentira para os benchmarks: responde 201 com um JSON no
+formato do sendText a qualquer POST, depois de uma latência configurável.
+
+    python -m bench.stub_evolution --porta 8081 --latencia-ms 80
+
+Na API: WHATSAPP_API_URL=http://localhost:8081/message/sendText/bench e
+WHATSAPP_TOKEN=qualquer-coisa.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+
+_contador = 0
+_trava = threading.Lock()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    latencia = 0.0
+    variacao = 0.0
+    taxa_erro = 0.0
+    protocol_version = "HTTP/1.1"  # keep-alive, como a Evolution de verdade
+
+    def do_POST(self):
+        global _contador
+        tamanho = int(self.headers.get("Content-Length") or 0)
+        corpo = self.rfile.read(tamanho) if tamanho else b""
+        try:
+            payload = json.loads(corpo or b"{}")
+        except ValueError:
+            payload = {}
+
+        espera = self.latencia + random.uniform(-self.variacao, self.variacao)
+        if espera > 0:
+            time.sleep(espera)
+
+        with _trava:
+            _contador += 1
+            message_id = f"BENCH{_contador:012d}"
+
+        if self.taxa_erro and random.random() < self.taxa_erro:
+            status, resposta = 500, {"status": 500, "error": "Internal Server Error"}
+        else:
+            status, resposta = 201, {
+                "key": {"remoteJid": f"{payload.get('number', '')}@s.whatsapp.net", "fromMe": True, "id": message_id},
+                "message": {"conversation": payload.get("text", "")},
+                "messageTimestamp": int(time.time()),
+                "status": "PENDING",
+            }
+
+        dados = json.dumps(resposta).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def log_message(self, format, *args):
+        # sem uma linha de log por requisição, senão o stub vira o gargalo
+        pass
+
+
+def criar_servidor(host: str, porta: int, latencia_ms: float, variacao_ms: float = 0.0, taxa_erro: float = 0.0):
+    handler = type(
+        "Handler",
+        (_Handler,),
+        {"latencia": latencia_ms / 1000, "variacao": variacao_ms / 1000, "taxa_erro": taxa_erro},
+    )
+    servidor = ThreadingHTTPServer((host, porta), handler)
+    servidor.daemon_threads = True
+    return servidor
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Stub da Evolution API para benchmarks.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--porta", type=int, default=8081)
+    parser.add_argument("--latencia-ms", type=float, default=80.0)
+    parser.add_argument("--variacao-ms", type=float, default=20.0)
+    parser.add_argument("--taxa-erro", type=float, default=0.0, help="fração de respostas 500 (0 a 1)")
+    args = parser.parse_args(argv)
+
+    servidor = criar_servidor(args.host, args.porta, args.latencia_ms, args.variacao_ms, args.taxa_erro)
+    print(f"==> Stub Evolution em http://{args.host}:{args.porta} (latência {args.latencia_ms:.0f}±{args.variacao_ms:.0f} ms)")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+
+if __name__ == "__main__":
+    main()
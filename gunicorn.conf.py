@@ -0,0 +1,89 @@
+# Perfil de produção: gunicorn gerenciando N workers do uvicorn.
+#
+#   gunicorn api.main:app -c gunicorn.conf.py
+#
+# - preload_app: o processo mestre importa a API uma vez e os workers nascem
+#   por fork, já com tudo importado (boot mais rápido nos rolling deploys).
+#   Nada abre conexão ou thread no import: pool do MySQL, buffers, filas e
+#   cliente httpx são criados no lifespan de cada worker (api/main.py).
+# - workers: WEB_CONCURRENCY ou um por CPU disponível para o container
+#   (afinidade e limite de CPU do cgroup, que é o que o swarm aplica).
+# - SIGTERM: cada worker para de aceitar conexões, termina as requisições em
+#   andamento e roda o shutdown do lifespan (drena fila de envio, eventos e
+#   idempotência e fecha o pool) em até GRACEFUL_TIMEOUT segundos.
+#
+# Cada worker tem o próprio pool: o MySQL precisa aceitar até
+# workers × (DB_POOL_SIZE + DB_POOL_MAX_OVERFLOW) conexões por réplica.
+# O que precisa valer entre workers fica no MySQL (limites de envio,
+# idempotência, outbox) ou no Redis (cache de leads, LEAD_CACHE_REDIS_URL).
+# As métricas de cada worker vão para METRICS_MULTIPROC_DIR e o /metrics
+# soma todos (api/metrics.py).
+import math
+import os
+
+
+def _cpus_disponiveis() -> int:
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    # cgroup v2: "max 100000" (sem limite) ou "<quota> <período>"
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, periodo = f.read().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, math.ceil(int(quota) / int(periodo))))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+worker_class = "uvicorn_worker.UvicornWorker"
+workers = int(os.getenv("WEB_CONCURRENCY") or _cpus_disponiveis())
+# A API lê o número de workers no import (o preload acontece depois deste
+# arquivo): limites de envio em memória e cache de leads dependem dele.
+os.environ["WEB_CONCURRENCY"] = str(workers)
+if workers > 1:
+    os.environ.setdefault("METRICS_MULTIPROC_DIR", "/tmp/leads_api_metrics")
+preload_app = True
+
+# Worker travado (sem heartbeat) por mais que isso é reiniciado
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 60))
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.getenv("KEEPALIVE", 5))
+
+# Recicla workers de tempos em tempos (0 desliga); o jitter evita que todos reiniciem juntos
+max_requests = int(os.getenv("MAX_REQUESTS", 0))
+max_requests_jitter = int(os.getenv("MAX_REQUESTS_JITTER", 0))
+
+# O Traefik fica na frente: confia nos X-Forwarded-* dele
+forwarded_allow_ips = os.getenv("FORWARDED_ALLOW_IPS", "*")
+
+accesslog = os.getenv("ACCESS_LOG") or None
+errorlog = "-"
+loglevel = os.getenv("LOG_LEVEL", "info")
+
+
+def on_starting(server):
+    # métricas de uma execução anterior não podem entrar na soma
+    if os.getenv("METRICS_MULTIPROC_DIR"):
+        from api.metrics import limpar_diretorio
+
+        limpar_diretorio(os.environ["METRICS_MULTIPROC_DIR"])
+
+
+def when_ready(server):
+    server.log.info("API pronta com %s workers (%s)", workers, worker_class)
+
+
+def post_fork(server, worker):
+    # o mestre importou a API; o que é por processo (pools, filas) nasce no lifespan
+    server.log.info("Worker %s iniciado", worker.pid)
+
+
+def child_exit(server, worker):
+    if os.getenv("METRICS_MULTIPROC_DIR"):
+        from api.metrics import marcar_processo_morto
+
+        marcar_processo_morto(os.environ["METRICS_MULTIPROC_DIR"], worker.pid)
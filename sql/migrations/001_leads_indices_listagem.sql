@@ -0,0 +1,25 @@
+-- Índices da listagem paginada de leads (GET /leads).
+--
+-- A paginação é por keyset em (updated_at, id) DESC, então cada filtro de
+-- igualdade ganha um índice composto (filtro, updated_at, id): o MySQL lê só
+-- as linhas da página, já na ordem, sem filesort e sem OFFSET.
+--
+-- score_min/score_max e o período de atualização são aplicados sobre esses
+-- mesmos índices (faixa em updated_at / filtro residual em score).
+
+CREATE INDEX idx_leads_updated
+    ON leads (updated_at, id);
+
+CREATE INDEX idx_leads_origem_updated
+    ON leads (origem, updated_at, id);
+
+CREATE INDEX idx_leads_etapa_updated
+    ON leads (etapa, updated_at, id);
+
+CREATE INDEX idx_leads_servico_updated
+    ON leads (servico_interesse, updated_at, id);
+
+-- Índice multi-valor (MySQL >= 8.0.17) para o filtro por tag:
+-- WHERE 'laser_parou' MEMBER OF (tags)
+CREATE INDEX idx_leads_tags
+    ON leads ((CAST(tags AS CHAR(64) ARRAY)));
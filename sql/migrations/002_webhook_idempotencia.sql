@@ -0,0 +1,19 @@
+-- Respostas já dadas pelo POST /webhooks/lead, por chave de idempotência.
+--
+-- n8n / ManyChat / Evolution reenviam o webhook quando dá timeout. A API
+-- guarda o LeadOut de cada chave (header Idempotency-Key ou hash do lead
+-- normalizado) e responde os reenvios com ele, sem novo upsert nem novo
+-- evento de entrada. A memória de cada processo é a primeira camada; esta
+-- tabela cobre restart e os outros workers.
+--
+-- Linhas vencidas são apagadas pela própria API aos poucos (idx por expira_em).
+
+CREATE TABLE IF NOT EXISTS webhook_idempotencia (
+    chave      CHAR(64)     NOT NULL,
+    rota       VARCHAR(64)  NOT NULL,
+    resposta   JSON         NOT NULL,
+    criado_em  TIMESTAMP    NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    expira_em  TIMESTAMP    NOT NULL,
+    PRIMARY KEY (chave),
+    KEY idx_webhook_idempotencia_expira (expira_em)
+);
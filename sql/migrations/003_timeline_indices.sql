@@ -0,0 +1,11 @@
+-- Índices da timeline do lead (GET /leads/{id}/timeline).
+--
+-- Cada ramo do UNION ALL filtra por lead_id e pagina por keyset na coluna de
+-- tempo + id, então (lead_id, tempo, id) entrega as linhas já na ordem, sem
+-- filesort, tanto em ordem crescente quanto decrescente.
+
+CREATE INDEX idx_lead_events_lead_created
+    ON lead_events (lead_id, created_at, id);
+
+CREATE INDEX idx_historico_servicos_lead_data
+    ON historico_servicos (lead_id, data_servico, id);
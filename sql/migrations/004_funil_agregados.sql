@@ -0,0 +1,122 @@
+-- Agregados do funil (GET /analytics/funnel).
+--
+-- funil_diario:   leads por dia de entrada (created_at) x origem x etapa atual
+-- receita_diaria: serviços por dia (data_servico) x servico x status, com a
+--                 soma dos tickets
+--
+-- As duas tabelas são mantidas por triggers, então todo caminho de escrita
+-- (webhook unitário e em lote, /action/update-lead, re-score, histórico de
+-- serviços) atualiza os contadores na mesma transação da escrita. Upsert que
+-- cai no ON DUPLICATE KEY UPDATE dispara o trigger de UPDATE: só mexe no
+-- agregado se origem/etapa/dia mudaram.
+--
+-- O job `python -m api.jobs.reconciliar_funil` recalcula um período a partir
+-- das tabelas de origem (carga inicial e correção de qualquer deriva).
+-- Colunas NULL entram como '' (não podem fazer parte da chave primária).
+
+CREATE TABLE IF NOT EXISTS funil_diario (
+    dia     DATE         NOT NULL,
+    origem  VARCHAR(32)  NOT NULL,
+    etapa   VARCHAR(32)  NOT NULL,
+    total   INT          NOT NULL DEFAULT 0,
+    PRIMARY KEY (dia, origem, etapa)
+);
+
+CREATE TABLE IF NOT EXISTS receita_diaria (
+    dia         DATE           NOT NULL,
+    servico     VARCHAR(32)    NOT NULL,
+    status      VARCHAR(32)    NOT NULL,
+    quantidade  INT            NOT NULL DEFAULT 0,
+    receita     DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (dia, servico, status)
+);
+
+DROP TRIGGER IF EXISTS trg_leads_funil_ins;
+DROP TRIGGER IF EXISTS trg_leads_funil_upd;
+DROP TRIGGER IF EXISTS trg_leads_funil_del;
+DROP TRIGGER IF EXISTS trg_historico_receita_ins;
+DROP TRIGGER IF EXISTS trg_historico_receita_upd;
+DROP TRIGGER IF EXISTS trg_historico_receita_del;
+
+DELIMITER $$
+
+CREATE TRIGGER trg_leads_funil_ins AFTER INSERT ON leads
+FOR EACH ROW
+BEGIN
+    INSERT INTO funil_diario (dia, origem, etapa, total)
+    VALUES (DATE(NEW.created_at), COALESCE(NEW.origem, ''), COALESCE(NEW.etapa, ''), 1)
+    ON DUPLICATE KEY UPDATE total = total + 1;
+END$$
+
+CREATE TRIGGER trg_leads_funil_upd AFTER UPDATE ON leads
+FOR EACH ROW
+BEGIN
+    IF NOT (DATE(OLD.created_at) <=> DATE(NEW.created_at)
+            AND OLD.origem <=> NEW.origem
+            AND OLD.etapa <=> NEW.etapa) THEN
+        UPDATE funil_diario
+           SET total = total - 1
+         WHERE dia = DATE(OLD.created_at)
+           AND origem = COALESCE(OLD.origem, '')
+           AND etapa = COALESCE(OLD.etapa, '');
+
+        INSERT INTO funil_diario (dia, origem, etapa, total)
+        VALUES (DATE(NEW.created_at), COALESCE(NEW.origem, ''), COALESCE(NEW.etapa, ''), 1)
+        ON DUPLICATE KEY UPDATE total = total + 1;
+    END IF;
+END$$
+
+CREATE TRIGGER trg_leads_funil_del AFTER DELETE ON leads
+FOR EACH ROW
+BEGIN
+    UPDATE funil_diario
+       SET total = total - 1
+     WHERE dia = DATE(OLD.created_at)
+       AND origem = COALESCE(OLD.origem, '')
+       AND etapa = COALESCE(OLD.etapa, '');
+END$$
+
+CREATE TRIGGER trg_historico_receita_ins AFTER INSERT ON historico_servicos
+FOR EACH ROW
+BEGIN
+    INSERT INTO receita_diaria (dia, servico, status, quantidade, receita)
+    VALUES (DATE(NEW.data_servico), COALESCE(NEW.servico, ''), COALESCE(NEW.status, ''), 1, COALESCE(NEW.ticket, 0))
+    ON DUPLICATE KEY UPDATE
+        quantidade = quantidade + 1,
+        receita = receita + COALESCE(NEW.ticket, 0);
+END$$
+
+CREATE TRIGGER trg_historico_receita_upd AFTER UPDATE ON historico_servicos
+FOR EACH ROW
+BEGIN
+    IF NOT (DATE(OLD.data_servico) <=> DATE(NEW.data_servico)
+            AND OLD.servico <=> NEW.servico
+            AND OLD.status <=> NEW.status
+            AND OLD.ticket <=> NEW.ticket) THEN
+        UPDATE receita_diaria
+           SET quantidade = quantidade - 1,
+               receita = receita - COALESCE(OLD.ticket, 0)
+         WHERE dia = DATE(OLD.data_servico)
+           AND servico = COALESCE(OLD.servico, '')
+           AND status = COALESCE(OLD.status, '');
+
+        INSERT INTO receita_diaria (dia, servico, status, quantidade, receita)
+        VALUES (DATE(NEW.data_servico), COALESCE(NEW.servico, ''), COALESCE(NEW.status, ''), 1, COALESCE(NEW.ticket, 0))
+        ON DUPLICATE KEY UPDATE
+            quantidade = quantidade + 1,
+            receita = receita + COALESCE(NEW.ticket, 0);
+    END IF;
+END$$
+
+CREATE TRIGGER trg_historico_receita_del AFTER DELETE ON historico_servicos
+FOR EACH ROW
+BEGIN
+    UPDATE receita_diaria
+       SET quantidade = quantidade - 1,
+           receita = receita - COALESCE(OLD.ticket, 0)
+     WHERE dia = DATE(OLD.data_servico)
+       AND servico = COALESCE(OLD.servico, '')
+       AND status = COALESCE(OLD.status, '');
+END$$
+
+DELIMITER ;
@@ -0,0 +1,36 @@
+-- Outbox de mensagens de WhatsApp (WHATSAPP_OUTBOX=1).
+--
+-- A API só grava a mensagem aqui (status 'pendente') e responde 202; o
+-- worker `python -m api.workers.outbox` (uma ou mais réplicas) reserva lotes
+-- com SELECT ... FOR UPDATE SKIP LOCKED, envia pela Evolution e grava o
+-- resultado + o evento do lead (mensagem_enviada / erro_envio).
+--
+-- status:
+--   pendente  esperando envio (ou nova tentativa) a partir de proxima_tentativa
+--   enviando  reservada por um worker; proxima_tentativa é o fim da reserva
+--             (renovada enquanto o lote é enviado).
+--             Se o worker morrer, a mensagem volta a ser elegível quando a
+--             reserva vencer
+--   enviada   entregue à Evolution (2xx)
+--   falhou    erro definitivo (4xx) ou tentativas esgotadas
+--
+-- O índice (status, proxima_tentativa, id) atende a reserva direto: o
+-- worker lê só as linhas elegíveis, já na ordem.
+
+CREATE TABLE IF NOT EXISTS outbox_mensagens (
+    id                 BIGINT UNSIGNED  NOT NULL AUTO_INCREMENT,
+    message_id         CHAR(32)         NOT NULL,
+    lead_id            BIGINT UNSIGNED  NOT NULL,
+    telefone           VARCHAR(32)      NOT NULL,
+    texto              TEXT             NOT NULL,
+    status             VARCHAR(16)      NOT NULL DEFAULT 'pendente',
+    tentativas         INT              NOT NULL DEFAULT 0,
+    proxima_tentativa  TIMESTAMP(3)     NOT NULL DEFAULT CURRENT_TIMESTAMP(3),
+    ultimo_resultado   JSON             NULL,
+    criado_em          TIMESTAMP        NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    concluido_em       TIMESTAMP        NULL,
+    PRIMARY KEY (id),
+    UNIQUE KEY uk_outbox_message_id (message_id),
+    KEY idx_outbox_fila (status, proxima_tentativa, id),
+    KEY idx_outbox_lead (lead_id)
+);
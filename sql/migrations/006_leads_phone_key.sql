@@ -0,0 +1,23 @@
+-- Chave numérica do telefone (passo 1 de 2).
+--
+-- phone_key é o telefone em E.164 (ex.: 5511999999999) guardado como
+-- BIGINT: 8 bytes no índice em vez de até 32 caracteres, e o mesmo número
+-- digitado de formas diferentes ("11 99999-9999", "+55 11 99999-9999",
+-- "5511999999999", celular antigo sem o nono dígito) cai na mesma chave
+-- (api/services/normalize.py). Telefone que não vira um E.164 brasileiro
+-- fica com phone_key NULL.
+--
+-- Ordem do deploy:
+--   1. esta migração (coluna + índice comum, sem travar a tabela);
+--   2. deploy da API, que já grava a phone_key nos inserts;
+--   3. python -m api.jobs.normalizar_telefones (backfill + mesclagem dos
+--      leads duplicados pelo telefone);
+--   4. 007_leads_phone_key_unica.sql (troca a chave única do telefone).
+
+ALTER TABLE leads
+    ADD COLUMN phone_key BIGINT UNSIGNED NULL AFTER telefone,
+    ALGORITHM=INSTANT;
+
+CREATE INDEX idx_leads_phone_key
+    ON leads (phone_key)
+    ALGORITHM=INPLACE LOCK=NONE;
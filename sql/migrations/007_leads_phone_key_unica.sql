@@ -0,0 +1,13 @@
+-- Chave única do telefone passa a ser a phone_key (passo 2 de 2).
+--
+-- Só depois do `python -m api.jobs.normalizar_telefones` (ver 006): se ainda
+-- houver duas linhas com a mesma phone_key a criação do índice único falha e
+-- nada muda. A partir daqui o ON DUPLICATE KEY do upsert e a busca de ids do
+-- upsert em lote usam só o índice da phone_key; a uk_leads_telefone sai para
+-- não manter dois índices únicos sobre o mesmo dado.
+
+ALTER TABLE leads
+    ADD UNIQUE KEY uk_leads_phone_key (phone_key),
+    DROP INDEX idx_leads_phone_key,
+    DROP INDEX uk_leads_telefone,
+    ALGORITHM=INPLACE, LOCK=NONE;
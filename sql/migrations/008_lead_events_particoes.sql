@@ -0,0 +1,52 @@
+-- Particionamento mensal do lead_events por created_at.
+--
+-- Cada mês fica numa partição pAAAAMM; o job `python -m api.jobs.arquivar_eventos`
+-- cria os meses seguintes (separando-os do p_futuro antes que recebam linhas)
+-- e, para os meses mais antigos que LEAD_EVENTS_RETENCAO_DIAS, grava os
+-- eventos no arquivo morto (api/services/arquivo_eventos.py) e remove a
+-- partição com DROP PARTITION, que é instantâneo, em vez de DELETE linha a
+-- linha. A tabela quente fica só com os meses recentes: menos páginas
+-- disputando o buffer pool e backups menores.
+--
+-- O MySQL exige a coluna de particionamento em toda chave única, então a
+-- chave primária passa a ser (id, created_at); o id continua AUTO_INCREMENT
+-- e único na prática. Os índices por lead (003) valem dentro de cada
+-- partição.
+--
+-- O ALTER reescreve a tabela inteira: rode numa janela de manutenção (ou com
+-- pt-online-schema-change) e com o event_buffer drenado.
+
+ALTER TABLE lead_events
+    DROP PRIMARY KEY,
+    ADD PRIMARY KEY (id, created_at)
+    PARTITION BY RANGE (UNIX_TIMESTAMP(created_at)) (
+        PARTITION p_antigas VALUES LESS THAN (UNIX_TIMESTAMP('2025-01-01 00:00:00')),
+        PARTITION p202501 VALUES LESS THAN (UNIX_TIMESTAMP('2025-02-01 00:00:00')),
+        PARTITION p202502 VALUES LESS THAN (UNIX_TIMESTAMP('2025-03-01 00:00:00')),
+        PARTITION p202503 VALUES LESS THAN (UNIX_TIMESTAMP('2025-04-01 00:00:00')),
+        PARTITION p202504 VALUES LESS THAN (UNIX_TIMESTAMP('2025-05-01 00:00:00')),
+        PARTITION p202505 VALUES LESS THAN (UNIX_TIMESTAMP('2025-06-01 00:00:00')),
+        PARTITION p202506 VALUES LESS THAN (UNIX_TIMESTAMP('2025-07-01 00:00:00')),
+        PARTITION p202507 VALUES LESS THAN (UNIX_TIMESTAMP('2025-08-01 00:00:00')),
+        PARTITION p202508 VALUES LESS THAN (UNIX_TIMESTAMP('2025-09-01 00:00:00')),
+        PARTITION p202509 VALUES LESS THAN (UNIX_TIMESTAMP('2025-10-01 00:00:00')),
+        PARTITION p202510 VALUES LESS THAN (UNIX_TIMESTAMP('2025-11-01 00:00:00')),
+        PARTITION p202511 VALUES LESS THAN (UNIX_TIMESTAMP('2025-12-01 00:00:00')),
+        PARTITION p202512 VALUES LESS THAN (UNIX_TIMESTAMP('2026-01-01 00:00:00')),
+        PARTITION p202601 VALUES LESS THAN (UNIX_TIMESTAMP('2026-02-01 00:00:00')),
+        PARTITION p202602 VALUES LESS THAN (UNIX_TIMESTAMP('2026-03-01 00:00:00')),
+        PARTITION p202603 VALUES LESS THAN (UNIX_TIMESTAMP('2026-04-01 00:00:00')),
+        PARTITION p202604 VALUES LESS THAN (UNIX_TIMESTAMP('2026-05-01 00:00:00')),
+        PARTITION p202605 VALUES LESS THAN (UNIX_TIMESTAMP('2026-06-01 00:00:00')),
+        PARTITION p202606 VALUES LESS THAN (UNIX_TIMESTAMP('2026-07-01 00:00:00')),
+        PARTITION p202607 VALUES LESS THAN (UNIX_TIMESTAMP('2026-08-01 00:00:00')),
+        PARTITION p202608 VALUES LESS THAN (UNIX_TIMESTAMP('2026-09-01 00:00:00')),
+        PARTITION p202609 VALUES LESS THAN (UNIX_TIMESTAMP('2026-10-01 00:00:00')),
+        PARTITION p202610 VALUES LESS THAN (UNIX_TIMESTAMP('2026-11-01 00:00:00')),
+        PARTITION p202611 VALUES LESS THAN (UNIX_TIMESTAMP('2026-12-01 00:00:00')),
+        PARTITION p202612 VALUES LESS THAN (UNIX_TIMESTAMP('2027-01-01 00:00:00')),
+        PARTITION p202701 VALUES LESS THAN (UNIX_TIMESTAMP('2027-02-01 00:00:00')),
+        PARTITION p202702 VALUES LESS THAN (UNIX_TIMESTAMP('2027-03-01 00:00:00')),
+        PARTITION p202703 VALUES LESS THAN (UNIX_TIMESTAMP('2027-04-01 00:00:00')),
+        PARTITION p_futuro VALUES LESS THAN MAXVALUE
+    );
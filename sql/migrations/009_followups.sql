@@ -0,0 +1,37 @@
+-- Agenda de follow-ups (FOLLOWUP_ENABLED=1).
+--
+-- A API grava aqui, junto com o upsert do lead, um follow-up por regra que a
+-- entrada dispara (ex.: "novo" -> novo_sem_mensagem, 24 h depois). O worker
+-- `python -m api.workers.followup` carrega os que vencem nas próximas horas
+-- para um heap em memória, dispara na hora certa, confere se a regra ainda
+-- vale (etapa, mensagem enviada nesse meio tempo) e grava o resultado + o
+-- evento `followup` do lead.
+--
+-- status:
+--   pendente   esperando agendado_para
+--   enviando   reservado por um worker; agendado_para é o fim da reserva,
+--              renovada enquanto o lote é enviado
+--              (se o worker morrer, volta a ser elegível quando vencer)
+--   enviado    mensagem entregue à Evolution (2xx)
+--   cancelado  a regra deixou de valer (lead avançou, já recebeu mensagem,
+--              sem telefone ou apagado)
+--   falhou     erro definitivo (4xx) ou tentativas esgotadas
+--
+-- Um follow-up por (lead, regra): reentrada do mesmo lead não agenda outro.
+-- O índice (status, agendado_para, id) atende a carga do worker e a
+-- reserva, sem varrer a tabela de leads.
+
+CREATE TABLE IF NOT EXISTS followups (
+    id                BIGINT UNSIGNED  NOT NULL AUTO_INCREMENT,
+    lead_id           BIGINT UNSIGNED  NOT NULL,
+    regra             VARCHAR(32)      NOT NULL,
+    status            VARCHAR(16)      NOT NULL DEFAULT 'pendente',
+    agendado_para     TIMESTAMP(3)     NOT NULL,
+    tentativas        INT              NOT NULL DEFAULT 0,
+    ultimo_resultado  JSON             NULL,
+    criado_em         TIMESTAMP        NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    concluido_em      TIMESTAMP        NULL,
+    PRIMARY KEY (id),
+    UNIQUE KEY uk_followups_lead_regra (lead_id, regra),
+    KEY idx_followups_fila (status, agendado_para, id)
+);
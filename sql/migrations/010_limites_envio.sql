@@ -0,0 +1,19 @@
+-- Limites de envio de WhatsApp compartilhados (api/services/rate_limit.py).
+--
+-- Os limites das campanhas (global e por número) valem para a conta da
+-- Evolution inteira, não por processo: com N workers do gunicorn e réplicas
+-- dos workers de outbox/follow-up, um token bucket em memória deixaria
+-- passar N vezes a taxa configurada. Cada limite é uma linha aqui, no
+-- formato GCRA: `tat_us` é o "theoretical arrival time" do próximo envio,
+-- em microssegundos desde a época no relógio do banco. Cada envio reserva o
+-- seu horário com um único INSERT ... ON DUPLICATE KEY UPDATE (a trava da
+-- linha serializa os processos) e dorme até ele.
+--
+-- Linhas de números que não enviam há mais de uma hora são apagadas aos
+-- poucos pelos próprios processos.
+
+CREATE TABLE IF NOT EXISTS limites_envio (
+    chave   VARCHAR(64)      NOT NULL,
+    tat_us  BIGINT UNSIGNED  NOT NULL,
+    PRIMARY KEY (chave)
+);
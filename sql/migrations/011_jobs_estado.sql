@@ -0,0 +1,14 @@
+-- Estado dos jobs disparados pela API (hoje o re-score de POST /admin/rescore).
+--
+-- Com vários workers do gunicorn o estado não pode ficar na memória de um
+-- processo: cada GET cairia num worker diferente. O job grava aqui o
+-- andamento (uma linha por job, sobrescrita a cada execução) e a exclusão
+-- mútua é um GET_LOCK do MySQL preso à conexão do job: se o processo morrer,
+-- a trava cai junto com a conexão.
+
+CREATE TABLE IF NOT EXISTS jobs_estado (
+    job            VARCHAR(32)  NOT NULL,
+    estado         JSON         NOT NULL,
+    atualizado_em  TIMESTAMP    NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (job)
+);
@@ -0,0 +1,15 @@
+-- Tenant (clínica) de cada lead.
+--
+-- O score é calculado com as regras do tenant do header X-Tenant
+-- (api/services/regras_score/<tenant>.json). Gravando o tenant no lead, o
+-- re-score em lote (python -m api.jobs.rescore, POST /admin/rescore) e as
+-- atualizações sem header usam as mesmas regras da entrada, em vez de
+-- sobrescrever tudo com o padrao.json. NULL = regras padrão.
+--
+-- Leads que entraram com X-Tenant antes desta migração ficam com NULL: rode
+-- o re-score com --tenant (ou ?tenant=) para eles, ou preencha a coluna com
+-- um UPDATE antes.
+
+ALTER TABLE leads
+    ADD COLUMN tenant VARCHAR(64) NULL AFTER etapa,
+    ALGORITHM=INSTANT;
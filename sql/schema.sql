@@ -0,0 +1,51 @@
+-- Esquema base do banco (MySQL 8.0), antes das migrações em sql/migrations/.
+--
+-- Usado para subir um banco do zero (ex.: docker-compose.bench.yml); em
+-- produção as tabelas já existem e só as migrações são aplicadas.
+--
+-- O upsert dos webhooks (ON DUPLICATE KEY UPDATE) depende das chaves únicas
+-- de email e telefone (a do telefone passa para a phone_key nas migrações
+-- 006/007).
+
+CREATE TABLE IF NOT EXISTS leads (
+    id                 BIGINT UNSIGNED  NOT NULL AUTO_INCREMENT,
+    nome               VARCHAR(150)     NOT NULL,
+    email              VARCHAR(150)     NULL,
+    telefone           VARCHAR(32)      NULL,
+    origem             VARCHAR(32)      NOT NULL DEFAULT 'outro',
+    tags               JSON             NULL,
+    externo_id         VARCHAR(100)     NULL,
+    score              INT              NOT NULL DEFAULT 0,
+    etapa              VARCHAR(32)      NOT NULL DEFAULT 'novo',
+    servico_interesse  VARCHAR(64)      NULL,
+    regiao_corpo       VARCHAR(255)     NULL,
+    disponibilidade    VARCHAR(255)     NULL,
+    created_at         TIMESTAMP        NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at         TIMESTAMP        NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id),
+    UNIQUE KEY uk_leads_email (email),
+    UNIQUE KEY uk_leads_telefone (telefone)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS lead_events (
+    id          BIGINT UNSIGNED  NOT NULL AUTO_INCREMENT,
+    lead_id     BIGINT UNSIGNED  NOT NULL,
+    tipo        VARCHAR(32)      NOT NULL,
+    payload     JSON             NULL,
+    created_at  TIMESTAMP        NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id),
+    KEY idx_lead_events_lead (lead_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS historico_servicos (
+    id            BIGINT UNSIGNED  NOT NULL AUTO_INCREMENT,
+    lead_id       BIGINT UNSIGNED  NOT NULL,
+    servico       VARCHAR(32)      NOT NULL,
+    data_servico  DATETIME         NOT NULL,
+    status        VARCHAR(32)      NOT NULL DEFAULT 'lead',
+    ticket        DECIMAL(10, 2)   NULL,
+    observacoes   TEXT             NULL,
+    created_at    TIMESTAMP        NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id),
+    KEY idx_historico_servicos_lead (lead_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
@@ -0,0 +1,37 @@
+import threading
+import time
+
+from mysql.connector import pooling
+
+from api import db
+from api.pooling import PoolTimeout
+
+
+def test_pool_sincrono_e_criado_uma_vez_com_threads_concorrentes(monkeypatch):
+    criados = []
+
+    class _Pool:
+        def __init__(self, **kwargs):
+            time.sleep(0.05)  # abrir conexões demora: as outras threads chegam antes
+            criados.append(self)
+
+    monkeypatch.setattr(pooling, "MySQLConnectionPool", _Pool)
+    monkeypatch.setattr(db, "pool", None)
+
+    vistos = []
+    threads = [threading.Thread(target=lambda: vistos.append(db._get_pool())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(criados) == 1
+    assert all(visto is criados[0] for visto in vistos)
+
+
+def test_ping_com_pool_esgotado_devolve_false(monkeypatch):
+    def get_conn():
+        raise PoolTimeout("Nenhuma conexão livre no pool")
+
+    monkeypatch.setattr(db, "get_conn", get_conn)
+    assert db.ping() is False
@@ -0,0 +1,123 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from api.services import campanha, fila_envio, messaging
+from api.services.fila_envio import FilaCheia, FilaEnvio
+
+
+class _Evolution(BaseHTTPRequestHandler):
+    """Evolution API de mentira: guarda cada POST e responde 201."""
+
+    recebidos = []
+
+    def do_POST(self):
+        corpo = self.rfile.read(int(self.headers["Content-Length"]))
+        self.recebidos.append((self.headers["apikey"], json.loads(corpo)))
+        resposta = b'{"key": {"id": "abc"}}'
+        self.send_response(201)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(resposta)))
+        self.end_headers()
+        self.wfile.write(resposta)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def evolution(monkeypatch):
+    _Evolution.recebidos = []
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), _Evolution)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    monkeypatch.setattr(messaging, "WHATSAPP_API", f"http://127.0.0.1:{servidor.server_port}/message/sendText")
+    monkeypatch.setattr(messaging, "WHATSAPP_TOKEN", "segredo")
+    yield _Evolution.recebidos
+    servidor.shutdown()
+    servidor.server_close()
+
+
+class _Limite:
+    def __init__(self):
+        self.chaves = []
+
+    async def adquirir(self, chave=""):
+        self.chaves.append(chave)
+
+
+class _Eventos:
+    def __init__(self):
+        self.registrados = []
+
+    async def registrar(self, lead_id, tipo, payload=None, conn=None):
+        self.registrados.append((lead_id, tipo, payload))
+
+
+async def _com_cliente(corrotina):
+    # o cliente httpx fica preso ao event loop de cada asyncio.run
+    try:
+        return await corrotina
+    finally:
+        await messaging.fechar_cliente()
+
+
+def test_envio_async_fala_com_a_evolution(evolution):
+    result = asyncio.run(_com_cliente(messaging.send_whatsapp_async("5511999990000", "oi")))
+
+    assert result == {"status": 201, "detail": '{"key": {"id": "abc"}}'}
+    assert evolution == [("segredo", {
+        "number": "5511999990000", "text": "oi", "delay": 0, "presence": "composing",
+    })]
+
+
+def test_envio_async_sem_servidor_vira_erro(monkeypatch):
+    monkeypatch.setattr(messaging, "WHATSAPP_API", "http://127.0.0.1:9/message/sendText")
+    monkeypatch.setattr(messaging, "WHATSAPP_TOKEN", "segredo")
+
+    result = asyncio.run(_com_cliente(messaging.send_whatsapp_async("5511999990000", "oi")))
+
+    assert result["status"] == "error"
+
+
+def test_envio_sem_configuracao_fica_desabilitado(monkeypatch):
+    monkeypatch.setattr(messaging, "WHATSAPP_API", "")
+    assert asyncio.run(messaging.send_whatsapp_async("5511999990000", "oi"))["status"] == "disabled"
+
+
+def test_fila_envia_pelos_limites_e_registra_eventos(evolution, monkeypatch):
+    por_numero, global_, eventos = _Limite(), _Limite(), _Eventos()
+    monkeypatch.setattr(campanha, "limite_por_numero", por_numero)
+    monkeypatch.setattr(campanha, "limite_global", global_)
+    monkeypatch.setattr(fila_envio, "event_buffer", eventos)
+
+    async def rodar():
+        fila = FilaEnvio(maxsize=10, concorrencia=2)
+        await fila.iniciar()
+        ids = [fila.enfileirar(lead_id, f"55119999900{lead_id:02d}", "oi") for lead_id in (1, 2, 3)]
+        await fila.parar()
+        return ids
+
+    ids = asyncio.run(_com_cliente(rodar()))
+
+    assert sorted(por_numero.chaves) == ["5511999990001", "5511999990002", "5511999990003"]
+    assert global_.chaves == [""] * 3
+    assert len(evolution) == 3
+    assert sorted((lead_id, tipo, p["message_id"]) for lead_id, tipo, p in eventos.registrados) == [
+        (1, "mensagem_enviada", ids[0]),
+        (2, "mensagem_enviada", ids[1]),
+        (3, "mensagem_enviada", ids[2]),
+    ]
+
+
+def test_fila_cheia_recusa_mensagem():
+    async def rodar():
+        fila = FilaEnvio(maxsize=1, concorrencia=0)
+        await fila.iniciar()
+        fila.enfileirar(1, "5511999990001", "oi")
+        with pytest.raises(FilaCheia):
+            fila.enfileirar(2, "5511999990002", "oi")
+
+    asyncio.run(rodar())
@@ -0,0 +1,135 @@
+import asyncio
+
+import pytest
+
+from api.services import event_buffer as modulo
+from api.services.event_buffer import EventBuffer
+
+
+class _Banco:
+    """add_event/add_events_batch em memória; `liberado` segura as gravações."""
+
+    def __init__(self):
+        self.eventos = []
+        self.lotes = []
+        self.liberado = None
+
+    async def add_event(self, lead_id, tipo, payload=None, conn=None):
+        self.eventos.append((lead_id, tipo, payload, conn))
+
+    async def add_events_batch(self, eventos, conn=None):
+        if self.liberado is not None:
+            await self.liberado.wait()
+        self.lotes.append(list(eventos))
+        return len(self.lotes[-1])
+
+
+@pytest.fixture
+def banco(monkeypatch):
+    banco = _Banco()
+    monkeypatch.setattr(modulo, "add_event", banco.add_event)
+    monkeypatch.setattr(modulo, "add_events_batch", banco.add_events_batch)
+    return banco
+
+
+def test_modo_sync_grava_na_hora_na_conexao_recebida(banco):
+    buffer = EventBuffer(modo="sync")
+    conn = object()
+
+    async def rodar():
+        await buffer.iniciar()
+        await buffer.registrar(1, "mensagem_enviada", {"texto": "oi"}, conn=conn)
+        await buffer.registrar_lote([(2, "erro_envio", None)], conn=conn)
+        await buffer.parar()
+
+    asyncio.run(rodar())
+
+    assert buffer.sincrono
+    assert banco.eventos == [(1, "mensagem_enviada", {"texto": "oi"}, conn)]
+    assert banco.lotes == [[(2, "erro_envio", None)]]
+
+
+def test_grava_em_lotes_de_max_lote(banco):
+    buffer = EventBuffer(modo="buffer", max_lote=3, intervalo_ms=5000, capacidade=100)
+
+    async def rodar():
+        await buffer.iniciar()
+        await buffer.registrar_lote([(lead_id, "mensagem_enviada", None) for lead_id in range(6)])
+        # dois lotes cheios saem sem esperar o intervalo
+        for _ in range(100):
+            if len(banco.lotes) == 2:
+                break
+            await asyncio.sleep(0.01)
+        lotes = list(banco.lotes)
+        await buffer.parar()
+        return lotes
+
+    lotes = asyncio.run(rodar())
+
+    assert [[lead_id for lead_id, _, _ in lote] for lote in lotes] == [[0, 1, 2], [3, 4, 5]]
+    assert buffer.stats()["gravados"] == 6
+
+
+def test_grava_lote_incompleto_depois_do_intervalo(banco):
+    buffer = EventBuffer(modo="buffer", max_lote=100, intervalo_ms=20, capacidade=100)
+
+    async def rodar():
+        await buffer.iniciar()
+        await buffer.registrar(1, "mensagem_enviada")
+        await asyncio.sleep(0.2)
+        lotes = list(banco.lotes)
+        await buffer.parar()
+        return lotes
+
+    assert asyncio.run(rodar()) == [[(1, "mensagem_enviada", None)]]
+
+
+def test_buffer_cheio_segura_o_produtor(banco):
+    buffer = EventBuffer(modo="buffer", max_lote=1, intervalo_ms=1, capacidade=2)
+
+    async def rodar():
+        banco.liberado = asyncio.Event()
+        await buffer.iniciar()
+        # 1 evento preso na gravação + 2 na fila: o quarto espera espaço
+        for lead_id in range(3):
+            await buffer.registrar(lead_id, "mensagem_enviada")
+        quarto = asyncio.ensure_future(buffer.registrar(3, "mensagem_enviada"))
+        await asyncio.sleep(0.05)
+        preso = not quarto.done()
+
+        banco.liberado.set()
+        await asyncio.wait_for(quarto, 1)
+        await buffer.parar()
+        return preso
+
+    assert asyncio.run(rodar())
+    assert [lote[0][0] for lote in banco.lotes] == [0, 1, 2, 3]
+
+
+def test_parar_grava_o_que_estiver_pendente(banco):
+    buffer = EventBuffer(modo="buffer", max_lote=2, intervalo_ms=60_000, capacidade=100)
+
+    async def rodar():
+        await buffer.iniciar()
+        await buffer.registrar_lote([(lead_id, "mensagem_enviada", None) for lead_id in range(5)])
+        await buffer.parar()
+
+    asyncio.run(rodar())
+
+    assert sorted(lead_id for lote in banco.lotes for lead_id, _, _ in lote) == [0, 1, 2, 3, 4]
+    assert all(len(lote) <= 2 for lote in banco.lotes)
+    assert buffer.sincrono
+
+
+def test_tipo_invalido_e_recusado_no_registro(banco):
+    buffer = EventBuffer(modo="buffer")
+
+    async def rodar():
+        await buffer.iniciar()
+        try:
+            with pytest.raises(ValueError):
+                await buffer.registrar(1, "inexistente")
+        finally:
+            await buffer.parar()
+
+    asyncio.run(rodar())
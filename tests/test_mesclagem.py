@@ -0,0 +1,36 @@
+from api.repositories.leads import mesclar_leads
+
+
+class _Cursor:
+    def __init__(self, executados):
+        self.executados = executados
+
+    def execute(self, sql, params=None):
+        self.executados.append((" ".join(sql.split()), list(params or [])))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class _Conn:
+    def __init__(self):
+        self.executados = []
+
+    def cursor(self, **kwargs):
+        return _Cursor(self.executados)
+
+
+def test_mesclagem_passa_followups_sem_bater_na_chave_unica():
+    conn = _Conn()
+    mesclar_leads(1, [5, 9], {}, None, conn)
+    sqls = [sql for sql, _ in conn.executados]
+
+    # as regras repetidas saem antes do UPDATE de lead_id da followups
+    assert sqls[0].startswith("DELETE d FROM followups d JOIN followups o")
+    assert conn.executados[0][1] == [1, 5, 9, 5, 9]
+    repontar = sqls.index("UPDATE followups SET lead_id = %s WHERE lead_id IN (%s, %s)")
+    assert 0 < repontar < sqls.index("DELETE FROM leads WHERE id IN (%s, %s)")
+    assert conn.executados[repontar][1] == [1, 5, 9]
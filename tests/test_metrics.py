@@ -0,0 +1,35 @@
+import json
+import os
+
+from api.metrics import CounterColetado, GaugeColetado, Registro
+
+
+def _registro(hits, pendentes):
+    registro = Registro()
+    registro.registrar(CounterColetado("leads_api_lead_cache_hits_total", "Hits do cache de leads", (), lambda: [((), hits)]))
+    registro.registrar(GaugeColetado("leads_api_fila_envio_pendentes", "Mensagens na fila", (), lambda: [((), pendentes)]))
+    return registro
+
+
+def test_counter_coletado_sai_como_counter():
+    saida = _registro(7, 2).exportar()
+
+    assert "# TYPE leads_api_lead_cache_hits_total counter" in saida
+    assert "leads_api_lead_cache_hits_total 7" in saida
+    assert "# TYPE leads_api_fila_envio_pendentes gauge" in saida
+
+
+def test_counter_coletado_soma_os_processos_sem_label_worker(tmp_path):
+    # retrato de outro worker, que já saiu
+    outro = _registro(5, 9).retrato()
+    outro["pid"], outro["vivo"] = 1, False
+    with open(os.path.join(tmp_path, "1.json"), "w") as f:
+        json.dump(outro, f)
+
+    saida = _registro(7, 2)._exportar_processos(str(tmp_path))
+
+    assert "# TYPE leads_api_lead_cache_hits_total counter" in saida
+    assert "leads_api_lead_cache_hits_total 12" in saida
+    # gauge só do processo vivo, com o pid
+    assert f'leads_api_fila_envio_pendentes{{worker="{os.getpid()}"}} 2' in saida
+    assert 'worker="1"' not in saida
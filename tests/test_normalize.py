@@ -0,0 +1,29 @@
+import pytest
+
+from api.services.normalize import clean_phone, phone_key
+
+
+@pytest.mark.parametrize(
+    "raw, esperado",
+    [
+        ("(11) 99999-9999", 5511999999999),
+        ("+55 11 9999-9999", 5511999999999),
+        ("011 99999-9999", 5511999999999),
+        # dígitos soltos do que o telefone_e164 não reconheceu
+        ("99999-9999", None),
+        ("123", None),
+        # fora do Brasil não tem como ser separado de dígitos soltos
+        ("+1 999 999 9999", None),
+        ("+44 7911 123456", None),
+        (None, None),
+        ("", None),
+    ],
+)
+def test_phone_key_so_de_e164(raw, esperado):
+    assert phone_key(clean_phone(raw)) == esperado
+
+
+def test_phone_key_nao_renormaliza():
+    # o valor tem de já ser o canônico: não cai no DDD 19 por acaso
+    assert phone_key("19999999999") is None
+    assert phone_key("5519999999999") == 5519999999999
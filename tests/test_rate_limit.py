@@ -0,0 +1,54 @@
+import asyncio
+import time
+
+from api.repositories.aio import limites
+from api.services.rate_limit import LimiteCompartilhado
+
+
+class _Limites:
+    """GCRA da tabela limites_envio em memória, contando as idas ao banco."""
+
+    def __init__(self):
+        self.tat = {}
+        self.reservas = []
+
+    async def reservar(self, chave, intervalo_us):
+        agora = int(time.monotonic() * 1_000_000)
+        self.tat[chave] = max(self.tat.get(chave, 0), agora) + intervalo_us
+        self.reservas.append((chave, intervalo_us))
+        return self.tat[chave] - agora
+
+    async def limpar(self, prefixo, limite=1000):
+        return 0
+
+
+def test_limite_global_reserva_em_bloco(monkeypatch):
+    banco = _Limites()
+    monkeypatch.setattr(limites, "reservar", banco.reservar)
+    limite = LimiteCompartilhado("teste:global", 200, capacidade=1, bloco=5)
+
+    async def medir():
+        inicio = time.monotonic()
+        for _ in range(10):
+            await limite.adquirir()
+        return time.monotonic() - inicio
+
+    duracao = asyncio.run(medir())
+
+    # 10 envios, 2 idas ao banco de 5 intervalos cada
+    assert banco.reservas == [("teste:global", 25_000)] * 2
+    # a 200/s, 10 envios sem burst levam ao menos 9 intervalos
+    assert duracao >= 9 * 0.005 - 0.001
+
+
+def test_limite_por_numero_reserva_um_envio_por_vez(monkeypatch):
+    banco = _Limites()
+    monkeypatch.setattr(limites, "reservar", banco.reservar)
+    limite = LimiteCompartilhado("teste:numero:", 1000, capacidade=3, bloco=5)
+
+    async def enviar():
+        for _ in range(3):
+            await limite.adquirir("5511999990000")
+
+    asyncio.run(enviar())
+    assert banco.reservas == [("teste:numero:5511999990000", 1000)] * 3
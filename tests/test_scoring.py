@@ -0,0 +1,60 @@
+import json
+
+import pytest
+
+from api.services.scoring import _Palavras, compute_score
+from bench.scoring import CASOS, compute_score_antigo
+
+# Os casos de bench/fixtures/scoring_casos.json, com o score da função
+# antiga (compute_score_antigo) como esperado.
+CASOS_PARIDADE = [(caso, caso.pop("esperado")) for caso in json.loads(CASOS.read_text(encoding="utf-8"))]
+
+
+@pytest.mark.parametrize("caso, esperado", CASOS_PARIDADE)
+def test_paridade_com_funcao_antiga(caso, esperado):
+    assert compute_score_antigo(**caso) == esperado
+    assert compute_score(**caso) == esperado
+
+
+def test_paridade_vetorizado():
+    pytest.importorskip("numpy")
+    from api.services.scoring_vetorizado import calcular_scores
+
+    casos = [caso for caso, _ in CASOS_PARIDADE]
+    vetor = calcular_scores(
+        ["11999999999" if c["has_phone"] else None for c in casos],
+        ["a@b.com" if c["has_email"] else None for c in casos],
+        [json.dumps(c["tags"]) if c["tags"] is not None else None for c in casos],
+        [c["servico_interesse"] for c in casos],
+        [c["regiao_corpo"] for c in casos],
+        [c["disponibilidade"] for c in casos],
+    )
+    assert [int(v) for v in vetor] == [esperado for _, esperado in CASOS_PARIDADE]
+
+
+def test_palavras_sobrepostas_e_contidas():
+    palavras = _Palavras({"braco": 10, "coxa": 15, "corpo": 5, "corpo todo": 15, "aba": 1, "bac": 20})
+    assert palavras.melhor["bracoxa"] == 15
+    assert palavras.melhor["CORPO TODO"] == 15
+    assert palavras.melhor["Braço"] == 10
+    # "aba" casa e esconde o "bac" que começa no último "b"
+    assert palavras.melhor["abac"] == 20
+    assert palavras.distintas["corpo todo e bracoxa"] == 4
+
+
+def test_palavras_grafias():
+    palavras = _Palavras({"manha": 1, "tarde": 1, "sabado": 1})
+    assert palavras.distintas["manhã ou manha"] == 2
+    assert palavras.distintas["Manhã ou manhã"] == 1
+    assert palavras.distintas["sábado à tarde 🙂 de manhã"] == 3
+    # fora do Latin-1 a posição das grafias continua certa
+    assert palavras.distintas["🙂 manhã 🙂 manha"] == 2
+    assert palavras.distintas[None] == 0
+    assert palavras.distintas[""] == 0
+
+
+def test_palavras_memo_limitado():
+    palavras = _Palavras({"tarde": 1})
+    for n in range(palavras._MEMO_MAX + 10):
+        assert palavras.distintas[f"tarde {n}"] == 1
+    assert len(palavras.distintas) <= palavras._MEMO_MAX
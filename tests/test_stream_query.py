@@ -0,0 +1,82 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+from api import db_async
+
+
+class _Cursor:
+    def __init__(self, conn, linhas=()):
+        self.conn = conn
+        self.linhas = list(linhas)
+
+    async def execute(self, sql, params=None):
+        self.conn.executados.append(sql)
+
+    async def fetchmany(self, tamanho):
+        bloco, self.linhas = self.linhas[:tamanho], self.linhas[tamanho:]
+        return bloco
+
+    async def close(self):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class _Conn:
+    def __init__(self, linhas):
+        self.linhas = linhas
+        self.executados = []
+        self.fechada = False
+
+    def cursor(self, *classe):
+        # o cursor do stream (SSDictCursor) é aguardado; o da restauração, usado com async with
+        cur = _Cursor(self, self.linhas if classe else ())
+        if classe:
+            async def criar():
+                return cur
+            return criar()
+        return cur
+
+    def close(self):
+        self.fechada = True
+
+
+def _com_conexao(monkeypatch, conn):
+    @asynccontextmanager
+    async def get_conn():
+        yield conn
+
+    monkeypatch.setattr(db_async, "get_conn", get_conn)
+
+
+def test_stream_lido_ate_o_fim_restaura_o_timeout_da_sessao(monkeypatch):
+    conn = _Conn([{"id": i} for i in range(5)])
+    _com_conexao(monkeypatch, conn)
+
+    async def ler():
+        return [bloco async for bloco in db_async.stream_query("SELECT id FROM leads", (), 2)]
+
+    blocos = asyncio.run(ler())
+
+    assert [len(bloco) for bloco in blocos] == [2, 2, 1]
+    assert conn.executados[-1] == "SET SESSION net_write_timeout = @@GLOBAL.net_write_timeout"
+    assert not conn.fechada
+
+
+def test_stream_interrompido_fecha_a_conexao(monkeypatch):
+    conn = _Conn([{"id": i} for i in range(5)])
+    _com_conexao(monkeypatch, conn)
+
+    async def ler_um_bloco():
+        blocos = db_async.stream_query("SELECT id FROM leads", (), 2)
+        await blocos.__anext__()
+        await blocos.aclose()
+
+    asyncio.run(ler_um_bloco())
+
+    assert conn.fechada
+    assert "SET SESSION net_write_timeout = @@GLOBAL.net_write_timeout" not in conn.executados